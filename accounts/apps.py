@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        # 用户保存 / 删除时清除用户与资料缓存
+        from . import signals  # noqa: F401
@@ -0,0 +1,29 @@
+# accounts/backends.py
+"""
+带缓存的认证后端。
+
+AuthenticationMiddleware 在每个已登录请求中都会按 session 里的用户 ID 查询一次用户表。
+CachedModelBackend 把用户对象缓存在 Django 缓存中，用户保存 / 删除时
+（包括修改密码、更新 last_login）由 accounts/signals.py 清除，保证权限和
+会话校验不会使用过期数据。
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY_PREFIX = 'accounts:user:'
+
+
+def user_cache_key(user_id):
+    return f"{USER_KEY_PREFIX}{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, timeout=getattr(settings, 'ACCOUNTS_USER_CACHE_TIMEOUT', 600))
+        return user
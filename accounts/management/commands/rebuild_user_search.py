@@ -0,0 +1,32 @@
+# accounts/management/commands/rebuild_user_search.py
+"""
+重新计算所有用户的姓名拼音列，并让各进程的用户搜索索引重建（见 accounts/search.py）。
+批量导入用户（bulk_create / update 不经过 CustomUser.save()）之后运行：
+
+    python manage.py rebuild_user_search
+    python manage.py rebuild_user_search --query zhang   # 重建后试搜一次
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import search
+
+
+class Command(BaseCommand):
+    help = "重新计算用户的姓名拼音并重建用户搜索索引。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', help="重建后用该关键词搜索一次，显示结果与耗时")
+
+    def handle(self, *args, query, **options):
+        updated = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"已更新 {updated} 个用户的拼音。"))
+        if query:
+            search.search_users(query)  # 首次搜索会建立进程内索引，不计入耗时
+            started = time.perf_counter()
+            profiles = search.search_users(query, limit=20, active_only=False)
+            elapsed = (time.perf_counter() - started) * 1000
+            for profile in profiles:
+                self.stdout.write(f"#{profile.id} {profile.username} {profile.display_name}")
+            self.stdout.write(f"共 {len(profiles)} 个结果，耗时 {elapsed:.1f} ms。")
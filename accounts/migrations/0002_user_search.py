@@ -0,0 +1,96 @@
+# Generated by Django 5.2 on 2026-10-19 04:19
+
+import re
+
+from django.db import migrations, models
+
+# PostgreSQL 上的搜索索引（见 accounts/search.py）：
+#   * GIN 三元组索引：三个字符以上的关键词按包含匹配 (icontains 比较的是 UPPER(列)，索引建在同一表达式上)；
+#   * btree text_pattern_ops 索引：一两个字符的关键词按前缀匹配 (istartswith)。
+# name_pinyin / name_initials 的 db_index 已带有 varchar_pattern_ops 的前缀索引。
+POSTGRES_INDEXES = {
+    'accounts_user_username_trgm': 'USING gin (UPPER("username"::text) gin_trgm_ops)',
+    'accounts_user_display_name_trgm': 'USING gin (UPPER("display_name"::text) gin_trgm_ops)',
+    'accounts_user_name_pinyin_trgm': 'USING gin ("name_pinyin" gin_trgm_ops)',
+    'accounts_user_name_initials_trgm': 'USING gin ("name_initials" gin_trgm_ops)',
+    'accounts_user_username_prefix': '(UPPER("username"::text) text_pattern_ops)',
+    'accounts_user_display_name_prefix': '(UPPER("display_name"::text) text_pattern_ops)',
+}
+
+
+# 迁移只依赖 pypinyin，不导入 accounts.search：以后修改搜索模块不会影响旧迁移。
+# 计算方式与写入迁移时的 accounts.search.pinyin_keys() 相同
+_CJK = re.compile(r'[㐀-鿿]')
+_PLAIN = '\x00'
+PINYIN_MAX_LENGTH = 255
+
+
+def pinyin_keys(name):
+    """中文姓名的 (拼音全拼, 首字母)，不含汉字或未安装 pypinyin 时返回 ('', '')。"""
+    if not name or not _CJK.search(name):
+        return '', ''
+    try:
+        from pypinyin import lazy_pinyin
+    except ImportError:
+        return '', ''
+    syllables = lazy_pinyin(name, errors=lambda chars: [_PLAIN + chars])
+    full = ''.join(syllable.lstrip(_PLAIN) for syllable in syllables)
+    initials = ''.join(
+        syllable[1:] if syllable.startswith(_PLAIN) else syllable[:1] for syllable in syllables
+    )
+    return (''.join(full.lower().split())[:PINYIN_MAX_LENGTH],
+            ''.join(initials.lower().split())[:PINYIN_MAX_LENGTH])
+
+
+def fill_pinyin(apps, schema_editor):
+    User = apps.get_model('accounts', 'CustomUser')
+    rows = []
+    for pk, username, display_name in User.objects.values_list('pk', 'username', 'display_name').iterator():
+        pinyin, initials = pinyin_keys(display_name or username)
+        if pinyin:
+            rows.append((pinyin, initials, pk))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'UPDATE "accounts_customuser" SET "name_pinyin" = %s, "name_initials" = %s WHERE "id" = %s', rows,
+        )
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in POSTGRES_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "accounts_customuser" {definition}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='name_initials',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='姓名拼音首字母'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='name_pinyin',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='姓名拼音'),
+        ),
+        migrations.RunPython(fill_pinyin, noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -17,6 +17,11 @@ class CustomUser(AbstractUser):
     )
     # 昵称或真实姓名，这个字段可以用来显示中文
     display_name = models.CharField(max_length=150, blank=True, null=True, verbose_name="显示名称")
+    # 中文姓名的拼音全拼与首字母，保存时自动计算，用于按拼音搜索用户（见 accounts/search.py）
+    name_pinyin = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True,
+                                   verbose_name="姓名拼音")
+    name_initials = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True,
+                                     verbose_name="姓名拼音首字母")
     # 可以添加其他字段，例如头像、电话等
 
     class Meta:
@@ -25,4 +30,14 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         # 优先显示 display_name，否则显示 username
-        return self.display_name or self.username
\ No newline at end of file
+        return self.display_name or self.username
+
+    def save(self, *args, **kwargs):
+        # 只在名称可能变化时重新计算拼音（登录时只更新 last_login，不必计算）
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'username', 'display_name'} & set(update_fields):
+            from .search import pinyin_keys
+            self.name_pinyin, self.name_initials = pinyin_keys(self.display_name or self.username)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'name_pinyin', 'name_initials'}
+        super().save(*args, **kwargs)
@@ -0,0 +1,58 @@
+# accounts/profiles.py
+"""
+用户资料缓存：只包含模板和导出需要的 username / display_name。
+
+导出、名单渲染等场景往往只需要显示名，这里按用户 ID 批量从缓存读取，
+未命中的部分用一次 values() 查询补齐，不实例化完整的用户对象。
+用户保存 / 删除时由 accounts/signals.py 让对应缓存失效。
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CustomUser
+
+PROFILE_KEY_PREFIX = 'accounts:profile:'
+
+
+@dataclass(frozen=True)
+class Profile:
+    id: int
+    username: str
+    display_name: str
+
+    @property
+    def label(self):
+        # 与模板中 {{ user.display_name|default:user.username }} 保持一致
+        return self.display_name or self.username
+
+
+def _profile_key(user_id):
+    return f"{PROFILE_KEY_PREFIX}{user_id}"
+
+
+def get_profiles(user_ids):
+    """批量获取用户资料，返回 {user_id: Profile}。不存在的用户不会出现在结果中。"""
+    user_ids = set(user_ids)
+    keys = {_profile_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(list(keys))
+    profiles = {keys[key]: Profile(*value) for key, value in cached.items()}
+
+    missing = user_ids - profiles.keys()
+    if missing:
+        rows = CustomUser.objects.filter(pk__in=missing).values_list('pk', 'username', 'display_name')
+        fresh = {}
+        for pk, username, display_name in rows:
+            profiles[pk] = Profile(pk, username, display_name or '')
+            fresh[_profile_key(pk)] = (pk, username, display_name or '')
+        cache.set_many(fresh, timeout=getattr(settings, 'ACCOUNTS_PROFILE_CACHE_TIMEOUT', 3600))
+    return profiles
+
+
+def get_profile(user_id):
+    return get_profiles([user_id]).get(user_id)
+
+
+def invalidate_profile(user_id):
+    cache.delete(_profile_key(user_id))
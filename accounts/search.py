@@ -0,0 +1,272 @@
+# accounts/search.py
+"""
+用户搜索：后台的发起人 / 参与者自动补全、用户列表搜索，以及选择参与者用的玩家搜索接口。
+
+原来的 search_fields 对 username / display_name 做 icontains，每次按键都要全表扫描。这里改为：
+  * 中文姓名额外保存拼音全拼 (name_pinyin) 与首字母 (name_initials)，保存用户时由
+    CustomUser.save() 计算，输入 zhangsan / zs 也能找到「张三」。拼音依赖 pypinyin，未安装时两列为空；
+    bulk_create 等不经过 save() 的写入之后运行 manage.py rebuild_user_search 补齐；
+  * PostgreSQL：按 username / display_name / 拼音匹配。不超过两个字符的关键词（两个汉字除外）按前缀匹配，
+    走 btree (text_pattern_ops) 索引；更长的关键词按包含匹配，走 pg_trgm 的 GIN 三元组索引
+    （索引见 accounts/migrations/0002_user_search.py）；
+  * 其他数据库（本地调试用的 SQLite）：在本进程内维护按关键字排序的前缀索引，用二分查找按前缀匹配；
+    中文显示名另外索引去掉首字后的各个后缀，输入名字（如「三丰」）也能找到；
+    用户的名称、状态变化或增删时递增缓存中的版本号，各进程在下次搜索时发现版本变化后重建索引。
+
+结果按「完全相同、前缀、包含」排序，同一类中显示名较短的在前。search_users() 只返回最匹配的前 limit 个，
+用于自动补全与玩家搜索；后台列表页需要全部匹配的用户（分页与计数要准确），用 user_filter()
+生成不限数量的包含匹配条件（PostgreSQL 上三个字符以上的关键词走三元组索引）。
+"""
+import bisect
+import functools
+import heapq
+import re
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Q, Value, When
+
+from .models import CustomUser
+from .profiles import Profile
+
+VERSION_KEY = 'accounts:search:version'
+# 后台自动补全最多返回的用户数
+ADMIN_MAX_RESULTS = 200
+# 不超过该长度的关键词按前缀匹配（三元组索引对更短的关键词无效）
+PREFIX_MAX_LENGTH = 2
+PINYIN_MAX_LENGTH = 255
+# 不超过该长度的中文显示名在进程内索引中额外索引后缀
+SUFFIX_MAX_LENGTH = 8
+
+_CJK = re.compile(r'[㐀-鿿]')
+_PLAIN = '\x00'
+
+_lock = threading.Lock()
+_index = None
+
+
+@functools.lru_cache(maxsize=4096)
+def pinyin_keys(name):
+    """
+    中文姓名的 (拼音全拼, 首字母)，均为小写、去掉空白，例如「张三丰」为 ('zhangsanfeng', 'zsf')。
+    不含汉字的名称、或未安装 pypinyin 时返回 ('', '')。
+    """
+    if not name or not _CJK.search(name):
+        return '', ''
+    try:
+        from pypinyin import lazy_pinyin
+    except ImportError:
+        return '', ''
+    # 非汉字部分原样保留并加上标记，首字母只取汉字拼音的第一个字母
+    syllables = lazy_pinyin(name, errors=lambda chars: [_PLAIN + chars])
+    full = ''.join(syllable.lstrip(_PLAIN) for syllable in syllables)
+    initials = ''.join(
+        syllable[1:] if syllable.startswith(_PLAIN) else syllable[:1] for syllable in syllables
+    )
+    return (''.join(full.lower().split())[:PINYIN_MAX_LENGTH],
+            ''.join(initials.lower().split())[:PINYIN_MAX_LENGTH])
+
+
+def normalize(query):
+    return ' '.join(query.split()).lower()
+
+
+def _rank(term, profile, pinyin, initials):
+    """排序键 (匹配类别, 显示名长度, 用户ID)，匹配类别 0 为完全相同，1 为前缀，2 为包含。"""
+    keys = [key for key in (profile.username.lower(), profile.display_name.lower(), pinyin, initials) if key]
+    if term in keys:
+        kind = 0
+    elif any(key.startswith(term) for key in keys):
+        kind = 1
+    else:
+        kind = 2
+    return kind, len(profile.label), profile.id
+
+
+# --- PostgreSQL ---
+
+def _search_database(term, limit, active_only):
+    # 两个汉字通常就是名字（如「三丰」），也按包含匹配；此时三元组索引用不上，退化为扫描显示名
+    if len(term) < PREFIX_MAX_LENGTH or (len(term) == PREFIX_MAX_LENGTH and not _CJK.search(term)):
+        lookup, case_insensitive = 'startswith', 'istartswith'
+    else:
+        lookup, case_insensitive = 'contains', 'icontains'
+    queryset = CustomUser.objects.filter(
+        Q(**{f'username__{case_insensitive}': term})
+        | Q(**{f'display_name__{case_insensitive}': term})
+        | Q(**{f'name_pinyin__{lookup}': term})
+        | Q(**{f'name_initials__{lookup}': term})
+    )
+    if active_only:
+        queryset = queryset.filter(is_active=True)
+    # 完全相同的排在最前，再多取一些候选行在内存中排序后截断
+    exact = Q(username__iexact=term) | Q(display_name__iexact=term) | Q(name_pinyin=term) | Q(name_initials=term)
+    rows = queryset.annotate(
+        exact=Case(When(exact, then=Value(0)), default=Value(1)),
+    ).order_by('exact').values_list('pk', 'username', 'display_name', 'name_pinyin', 'name_initials')[:limit * 5]
+    ranked = sorted(
+        (_rank(term, profile, pinyin, initials), profile)
+        for profile, pinyin, initials in (
+            (Profile(pk, username, display_name or ''), pinyin, initials)
+            for pk, username, display_name, pinyin, initials in rows
+        )
+    )
+    return [profile for _, profile in ranked[:limit]]
+
+
+# --- 进程内前缀索引 ---
+
+class PrefixIndex:
+    """
+    所有用户名称关键字（用户名、显示名、拼音、首字母）的有序列表，按前缀二分查找。
+    中文显示名的后缀另存一个有序列表，通过后缀命中的算作「包含」，只在前缀命中不足 limit 个用户时查找。
+    """
+
+    # 每个列表最多扫描 limit 的多少倍个关键字，在其中排序后截断（与数据库查询多取候选行相同）
+    OVERFETCH = 5
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.profiles = {}
+        self.inactive = set()
+        names, suffixes = [], []
+        for pk, username, display_name, pinyin, initials, is_active in rows:
+            display_name = display_name or ''
+            self.profiles[pk] = Profile(pk, username, display_name)
+            if not is_active:
+                self.inactive.add(pk)
+            for key in {username.lower(), display_name.lower(), pinyin, initials}:
+                if key:
+                    names.append((key, pk))
+            if pinyin and len(display_name) <= SUFFIX_MAX_LENGTH:
+                for start in range(1, len(display_name)):
+                    suffixes.append((display_name[start:], pk))
+        self.names = self._sorted(names)
+        self.suffixes = self._sorted(suffixes)
+
+    @staticmethod
+    def _sorted(entries):
+        # 只按关键字排序（比较元组要慢得多）
+        entries.sort(key=lambda entry: entry[0])
+        return [entry[0] for entry in entries], [entry[1] for entry in entries]
+
+    def _scan(self, entries, term, limit, active_only, kind, found):
+        """
+        扫描前缀为 term 的关键字，把命中的用户及排序键记入 found。
+        有序列表中完全相同的关键字排在最前，最多扫描 limit * OVERFETCH 个关键字。
+        """
+        keys, ids = entries
+        position = bisect.bisect_left(keys, term)
+        stop = min(len(keys), position + limit * self.OVERFETCH)
+        while position < stop and keys[position].startswith(term):
+            pk = ids[position]
+            if not (active_only and pk in self.inactive):
+                rank = (0 if kind == 1 and keys[position] == term else kind, len(self.profiles[pk].label), pk)
+                found[pk] = min(found.get(pk, rank), rank)
+            position += 1
+
+    def search(self, term, limit, active_only):
+        found = {}
+        self._scan(self.names, term, limit, active_only, 1, found)
+        if len(found) < limit:
+            self._scan(self.suffixes, term, limit, active_only, 2, found)
+        return [self.profiles[pk] for pk in heapq.nsmallest(limit, found, key=found.get)]
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        # add 失败说明其他进程刚刚写入，重新读取一次
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _prefix_index():
+    global _index
+    version = _current_version()
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                rows = CustomUser.objects.values_list(
+                    'pk', 'username', 'display_name', 'name_pinyin', 'name_initials', 'is_active',
+                )
+                _index = PrefixIndex(version, rows.iterator(chunk_size=5000))
+            index = _index
+    return index
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def invalidate():
+    """
+    用户名称、状态变化或增删后调用（见 accounts/signals.py），各进程的前缀索引在下次搜索时重建。
+    版本号在事务提交后才递增，否则并发的搜索可能用未提交前的数据建立新版本的索引。
+    """
+    transaction.on_commit(_bump_version)
+
+
+# --- 对外接口 ---
+
+def search_users(query, limit=10, active_only=True):
+    """按用户名、显示名或拼音搜索用户，返回按匹配程度排序的 Profile 列表。"""
+    term = normalize(query)
+    if not term:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_database(term, limit, active_only)
+    return _prefix_index().search(term, limit, active_only)
+
+
+def search_user_ids(query, limit=ADMIN_MAX_RESULTS, active_only=False):
+    return [profile.id for profile in search_users(query, limit, active_only)]
+
+
+def user_filter(query, prefix=''):
+    """
+    按用户名、显示名（不区分大小写）或拼音包含关键词匹配用户的 Q 对象，不限数量，可直接用于 filter()。
+    prefix 为关联路径，例如 'creator__'。PostgreSQL 上 icontains 比较 UPPER(列)，
+    三个字符以上的关键词走迁移中建在同一表达式上的三元组索引。
+    """
+    term = normalize(query)
+    return (
+        Q(**{f'{prefix}username__icontains': term})
+        | Q(**{f'{prefix}display_name__icontains': term})
+        | Q(**{f'{prefix}name_pinyin__contains': term})
+        | Q(**{f'{prefix}name_initials__contains': term})
+    )
+
+
+def _update_pinyin(rows):
+    """rows 为 (拼音, 首字母, 用户ID)。bulk_update 生成的 CASE 语句在上万行时很慢，这里逐行 executemany。"""
+    table = connection.ops.quote_name(CustomUser._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'UPDATE {table} SET "name_pinyin" = %s, "name_initials" = %s WHERE "id" = %s', rows)
+
+
+def rebuild(batch_size=1000):
+    """重新计算所有用户的拼音列，返回更新的用户数。"""
+    updated = 0
+    batch = []
+    users = CustomUser.objects.values_list('pk', 'username', 'display_name', 'name_pinyin', 'name_initials')
+    with transaction.atomic():
+        for pk, username, display_name, pinyin, initials in users.order_by('pk').iterator(chunk_size=batch_size):
+            keys = pinyin_keys(display_name or username)
+            if keys != (pinyin, initials):
+                batch.append((*keys, pk))
+            if len(batch) >= batch_size:
+                _update_pinyin(batch)
+                updated += len(batch)
+                batch = []
+        _update_pinyin(batch)
+    invalidate()
+    return updated + len(batch)
@@ -0,0 +1,22 @@
+# accounts/signals.py
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .backends import user_cache_key
+from .models import CustomUser
+from .profiles import invalidate_profile
+
+# 这些字段变化时用户搜索的进程内索引需要重建
+SEARCH_FIELDS = {'username', 'display_name', 'is_active'}
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+    invalidate_profile(instance.pk)
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        search.invalidate()
@@ -1,3 +1,101 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import search
+from booking.models import Booking, Store
+from .models import CustomUser
+
+# 测试不依赖 Redis：缓存改用进程内的 LocMemCache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# 测试中创建的用户很多，用最快的密码哈希
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PASSWORD_HASHERS=FAST_HASHERS)
+class PrefixIndexSearchTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def create_users(self, *names):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [
+                CustomUser.objects.create_user(f"user{i}", password='pw', display_name=name)
+                for i, name in enumerate(names)
+            ]
+
+    def labels(self, query, limit=10):
+        return [profile.label for profile in search.search_users(query, limit)]
+
+    def test_prefix_hits_rank_before_suffix_hits(self):
+        # 「张三」的后缀「三」在有序列表中排在「三丰」之前，不能因此挤掉前缀命中
+        self.create_users("张三", "李三", "三丰", "三娘子")
+        self.assertEqual(self.labels("三", limit=2), ["三丰", "三娘子"])
+        self.assertEqual(self.labels("三"), ["三丰", "三娘子", "张三", "李三"])
+
+    def test_exact_match_ranks_first(self):
+        self.create_users("王小明", "王明")
+        self.assertEqual(self.labels("王明", limit=1), ["王明"])
+
+    def test_pinyin_and_initials(self):
+        self.create_users("张三丰", "赵四")
+        self.assertEqual(self.labels("zhangsan"), ["张三丰"])
+        # 「赵四」的首字母与关键词完全相同，排在前缀命中的「张三丰」之前
+        self.assertEqual(self.labels("zs"), ["赵四", "张三丰"])
+
+    def test_rename_rebuilds_index_after_commit(self):
+        user, = self.create_users("张三")
+        self.assertEqual(self.labels("张"), ["张三"])
+        user.display_name = "李四"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.labels("张"), [])
+        self.assertEqual(self.labels("李"), ["李四"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS)
+class AdminUserSearchTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser("admin", password='pw')
+        self.client.force_login(self.admin)
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f"zhang{i:03d}", display_name=f"张{i:03d}") for i in range(search.ADMIN_MAX_RESULTS + 5)
+        ])
+
+    def changelist_count(self, url, query):
+        response = self.client.get(url, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'].result_count
+
+    def test_changelist_is_not_capped(self):
+        url = reverse('admin:accounts_customuser_changelist')
+        self.assertEqual(self.changelist_count(url, "zhang"), search.ADMIN_MAX_RESULTS + 5)
+
+    def test_short_term_matches_substrings(self):
+        # 一两个字符的关键词也按包含匹配，与原来的 icontains 相同
+        url = reverse('admin:accounts_customuser_changelist')
+        self.assertEqual(self.changelist_count(url, "ng"), search.ADMIN_MAX_RESULTS + 5)
+        self.assertEqual(self.changelist_count(url, "01"), 13)
+
+    def test_booking_changelist_matches_all_creators(self):
+        store = Store.objects.create(name="测试门店", address="地址")
+        start = timezone.now() + datetime.timedelta(days=1)
+        Booking.objects.bulk_create([
+            Booking(creator=user, store=store, start_time=start, end_time=start + datetime.timedelta(hours=3), num_games=4)
+            for user in CustomUser.objects.filter(username__startswith="zhang")
+        ])
+        url = reverse('admin:booking_booking_changelist')
+        self.assertEqual(self.changelist_count(url, "ang"), search.ADMIN_MAX_RESULTS + 5)
+
+    def test_autocomplete_uses_ranked_search(self):
+        with mock.patch.object(search, 'search_user_ids', wraps=search.search_user_ids) as search_user_ids:
+            response = self.client.get(reverse('admin:autocomplete'), {
+                'app_label': 'booking', 'model_name': 'booking', 'field_name': 'creator', 'term': "zhang",
+            })
+        self.assertEqual(response.status_code, 200)
+        search_user_ids.assert_called_once_with("zhang")
+        self.assertTrue(response.json()['results'])
@@ -1,31 +1,31 @@
 # booking/admin.py
 
 from django.contrib import admin
-from django.db.models import Count, Q
+from django.db.models import Q, Subquery
 from django.utils import timezone
 from django.conf import settings 
 from django import forms
 from django.contrib.admin.helpers import ActionForm
+from django.db import transaction
 from django.shortcuts import redirect
-from django.urls import reverse
-from collections import defaultdict
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 import datetime
+from accounts import search as user_search
 # 从 accounts.models 导入 CustomUser（确保路径正确）
 from accounts.models import CustomUser 
-from .models import Store, MahjongTable, Booking
-
-# 新增导入：处理 HTTP 响应和 Excel 文件
-from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from notifications import outbox
+from .models import Store, MahjongTable, Booking, BookingEvent, ChangeFeedConsumer, ChangeFeedEntry
+from . import bulk, changes, conflicts, history, metadata, occupancy
+from .caching import bump_versions
+from .db_routing import replica_reads
 
 @admin.register(Store)
 class StoreAdmin(admin.ModelAdmin):
     """
     门店模型后台管理
     """
-    list_display = ('name', 'address')
+    list_display = ('name', 'address', 'opening_time', 'closing_time')
 
 @admin.register(MahjongTable)
 class MahjongTableAdmin(admin.ModelAdmin):
@@ -39,49 +39,48 @@ class MahjongTableAdmin(admin.ModelAdmin):
 
     def create_walk_in_booking(self, request, queryset):
         """
-        Admin Action: 为选中的单个牌桌创建散客对局
+        Admin Action: 为选中的牌桌各创建一个散客对局（一次校验、一次批量写入）
         """
-        if queryset.count() != 1:
-            # ★★★ 修复：将 _self_ 改为 self ★★★
-            self.message_user(request, "请一次只选择一个牌桌进行此操作。", level='WARNING')
-            return
-
-        table = queryset.first()
-        now = timezone.now()
-
-        # 检查该桌当前是否已被占用
-        if Booking.objects.filter(table=table, status='CONFIRMED', end_time__gt=now).exists():
-            # ★★★ 修复：将 _self_ 改为 self ★★★
-            self.message_user(request, f"{table} 当前已被占用，无法创建新的对局。", level='ERROR')
-            return
-
-        # 创建一个默认的散客对局
-        Booking.objects.create(
-            creator=request.user,  # 使用当前管理员作为 creator
-            store=table.store,
-            table=table,
-            start_time=now,
-            end_time=now + datetime.timedelta(hours=3),
-            num_games=4,           # 默认4个半庄
-            status='CONFIRMED',    # 直接设置为已成行
-            # end_time 会在 Booking 模型的 save 方法中根据 num_games 自动计算
-        )
-        # ★★★ 修复：将 _self_ 改为 self ★★★
-        self.message_user(request, f"已为 {table} 成功创建一个为期3小时的散客对局。")
+        result = bulk.open_walk_ins(queryset, request.user)
+        report_bulk_result(self, request, result, f"已为 {len(result.applied)} 张牌桌创建为期3小时的散客对局")
 
     create_walk_in_booking.short_description = "为选中牌桌创建散客对局 (占用3小时)"
 
     def get_current_status(self, obj):
         """
-        辅助方法: 获取牌桌的当前占用状态
+        辅助方法: 获取牌桌的当前占用状态（读取共享内存占用看板，看板不可用时查询数据库）
         """
-        now = timezone.now()
-        if Booking.objects.filter(table=obj, status='CONFIRMED', end_time__gt=now).exists():
+        current_id, next_start = occupancy.table_status(obj.id)
+        if current_id:
             return "占用中"
+        if next_start:
+            next_start = timezone.localtime(next_start)
+            label = f"{next_start:%H:%M}" if next_start.date() == timezone.localdate() else f"{next_start:%m-%d %H:%M}"
+            return f"空闲（{label} 开始下一局）"
         return "空闲"
     get_current_status.short_description = "当前状态"
 
-class BookingExportActionForm(ActionForm):
+def report_bulk_result(model_admin, request, result, done, limit=10):
+    """批量操作的汇总提示：写入了多少行，跳过了哪些行（列出前 limit 个）及原因。"""
+    if result.applied:
+        model_admin.message_user(request, f"{done}。", level='SUCCESS')
+    if result.skipped:
+        counts = "，".join(f"{reason} {count} 个" for reason, count in result.reasons().items())
+        details = "；".join(
+            f"{f'#{obj.pk}' if isinstance(obj, Booking) else obj}：{reason}"
+            + (f"（与 #{other_id}）" if other_id else "")
+            for obj, reason, other_id in result.skipped[:limit]
+        )
+        more = " 等" if len(result.skipped) > limit else ""
+        verb = "未做任何修改" if not result.applied else "已跳过"
+        model_admin.message_user(
+            request, f"{verb} {len(result.skipped)} 项（{counts}）：{details}{more}", level='WARNING',
+        )
+    if not result.applied and not result.skipped:
+        model_admin.message_user(request, "没有需要处理的项目。", level='WARNING')
+
+
+class BookingActionForm(ActionForm):
     start_date = forms.DateField(
         required=False,
         label="开始日期",
@@ -92,6 +91,13 @@ class BookingExportActionForm(ActionForm):
         label="结束日期",
         widget=forms.DateInput(attrs={"type": "date"})
     )
+    shift_minutes = forms.IntegerField(required=False, label="顺延分钟数（负数为提前）")
+    cancel_reason = forms.CharField(required=False, max_length=200, label="取消原因")
+
+
+class ConflictReportForm(forms.Form):
+    start_date = forms.DateField(required=False, label="开始日期", widget=forms.DateInput(attrs={"type": "date"}))
+    end_date = forms.DateField(required=False, label="结束日期", widget=forms.DateInput(attrs={"type": "date"}))
 
 
 class BookingStageFilter(admin.SimpleListFilter):
@@ -131,7 +137,16 @@ class BookingAdmin(admin.ModelAdmin):
     list_filter = ('status', BookingStageFilter, 'store', 'start_time')
     search_fields = ('creator__username', 'creator__display_name', 'store__name')
     autocomplete_fields = ['creator', 'participants'] 
-    action_form = BookingExportActionForm
+    action_form = BookingActionForm
+
+    def get_search_results(self, request, queryset, search_term):
+        # 发起人按用户名、显示名或拼音匹配（子查询，不限数量），门店名在进程内的门店目录中匹配
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        store_ids = [store.id for store in metadata.store_directory().stores if term.lower() in store.name.lower()]
+        creators = CustomUser.objects.filter(user_search.user_filter(term)).values('pk')
+        return queryset.filter(Q(creator_id__in=creators) | Q(store_id__in=store_ids)), False
     
     # --- 修复 1: 确保参与者、半庄数和结束时间在自定义表单中是非必填项 ---
     def get_form(self, request, obj=None, **kwargs):
@@ -148,31 +163,117 @@ class BookingAdmin(admin.ModelAdmin):
     
     # --- 辅助方法：计算参与人数并显示 (与修复无关，保持不变) ---
     def get_participant_count(self, obj):     
-        return obj.participants.count()     
+        return obj.participant_count
     get_participant_count.short_description = '参与人数'       
   
     # --- 管理员 Actions ---
     change_form_template = "admin/booking/booking/change_form.html"
-    actions = ['confirm_selected_bookings', 'export_bookings_to_xlsx', 'export_schedule_to_xlsx'] # 在这里添加新的 Action
+    change_list_template = "admin/booking/booking/change_list.html"
+    actions = [
+        'confirm_selected_bookings', 'shift_selected_bookings', 'cancel_selected_bookings',
+        'assign_free_tables', 'export_bookings_to_xlsx', 'export_schedule_to_xlsx',
+        'print_schedule_pdf', 'print_schedule_html',
+    ] # 在这里添加新的 Action
+
+    def _occupied_table_ids(self, request, object_id):
+        """
+        编辑已有对局时，与其时间重叠的其他对局占用的牌桌（按门店分组的区间树计算）。
+        changeform_view 与 formfield_for_foreignkey 共用，每个请求只计算一次。
+        """
+        cached = getattr(request, '_booking_occupied_tables', None)
+        if cached is not None and cached[0] == object_id:
+            return cached[1]
+        booking = Booking.objects.filter(pk=object_id).only('store_id', 'start_time', 'end_time').first()
+        occupied = {}
+        if booking:
+            detector = conflicts.ConflictDetector.for_range(booking.start_time, booking.end_time)
+            occupied = {
+                store.id: detector.occupied_table_ids(store.id, booking.start_time, booking.end_time, exclude={booking.pk})
+                for store in metadata.store_directory().stores
+            }
+        request._booking_occupied_tables = (object_id, occupied)
+        return occupied
 
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
         extra_context = extra_context or {}
-        tables = MahjongTable.objects.select_related('store').order_by('store__name', 'table_number')
+        # 牌桌来自进程内元数据缓存；编辑已有对局时只下发该时段内空闲的牌桌，
+        # 前端切换门店时也不会出现已被占用的牌桌
+        occupied = self._occupied_table_ids(request, object_id) if object_id else {}
+        stores = sorted(metadata.store_directory().stores, key=lambda store: store.name)
         extra_context['tables_data'] = [
             {
                 'id': table.id,
-                'store_id': table.store_id,
+                'store_id': store.id,
                 'label': table.display_label()
             }
-            for table in tables
+            for store in stores
+            for table in store.sorted_tables
+            if table.id not in occupied.get(store.id, ())
         ]
         return super().changeform_view(request, object_id, form_url, extra_context)
 
+    def get_urls(self):
+        custom_urls = [
+            path(
+                'conflicts/',
+                self.admin_site.admin_view(self.conflict_report_view),
+                name='booking_booking_conflicts',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+
+    @replica_reads()
+    def conflict_report_view(self, request):
+        """冲突报告：指定日期范围内的同桌冲突、跨门店牌桌与超出营业时间的对局。"""
+        form = ConflictReportForm(request.GET or None)
+        today = timezone.localdate()
+        start_date, end_date = today, today + datetime.timedelta(days=7)
+        if form.is_valid():
+            start_date = form.cleaned_data['start_date'] or start_date
+            end_date = form.cleaned_data['end_date'] or end_date
+        if end_date < start_date:
+            start_date, end_date = end_date, start_date
+
+        start_dt = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        end_dt = timezone.make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min))
+        report = conflicts.conflict_report(start_dt, end_dt)
+        directory = metadata.store_directory()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': '对局冲突报告',
+            'form': form,
+            'start_date': start_date,
+            'end_date': end_date,
+            'rows': [
+                {
+                    'conflict': conflict,
+                    'store': directory.get(conflict.store_id),
+                    'table': directory.tables_by_id.get(conflict.table_id),
+                }
+                for conflict in report
+            ],
+        }
+        return TemplateResponse(request, 'admin/booking/booking/conflict_report.html', context)
+
     def confirm_selected_bookings(self, request, queryset):       
-        valid_bookings = queryset.filter(status='PENDING').annotate(p_count=Count('participants')).filter(p_count=4)       
+        valid_bookings = queryset.filter(status='PENDING', participant_count=4)       
               
         if valid_bookings:       
-            updated_count = valid_bookings.update(status='CONFIRMED')       
+            with transaction.atomic():
+                bookings = list(valid_bookings)
+                updated_count = valid_bookings.update(status='CONFIRMED', updated_at=timezone.now())
+                for booking in bookings:
+                    booking.status = 'CONFIRMED'
+                outbox.bookings_confirmed(bookings)
+                history.record_many(bookings, 'CONFIRMED', actor=request.user)
+                changes.record_bookings(bookings)
+            bump_versions(
+                [booking.store_id for booking in bookings],
+                [booking.table_id for booking in bookings],
+                [user_id for booking in bookings for user_id in booking.participant_ids],
+            )
             # ★★★ 修复：将 _self_ 改为 self ★★★
             self.message_user(request, f"{updated_count} 个满足条件的预约已成功标记为 '已成行'。", level='SUCCESS')     
         else:       
@@ -181,6 +282,39 @@ class BookingAdmin(admin.ModelAdmin):
           
     confirm_selected_bookings.short_description = "将选中项标记为 '已成行' (仅限满员)"   
 
+    def shift_selected_bookings(self, request, queryset):
+        """Admin Action: 把选中的对局整体顺延 / 提前（分钟数填在操作栏中），有冲突时不做修改"""
+        try:
+            minutes = int(request.POST.get('shift_minutes') or 0)
+        except ValueError:
+            minutes = 0
+        if not minutes:
+            self.message_user(request, "请在操作栏中填写顺延的分钟数（负数为提前）。", level='ERROR')
+            return
+        result = bulk.shift_bookings(queryset, datetime.timedelta(minutes=minutes), actor=request.user)
+        verb = "顺延" if minutes > 0 else "提前"
+        report_bulk_result(self, request, result, f"已将 {len(result.applied)} 个对局{verb} {abs(minutes)} 分钟")
+
+    shift_selected_bookings.short_description = "顺延 / 提前选中的对局（按操作栏中的分钟数）"
+
+    def cancel_selected_bookings(self, request, queryset):
+        """Admin Action: 取消选中的对局，操作栏中的取消原因写入事件日志"""
+        reason = (request.POST.get('cancel_reason') or '').strip()
+        if not reason:
+            self.message_user(request, "请在操作栏中填写取消原因。", level='ERROR')
+            return
+        result = bulk.cancel_bookings(queryset, reason, actor=request.user)
+        report_bulk_result(self, request, result, f"已取消 {len(result.applied)} 个对局（原因：{reason}）")
+
+    cancel_selected_bookings.short_description = "取消选中的对局（填写取消原因）"
+
+    def assign_free_tables(self, request, queryset):
+        """Admin Action: 为选中的未分配牌桌的对局自动分配空闲牌桌"""
+        result = bulk.assign_free_tables(queryset, actor=request.user)
+        report_bulk_result(self, request, result, f"已为 {len(result.applied)} 个对局分配牌桌")
+
+    assign_free_tables.short_description = "为选中的对局自动分配空闲牌桌"
+
     def _filter_queryset_by_dates(self, request, queryset):
         start_date_str = request.POST.get('start_date')
         end_date_str = request.POST.get('end_date')
@@ -204,81 +338,19 @@ class BookingAdmin(admin.ModelAdmin):
             queryset = queryset.filter(start_time__lte=end_dt)
         return queryset, start_dt, end_dt
 
+    @replica_reads()
     def export_bookings_to_xlsx(self, request, queryset):   
         """   
         Admin Action: 导出选中的对局记录为 XLSX 文件  
         """   
+        from . import exports  # 导出依赖 openpyxl，按需加载
+
         queryset, start_dt, end_dt = self._filter_queryset_by_dates(request, queryset)
-        response = HttpResponse(   
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'   
-        )   
-        response['Content-Disposition'] = 'attachment; filename="mahjong_bookings_export.xlsx"'   
-  
-        workbook = Workbook()   
-        worksheet = workbook.active  
-        worksheet.title = "对局记录"   
-  
-        # 定义表头  
-        columns = [   
-            ("ID", 5),   
-            ("发起人", 15),   
-            ("参与者", 30), # 参与者可能较多，宽度大一些  
-            ("门店", 15),   
-            ("牌桌", 10),   
-            ("半庄数", 8),   
-            ("开始时间", 20),   
-            ("结束时间", 20),   
-            ("状态", 10),   
-            ("创建时间", 20),   
-        ]   
-          
-        header_font = Font(name='Calibri', bold=True)   
-        thin_border = Border(left=Side(style='thin'),   
-                             right=Side(style='thin'),   
-                             top=Side(style='thin'),   
-                             bottom=Side(style='thin'))   
-        align_center = Alignment(horizontal="center", vertical="center")   
-        align_left = Alignment(horizontal="left", vertical="top", wrap_text=True)   
-  
-  
-        # 写入表头  
-        for col_idx, (header_text, width) in enumerate(columns, 1):   
-            cell = worksheet.cell(row=1, column=col_idx, value=header_text)   
-            cell.font = header_font  
-            cell.alignment = align_center  
-            cell.border = thin_border  
-            worksheet.column_dimensions[get_column_letter(col_idx)].width = width  
-          
-        row_num = 2  
-        for booking in queryset.order_by('start_time'):   
-            participants_str = ", ".join([p.display_name or p.username for p in booking.participants.all()])   
-              
-            # 确保时间以本地时区显示  
-            start_time_local = timezone.localtime(booking.start_time) if booking.start_time else ""   
-            end_time_local = timezone.localtime(booking.end_time) if booking.end_time else ""   
-            created_at_local = timezone.localtime(booking.created_at) if booking.created_at else ""   
-  
-            # 填充数据  
-            worksheet.cell(row=row_num, column=1, value=booking.id).border = thin_border  
-            worksheet.cell(row=row_num, column=2, value=booking.creator.display_name or booking.creator.username).border = thin_border  
-            worksheet.cell(row=row_num, column=3, value=participants_str).alignment = align_left # 参与者可能多，允许换行  
-            worksheet.cell(row=row_num, column=3).border = thin_border  
-            worksheet.cell(row=row_num, column=4, value=booking.store.name).border = thin_border  
-            worksheet.cell(row=row_num, column=5, value=booking.table.table_number if booking.table else "未分配").border = thin_border  
-            worksheet.cell(row=row_num, column=6, value=booking.num_games if booking.num_games is not None else "-").border = thin_border
-            worksheet.cell(row=row_num, column=7, value=start_time_local.strftime('%Y-%m-%d %H:%M') if start_time_local else "").border = thin_border
-            worksheet.cell(row=row_num, column=8, value=end_time_local.strftime('%Y-%m-%d %H:%M') if end_time_local else "").border = thin_border  
-            worksheet.cell(row=row_num, column=9, value=booking.get_status_display()).border = thin_border  
-            worksheet.cell(row=row_num, column=10, value=created_at_local.strftime('%Y-%m-%d %H:%M') if created_at_local else "").border = thin_border
-              
-            row_num += 1  
-  
-        workbook.save(response) # 将工作簿保存到响应中  
-        return response  
-  
+        return exports.export_bookings_xlsx(queryset)
+
     export_bookings_to_xlsx.short_description = "导出选中的对局记录为 XLSX"   
 
-    def export_schedule_to_xlsx(self, request, queryset):
+    def _export_schedule(self, request, queryset, exporter):
         queryset, start_dt, end_dt = self._filter_queryset_by_dates(request, queryset)
         if not start_dt:
             self.message_user(request, "请至少选择一个开始日期以导出对局记录。", level='ERROR')
@@ -288,123 +360,56 @@ class BookingAdmin(admin.ModelAdmin):
         if end_dt < start_dt:
             start_dt, end_dt = end_dt, start_dt
 
-        bookings = queryset.select_related('store', 'table', 'creator') \
-                           .prefetch_related('participants', 'store__tables') \
-                           .order_by('start_time')
+        # 导出函数按开始时间单次遍历 values_list，牌桌来自门店元数据缓存，无需关联预取
+        bookings = queryset
         if not bookings.exists():
             self.message_user(request, "选定范围内没有预约记录。", level='WARNING')
             return
 
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="mahjong_schedule.xlsx"'
+        from . import exports  # 导出依赖 openpyxl，按需加载
 
-        workbook = Workbook()
-        workbook.remove(workbook.active)
+        return getattr(exports, exporter)(bookings, start_dt, end_dt)
 
-        local_tz = timezone.get_current_timezone()
-        start_day = timezone.localtime(start_dt, local_tz).date()
-        end_day = timezone.localtime(end_dt, local_tz).date()
+    @replica_reads()
+    def export_schedule_to_xlsx(self, request, queryset):
+        return self._export_schedule(request, queryset, 'export_schedule_xlsx')
 
-        bookings_list = list(bookings)
-        store_cache = {b.store_id: b.store for b in bookings_list}
+    export_schedule_to_xlsx.short_description = "导出对局记录（按日期范围）"
 
-        current_day = start_day
-        while current_day <= end_day:
-            day_start = datetime.datetime.combine(current_day, datetime.time.min)
-            day_start = timezone.make_aware(day_start, local_tz)
-            day_end = day_start + datetime.timedelta(days=1)
+    @replica_reads()
+    def print_schedule_pdf(self, request, queryset):
+        return self._export_schedule(request, queryset, 'export_schedule_pdf')
 
-            for store_id, store in store_cache.items():
-                day_store_bookings = [
-                    b for b in bookings_list
-                    if b.store_id == store_id
-                    and timezone.localtime(b.end_time, local_tz) > day_start
-                    and timezone.localtime(b.start_time, local_tz) < day_end
-                ]
-                if not day_store_bookings:
-                    continue
+    print_schedule_pdf.short_description = "打印课表 PDF（按日期范围）"
 
-                sheet_name = f"{current_day.strftime('%m%d')}-{store.name}"[:31]
-                sheet = workbook.create_sheet(title=sheet_name)
-                self._build_schedule_sheet(sheet, day_start, store, day_store_bookings, local_tz)
+    @replica_reads()
+    def print_schedule_html(self, request, queryset):
+        return self._export_schedule(request, queryset, 'export_schedule_html')
 
-            current_day += datetime.timedelta(days=1)
+    print_schedule_html.short_description = "打印课表网页版（按日期范围）"
 
-        workbook.save(response)
-        return response
+    def save_model(self, request, obj, form, change):
+        # 记下修改前的状态，参与者保存之后再与修改后的状态比较、写入事件日志
+        previous = Booking.objects.filter(pk=obj.pk).first() if change else None
+        request._booking_before = history.booking_state(previous) if previous else None
+        super().save_model(request, obj, form, change)
 
-    export_schedule_to_xlsx.short_description = "导出对局记录（按日期范围）"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # 参与者保存后名单才是最新的；成行通知按参与者与开始时间去重，重复保存不会重复发送
+        if form.instance.status == 'CONFIRMED':
+            outbox.booking_confirmed(form.instance)
+        history.record_changes(getattr(request, '_booking_before', None), form.instance, actor=request.user)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            history.record(obj, 'DELETED', actor=request.user)
+            super().delete_model(request, obj)
 
-    def _build_schedule_sheet(self, sheet, day_start, store, bookings, local_tz):
-        sheet.cell(row=1, column=1, value="表号")
-        sheet.cell(row=2, column=1, value="时间")
-
-        block_headers = ["起止时间", "半庄数", "参与者1", "参与者2", "参与者3", "参与者4"]
-        tables = list(store.tables.all().order_by('table_number'))
-
-        table_booking_map = defaultdict(list)
-        unassigned = []
-        for booking in bookings:
-            if booking.table_id:
-                table_booking_map[booking.table_id].append(booking)
-            else:
-                unassigned.append(booking)
-
-        table_blocks = [(t.table_number, t.id) for t in tables]
-        if unassigned:
-            table_blocks.append(("未分配", None))
-
-        width = len(block_headers)
-        for idx, (table_name, table_id) in enumerate(table_blocks):
-            base_col = 2 + idx * width
-            sheet.merge_cells(start_row=1, start_column=base_col, end_row=1, end_column=base_col + width - 1)
-            cell = sheet.cell(row=1, column=base_col, value=str(table_name))
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.font = Font(bold=True)
-
-            for offset, header in enumerate(block_headers):
-                header_cell = sheet.cell(row=2, column=base_col + offset, value=header)
-                header_cell.font = Font(bold=True)
-                header_cell.alignment = Alignment(horizontal="center", vertical="center")
-                sheet.column_dimensions[get_column_letter(base_col + offset)].width = 16 if offset == 0 else 14
-
-            relevant = table_booking_map[table_id] if table_id else unassigned
-            self._fill_table_block(sheet, base_col, relevant, day_start, local_tz)
-
-        for hour in range(24):
-            row = 3 + hour
-            slot_start = day_start + datetime.timedelta(hours=hour)
-            slot_end = slot_start + datetime.timedelta(hours=1)
-            sheet.cell(row=row, column=1, value=f"{slot_start.strftime('%H:%M')} - {slot_end.strftime('%H:%M')}")
-
-    def _fill_table_block(self, sheet, base_col, bookings, day_start, local_tz):
-        def append_cell(cell, text):
-            if not text:
-                return
-            if cell.value:
-                cell.value = f"{cell.value}\n{text}"
-            else:
-                cell.value = text
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-
-        for booking in bookings:
-            start_local = timezone.localtime(booking.start_time, local_tz)
-            end_local = timezone.localtime(booking.end_time, local_tz)
-            hour_offset = int(max(0, min(23, (start_local - day_start).total_seconds() // 3600)))
-            row = 3 + hour_offset
-
-            append_cell(sheet.cell(row=row, column=base_col), f"{start_local.strftime('%H:%M')} - {end_local.strftime('%H:%M')}")
-            append_cell(sheet.cell(row=row, column=base_col + 1), str(booking.num_games or ""))
-
-            participants = list(booking.participants.all())
-            for idx in range(4):
-                name = ""
-                if idx < len(participants):
-                    participant = participants[idx]
-                    name = participant.display_name or participant.username
-                append_cell(sheet.cell(row=row, column=base_col + 2 + idx), name)
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            history.record_many(list(queryset.only('pk', 'store_id')), 'DELETED', actor=request.user)
+            super().delete_queryset(request, queryset)
 
     def response_change(self, request, obj):
         if "_duplicate_and_edit" in request.POST:
@@ -413,6 +418,7 @@ class BookingAdmin(admin.ModelAdmin):
             obj.created_at = timezone.now()
             obj.save()
             obj.participants.set(original_participants)
+            history.record(obj, 'CREATED', actor=request.user)
             self.message_user(
                 request,
                 "已复制当前对局，请更改对局时间、半庄数及对局者后保存。",
@@ -450,13 +456,7 @@ class BookingAdmin(admin.ModelAdmin):
             if obj_id:   
                 booking = self.get_object(request, obj_id)   
                 if booking:   
-                    conflicting_bookings = Booking.objects.filter(   
-                        store=booking.store,   
-                        table__isnull=False,   
-                        start_time__lt=booking.end_time,   
-                        end_time__gt=booking.start_time  
-                    ).exclude(pk=booking.pk).exclude(status__in=['CANCELED'])   
-                    occupied_table_ids = conflicting_bookings.values_list('table_id', flat=True)   
+                    occupied_table_ids = self._occupied_table_ids(request, obj_id).get(booking.store_id, set())
                     kwargs["queryset"] = MahjongTable.objects.filter(   
                         store=booking.store  
                     ).exclude(id__in=occupied_table_ids)   
@@ -464,7 +464,61 @@ class BookingAdmin(admin.ModelAdmin):
                 kwargs["queryset"] = MahjongTable.objects.all()   
         return super().formfield_for_foreignkey(db_field, request, **kwargs)       
         
+@admin.register(BookingEvent)
+class BookingEventAdmin(admin.ModelAdmin):
+    """
+    对局事件日志（只读）：按对局 ID 搜索即可查到该对局的完整经过
+    """
+    list_display = ('created_at', 'booking_id', 'get_store', 'kind', 'actor', 'data')
+    list_filter = ('kind',)
+    search_fields = ('=booking_id',)
+    list_select_related = ('actor',)
+    date_hierarchy = 'created_at'
+
+    def get_store(self, obj):
+        store = metadata.get_store(obj.store_id)
+        return store.name if store else obj.store_id
+    get_store.short_description = "门店"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ChangeFeedConsumer)
+class ChangeFeedConsumerAdmin(admin.ModelAdmin):
+    """
+    变更订阅的消费者：查看各下游系统的积压；修改偏移量可让其重新同步，
+    删除长期不再读取的消费者后，压缩任务才能移除它尚未读过的删除记录
+    """
+    list_display = ('name', 'offset', 'get_backlog', 'updated_at')
+    fields = ('name', 'offset')
+
+    def get_queryset(self, request):
+        latest = ChangeFeedEntry.objects.filter(seq__isnull=False).order_by('-seq').values('seq')[:1]
+        return super().get_queryset(request).annotate(latest_seq=Subquery(latest))
+
+    def get_backlog(self, obj):
+        return max((obj.latest_seq or 0) - obj.offset, 0)
+    get_backlog.short_description = "积压"
+
 @admin.register(CustomUser)   
 class CustomUserAdmin(admin.ModelAdmin):   
     list_display = ('username', 'display_name', 'is_staff', 'is_active')   
     search_fields = ('username', 'display_name')
+    ordering = ('username',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # 对局发起人 / 参与者的自动补全只取最匹配的前 ADMIN_MAX_RESULTS 个（见 accounts/search.py）；
+        # 用户列表页需要全部匹配的用户，分页与计数才准确
+        if not search_term.strip():
+            return queryset, False
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name == 'autocomplete':
+            return queryset.filter(pk__in=user_search.search_user_ids(search_term)), False
+        return queryset.filter(user_search.user_filter(search_term)), False
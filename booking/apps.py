@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BookingConfig(AppConfig):
     name = 'booking'
+
+    def ready(self):
+        # 注册模型信号（门店版本号、数据库连接统计等）
+        from . import db_routing, signals  # noqa: F401
@@ -0,0 +1,337 @@
+# booking/archive.py
+"""
+已完成对局的列式归档：统计分析直接扫描磁盘上的 .npy 文件，不再反复扫描 Booking 表与参与者表。
+
+目录结构（BOOKING_ARCHIVE_DIR）：
+  manifest.json                       段列表与归档进度（archived_until）
+  <YYYY-MM>-<序号>/<列名>.npy           每段一个目录，每列一个定宽数组，段内按开始时间排序
+
+列：id (int64)、store (int32)、table (int32，0 表示未分配)、start / end (int64，Unix 秒)、
+participants (int32，形状为 (行数, 宽度)，宽度取该段中参与人数的最大值、至少 SEATS，不足补 0)。
+参与者取自对局上反范式化的 participant_ids，不读参与者关系表。
+
+  * 追加：每晚由 Celery Beat 调用 archive_completed()，把结束时间在上次进度之后、截止时间之前的
+    已成行对局按结束时间顺序分批写成新段（按开始时间的 UTC 月份拆分），段目录写完再原子地替换
+    manifest.json，中途失败不会留下重复或半截的段；随后把已结束月份的多个段合并为一段（compact()）；
+  * 读取：BookingArchive 以 np.load(mmap_mode='r') 打开各列，scan() 先按 manifest 中每段的
+    开始 / 结束时间范围跳过无关的段，段内用二分查找定位开始时间的范围，只有命中的页被读入内存。
+截止时间为今天 0 点（本地时间）再往前 BOOKING_ARCHIVE_DELAY_DAYS 天，留出事后修改对局的余地；
+已归档的对局之后再被修改不会同步到归档（需要时删除归档目录重建）。
+"""
+import contextlib
+import datetime
+import json
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Booking
+from .policy import SEATS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+COLUMNS = ('id', 'store', 'table', 'start', 'end', 'participants')
+DTYPES = {
+    'id': 'int64', 'store': 'int32', 'table': 'int32', 'start': 'int64', 'end': 'int64', 'participants': 'int32',
+}
+# 从数据库读取时每批的行数（批与批之间在结束时间处断开）
+BATCH_ROWS = 500_000
+
+
+def archive_dir():
+    return Path(getattr(settings, 'BOOKING_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+
+
+def archive_cutoff(now=None):
+    """归档的截止时间：今天 0 点（本地时间）往前 BOOKING_ARCHIVE_DELAY_DAYS 天。"""
+    today = timezone.localtime(now or timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - datetime.timedelta(days=getattr(settings, 'BOOKING_ARCHIVE_DELAY_DAYS', 1))
+
+
+def _epoch(value):
+    return value if isinstance(value, int) else int(value.timestamp())
+
+
+def _progress(manifest):
+    """归档进度（datetime）：结束时间不晚于它的成行对局都已归档。按 ISO 格式保存，保留微秒。"""
+    value = manifest['archived_until']
+    return datetime.datetime.fromisoformat(value) if value is not None else None
+
+
+def _read_manifest(root):
+    try:
+        with open(root / MANIFEST, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {'version': 1, 'archived_until': None, 'next_segment': 0, 'segments': []}
+
+
+def _write_manifest(root, manifest):
+    temporary = root / f".{MANIFEST}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=1)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, root / MANIFEST)
+
+
+@contextlib.contextmanager
+def _writer_lock(root):
+    """写入方（每晚的任务、手动执行的命令）之间互斥。"""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / '.lock', 'a') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+class Segment:
+    def __init__(self, root, entry):
+        self.path = root / entry['name']
+        self.name = entry['name']
+        self.month = entry['month']
+        self.rows = entry['rows']
+        self.start_min = entry['start_min']
+        self.start_max = entry['start_max']
+        self.end_max = entry['end_max']
+        self.max_duration = entry['max_duration']
+        self._columns = {}
+
+    def column(self, name):
+        """列的只读内存映射（np.memmap），首次访问时打开。"""
+        if name not in self._columns:
+            import numpy as np
+
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode='r')
+        return self._columns[name]
+
+    def overlaps(self, start, end):
+        return (end is None or self.start_min < end) and (start is None or self.end_max > start)
+
+
+class BookingArchive:
+    """只读地打开归档。manifest 在构造时读取一次，之后的追加不影响已打开的实例。"""
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root is not None else archive_dir()
+        manifest = _read_manifest(self.root)
+        self.archived_until = _progress(manifest)
+        self.segments = [Segment(self.root, entry) for entry in manifest['segments']]
+
+    def __len__(self):
+        return sum(segment.rows for segment in self.segments)
+
+    def segments_for(self, start=None, end=None):
+        """与 [start, end) 有重叠对局的段（只看 manifest，不打开文件）。"""
+        start = _epoch(start) if start is not None else None
+        end = _epoch(end) if end is not None else None
+        return [segment for segment in self.segments if segment.overlaps(start, end)]
+
+    def scan(self, start=None, end=None, columns=COLUMNS, stores=None):
+        """
+        逐段产出与 [start, end) 重叠的对局 {列名: 数组}（start / end 为 datetime 或 Unix 秒，
+        stores 为门店 ID 列表）。不需要逐行过滤时产出的是内存映射的切片，不复制数据。
+        """
+        import numpy as np
+
+        start = _epoch(start) if start is not None else None
+        end = _epoch(end) if end is not None else None
+        for segment in self.segments_for(start, end):
+            starts = segment.column('start')
+            low, high = 0, segment.rows
+            if end is not None:
+                high = int(np.searchsorted(starts, end, side='left'))
+            if start is not None:
+                # 段内按开始时间排序，结束时间晚于 start 的对局开始时间不早于 start - 最长时长
+                low = int(np.searchsorted(starts[:high], start - segment.max_duration, side='right'))
+            if low >= high:
+                continue
+            mask = None
+            if start is not None:
+                mask = segment.column('end')[low:high] > start
+            if stores is not None:
+                in_stores = np.isin(segment.column('store')[low:high], stores)
+                mask = in_stores if mask is None else mask & in_stores
+            rows = {name: segment.column(name)[low:high] for name in columns}
+            if mask is not None and not mask.all():
+                if not mask.any():
+                    continue
+                rows = {name: values[mask] for name, values in rows.items()}
+            yield rows
+
+    def load(self, start=None, end=None, columns=COLUMNS, stores=None):
+        """scan() 的结果合并为一组数组（参与者矩阵按最宽的段补 0）。"""
+        import numpy as np
+
+        chunks = list(self.scan(start, end, columns, stores))
+        result = {}
+        for name in columns:
+            parts = [chunk[name] for chunk in chunks]
+            if name == 'participants':
+                width = max([part.shape[1] for part in parts], default=SEATS)
+                parts = [np.pad(part, ((0, 0), (0, width - part.shape[1]))) for part in parts]
+                empty = np.zeros((0, width), dtype=DTYPES[name])
+            else:
+                empty = np.zeros(0, dtype=DTYPES[name])
+            result[name] = np.concatenate(parts) if parts else empty
+        return result
+
+    def describe(self):
+        return {
+            'rows': len(self),
+            'segments': len(self.segments),
+            'bytes': sum(path.stat().st_size for segment in self.segments for path in segment.path.glob('*.npy')),
+            'archived_until': self.archived_until,
+        }
+
+
+def _write_segment(root, name, columns):
+    """把一组已按开始时间排序的列写成段目录，返回 manifest 中的条目。"""
+    import numpy as np
+
+    temporary = root / f".{name}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    temporary.mkdir(parents=True)
+    for column in COLUMNS:
+        np.save(temporary / f"{column}.npy", np.ascontiguousarray(columns[column], dtype=DTYPES[column]))
+    os.replace(temporary, root / name)
+    starts, ends = columns['start'], columns['end']
+    return {
+        'name': name,
+        'month': name[:7],
+        'rows': len(starts),
+        'start_min': int(starts[0]),
+        'start_max': int(starts[-1]),
+        'end_max': int(ends.max()),
+        'max_duration': int((ends - starts).max()),
+    }
+
+
+def _month_of(starts):
+    import numpy as np
+
+    return starts.astype('datetime64[s]').astype('datetime64[M]')
+
+
+def append(columns, archived_until, root=None):
+    """
+    追加一批对局（{列名: 数组}，顺序任意；None 表示只推进进度）并把归档进度推进到 archived_until
+    （aware datetime）。按开始时间的 UTC 月份拆分为多个段；全部段写完后才替换 manifest。
+    调用方负责持有写入锁。
+    """
+    import numpy as np
+
+    root = Path(root) if root is not None else archive_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(root)
+    if columns is not None and len(columns['id']):
+        order = np.argsort(columns['start'], kind='stable')
+        columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+        months = _month_of(columns['start'])
+        boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+        for low, high in zip([0, *boundaries], [*boundaries, len(months)]):
+            name = f"{months[low]}-{manifest['next_segment']:06d}"
+            manifest['next_segment'] += 1
+            manifest['segments'].append(
+                _write_segment(root, name, {column: values[low:high] for column, values in columns.items()})
+            )
+    manifest['archived_until'] = archived_until.isoformat()
+    _write_manifest(root, manifest)
+
+
+def compact(root=None, before=None):
+    """把开始时间在 before（默认本月）之前的各月份的多个段各合并为一段，返回合并掉的段数。"""
+    import numpy as np
+
+    root = Path(root) if root is not None else archive_dir()
+    manifest = _read_manifest(root)
+    current = str(_month_of(np.array([_epoch(before or timezone.now())]))[0])
+    by_month = {}
+    for entry in manifest['segments']:
+        by_month.setdefault(entry['month'], []).append(entry)
+    merged = 0
+    for month, entries in sorted(by_month.items()):
+        if month >= current or len(entries) < 2:
+            continue
+        segments = [Segment(root, entry) for entry in entries]
+        width = max(segment.column('participants').shape[1] for segment in segments)
+        columns = {
+            name: np.concatenate([
+                np.pad(segment.column(name), ((0, 0), (0, width - segment.column(name).shape[1])))
+                if name == 'participants' else segment.column(name)
+                for segment in segments
+            ])
+            for name in COLUMNS
+        }
+        order = np.argsort(columns['start'], kind='stable')
+        name = f"{month}-{manifest['next_segment']:06d}"
+        manifest['next_segment'] += 1
+        entry = _write_segment(root, name, {column: values[order] for column, values in columns.items()})
+        old_names = {old['name'] for old in entries}
+        manifest['segments'] = sorted(
+            [*(old for old in manifest['segments'] if old['name'] not in old_names), entry],
+            key=lambda segment: segment['name'],
+        )
+        _write_manifest(root, manifest)
+        # 已打开的读取方仍持有旧文件的映射，删除目录不影响它们
+        for old in old_names:
+            shutil.rmtree(root / old, ignore_errors=True)
+        merged += len(entries)
+    return merged
+
+
+def _columns_from_rows(rows):
+    import numpy as np
+
+    width = max([SEATS, *(len(row[5]) for row in rows)])
+    participants = np.zeros((len(rows), width), dtype=DTYPES['participants'])
+    for index, row in enumerate(rows):
+        participants[index, :len(row[5])] = row[5]
+    return {
+        'id': np.array([row[0] for row in rows], dtype=DTYPES['id']),
+        'store': np.array([row[1] for row in rows], dtype=DTYPES['store']),
+        'table': np.array([row[2] or 0 for row in rows], dtype=DTYPES['table']),
+        'start': np.array([int(row[3].timestamp()) for row in rows], dtype=DTYPES['start']),
+        'end': np.array([int(row[4].timestamp()) for row in rows], dtype=DTYPES['end']),
+        'participants': participants,
+    }
+
+
+def archive_completed(until=None, root=None):
+    """
+    把结束时间在 (上次进度, until] 内的已成行对局追加到归档（until 默认为 archive_cutoff()），
+    并合并已结束月份的段。返回统计信息。
+    """
+    root = Path(root) if root is not None else archive_dir()
+    until = until or archive_cutoff()
+    appended = 0
+    with _writer_lock(root):
+        previous = _progress(_read_manifest(root))
+        bookings = Booking.objects.filter(status='CONFIRMED', end_time__lte=until)
+        if previous is not None:
+            bookings = bookings.filter(end_time__gt=previous)
+        rows = bookings.order_by('end_time', 'id').values_list(
+            'id', 'store_id', 'table_id', 'start_time', 'end_time', 'participant_ids',
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=10000):
+            # 只在结束时间变化处断开，保证每批之后的进度之前没有遗漏的对局
+            if len(batch) >= BATCH_ROWS and row[4] != batch[-1][4]:
+                append(_columns_from_rows(batch), batch[-1][4], root)
+                appended += len(batch)
+                batch = []
+            batch.append(row)
+        if batch:
+            append(_columns_from_rows(batch), until, root)
+            appended += len(batch)
+        elif previous is None or previous < until:
+            append(None, until, root)
+        merged = compact(root)
+    return {'rows': appended, 'merged': merged, 'archived_until': until}
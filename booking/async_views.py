@@ -0,0 +1,197 @@
+# booking/async_views.py
+"""
+读多写少页面的异步 (ASGI) 版本。
+
+与 booking/views.py 中的同名视图输出完全相同的页面，区别在于：
+  * 使用 Django 的异步 ORM (aiterator) 取数；
+  * 门店状态与时间表的占用情况来自紧凑排期（booking/schedule.py），对局详情在
+    模板渲染线程中按需加载；
+  * 互不依赖的取数（排期、需求预测、牌桌版本号）用 asyncio.gather 并发执行。异步 ORM 与
+    sync_to_async 默认都排在同一请求的单个线程中依次执行，这里把同步的取数函数放到线程池
+    (thread_sensitive=False)，才能与其他查询真正重叠；
+  * 模板渲染仍然是同步的（模板中会访问 user / messages 等惰性对象），
+    通过 sync_to_async 放到线程中执行。
+
+在 settings.py 中设置 BOOKING_ASYNC_VIEWS = True 并使用 ASGI 服务器
+(例如 uvicorn config.asgi:application) 部署时由 booking/urls.py 启用。
+"""
+import asyncio
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import render
+from django.utils import timezone
+
+from .caching import aget_table_versions, versioned_page
+from .db_routing import read_replica
+from . import ical, metadata, occupancy, schedule
+from .models import Booking
+from forecasts.forecasting import overlay as forecast_overlay
+
+arender = sync_to_async(render)
+
+
+async def _alist(queryset, chunk_size=2000):
+    return [obj async for obj in queryset.aiterator(chunk_size=chunk_size)]
+
+
+def _concurrent(func):
+    """
+    把只读的同步函数包装为在线程池中执行的协程，与同一请求中的其他取数并发。
+    线程池中的数据库连接不随请求结束关闭，每次调用后按 CONN_MAX_AGE 处理（与 request_finished 相同）。
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+# --- 视图 1: 门店对局情况 ---
+@versioned_page()
+@read_replica
+async def store_status_view(request):
+    now = timezone.now()
+    directory = await sync_to_async(metadata.store_directory)()
+    stores = directory.stores
+
+    # 当前对局优先读共享内存占用看板（见 booking/occupancy.py），不可用时回退到紧凑排期；
+    # 对局详情在模板片段未命中时才按 ID 加载（见 booking/schedule.py）
+    table_ids = [table.id for store in stores for table in store.sorted_tables]
+    current_booking_ids = occupancy.current_booking_ids(table_ids, now=now)
+    if current_booking_ids is None:
+        current_booking_ids, table_versions = await asyncio.gather(
+            _concurrent(schedule.current_booking_ids)([store.id for store in stores], now=now),
+            aget_table_versions(table_ids),
+        )
+    else:
+        table_versions = await aget_table_versions(table_ids)
+
+    context = {
+        'stores': stores,
+        'bookings_by_table': schedule.LazyBookings(
+            {table_id: [booking_id] for table_id, booking_id in current_booking_ids.items()},
+            Booking.objects.select_related('creator'),
+            many=False,
+        ),
+        'current_booking_ids': current_booking_ids,
+        'table_versions': table_versions,
+        'now': now,
+    }
+    return await arender(request, 'booking/store_status.html', context)
+
+
+# --- 视图 2: 可加入的预约列表 ---
+@versioned_page()
+@read_replica
+async def list_pending_bookings_view(request):
+    now = timezone.now()
+    pending_bookings = await _alist(
+        Booking.objects.filter(status='PENDING', end_time__gte=now)
+        .select_related('store', 'creator')
+    )
+    last_hour = now + datetime.timedelta(hours=1)
+    for booking in pending_bookings:
+        booking.is_last_hour = booking.start_time <= last_hour
+
+    return await arender(request, 'booking/list_pending.html', {'bookings': pending_bookings})
+
+
+# --- 视图 6: 我的预约 ---
+@login_required
+async def my_bookings_view(request):
+    user = await request.auser()
+    bookings = await _alist(
+        user.joined_bookings
+        .filter(
+            end_time__gte=timezone.now(),
+            status__in=['PENDING', 'CONFIRMED']
+        )
+        .select_related('store', 'table')
+        .order_by('start_time')
+    )
+    return await arender(request, 'booking/my_bookings.html', {
+        'bookings': bookings,
+        **ical.subscription_urls(request, user.pk),
+    })
+
+
+@login_required
+@read_replica
+async def my_games_view(request):
+    user = await request.auser()
+    games = await _alist(
+        user.joined_bookings
+        .filter(status='CONFIRMED')
+        .select_related('store', 'table')
+        .order_by('-start_time')
+    )
+
+    phase_counts = {'NOT_STARTED': 0, 'IN_PROGRESS': 0, 'COMPLETED': 0}
+    for game in games:
+        phase = game.game_phase
+        if phase in phase_counts:
+            phase_counts[phase] += 1
+
+    context = {
+        'games': games,
+        'phase_counts': phase_counts,
+    }
+    return await arender(request, 'booking/my_games.html', context)
+
+
+async def _aget_store(store_id):
+    store = await sync_to_async(metadata.get_store)(store_id)
+    if store is None:
+        raise Http404("门店不存在。")
+    return store
+
+
+@versioned_page(store_kwarg='store_id', bucket_seconds=3600)
+@read_replica
+async def store_timetable_view(request, store_id):
+    now = timezone.localtime(timezone.now())
+    start_of_view = now.replace(minute=0, second=0, microsecond=0)
+    end_of_view = start_of_view + datetime.timedelta(hours=24)
+
+    store = await _aget_store(store_id)
+    tables = store.sorted_tables
+    # 排期、需求预测与牌桌版本号互不依赖，并发读取
+    store_schedule, forecasts, table_versions = await asyncio.gather(
+        _concurrent(schedule.get_schedule)(store.id, start_of_view, end_of_view),
+        _concurrent(forecast_overlay)(store, start_of_view),
+        aget_table_versions([table.id for table in tables]),
+    )
+    booking_ids = store_schedule.booking_ids_by_table(
+        schedule.to_minutes(start_of_view), schedule.to_minutes(end_of_view)
+    )
+    bookings_by_table = schedule.LazyBookings(
+        {table.id: booking_ids.get(table.id, []) for table in tables},
+        Booking.objects.select_related('creator'),
+    )
+
+    time_slots = []
+    for i in range(24):
+        slot_time = start_of_view + datetime.timedelta(hours=i)
+        time_slots.append({
+            'label': slot_time.strftime('%H:00'),
+            'is_current_hour': (slot_time.hour == now.hour and slot_time.day == now.day),
+            'forecast': forecasts[i],
+        })
+
+    context = {
+        'store': store,
+        'bookings_by_table': bookings_by_table,
+        'tables': tables,
+        'time_slots': time_slots,
+        'timetable_start_datetime': start_of_view,
+        'timeline_start_display_hour': start_of_view.hour,
+        'now': now,
+        'table_versions': table_versions,
+        'fragment_hour': start_of_view.strftime('%Y%m%d%H'),
+    }
+    return await arender(request, 'booking/store_timetable.html', context)
@@ -0,0 +1,230 @@
+# booking/bulk.py
+"""
+后台的批量操作：为多张牌桌开散客局、整体顺延 / 提前、带原因取消、自动分配空闲牌桌。
+
+每个操作在一个事务中先锁定选中的行与涉及的牌桌，再用一次范围查询建立 ConflictDetector
+（见 booking/conflicts.py）在内存中校验全部选中的行，然后在同一事务中用一条 UPDATE（或 bulk_create / bulk_update）写入，并批量写入事件日志与变更订阅；
+批量写入不触发模型信号，版本号与占用看板在这里手动刷新。选中几百行也只需一个请求、几次查询。
+返回 BulkResult（写入的行与跳过的行及原因），后台据此给出汇总提示。
+"""
+import datetime
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications import outbox
+
+from . import changes, history, metadata, occupancy
+from .caching import bump_versions
+from .conflicts import (
+    ACTIVE_STATUSES, DOUBLE_BOOKING, OUT_OF_HOURS, ConflictDetector, lock_tables, within_opening_hours,
+)
+from .models import Booking
+from .policy import GAME_MINUTES
+
+
+@dataclass
+class BulkResult:
+    applied: list = field(default_factory=list)
+    # [(对局或牌桌, 原因, 与之冲突的对局ID)]
+    skipped: list = field(default_factory=list)
+
+    def skip(self, obj, reason, other_booking_id=None):
+        self.skipped.append((obj, reason, other_booking_id))
+
+    def reasons(self):
+        """跳过的原因及次数，例如 {'同桌时间冲突': 3}。"""
+        counts = {}
+        for _, reason, _ in self.skipped:
+            counts[reason] = counts.get(reason, 0) + 1
+        return counts
+
+
+def _refresh(bookings):
+    """递增涉及的门店、牌桌、用户的版本号，并在提交后刷新占用看板。"""
+    table_ids = [booking.table_id for booking in bookings]
+    bump_versions(
+        [booking.store_id for booking in bookings],
+        table_ids,
+        [user_id for booking in bookings for user_id in (booking.creator_id, *booking.participant_ids)],
+    )
+    occupancy.refresh_tables(table_ids)
+
+
+def _store_ids(bookings):
+    """对局所在门店以及所分配牌桌实际所属的门店（冲突检测按牌桌所属门店分组）。"""
+    tables = metadata.store_directory().tables_by_id
+    store_ids = {booking.store_id for booking in bookings}
+    store_ids.update(tables[booking.table_id].store_id for booking in bookings if booking.table_id in tables)
+    return store_ids
+
+
+def _lock(queryset):
+    """在当前事务中锁定并读出选中的对局，校验与写入之间不会被其他请求修改。"""
+    return list(queryset.select_for_update().order_by('pk'))
+
+
+def open_walk_ins(tables, creator, num_games=4, start=None):
+    """
+    为每张牌桌创建一个立即开始的散客对局（已成行，发起人为 creator）。
+    与现有对局时间重叠的牌桌跳过，其余牌桌一次 bulk_create 写入。
+    """
+    start = start or timezone.now()
+    end = start + datetime.timedelta(minutes=num_games * GAME_MINUTES)
+    tables = list(tables)
+    result = BulkResult()
+    if not tables:
+        return result
+    proposals = [
+        Booking(
+            creator=creator, store_id=table.store_id, table_id=table.pk,
+            start_time=start, end_time=end, num_games=num_games, status='CONFIRMED',
+        )
+        for table in tables
+    ]
+    with transaction.atomic():
+        # 先锁定牌桌再校验：并发的批量操作或建轮要等本事务提交后才能校验这些牌桌
+        lock_tables(table.pk for table in tables)
+        detector = ConflictDetector.for_range(start, end, {table.store_id for table in tables})
+        for table, booking, found in zip(tables, proposals, detector.validate(proposals)):
+            blocking = [conflict for conflict in found if conflict.kind == DOUBLE_BOOKING]
+            if blocking:
+                result.skip(table, blocking[0].label, blocking[0].other_booking_id)
+            else:
+                result.applied.append(booking)
+        if not result.applied:
+            return result
+        Booking.objects.bulk_create(result.applied)
+        history.record_many(result.applied, 'CREATED', actor=creator)
+        changes.record_bookings(result.applied)
+    _refresh(result.applied)
+    return result
+
+
+def shift_bookings(queryset, delta, actor=None):
+    """
+    把选中的有效对局整体顺延 delta（负数为提前），牌桌不变。
+    移动后与其他对局同桌冲突、或由营业时间内移到营业时间外的对局会被列出，
+    只要有一个对局冲突就不做任何修改（各对局是一起校验的，部分写入会让校验失效）。
+    """
+    result = BulkResult()
+    with transaction.atomic():
+        bookings = []
+        for booking in _lock(queryset):
+            if booking.status in ACTIVE_STATUSES:
+                bookings.append(booking)
+            else:
+                result.skip(booking, "已取消")
+        if not bookings or not delta:
+            return result
+
+        lock_tables(booking.table_id for booking in bookings if booking.table_id is not None)
+        proposals = [
+            Booking(
+                pk=booking.pk, store_id=booking.store_id, table_id=booking.table_id,
+                start_time=booking.start_time + delta, end_time=booking.end_time + delta,
+            )
+            for booking in bookings
+        ]
+        detector = ConflictDetector.for_range(
+            min(proposal.start_time for proposal in proposals),
+            max(proposal.end_time for proposal in proposals),
+            _store_ids(bookings),
+        )
+        conflicted = False
+        for booking, found in zip(bookings, detector.validate(proposals)):
+            for conflict in found:
+                if conflict.kind == DOUBLE_BOOKING or (
+                    conflict.kind == OUT_OF_HOURS
+                    and within_opening_hours(booking.store_id, booking.start_time, booking.end_time)
+                ):
+                    result.skip(booking, conflict.label, conflict.other_booking_id)
+                    conflicted = True
+                    break
+        if conflicted:
+            return result
+
+        now = timezone.now()
+        Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(
+            start_time=F('start_time') + delta, end_time=F('end_time') + delta, updated_at=now,
+        )
+        for booking in bookings:
+            booking.start_time += delta
+            booking.end_time += delta
+            booking.updated_at = now
+        history.record_many(bookings, 'UPDATED', actor=actor, changed=['start', 'end'])
+        changes.record_bookings(bookings)
+        # 开始时间变了：按新时间重新通知并写入开局提醒，旧提醒投递时会被识别为失效
+        outbox.bookings_confirmed([booking for booking in bookings if booking.status == 'CONFIRMED'])
+        result.applied = bookings
+    _refresh(bookings)
+    return result
+
+
+def cancel_bookings(queryset, reason, actor=None):
+    """取消选中的未结束的有效对局，原因写入事件日志。"""
+    result = BulkResult()
+    now = timezone.now()
+    with transaction.atomic():
+        for booking in _lock(queryset):
+            if booking.status not in ACTIVE_STATUSES:
+                result.skip(booking, "已取消")
+            elif booking.end_time <= now:
+                result.skip(booking, "已结束")
+            else:
+                result.applied.append(booking)
+        if not result.applied:
+            return result
+        Booking.objects.filter(pk__in=[booking.pk for booking in result.applied]).update(
+            status='CANCELED', updated_at=now,
+        )
+        for booking in result.applied:
+            booking.status = 'CANCELED'
+            booking.updated_at = now
+        history.record_many(result.applied, 'CANCELED', actor=actor, reason=reason)
+        changes.record_bookings(result.applied)
+    _refresh(result.applied)
+    return result
+
+
+def assign_free_tables(queryset, actor=None):
+    """为选中的未分配牌桌、未结束的有效对局按开始时间依次分配门店中第一张空闲牌桌。"""
+    result = BulkResult()
+    now = timezone.now()
+    with transaction.atomic():
+        bookings = []
+        for booking in _lock(queryset):
+            if booking.status not in ACTIVE_STATUSES:
+                result.skip(booking, "已取消")
+            elif booking.end_time <= now:
+                result.skip(booking, "已结束")
+            elif booking.table_id is not None:
+                result.skip(booking, "已分配牌桌")
+            else:
+                bookings.append(booking)
+        if not bookings:
+            return result
+
+        store_ids = _store_ids(bookings)
+        lock_tables(table.id for table in metadata.store_directory().tables_by_id.values() if table.store_id in store_ids)
+        detector = ConflictDetector.for_range(
+            min(booking.start_time for booking in bookings),
+            max(booking.end_time for booking in bookings),
+            store_ids,
+        )
+        for booking, table_id in zip(bookings, detector.suggest(bookings)):
+            if table_id is None:
+                result.skip(booking, "没有空闲牌桌")
+                continue
+            booking.table_id = table_id
+            booking.updated_at = now
+            result.applied.append(booking)
+        if not result.applied:
+            return result
+        Booking.objects.bulk_update(result.applied, ['table', 'updated_at'])
+        history.record_many(result.applied, 'TABLE_ASSIGNED', actor=actor)
+        changes.record_bookings(result.applied)
+    _refresh(result.applied)
+    return result
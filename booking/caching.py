@@ -0,0 +1,233 @@
+# booking/caching.py
+"""
+门店级版本号与 HTTP 条件请求 (ETag / 304)。
+
+每个门店在缓存中维护一个单调递增的版本号，另外还有一个覆盖所有门店的全局版本号，
+以及每张牌桌各自的版本号（用于模板中按牌桌缓存渲染结果）和每个用户的版本号
+（用于个人日历订阅，见 booking/ical.py）。对局、牌桌、门店发生任何变化时
+（见 booking/signals.py）都会在事务提交后递增对应的版本号。
+公开页面用「版本号 + 当前用户 + 时间片」拼出强 ETag，客户端带 If-None-Match
+轮询时直接在视图执行前返回 304，不触发任何数据库查询。登录用户的 ETag 还包含
+页面顶部的未读消息数（见 notifications/inbox.py），收到新消息后不会继续返回 304；
+该数字记在 request 上，渲染角标时不再读取缓存。
+有待显示的 messages 提示（例如 POST 后重定向到该页面）时不做条件请求、也不发 ETag，
+否则客户端会拿到 304，提示被消耗在之后某个无关的页面上。
+"""
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    add_never_cache_headers, get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+from notifications.inbox import aunread_count, unread_count
+
+from .db_routing import note_primary_write
+
+GLOBAL_SCOPE = 'all'
+VERSION_KEY_PREFIX = 'booking:version:'
+TABLE_VERSION_KEY_PREFIX = 'booking:version:table:'
+USER_VERSION_KEY_PREFIX = 'booking:version:user:'
+
+
+def _version_key(store_id):
+    return f"{VERSION_KEY_PREFIX}{store_id if store_id is not None else GLOBAL_SCOPE}"
+
+
+def _table_version_key(table_id):
+    return f"{TABLE_VERSION_KEY_PREFIX}{table_id}"
+
+
+def _user_version_key(user_id):
+    return f"{USER_VERSION_KEY_PREFIX}{user_id}"
+
+
+def _initial_version():
+    # 缓存被清空或淘汰后，用毫秒时间戳作为新的起点，保证版本号不会回退到旧值
+    return int(time.time() * 1000)
+
+
+def _read_versions(keys):
+    """keys 为 {缓存键: 返回字典的键}，缓存中不存在的版本号会被初始化。"""
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, scope in keys.items():
+        if key in found:
+            versions[scope] = found[key]
+        else:
+            initial = _initial_version()
+            # add 失败说明其他进程刚刚写入，重新读取一次
+            if not cache.add(key, initial, timeout=None):
+                initial = cache.get(key, initial)
+            versions[scope] = initial
+    return versions
+
+
+async def _aread_versions(keys):
+    found = await cache.aget_many(list(keys))
+    versions = {}
+    for key, scope in keys.items():
+        if key in found:
+            versions[scope] = found[key]
+        else:
+            initial = _initial_version()
+            if not await cache.aadd(key, initial, timeout=None):
+                initial = await cache.aget(key, initial)
+            versions[scope] = initial
+    return versions
+
+
+def _incr_versions(keys):
+    # 副本可能还没有追上这次写入，窗口内的只读页面改读主库，避免把旧数据存到新版本号下
+    note_primary_write()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+
+
+def get_versions(store_ids):
+    """
+    批量读取版本号，返回 {store_id: version}。store_id 为 None 表示全局版本号。
+    """
+    return _read_versions({_version_key(store_id): store_id for store_id in store_ids})
+
+
+def get_version(store_id=None):
+    return get_versions([store_id])[store_id]
+
+
+async def aget_version(store_id=None):
+    versions = await _aread_versions({_version_key(store_id): store_id})
+    return versions[store_id]
+
+
+def get_table_versions(table_ids):
+    """批量读取牌桌版本号，返回 {table_id: version}，用于模板片段缓存的键。"""
+    return _read_versions({_table_version_key(table_id): table_id for table_id in table_ids})
+
+
+async def aget_table_versions(table_ids):
+    return await _aread_versions({_table_version_key(table_id): table_id for table_id in table_ids})
+
+
+def get_user_version(user_id):
+    """用户版本号：该用户参与的任一对局发生变化时递增。"""
+    return _read_versions({_user_version_key(user_id): user_id})[user_id]
+
+
+def bump_versions(store_ids, table_ids=(), user_ids=()):
+    """
+    递增指定门店、牌桌、用户以及全局的版本号。queryset.update() 等不会触发信号的
+    批量操作需要在执行后手动调用。
+    在事务中调用时，版本号在事务提交后才递增：否则并发的读请求可能在提交前读到旧数据，
+    却把排期、模板片段和 ETag 存在新版本号下，直到下一次写入之前一直返回旧内容。
+    """
+    scopes = {store_id for store_id in store_ids if store_id is not None}
+    scopes.add(None)
+    keys = [_version_key(store_id) for store_id in scopes]
+    keys.extend(_table_version_key(table_id) for table_id in set(table_ids) if table_id is not None)
+    keys.extend(_user_version_key(user_id) for user_id in set(user_ids) if user_id is not None)
+    transaction.on_commit(lambda: _incr_versions(keys))
+
+
+def _current_user_id(request):
+    # 直接读取 session 中的用户 ID，避免为计算 ETag 而查询用户表
+    session = getattr(request, 'session', None)
+    if session is None:
+        return ''
+    return session.get(SESSION_KEY, '')
+
+
+async def _acurrent_user_id(request):
+    session = getattr(request, 'session', None)
+    if session is None:
+        return ''
+    return await session.aget(SESSION_KEY, '')
+
+
+def _page_etag(store_id, version, user_id, unread, bucket_seconds):
+    bucket = int(time.time() // bucket_seconds)
+    raw = f"{store_id}:{version}:{bucket}:{user_id}:{unread}"
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def _has_pending_messages(request):
+    """是否有尚未显示的 messages 提示（本请求新加的，或上一个请求存在 Cookie / 会话中的）。"""
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def _finalize_response(request, response, etag, user_id, max_age):
+    if request.method in ('GET', 'HEAD'):
+        response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, max_age=max_age, must_revalidate=True)
+        if user_id:
+            patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def versioned_page(store_kwarg=None, bucket_seconds=60):
+    """
+    视图装饰器：为公开页面加上基于版本号的强 ETag 和 Cache-Control。
+    同时支持同步视图和异步视图（见 booking/async_views.py）。
+
+    store_kwarg: URL 参数中门店 ID 的名称；为 None 时使用全局版本号。
+    bucket_seconds: 页面内容随时间变化的粒度（例如“当前时间”只精确到分钟），
+                    同一时间片内版本号不变则返回 304。
+
+    用法::
+
+        @versioned_page(store_kwarg='store_id', bucket_seconds=3600)
+        def store_timetable_view(request, store_id):
+            ...
+    """
+    max_age = getattr(settings, 'BOOKING_PAGE_MAX_AGE', 0)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            @functools.wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                if await sync_to_async(_has_pending_messages)(request):
+                    response = await view_func(request, *args, **kwargs)
+                    add_never_cache_headers(response)
+                    return response
+                store_id = kwargs.get(store_kwarg) if store_kwarg else None
+                user_id = await _acurrent_user_id(request)
+                unread = await aunread_count(request) if user_id else ''
+                etag = _page_etag(store_id, await aget_version(store_id), user_id, unread, bucket_seconds)
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return _finalize_response(request, response, etag, user_id, max_age)
+
+        else:
+
+            @functools.wraps(view_func)
+            def _wrapped_view(request, *args, **kwargs):
+                if _has_pending_messages(request):
+                    response = view_func(request, *args, **kwargs)
+                    add_never_cache_headers(response)
+                    return response
+                store_id = kwargs.get(store_kwarg) if store_kwarg else None
+                user_id = _current_user_id(request)
+                unread = unread_count(request) if user_id else ''
+                etag = _page_etag(store_id, get_version(store_id), user_id, unread, bucket_seconds)
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = view_func(request, *args, **kwargs)
+                return _finalize_response(request, response, etag, user_id, max_age)
+
+        return _wrapped_view
+
+    return decorator
@@ -0,0 +1,205 @@
+# booking/changes.py
+"""
+变更订阅：收银、财务等下游系统按序号增量同步对局与牌桌，不再整表比对。
+
+  * 写入：对局、牌桌的保存 / 删除以及参与者变化由 booking/signals.py 在同一个事务中追加
+    ChangeFeedEntry；queryset.update()、bulk_create 等不触发信号的批量操作（后台批量成行、
+    过期清理、比赛建轮、名单修复）显式调用 record_bookings()。变更只记「哪个对象变了」，
+    内容在读取时取对象的当前状态，同一对象的多次变化只需同步一次；
+  * 序号：自增主键在插入时分配、提交顺序却不确定，消费者按主键读取可能跳过晚提交的小主键。
+    因此变更插入时不带序号，读取前由 sequence() 给已提交的变更按主键顺序接着最大序号编号，
+    之后才提交的变更只会得到更大的序号，消费者记住读到的最大序号即可不重不漏。
+    PostgreSQL 上编号前先取事务级咨询锁，多个进程依次编号；seq 上的唯一约束兜底，冲突时重试。
+    主键连续的一段变更用一条 UPDATE（seq = 主键 + 差值）编号，补写上万条时也只需几条语句；
+  * 读取：fetch(after) 返回序号 after 之后的一批变更，同一批中同一对象只保留最后一条，
+    新增 / 修改附带对象的当前状态（对局为 history.booking_state() 加参与者名单）。
+    消费者的偏移量保存在 ChangeFeedConsumer 中（commit() / offset()），
+    接口与 manage.py change_feed 都可以按消费者名从上次提交的位置继续；
+  * 压缩：compact() 删除已被同一对象更晚的变更覆盖的旧变更（内容总是取当前状态，旧变更不再需要），
+    以及所有消费者都已读过、超过保留天数的删除记录。压缩后从 0 开始读取即可得到全部现存对象；
+    变更订阅上线之前就存在的对象在压缩时由 record_baseline() 补写一条新增记录。
+"""
+import datetime
+import hmac
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, Max, Min, OuterRef
+from django.utils import timezone
+
+from .history import booking_state
+from .models import Booking, ChangeFeedConsumer, ChangeFeedEntry, MahjongTable
+
+# 每次编号最多处理的变更数
+SEQUENCE_BATCH = 5000
+# 编号时使用的 PostgreSQL 咨询锁编号
+SEQUENCE_LOCK = 0x6d6a6364
+# 单次读取的上限
+MAX_BATCH_SIZE = 5000
+# 同步给下游的对局字段（history.booking_state() 用到的字段加参与者名单）
+BOOKING_FIELDS = (
+    'status', 'store_id', 'table_id', 'start_time', 'end_time', 'num_games', 'booking_type', 'creator_id',
+    'participant_ids', 'participant_names',
+)
+
+
+def record(entity, rows, op='UPSERT'):
+    """在当前事务中为一组对象追加变更，rows 为 (对象ID, 门店ID)。"""
+    now = timezone.now()
+    ChangeFeedEntry.objects.bulk_create(
+        [
+            ChangeFeedEntry(entity=entity, object_id=object_id, store_id=store_id, op=op, created_at=now)
+            for object_id, store_id in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def record_bookings(bookings, op='UPSERT'):
+    record('booking', [(booking.pk, booking.store_id) for booking in bookings], op)
+
+
+def sequence():
+    """给已提交、尚未编号的变更按主键顺序分配序号，返回编号的条数。"""
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SEQUENCE_LOCK])
+                pending = list(
+                    ChangeFeedEntry.objects.filter(seq__isnull=True).order_by('pk')
+                    .values_list('pk', flat=True)[:SEQUENCE_BATCH]
+                )
+                if not pending:
+                    return 0
+                last = ChangeFeedEntry.objects.aggregate(last=Max('seq'))['last'] or 0
+                # 按主键连续的段编号：[(首个主键, 末个主键, 首个序号)]
+                runs = []
+                for number, pk in enumerate(pending, last + 1):
+                    if runs and pk == runs[-1][1] + 1:
+                        runs[-1][1] = pk
+                    else:
+                        runs.append([pk, pk, number])
+                for first, end, number in runs:
+                    ChangeFeedEntry.objects.filter(pk__range=(first, end), seq__isnull=True).update(
+                        seq=F('pk') + (number - first),
+                    )
+            return len(pending)
+        except IntegrityError:
+            # 另一个进程同时在编号，重新读取最大序号
+            continue
+    return 0
+
+
+def _booking_data(booking_ids):
+    return {
+        booking.pk: {**booking_state(booking), 'names': booking.participant_names}
+        for booking in Booking.objects.filter(pk__in=booking_ids).only(*BOOKING_FIELDS)
+    }
+
+
+def _table_data(table_ids):
+    return {
+        table.pk: {'store': table.store_id, 'number': table.table_number, 'alias': table.alias}
+        for table in MahjongTable.objects.filter(pk__in=table_ids)
+    }
+
+
+LOADERS = {'booking': _booking_data, 'table': _table_data}
+
+
+def fetch(after=0, limit=None):
+    """
+    序号 after 之后的一批变更：{'changes': [...], 'next': 下次读取的起点, 'more': 是否还有更多}。
+    新增 / 修改的对象在读取时已被删除的，跳过该条（它的删除记录在同一事务中写入，随后就会读到）。
+    """
+    limit = max(1, min(limit or settings.BOOKING_CHANGE_FEED_BATCH_SIZE, MAX_BATCH_SIZE))
+    sequence()
+    rows = list(
+        ChangeFeedEntry.objects.filter(seq__gt=after).order_by('seq')
+        .values_list('seq', 'entity', 'object_id', 'store_id', 'op', 'created_at')[:limit]
+    )
+    # 同一对象只保留本批中的最后一条
+    latest = {(row[1], row[2]): row for row in rows}
+    data = {
+        entity: loader([object_id for kind, object_id in latest if kind == entity])
+        for entity, loader in LOADERS.items()
+    }
+    changes = []
+    for seq, entity, object_id, store_id, op, created_at in sorted(latest.values()):
+        change = {'seq': seq, 'entity': entity, 'id': object_id, 'store': store_id, 'op': op,
+                  'at': created_at.isoformat()}
+        if op == 'UPSERT':
+            if object_id not in data[entity]:
+                continue
+            change['data'] = data[entity][object_id]
+        changes.append(change)
+    return {'changes': changes, 'next': rows[-1][0] if rows else after, 'more': len(rows) == limit}
+
+
+def offset(consumer):
+    """消费者上次提交的序号，新消费者为 0。"""
+    return ChangeFeedConsumer.objects.filter(name=consumer).values_list('offset', flat=True).first() or 0
+
+
+def commit(consumer, value):
+    """记录消费者已处理到序号 value（之前的变更都已处理）。"""
+    ChangeFeedConsumer.objects.update_or_create(name=consumer, defaults={'offset': value})
+
+
+def consumer_for_token(authorization):
+    """按请求头 Authorization: Bearer <令牌> 找到对应的消费者名，令牌无效时返回 None。"""
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    for consumer, expected in settings.BOOKING_CHANGE_FEED_TOKENS.items():
+        if hmac.compare_digest(token.encode(), expected.encode()):
+            return consumer
+    return None
+
+
+def record_baseline():
+    """为还没有任何变更的对局、牌桌补写新增记录，返回补写的条数。"""
+    count = 0
+    for entity, model in (('booking', Booking), ('table', MahjongTable)):
+        recorded = ChangeFeedEntry.objects.filter(entity=entity).values('object_id')
+        rows = model.objects.exclude(pk__in=recorded).order_by('pk').values_list('pk', 'store_id')
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            batch.append(row)
+            if len(batch) >= 2000:
+                record(entity, batch)
+                count += len(batch)
+                batch = []
+        record(entity, batch)
+        count += len(batch)
+    return count
+
+
+def compact(now=None):
+    """
+    补写尚未记录的对象，删除被覆盖的旧变更与过期的删除记录，
+    返回 {'baseline': 条数, 'superseded': 条数, 'tombstones': 条数}。
+    """
+    baseline = record_baseline()
+    while sequence():
+        pass
+    sequenced = ChangeFeedEntry.objects.filter(seq__isnull=False)
+    later = ChangeFeedEntry.objects.filter(
+        entity=OuterRef('entity'), object_id=OuterRef('object_id'), seq__gt=OuterRef('seq'),
+    )
+    superseded, _ = sequenced.filter(Exists(later)).delete()
+
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=settings.BOOKING_CHANGE_FEED_TOMBSTONE_DAYS)
+    tombstones = sequenced.filter(op='DELETE', created_at__lt=cutoff)
+    # 删除记录要等所有消费者都读过之后才能移除，否则它们会漏掉这次删除
+    lowest = ChangeFeedConsumer.objects.aggregate(lowest=Min('offset'))['lowest']
+    if lowest is not None:
+        tombstones = tombstones.filter(seq__lte=lowest)
+    removed, _ = tombstones.delete()
+    return {'baseline': baseline, 'superseded': superseded, 'tombstones': removed}
+
+
+def latest_seq():
+    return ChangeFeedEntry.objects.aggregate(last=Max('seq'))['last'] or 0
@@ -0,0 +1,274 @@
+# booking/conflicts.py
+"""
+牌桌分配冲突检测。
+
+按门店把一段时间内的有效对局（匹配中 / 匹配成功）装入区间树，支持：
+  * ConflictDetector.validate()：批量校验一组牌桌分配，批内互相冲突也会被发现；
+  * ConflictDetector.suggest()：为一组对局批量推荐空闲牌桌；
+  * conflict_report()：一次遍历找出时间范围内的所有问题——同桌时间重叠、
+    牌桌不属于对局门店、超出门店营业时间。
+后台「冲突报告」页面与 manage.py check_conflicts 都基于 conflict_report()。
+分配牌桌的写入先在事务中用 lock_tables() 锁定涉及的牌桌，再建立检测器、写入，
+同一张牌桌上的校验与写入依次进行，不会有两个对局在校验之后同时占用同一张牌桌。
+"""
+import datetime
+from dataclasses import dataclass
+
+from django.utils import timezone
+
+from . import metadata
+from .policy import minute_of_day, within_hours
+from .models import Booking, MahjongTable
+from .schedule import to_minutes
+
+ACTIVE_STATUSES = ('PENDING', 'CONFIRMED')
+
+DOUBLE_BOOKING = 'DOUBLE_BOOKING'
+WRONG_STORE = 'WRONG_STORE'
+OUT_OF_HOURS = 'OUT_OF_HOURS'
+KIND_LABELS = {
+    DOUBLE_BOOKING: '同桌时间冲突',
+    WRONG_STORE: '牌桌不属于该门店',
+    OUT_OF_HOURS: '超出营业时间',
+}
+
+
+class Span:
+    """一个对局占用的区间，start / end 为纪元分钟，table_store_id 为牌桌实际所属门店。"""
+
+    __slots__ = ('booking_id', 'store_id', 'table_id', 'table_store_id', 'start', 'end', 'start_time', 'end_time')
+
+    def __init__(self, booking_id, store_id, table_id, table_store_id, start_time, end_time):
+        self.booking_id = booking_id
+        self.store_id = store_id
+        self.table_id = table_id
+        self.table_store_id = table_store_id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start = to_minutes(start_time)
+        self.end = to_minutes(end_time)
+
+
+class IntervalTree:
+    """
+    静态的中心点区间树，区间为半开区间 [start, end)。
+    每个节点保存包含中心点的区间（分别按开始、结束时间排序），左 / 右子树保存
+    完全在中心点左侧 / 右侧的区间。查询复杂度 O(log n + k)。
+    """
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, items):
+        # 以开始时间的中位数为中心点，保证至少有一个区间留在本节点，递归必然收敛
+        starts = sorted(item.start for item in items)
+        self.center = starts[len(starts) // 2] if starts else 0
+        here, left, right = [], [], []
+        for item in items:
+            if item.end <= self.center and item.start < self.center:
+                left.append(item)
+            elif item.start > self.center:
+                right.append(item)
+            else:
+                here.append(item)
+        self.by_start = sorted(here, key=lambda item: item.start)
+        self.by_end = sorted(here, key=lambda item: item.end, reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start, end):
+        """返回与 [start, end) 重叠的全部区间。"""
+        result = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if end <= node.center:
+                for item in node.by_start:
+                    if item.start >= end:
+                        break
+                    result.append(item)
+            elif start > node.center:
+                for item in node.by_end:
+                    if item.end <= start:
+                        break
+                    result.append(item)
+            else:
+                result.extend(node.by_start)
+            if node.left is not None and start < node.center:
+                stack.append(node.left)
+            if node.right is not None and end > node.center:
+                stack.append(node.right)
+        return result
+
+
+@dataclass(frozen=True)
+class Conflict:
+    kind: str
+    booking_id: int
+    store_id: int
+    table_id: int
+    start_time: datetime.datetime
+    end_time: datetime.datetime
+    other_booking_id: int = None
+
+    @property
+    def label(self):
+        return KIND_LABELS[self.kind]
+
+
+def lock_tables(table_ids):
+    """
+    在当前事务中按主键顺序锁定牌桌行（SELECT ... FOR UPDATE），直到事务结束。
+    SQLite 不支持行锁，写事务本来就是串行的。
+    """
+    list(MahjongTable.objects.select_for_update().filter(pk__in=set(table_ids)).order_by('pk').values_list('pk'))
+
+
+def load_spans(start, end, store_ids=None):
+    """读取与 [start, end)（datetime）重叠的有效对局，一次 values_list 查询。"""
+    bookings = Booking.objects.filter(
+        status__in=ACTIVE_STATUSES, start_time__lt=end, end_time__gt=start,
+    )
+    if store_ids is not None:
+        # 其他门店的对局也可能错误地占用了这些门店的牌桌
+        bookings = bookings.filter(store_id__in=store_ids) | bookings.filter(table__store_id__in=store_ids)
+    rows = bookings.values_list('id', 'store_id', 'table_id', 'table__store_id', 'start_time', 'end_time')
+    return [Span(*row) for row in rows]
+
+
+class ConflictDetector:
+    """
+    按牌桌所属门店分组建立区间树。validate / suggest 中已接受的分配记在批内覆盖层里，
+    后续对局会与之比较；批内涉及的对局在树中的旧区间会被忽略（视为重新分配）。
+    """
+
+    def __init__(self, spans):
+        self.spans = spans
+        by_store = {}
+        for span in spans:
+            if span.table_id is not None:
+                by_store.setdefault(span.table_store_id, []).append(span)
+        self.trees = {store_id: IntervalTree(items) for store_id, items in by_store.items()}
+
+    @classmethod
+    def for_range(cls, start, end, store_ids=None):
+        return cls(load_spans(start, end, store_ids))
+
+    def occupied(self, store_id, start, end, exclude=()):
+        """返回门店牌桌上与 [start, end)（纪元分钟）重叠的区间。"""
+        tree = self.trees.get(store_id)
+        if tree is None:
+            return []
+        return [span for span in tree.overlapping(start, end) if span.booking_id not in exclude]
+
+    def occupied_table_ids(self, store_id, start_time, end_time, exclude=()):
+        return {
+            span.table_id
+            for span in self.occupied(store_id, to_minutes(start_time), to_minutes(end_time), exclude)
+        }
+
+    def _busy(self, store_id, start, end, exclude, accepted):
+        """{牌桌ID: 占用它的对局ID}，包括树中的对局和批内已接受的分配。"""
+        busy = {span.table_id: span.booking_id for span in self.occupied(store_id, start, end, exclude)}
+        for other_id, table_id, other_start, other_end in accepted.get(store_id, ()):
+            if other_start < end and other_end > start:
+                busy.setdefault(table_id, other_id)
+        return busy
+
+    def validate(self, proposals):
+        """
+        批量校验分配方案。proposals 为 Booking（可未保存），按其 store / table /
+        start_time / end_time 判断，批内的分配彼此之间也会检查；
+        返回与输入顺序一致的 [Conflict, ...] 列表。
+        """
+        proposals = list(proposals)
+        exclude = {booking.pk for booking in proposals if booking.pk is not None}
+        tables = metadata.store_directory().tables_by_id
+        accepted = {}
+        results = []
+        for booking in proposals:
+            start, end = to_minutes(booking.start_time), to_minutes(booking.end_time)
+            conflicts = []
+            if booking.table_id is not None:
+                table = tables.get(booking.table_id)
+                table_store_id = table.store_id if table else None
+                if table_store_id != booking.store_id:
+                    conflicts.append(_conflict(WRONG_STORE, booking))
+                busy = self._busy(table_store_id, start, end, exclude, accepted)
+                if booking.table_id in busy:
+                    conflicts.append(_conflict(DOUBLE_BOOKING, booking, busy[booking.table_id]))
+                accepted.setdefault(table_store_id, []).append((booking.pk, booking.table_id, start, end))
+            if not within_opening_hours(booking.store_id, booking.start_time, booking.end_time):
+                conflicts.append(_conflict(OUT_OF_HOURS, booking))
+            results.append(conflicts)
+        return results
+
+    def suggest(self, proposals):
+        """
+        为一组对局按开始时间依次分配门店中第一张空闲牌桌（按桌号），返回与输入
+        顺序一致的牌桌 ID 列表，没有空闲牌桌时为 None。
+        """
+        proposals = list(proposals)
+        exclude = {booking.pk for booking in proposals if booking.pk is not None}
+        accepted = {}
+        suggestions = [None] * len(proposals)
+        for index in sorted(range(len(proposals)), key=lambda i: proposals[i].start_time):
+            booking = proposals[index]
+            start, end = to_minutes(booking.start_time), to_minutes(booking.end_time)
+            busy = self._busy(booking.store_id, start, end, exclude, accepted)
+            store = metadata.get_store(booking.store_id)
+            for table in store.sorted_tables if store else ():
+                if table.id not in busy:
+                    suggestions[index] = table.id
+                    accepted.setdefault(booking.store_id, []).append((booking.pk, table.id, start, end))
+                    break
+        return suggestions
+
+
+def _conflict(kind, booking, other_booking_id=None):
+    return Conflict(kind, booking.pk, booking.store_id, booking.table_id,
+                    booking.start_time, booking.end_time, other_booking_id)
+
+
+LOCAL_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def local_minutes(value):
+    """aware datetime -> 当前时区本地时间自 1970-01-01 00:00 起的分钟数（可带小数），整天落在 1440 的整数倍上。"""
+    return (timezone.localtime(value).replace(tzinfo=None) - LOCAL_EPOCH).total_seconds() / 60
+
+
+def within_opening_hours(store_id, start_time, end_time):
+    """对局是否完全落在门店的某个营业时段内；未设置营业时间的门店视为 24 小时营业。"""
+    store = metadata.get_store(store_id)
+    if store is None:
+        return True
+    return within_hours(
+        minute_of_day(store.opening_time), minute_of_day(store.closing_time),
+        local_minutes(start_time), local_minutes(end_time),
+    )
+
+
+def conflict_report(start, end, store_ids=None):
+    """
+    返回 [start, end) 范围内的全部冲突（按开始时间排序）。同桌重叠的一对对局只报告一次，
+    booking_id 为较早的一方，other_booking_id 为另一方。
+    """
+    spans = load_spans(start, end, store_ids)
+    detector = ConflictDetector(spans)
+    conflicts = []
+    for span in spans:
+        def add(kind, other=None):
+            conflicts.append(Conflict(kind, span.booking_id, span.store_id, span.table_id,
+                                      span.start_time, span.end_time, other))
+
+        if span.table_id is not None:
+            if span.table_store_id != span.store_id:
+                add(WRONG_STORE)
+            for other in detector.occupied(span.table_store_id, span.start, span.end):
+                if other.table_id == span.table_id and (other.start, other.booking_id) > (span.start, span.booking_id):
+                    add(DOUBLE_BOOKING, other.booking_id)
+        if not within_opening_hours(span.store_id, span.start_time, span.end_time):
+            add(OUT_OF_HOURS)
+
+    conflicts.sort(key=lambda conflict: (conflict.start_time, conflict.booking_id, conflict.kind))
+    return conflicts
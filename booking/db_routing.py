@@ -0,0 +1,170 @@
+# booking/db_routing.py
+"""
+读写分离：把只读页面的查询路由到只读副本，并统计连接池使用情况。
+
+  * PrimaryReplicaRouter：数据库路由。只有在 read_replica 视图装饰器（或 replica_reads
+    上下文）内，booking 应用的读查询才会发往 settings.BOOKING_READ_REPLICA 指定的别名；
+    其他情况以及所有写操作都走主库。
+  * ReplicaPinMiddleware：用户提交 POST 等写请求后，在 Cookie 中记录一个短暂的“固定主库”
+    时间窗口，窗口内的请求全部读主库，保证用户能立即看到自己刚写入的数据。
+  * 写入后的全局窗口：只读页面的结果会按版本号存进共享缓存（排期、模板片段、ETag），
+    副本落后时读到的旧数据会被存到新版本号下、发给所有客户端。因此每次写入提交、递增版本号时
+    （见 booking/caching.py）调用 note_primary_write()，之后 BOOKING_REPLICA_STICKY_SECONDS 秒内
+    所有只读视图都读主库；该值应大于副本的最大复制延迟。
+  * pool_stats()：各数据库别名的连接建立次数、路由读次数及 psycopg 连接池状态。
+"""
+import contextlib
+import functools
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE_NAME = 'db_pin'
+RECENT_WRITE_KEY = 'booking:replica:recent_write'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+# 只有这些应用的读查询会走副本；session / 用户表留在主库，避免复制延迟导致“刚登录又掉线”
+REPLICA_APPS = {'booking'}
+
+_replica_reads = ContextVar('booking_replica_reads', default=False)
+
+connections_opened = Counter()
+routed_reads = Counter()
+
+
+def replica_alias():
+    """返回已配置的只读副本别名；未配置时返回 None（全部读主库）。"""
+    alias = getattr(settings, 'BOOKING_READ_REPLICA', None)
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def _sticky_seconds():
+    return getattr(settings, 'BOOKING_REPLICA_STICKY_SECONDS', 10)
+
+
+def note_primary_write():
+    """写入提交后调用：副本可能还没有追上，接下来的一段时间内只读视图都读主库。"""
+    if replica_alias():
+        cache.set(RECENT_WRITE_KEY, 1, timeout=_sticky_seconds())
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = DEFAULT_DB_ALIAS
+        if _replica_reads.get() and model._meta.app_label in REPLICA_APPS:
+            alias = replica_alias() or DEFAULT_DB_ALIAS
+        routed_reads[alias] += 1
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本与主库数据相同，允许跨别名建立关联
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由主库复制而来，不在副本上执行迁移
+        if db == replica_alias():
+            return False
+        return None
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """在 with 块（或被装饰的函数）内把 booking 的读查询发往只读副本。"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_replica(view_func):
+    """
+    视图装饰器：只读视图的查询走只读副本。若请求处于写后固定主库窗口内
+    （见 ReplicaPinMiddleware），或最近有写入提交（见 note_primary_write），仍然读主库。
+    同时支持同步和异步视图。
+    """
+    if iscoroutinefunction(view_func):
+
+        @functools.wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            if not replica_alias() or getattr(request, 'db_pinned', False) or await cache.aget(RECENT_WRITE_KEY):
+                return await view_func(request, *args, **kwargs)
+            with replica_reads():
+                return await view_func(request, *args, **kwargs)
+
+    else:
+
+        @functools.wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not replica_alias() or getattr(request, 'db_pinned', False) or cache.get(RECENT_WRITE_KEY):
+                return view_func(request, *args, **kwargs)
+            with replica_reads():
+                return view_func(request, *args, **kwargs)
+
+    return _wrapped_view
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """写请求之后的一小段时间内，让该客户端的读请求固定走主库（read-your-writes）。"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sticky_seconds = _sticky_seconds()
+
+    def process_request(self, request):
+        try:
+            pinned_until = int(request.COOKIES.get(PIN_COOKIE_NAME, 0))
+        except ValueError:
+            pinned_until = 0
+        request.db_pinned = pinned_until > time.time()
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and replica_alias():
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                str(int(time.time()) + self.sticky_seconds),
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    connections_opened[connection.alias] += 1
+
+
+def pool_stats():
+    """
+    返回当前进程中各数据库别名的连接使用情况::
+
+        {'default': {'connections_opened': 3, 'routed_reads': 120, 'pool': {...}}, ...}
+
+    pool 为 psycopg 连接池的 get_stats() 结果；未启用连接池（使用 CONN_MAX_AGE
+    持久连接）时为 None。
+    """
+    stats = {}
+    for alias in settings.DATABASES:
+        pool = getattr(connections[alias], 'pool', None)
+        stats[alias] = {
+            'connections_opened': connections_opened[alias],
+            'routed_reads': routed_reads[alias],
+            'pool': pool.get_stats() if pool is not None else None,
+        }
+    return stats
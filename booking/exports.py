@@ -0,0 +1,330 @@
+# booking/exports.py
+"""
+后台导出：对局记录 XLSX，以及按天 / 门店的课表（XLSX 与打印用的 HTML / PDF，
+三者共用 iter_schedule_sheets() 生成的课表网格，打印版的渲染见 booking/printing.py）。
+
+openpyxl 体积较大，只在真正执行导出时才导入；booking/admin.py 也只在管理员
+触发导出动作时才加载本模块，避免 Web / Celery 进程启动时为此付出导入开销。
+"""
+import copy
+import datetime
+import os
+import tempfile
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+
+from accounts.profiles import get_profiles
+
+from . import metadata, printing
+
+
+def export_bookings_xlsx(queryset):
+    """
+    导出对局记录为 XLSX，返回可直接下载的 HttpResponse。
+    """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+
+    response = HttpResponse(
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = 'attachment; filename="mahjong_bookings_export.xlsx"'
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "对局记录"
+
+    # 定义表头
+    columns = [
+        ("ID", 5),
+        ("发起人", 15),
+        ("参与者", 30), # 参与者可能较多，宽度大一些
+        ("门店", 15),
+        ("牌桌", 10),
+        ("半庄数", 8),
+        ("开始时间", 20),
+        ("结束时间", 20),
+        ("状态", 10),
+        ("创建时间", 20),
+    ]
+
+    header_font = Font(name='Calibri', bold=True)
+    thin_border = Border(left=Side(style='thin'),
+                         right=Side(style='thin'),
+                         top=Side(style='thin'),
+                         bottom=Side(style='thin'))
+    align_center = Alignment(horizontal="center", vertical="center")
+    align_left = Alignment(horizontal="left", vertical="top", wrap_text=True)
+
+
+    # 写入表头
+    for col_idx, (header_text, width) in enumerate(columns, 1):
+        cell = worksheet.cell(row=1, column=col_idx, value=header_text)
+        cell.font = header_font
+        cell.alignment = align_center
+        cell.border = thin_border
+        worksheet.column_dimensions[get_column_letter(col_idx)].width = width
+
+    # 参与者名单已反范式化保存在对局上；发起人显示名从用户资料缓存批量读取
+    bookings = list(queryset.select_related('store', 'table').order_by('start_time'))
+    profiles = get_profiles({booking.creator_id for booking in bookings})
+
+    row_num = 2
+    for booking in bookings:
+        participants_str = ", ".join(booking.participant_names)
+        creator = profiles.get(booking.creator_id)
+
+        # 确保时间以本地时区显示
+        start_time_local = timezone.localtime(booking.start_time) if booking.start_time else ""
+        end_time_local = timezone.localtime(booking.end_time) if booking.end_time else ""
+        created_at_local = timezone.localtime(booking.created_at) if booking.created_at else ""
+
+        # 填充数据
+        worksheet.cell(row=row_num, column=1, value=booking.id).border = thin_border
+        worksheet.cell(row=row_num, column=2, value=creator.label if creator else "").border = thin_border
+        worksheet.cell(row=row_num, column=3, value=participants_str).alignment = align_left # 参与者可能多，允许换行
+        worksheet.cell(row=row_num, column=3).border = thin_border
+        worksheet.cell(row=row_num, column=4, value=booking.store.name).border = thin_border
+        worksheet.cell(row=row_num, column=5, value=booking.table.table_number if booking.table else "未分配").border = thin_border
+        worksheet.cell(row=row_num, column=6, value=booking.num_games if booking.num_games is not None else "-").border = thin_border
+        worksheet.cell(row=row_num, column=7, value=start_time_local.strftime('%Y-%m-%d %H:%M') if start_time_local else "").border = thin_border
+        worksheet.cell(row=row_num, column=8, value=end_time_local.strftime('%Y-%m-%d %H:%M') if end_time_local else "").border = thin_border
+        worksheet.cell(row=row_num, column=9, value=booking.get_status_display()).border = thin_border
+        worksheet.cell(row=row_num, column=10, value=created_at_local.strftime('%Y-%m-%d %H:%M') if created_at_local else "").border = thin_border
+
+        row_num += 1
+
+    workbook.save(response) # 将工作簿保存到响应中
+    return response
+
+
+def iter_schedule_sheets(bookings, start_dt, end_dt):
+    """
+    按天、门店顺序生成课表网格（booking.printing.ScheduleSheet），XLSX / HTML / PDF 导出共用。
+
+    bookings 为 Booking 查询集。按开始时间单次遍历：当天的对局收齐后立即生成该天
+    各门店的课表，只保留跨越午夜、仍需出现在后续日期中的对局，
+    内存占用只与单日对局数有关。牌桌来自门店元数据缓存，不再逐表查询。
+    """
+    local_tz = timezone.get_current_timezone()
+    start_day = timezone.localtime(start_dt, local_tz).date()
+    end_day = timezone.localtime(end_dt, local_tz).date()
+    directory = metadata.store_directory()
+
+    rows = (
+        bookings.order_by('start_time')
+        .values_list('store_id', 'table_id', 'start_time', 'end_time', 'num_games', 'participant_names')
+        .iterator(chunk_size=2000)
+    )
+    active = []
+    current_day = start_day
+    for store_id, table_id, start_time, end_time, num_games, names in rows:
+        record = _ScheduleEntry(
+            store_id, table_id,
+            timezone.localtime(start_time, local_tz), timezone.localtime(end_time, local_tz),
+            num_games, names,
+        )
+        # 新对局开始于更晚的日期时，之前的日期已经收齐，可以生成
+        while current_day < record.start.date() and current_day <= end_day:
+            sheets, active = _day_sheets(directory, current_day, active, local_tz)
+            yield from sheets
+            current_day += datetime.timedelta(days=1)
+        active.append(record)
+
+    while active and current_day <= end_day:
+        sheets, active = _day_sheets(directory, current_day, active, local_tz)
+        yield from sheets
+        current_day += datetime.timedelta(days=1)
+
+
+def export_schedule_xlsx(bookings, start_dt, end_dt):
+    """按天 / 门店生成课表 XLSX，每小时一格展示各牌桌占用情况，每个门店日一个工作表。"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    styles = _ScheduleStyles()
+    for sheet in iter_schedule_sheets(bookings, start_dt, end_dt):
+        _write_schedule_sheet(workbook.create_sheet(title=sheet.title), styles, sheet)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    return _file_response(
+        output, 'mahjong_schedule.xlsx',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True,
+    )
+
+
+def export_schedule_pdf(bookings, start_dt, end_dt):
+    """
+    课表的打印版 PDF：每个门店日至少一页，由进程池并行渲染后合并为一个文件，
+    浏览器内直接打开即可打印。
+    """
+    output = tempfile.TemporaryFile()
+    printing.write_pdf(
+        iter_schedule_sheets(bookings, start_dt, end_dt), output,
+        workers=_print_workers(start_dt, end_dt),
+    )
+    return _file_response(output, 'mahjong_schedule.pdf', 'application/pdf')
+
+
+def export_schedule_html(bookings, start_dt, end_dt):
+    """课表的打印版 HTML：每个门店日一节，打印时各自起一页，表头在续页重复。"""
+    title = f"对局课表 {timezone.localtime(start_dt):%Y-%m-%d} 至 {timezone.localtime(end_dt):%Y-%m-%d}"
+    output = tempfile.TemporaryFile()
+    printing.write_html(
+        iter_schedule_sheets(bookings, start_dt, end_dt), output, title,
+        workers=_print_workers(start_dt, end_dt),
+    )
+    return _file_response(output, 'mahjong_schedule.html', 'text/html; charset=utf-8')
+
+
+def _print_workers(start_dt, end_dt):
+    """
+    打印渲染的进程数。单个门店日只需几毫秒，而 spawn 子进程的启动开销约为数百毫秒，
+    每个进程分到的门店日少于 BOOKING_PRINT_SHEETS_PER_WORKER 时直接在本进程渲染。
+    """
+    workers = getattr(settings, 'BOOKING_PRINT_WORKERS', None) or os.cpu_count() or 1
+    days = (timezone.localtime(end_dt).date() - timezone.localtime(start_dt).date()).days + 1
+    sheets = days * len(metadata.store_directory().stores)
+    per_worker = getattr(settings, 'BOOKING_PRINT_SHEETS_PER_WORKER', 200)
+    return max(1, min(workers, sheets // per_worker))
+
+
+def _file_response(output, filename, content_type, as_attachment=False):
+    output.seek(0)
+    return FileResponse(output, as_attachment=as_attachment, filename=filename, content_type=content_type)
+
+
+class _ScheduleEntry:
+    __slots__ = ('store_id', 'table_id', 'start', 'end', 'num_games', 'names')
+
+    def __init__(self, store_id, table_id, start, end, num_games, names):
+        self.store_id = store_id
+        self.table_id = table_id
+        self.start = start
+        self.end = end
+        self.num_games = num_games
+        self.names = names
+
+
+def _day_sheets(directory, day, active, local_tz):
+    """生成某天各门店的课表，返回 (课表列表, 仍延续到下一天的对局)。"""
+    day_start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), local_tz)
+    day_end = day_start + datetime.timedelta(days=1)
+
+    by_store = defaultdict(list)
+    for entry in active:
+        if entry.end > day_start and entry.start < day_end:
+            by_store[entry.store_id].append(entry)
+
+    sheets = [
+        _build_sheet(day, day_start, store, by_store[store.id])
+        for store in directory.stores if by_store.get(store.id)
+    ]
+    return sheets, [entry for entry in active if entry.end > day_end]
+
+
+def _build_sheet(day, day_start, store, entries):
+    table_entries = defaultdict(list)
+    unassigned = []
+    for entry in entries:
+        if entry.table_id:
+            table_entries[entry.table_id].append(entry)
+        else:
+            unassigned.append(entry)
+
+    tables = [table.table_number for table in store.sorted_tables]
+    blocks = [table_entries[table.id] for table in store.sorted_tables]
+    if unassigned:
+        tables.append("未分配")
+        blocks.append(unassigned)
+
+    # 24 小时 × 牌桌块，对局放在其开始的小时（前一天开始的对局放在 0 点）
+    cells = [[[] for _ in blocks] for _ in range(24)]
+    for block_index, block_entries in enumerate(blocks):
+        for entry in block_entries:
+            hour = int(max(0, min(23, (entry.start - day_start).total_seconds() // 3600)))
+            cells[hour][block_index].append((
+                f"{entry.start.strftime('%H:%M')} - {entry.end.strftime('%H:%M')}",
+                entry.num_games,
+                tuple(entry.names[:4]),
+            ))
+    return printing.ScheduleSheet(day, store.name, tables, cells)
+
+
+class _ScheduleStyles:
+    """
+    只写工作表的单元格样式，整个导出共用一份。第一次使用某种样式时按常规方式设置
+    字体 / 对齐并记下登记后的样式索引，之后的单元格直接复制索引，省去每格的样式查找。
+    """
+
+    def __init__(self):
+        from openpyxl.styles import Alignment, Font
+
+        self._specs = {
+            'header': (Font(bold=True), Alignment(horizontal="center", vertical="center")),
+            'wrap': (None, Alignment(vertical="top", wrap_text=True)),
+        }
+        self._style_arrays = {}
+
+    def cell(self, sheet, value, kind):
+        from openpyxl.cell import WriteOnlyCell
+
+        cell = WriteOnlyCell(sheet, value=value)
+        style_array = self._style_arrays.get(kind)
+        if style_array is None:
+            font, alignment = self._specs[kind]
+            if font is not None:
+                cell.font = font
+            cell.alignment = alignment
+            self._style_arrays[kind] = copy.copy(cell._style)
+        else:
+            cell._style = copy.copy(style_array)
+        return cell
+
+
+def _write_schedule_sheet(sheet, styles, schedule):
+    """把一个门店日的课表写成只写工作表：每个牌桌块 6 列，第一行为合并的桌号。"""
+    from openpyxl.utils import get_column_letter
+
+    block_headers = ["起止时间", "半庄数", "参与者1", "参与者2", "参与者3", "参与者4"]
+    width = len(block_headers)
+
+    # 只写工作表需要在写入任何行之前设置列宽与合并区域
+    for block_index in range(len(schedule.tables)):
+        base_col = 2 + block_index * width
+        for offset in range(width):
+            sheet.column_dimensions[get_column_letter(base_col + offset)].width = 16 if offset == 0 else 14
+        sheet.merged_cells.add(
+            f"{get_column_letter(base_col)}1:{get_column_letter(base_col + width - 1)}1"
+        )
+
+    title_row = ["表号"]
+    header_row = ["时间"]
+    for table_name in schedule.tables:
+        title_row.append(styles.cell(sheet, str(table_name), 'header'))
+        title_row.extend([None] * (width - 1))
+        header_row.extend(styles.cell(sheet, header, 'header') for header in block_headers)
+    sheet.append(title_row)
+    sheet.append(header_row)
+
+    for hour, blocks in enumerate(schedule.cells):
+        row = [printing.hour_label(hour)]
+        for entries in blocks:
+            texts = [[] for _ in range(width)]
+            for time_label, num_games, names in entries:
+                texts[0].append(time_label)
+                if num_games:
+                    texts[1].append(str(num_games))
+                for idx, name in enumerate(names):
+                    if name:
+                        texts[2 + idx].append(name)
+            row.extend(styles.cell(sheet, "\n".join(lines), 'wrap') if lines else None for lines in texts)
+        sheet.append(row)
+
+    # 立即写完并关闭该表的临时文件，导出上千个工作表时也不会同时占用大量文件句柄
+    sheet.close()
@@ -0,0 +1,216 @@
+# booking/history.py
+"""
+对局事件日志：对局的每次状态变化追加一条 BookingEvent，可以查到「谁在什么时候做了什么」，
+也可以重建任意对局或门店在任意时刻的状态。
+
+  * 写入：调用方在修改对局的同一个事务中调用 record() / record_many()（与通知发件箱相同的做法），
+    事务回滚时事件也不会留下；批量操作（后台批量成行、过期清理、比赛建轮）用 bulk_create 一次写入。
+    后台修改表单由 record_changes() 比较修改前后的状态，拆成加入 / 退出 / 成行 / 分配牌桌等事件；
+  * 事件内容：创建事件带对局的完整状态，加入 / 退出带玩家 ID，分配牌桌带牌桌 ID，取消带原因，
+    修改时间 / 门店等字段的「修改」事件带修改后的完整状态。apply() 把一条事件作用到状态上；
+  * 重建：单个对局的事件很少，booking_at() 直接按 (booking_id, created_at) 索引取出并重放；
+    门店的状态从该时刻之前最近的快照开始，只重放快照之后的事件（按 (store_id, created_at) 索引），
+    不扫描整个日志。take_snapshots() 每晚由 Celery Beat 调用，在上一份快照上重放当天的事件得到
+    新快照，只保留尚未结束的对局，快照大小与日志长度无关。
+事件日志上线之前就存在的对局没有创建事件，第一次生成快照时为它们补写一条带当前状态的
+创建事件（时间取对局的创建时间，data 中标记 baseline）。
+"""
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking, BookingEvent, BookingSnapshot, Store
+
+STATE_KEYS = ('status', 'store', 'table', 'start', 'end', 'games', 'type', 'creator', 'participants')
+# 状态变为这些值时记录的事件
+STATUS_EVENTS = {'CONFIRMED': 'CONFIRMED', 'PENDING': 'REVERTED', 'CANCELED': 'CANCELED'}
+# 字段变化时记录为「修改」事件（带完整状态）
+UPDATED_KEYS = ('store', 'start', 'end', 'games', 'type', 'creator')
+# 快照只包含这之前的事件，给仍在进行中的事务留出提交的时间
+SNAPSHOT_LAG = datetime.timedelta(minutes=5)
+
+
+def _isoformat(value):
+    return value.astimezone(datetime.timezone.utc).isoformat()
+
+
+def booking_state(booking):
+    """对局当前的状态（可存入 JSON 的 dict）。参与者取自对局上的名单。"""
+    return {
+        'status': booking.status,
+        'store': booking.store_id,
+        'table': booking.table_id,
+        'start': _isoformat(booking.start_time),
+        'end': _isoformat(booking.end_time),
+        'games': booking.num_games,
+        'type': booking.booking_type,
+        'creator': booking.creator_id,
+        'participants': list(booking.participant_ids),
+    }
+
+
+def _event(booking, kind, actor, data, now, store_id=None):
+    if kind == 'CREATED':
+        data = {**booking_state(booking), **data}
+    elif kind == 'TABLE_ASSIGNED':
+        data = {'table': booking.table_id, **data}
+    elif kind == 'UPDATED':
+        data = {**data, 'state': booking_state(booking)}
+    return BookingEvent(
+        booking_id=booking.pk,
+        store_id=store_id or booking.store_id,
+        kind=kind,
+        actor_id=getattr(actor, 'pk', actor),
+        data=data,
+        created_at=now,
+    )
+
+
+def record(booking, kind, actor=None, **data):
+    """在当前事务中追加一条事件。actor 为操作人（用户或 ID，系统任务为 None），data 为事件内容。"""
+    event = _event(booking, kind, actor, data, timezone.now())
+    event.save()
+    return event
+
+
+def record_many(bookings, kind, actor=None, **data):
+    """一组对局发生同一事件（批量操作），一次 bulk_create 写入。"""
+    now = timezone.now()
+    return BookingEvent.objects.bulk_create(
+        [_event(booking, kind, actor, data, now) for booking in bookings], batch_size=1000,
+    )
+
+
+def record_changes(before, booking, actor=None):
+    """
+    比较修改前的状态 before（booking_state() 的结果，新建时为 None）与对局的当前状态，写入对应的事件。
+    后台修改表单在参与者保存之后调用。
+    """
+    now = timezone.now()
+    if before is None:
+        return BookingEvent.objects.bulk_create([_event(booking, 'CREATED', actor, {}, now)])
+    after = booking_state(booking)
+    events = [
+        _event(booking, 'JOINED', actor, {'user': user_id}, now)
+        for user_id in after['participants'] if user_id not in before['participants']
+    ] + [
+        _event(booking, 'LEFT', actor, {'user': user_id}, now)
+        for user_id in before['participants'] if user_id not in after['participants']
+    ]
+    if after['status'] != before['status']:
+        events.append(_event(booking, STATUS_EVENTS[after['status']], actor, {}, now))
+    if after['table'] != before['table']:
+        events.append(_event(booking, 'TABLE_ASSIGNED', actor, {}, now))
+    changed = [key for key in UPDATED_KEYS if after[key] != before[key]]
+    if changed:
+        events.append(_event(booking, 'UPDATED', actor, {'changed': changed}, now))
+        if 'store' in changed:
+            # 换了门店：旧门店的事件流也要看到这次修改，对局才会从旧门店的状态中移除
+            events.append(_event(booking, 'UPDATED', actor, {'changed': changed}, now, store_id=before['store']))
+    return BookingEvent.objects.bulk_create(events)
+
+
+def apply(state, kind, data):
+    """把一条事件作用到对局状态上，返回新的状态（对局被删除或尚不存在时为 None）。"""
+    if kind == 'CREATED':
+        return {key: data[key] for key in STATE_KEYS}
+    if kind == 'UPDATED':
+        return dict(data['state'])
+    if kind == 'DELETED' or state is None:
+        return None
+    state = dict(state)
+    if kind == 'JOINED':
+        if data['user'] not in state['participants']:
+            state['participants'] = [*state['participants'], data['user']]
+    elif kind == 'LEFT':
+        state['participants'] = [user_id for user_id in state['participants'] if user_id != data['user']]
+    elif kind == 'CONFIRMED':
+        state['status'] = 'CONFIRMED'
+    elif kind == 'REVERTED':
+        state['status'] = 'PENDING'
+    elif kind == 'CANCELED':
+        state['status'] = 'CANCELED'
+    elif kind == 'TABLE_ASSIGNED':
+        state['table'] = data['table']
+    return state
+
+
+def booking_at(booking_id, at):
+    """对局在 at 时刻的状态，当时尚未创建或已被删除时返回 None。"""
+    state = None
+    events = BookingEvent.objects.filter(booking_id=booking_id, created_at__lte=at).order_by('created_at', 'id')
+    for kind, data in events.values_list('kind', 'data'):
+        state = apply(state, kind, data)
+    return state
+
+
+def _replay(state, events, store_id):
+    for booking_id, kind, data in events.order_by('created_at', 'id').values_list('booking_id', 'kind', 'data'):
+        updated = apply(state.get(booking_id), kind, data)
+        if updated is None or updated['store'] != store_id:
+            state.pop(booking_id, None)
+        else:
+            state[booking_id] = updated
+    return state
+
+
+def _not_ended(state, at):
+    return {
+        booking_id: booking for booking_id, booking in state.items()
+        if datetime.datetime.fromisoformat(booking['end']) > at
+    }
+
+
+def store_at(store_id, at):
+    """门店在 at 时刻尚未结束的全部对局 {对局ID: 状态}：最近的快照 + 之后的事件，共两次查询。"""
+    snapshot = BookingSnapshot.objects.filter(store_id=store_id, taken_at__lte=at).order_by('-taken_at').first()
+    state = {int(booking_id): booking for booking_id, booking in snapshot.bookings.items()} if snapshot else {}
+    events = BookingEvent.objects.filter(store_id=store_id, created_at__lte=at)
+    if snapshot:
+        events = events.filter(created_at__gt=snapshot.taken_at)
+    return _not_ended(_replay(state, events, store_id), at)
+
+
+def record_baseline(at=None):
+    """
+    为还没有任何事件的对局（事件日志上线之前创建的）补写带当前状态的创建事件，返回补写的条数。
+    事件时间为 at，未给出时取对局的创建时间。
+    """
+    bookings = Booking.objects.exclude(pk__in=BookingEvent.objects.values('booking_id'))
+    count = 0
+    events = []
+    for booking in bookings.iterator(chunk_size=2000):
+        events.append(_event(booking, 'CREATED', None, {'baseline': True}, at or booking.created_at))
+        if len(events) >= 2000:
+            BookingEvent.objects.bulk_create(events)
+            count += len(events)
+            events = []
+    BookingEvent.objects.bulk_create(events)
+    return count + len(events)
+
+
+def take_snapshots(now=None, store_ids=None):
+    """为各门店生成新的快照（上一份快照 + 之后的事件），返回生成的快照数。"""
+    taken_at = (now or timezone.now()) - SNAPSHOT_LAG
+    if store_ids is None:
+        store_ids = list(Store.objects.values_list('pk', flat=True))
+    # 第一次生成快照时按对局的创建时间补写；之后才出现的无事件对局（例如在 shell 中直接创建的）
+    # 按本次快照的时间补写，保证落在本次重放的范围内
+    record_baseline(taken_at if BookingSnapshot.objects.exists() else None)
+    snapshots = []
+    for store_id in store_ids:
+        previous = (
+            BookingSnapshot.objects.filter(store_id=store_id, taken_at__lt=taken_at).order_by('-taken_at').first()
+        )
+        state = {int(booking_id): booking for booking_id, booking in previous.bookings.items()} if previous else {}
+        events = BookingEvent.objects.filter(store_id=store_id, created_at__lte=taken_at)
+        if previous:
+            events = events.filter(created_at__gt=previous.taken_at)
+        state = _not_ended(_replay(state, events, store_id), taken_at)
+        snapshots.append(BookingSnapshot(
+            store_id=store_id, taken_at=taken_at, bookings={str(key): value for key, value in state.items()},
+        ))
+    with transaction.atomic():
+        BookingSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
@@ -0,0 +1,207 @@
+# booking/ical.py
+"""
+iCalendar 订阅：个人日历（带签名令牌的 URL）与门店 / 牌桌日历。
+
+  * 个人日历的令牌是对用户 ID 的签名（django.core.signing），校验时不查询数据库；
+  * ETag 由订阅范围的版本号（用户 / 门店 / 牌桌，见 booking/caching.py）、当天日期与
+    since 参数拼成，客户端带 If-None-Match 时直接返回 304；没有带条件请求头时，
+    版本号未变的订阅直接返回缓存中的正文。两种情况都不查询数据库；
+  * 需要生成时用一次 values_list 查询流式读取对局，门店 / 牌桌名称来自元数据缓存，
+    不实例化 Booking；
+  * since=<Unix 时间戳或 ISO 时间> 只返回此后修改过的对局（包括已取消的，
+    以 STATUS:CANCELLED 告知客户端删除）。响应头 X-Calendar-Sync 给出下一次
+    增量同步应使用的时间戳。增量结果不包含被删除的对局和用户已退出的对局，
+    客户端仍需定期做一次完整同步。
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+
+from . import metadata
+from .models import Booking
+
+TOKEN_SALT = 'booking.ical'
+BODY_KEY_PREFIX = 'booking:ical:'
+PRODID = '-//mahjong_booking_system//calendar//ZH'
+EVENT_FIELDS = (
+    'id', 'store_id', 'table_id', 'start_time', 'end_time', 'status',
+    'num_games', 'participant_names', 'updated_at',
+)
+EVENT_STATUS = {'PENDING': 'TENTATIVE', 'CONFIRMED': 'CONFIRMED', 'CANCELED': 'CANCELLED'}
+
+
+def user_token(user_id):
+    """个人日历 URL 中的令牌。更换 SECRET_KEY 会使所有令牌失效。"""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user_id))
+
+
+def user_id_from_token(token):
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def subscription_urls(request, user_id):
+    """「我的预约」页面展示的个人订阅地址：{'calendar_url': https 地址, 'webcal_url': webcal 地址}。"""
+    calendar_url = request.build_absolute_uri(reverse('user_calendar', args=[user_token(user_id)]))
+    return {
+        'calendar_url': calendar_url,
+        'webcal_url': 'webcal://' + calendar_url.split('://', 1)[1],
+    }
+
+
+def parse_since(value):
+    """解析 since 参数，返回 aware datetime；为空或无法解析时返回 None。"""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(int(value), tz=datetime.timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    parsed = parse_datetime(value)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _window(today):
+    past = getattr(settings, 'BOOKING_CALENDAR_PAST_DAYS', 30)
+    future = getattr(settings, 'BOOKING_CALENDAR_FUTURE_DAYS', 90)
+    start = timezone.make_aware(datetime.datetime.combine(today - datetime.timedelta(days=past), datetime.time.min))
+    return start, start + datetime.timedelta(days=past + future + 1)
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """按 RFC 5545 把超过 75 字节的行折叠（续行以空格开头），不拆开多字节字符。"""
+    if len(line.encode()) <= 75:
+        return line
+    parts, current, size = [], "", 0
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > (75 if not parts else 74):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += char_size
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def _utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event_lines(row, directory):
+    (booking_id, store_id, table_id, start_time, end_time, status,
+     num_games, names, updated_at) = row
+    store = directory.get(store_id)
+    table = directory.tables_by_id.get(table_id)
+    store_name = store.name if store else ""
+    summary = f"麻将 · {store_name}" + (f" · {table.display_label()}" if table else "")
+    details = [f"参与者：{'、'.join(name for name in names if name) or '-'}"]
+    if num_games:
+        details.append(f"半庄数：{num_games}")
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:booking-{booking_id}@mahjong-booking',
+        f'DTSTAMP:{_utc(updated_at)}',
+        f'LAST-MODIFIED:{_utc(updated_at)}',
+        f'DTSTART:{_utc(start_time)}',
+        f'DTEND:{_utc(end_time)}',
+        f'SUMMARY:{_escape(summary)}',
+        f'DESCRIPTION:{_escape(chr(10).join(details))}',
+        f'STATUS:{EVENT_STATUS.get(status, "TENTATIVE")}',
+    ]
+    if store:
+        lines.append(f'LOCATION:{_escape(store.address)}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def render_calendar(name, rows):
+    """rows 为按 EVENT_FIELDS 顺序的元组，返回完整的 VCALENDAR 文本。"""
+    directory = metadata.store_directory()
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        'X-PUBLISHED-TTL:PT15M',
+    ]
+    for row in rows:
+        lines.extend(_event_lines(row, directory))
+    lines.append('END:VCALENDAR')
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def event_rows(bookings, since=None, today=None):
+    """
+    从对局查询集中取出日历窗口内的对局（values_list 流式读取）。完整同步不含已取消的对局，
+    增量同步返回 since 之后修改过的全部对局。
+    """
+    window_start, window_end = _window(today or timezone.localdate())
+    bookings = bookings.filter(end_time__gte=window_start, start_time__lt=window_end)
+    if since is None:
+        bookings = bookings.exclude(status='CANCELED')
+    else:
+        bookings = bookings.filter(updated_at__gt=since)
+    return bookings.order_by('start_time').values_list(*EVENT_FIELDS).iterator(chunk_size=500)
+
+
+def user_bookings(user_id):
+    return Booking.objects.filter(
+        pk__in=Booking.participants.through.objects.filter(customuser_id=user_id).values('booking_id')
+    )
+
+
+def feed_response(request, scope, version, name, bookings):
+    """
+    返回订阅范围 scope（如 'user:3'、'store:1'）的日历响应。
+    bookings 为该范围的 Booking 查询集，只在需要重新生成正文时才执行。
+    """
+    since = parse_since(request.GET.get('since'))
+    today = timezone.localdate()
+    raw = f"{scope}:{version}:{today.isoformat()}:{since.timestamp() if since else ''}"
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    etag = quote_etag(digest)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+
+    # 正文缓存键包含版本号，对局变化后旧正文自然不再命中
+    cache_key = f"{BODY_KEY_PREFIX}{digest}"
+    cached = cache.get(cache_key)
+    if cached is None:
+        synced_at = int(timezone.now().timestamp())
+        body = render_calendar(name, event_rows(bookings, since=since, today=today))
+        cached = (body, synced_at)
+        cache.set(cache_key, cached, getattr(settings, 'BOOKING_CALENDAR_CACHE_TIMEOUT', 3600))
+    body, synced_at = cached
+
+    response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    response['Content-Disposition'] = 'inline; filename="mahjong.ics"'
+    response['X-Calendar-Sync'] = str(synced_at)
+    return response
@@ -0,0 +1,41 @@
+# booking/management/commands/archive_bookings.py
+"""
+把已结束的成行对局追加到列式归档（见 booking/archive.py），平时由 Celery Beat 每晚执行。
+
+    python manage.py archive_bookings                     # 归档到默认截止时间（昨天 0 点）
+    python manage.py archive_bookings --until 2025-01-01  # 归档到指定日期 0 点（本地时间）
+    python manage.py archive_bookings --stats             # 只显示归档概况
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking.archive import BookingArchive, archive_completed
+
+
+class Command(BaseCommand):
+    help = "把已结束的成行对局追加到列式归档并合并已结束月份的段。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=datetime.date.fromisoformat, help="归档截止日期 (YYYY-MM-DD)")
+        parser.add_argument('--stats', action='store_true', help="只显示归档概况")
+
+    def handle(self, *args, until, stats, **options):
+        if not stats:
+            cutoff = None
+            if until is not None:
+                cutoff = timezone.make_aware(datetime.datetime.combine(until, datetime.time.min))
+                if cutoff > timezone.now():
+                    raise CommandError("截止日期不能晚于现在。")
+            result = archive_completed(cutoff)
+            self.stdout.write(self.style.SUCCESS(
+                f"归档 {result['rows']} 条对局，合并 {result['merged']} 个段。"
+            ))
+        summary = BookingArchive().describe()
+        archived_until = summary['archived_until']
+        self.stdout.write(
+            f"归档共 {summary['rows']:,} 条对局、{summary['segments']} 个段、"
+            f"{summary['bytes'] / 1024 / 1024:.1f} MB，"
+            f"截至 {timezone.localtime(archived_until):%Y-%m-%d %H:%M}。" if archived_until else "归档为空。"
+        )
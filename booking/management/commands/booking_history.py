@@ -0,0 +1,69 @@
+# booking/management/commands/booking_history.py
+"""
+查询对局事件日志、重建历史状态（见 booking/history.py）。
+
+    python manage.py booking_history --booking 42                          # 对局 42 的全部事件与当前状态
+    python manage.py booking_history --booking 42 --at "2025-01-01 20:00"  # 对局 42 在该时刻的状态
+    python manage.py booking_history --store 1 --at "2025-01-01 20:00"     # 门店 1 在该时刻尚未结束的对局
+    python manage.py booking_history --snapshot                            # 立即为各门店生成快照
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking import history, metadata
+from booking.models import BookingEvent
+
+
+def _moment(value):
+    try:
+        return timezone.make_aware(datetime.datetime.fromisoformat(value))
+    except ValueError:
+        raise CommandError(f"无法识别的时间：{value}（格式如 2025-01-01 20:00）")
+
+
+def _describe(state):
+    store = metadata.get_store(state['store'])
+    table = metadata.store_directory().tables_by_id.get(state['table'])
+    start = timezone.localtime(datetime.datetime.fromisoformat(state['start']))
+    end = timezone.localtime(datetime.datetime.fromisoformat(state['end']))
+    return (
+        f"{state['status']} {store.name if store else state['store']} / {table or '未分配'} "
+        f"{start:%Y-%m-%d %H:%M} - {end:%H:%M} 参与者 {state['participants']}"
+    )
+
+
+class Command(BaseCommand):
+    help = "查看对局事件日志，重建对局或门店在某一时刻的状态。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--booking', type=int, help="对局 ID")
+        parser.add_argument('--store', type=int, help="门店 ID")
+        parser.add_argument('--at', type=_moment, help="时刻（本地时间），默认现在")
+        parser.add_argument('--snapshot', action='store_true', help="为各门店生成快照")
+
+    def handle(self, *args, booking, store, at, snapshot, **options):
+        at = at or timezone.now()
+        if snapshot:
+            count = history.take_snapshots()
+            self.stdout.write(self.style.SUCCESS(f"已生成 {count} 个门店的对局状态快照。"))
+        elif booking is not None:
+            events = BookingEvent.objects.filter(booking_id=booking, created_at__lte=at).select_related('actor')
+            for event in events.order_by('created_at', 'id'):
+                actor = event.actor.username if event.actor else "系统"
+                self.stdout.write(
+                    f"{timezone.localtime(event.created_at):%Y-%m-%d %H:%M:%S} {event.get_kind_display()} "
+                    f"{actor} {event.data if event.kind not in ('CREATED', 'UPDATED') else ''}".rstrip()
+                )
+            state = history.booking_at(booking, at)
+            self.stdout.write(
+                f"{timezone.localtime(at):%Y-%m-%d %H:%M} 时的状态：{_describe(state) if state else '不存在'}"
+            )
+        elif store is not None:
+            state = history.store_at(store, at)
+            for booking_id, booking_state in sorted(state.items(), key=lambda item: item[1]['start']):
+                self.stdout.write(f"#{booking_id} {_describe(booking_state)}")
+            self.stdout.write(f"{timezone.localtime(at):%Y-%m-%d %H:%M} 时尚未结束的对局共 {len(state)} 个。")
+        else:
+            raise CommandError("请指定 --booking、--store 或 --snapshot。")
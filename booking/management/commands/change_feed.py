@@ -0,0 +1,65 @@
+# booking/management/commands/change_feed.py
+"""
+读取、管理变更订阅（见 booking/changes.py）。变更每行输出一个 JSON，便于脚本逐行处理。
+
+    python manage.py change_feed --after 0 --limit 100           # 序号 0 之后的 100 条变更
+    python manage.py change_feed --consumer pos                  # 从消费者 pos 上次提交的位置读取一批
+    python manage.py change_feed --consumer pos --commit         # 读取后把偏移量提交到这批的末尾
+    python manage.py change_feed --consumer pos --reset 0        # 把消费者 pos 的偏移量改为 0（重新全量同步）
+    python manage.py change_feed --consumers                     # 各消费者的偏移量与积压
+    python manage.py change_feed --compact                       # 立即压缩（首次运行时为已有对象补写新增记录）
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking import changes
+from booking.models import ChangeFeedConsumer
+
+
+class Command(BaseCommand):
+    help = "按序号读取对局 / 牌桌的变更，管理消费者偏移量，压缩旧变更。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after', type=int, help="从该序号之后读取（默认为消费者上次提交的位置或 0）")
+        parser.add_argument('--limit', type=int, help="本批最多读取的变更数")
+        parser.add_argument('--consumer', help="消费者名")
+        parser.add_argument('--commit', action='store_true', help="读取后提交消费者的偏移量")
+        parser.add_argument('--reset', type=int, metavar='SEQ', help="把消费者的偏移量改为指定序号")
+        parser.add_argument('--consumers', action='store_true', help="列出消费者")
+        parser.add_argument('--compact', action='store_true', help="删除被覆盖的变更与过期的删除记录")
+
+    def handle(self, *args, after, limit, consumer, commit, reset, consumers, compact, **options):
+        if compact:
+            result = changes.compact()
+            self.stdout.write(self.style.SUCCESS(
+                f"补写 {result['baseline']} 条，删除被覆盖的变更 {result['superseded']} 条、"
+                f"过期的删除记录 {result['tombstones']} 条。"
+            ))
+        elif consumers:
+            changes.sequence()
+            latest = changes.latest_seq()
+            for row in ChangeFeedConsumer.objects.order_by('name'):
+                self.stdout.write(
+                    f"{row.name}：已处理到 {row.offset}，积压 {max(latest - row.offset, 0)}，"
+                    f"最后提交于 {timezone.localtime(row.updated_at):%Y-%m-%d %H:%M:%S}"
+                )
+            self.stdout.write(f"最新序号 {latest}。")
+        elif reset is not None:
+            if not consumer:
+                raise CommandError("--reset 需要同时指定 --consumer。")
+            changes.commit(consumer, reset)
+            self.stdout.write(self.style.SUCCESS(f"消费者 {consumer} 的偏移量已改为 {reset}。"))
+        else:
+            if commit and not consumer:
+                raise CommandError("--commit 需要同时指定 --consumer。")
+            if after is None:
+                after = changes.offset(consumer) if consumer else 0
+            batch = changes.fetch(after, limit)
+            for change in batch['changes']:
+                self.stdout.write(json.dumps(change, ensure_ascii=False))
+            if commit:
+                changes.commit(consumer, batch['next'])
+            more = "，还有更多变更" if batch['more'] else ""
+            self.stderr.write(f"下次从序号 {batch['next']} 之后读取{more}。")
@@ -0,0 +1,48 @@
+# booking/management/commands/check_conflicts.py
+"""
+检查指定日期范围内的对局冲突（同桌时间重叠、跨门店牌桌、超出营业时间），适合每晚定时运行。
+
+    python manage.py check_conflicts                      # 从今天起 7 天
+    python manage.py check_conflicts --start 2025-01-01 --days 30 --store 1 --store 2
+    python manage.py check_conflicts --fail-on-conflict   # 发现冲突时以非零状态退出
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking import metadata
+from booking.conflicts import conflict_report
+
+
+class Command(BaseCommand):
+    help = "报告日期范围内的对局冲突：同桌时间重叠、牌桌不属于该门店、超出营业时间。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help="开始日期 (YYYY-MM-DD)，默认今天")
+        parser.add_argument('--days', type=int, default=7, help="检查的天数，默认 7")
+        parser.add_argument('--store', type=int, action='append', dest='stores', help="只检查指定门店，可重复")
+        parser.add_argument('--fail-on-conflict', action='store_true', help="发现冲突时返回非零退出码")
+
+    def handle(self, *args, start, days, stores, fail_on_conflict, **options):
+        start_date = start or timezone.localdate()
+        start_dt = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        end_dt = start_dt + datetime.timedelta(days=days)
+
+        report = conflict_report(start_dt, end_dt, store_ids=stores)
+        directory = metadata.store_directory()
+        for conflict in report:
+            store = directory.get(conflict.store_id)
+            table = directory.tables_by_id.get(conflict.table_id)
+            other = f" 与 #{conflict.other_booking_id}" if conflict.other_booking_id else ""
+            self.stdout.write(
+                f"[{conflict.label}] #{conflict.booking_id}{other} "
+                f"{store.name if store else conflict.store_id} / {table or '未分配'} "
+                f"{timezone.localtime(conflict.start_time):%Y-%m-%d %H:%M} - "
+                f"{timezone.localtime(conflict.end_time):%H:%M}"
+            )
+
+        summary = f"{start_date} 起 {days} 天内共发现 {len(report)} 个冲突。"
+        if report and fail_on_conflict:
+            raise CommandError(summary)
+        self.stdout.write(self.style.WARNING(summary) if report else self.style.SUCCESS(summary))
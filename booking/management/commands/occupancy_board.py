@@ -0,0 +1,74 @@
+# booking/management/commands/occupancy_board.py
+"""
+共享内存占用看板的更新进程（见 booking/occupancy.py）：创建看板，并每隔 --interval 秒按数据库全量校正。
+与 Web 进程运行在同一台机器上，由进程管理器（systemd / supervisor）常驻；退出时删除看板，
+Web 进程随即回退到数据库路径。
+
+    python manage.py occupancy_board                 # 每 30 秒校正一次，直到被终止
+    python manage.py occupancy_board --interval 10
+    python manage.py occupancy_board --once          # 只校正一次并保留看板（可由 cron 驱动）
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Max
+
+from booking import occupancy
+from booking.models import MahjongTable
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = "创建共享内存占用看板并定期按数据库校正。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30, help="全量校正的间隔秒数，默认 30")
+        parser.add_argument('--once', action='store_true', help="只校正一次，退出时保留看板")
+
+    def handle(self, *args, interval, once, **options):
+        name = occupancy.board_name()
+        if not name:
+            raise CommandError("占用看板未启用（BOOKING_OCCUPANCY_BOARD 为空，或当前平台不支持）。")
+        if not once and interval >= occupancy.max_age():
+            raise CommandError(
+                f"校正间隔必须小于 BOOKING_OCCUPANCY_MAX_AGE（{occupancy.max_age()} 秒），否则看板会被视为过期。"
+            )
+        capacity = occupancy.board_capacity()
+        largest = MahjongTable.objects.aggregate(largest=Max('id'))['largest'] or 0
+        if largest >= capacity:
+            self.stdout.write(self.style.WARNING(
+                f"最大牌桌 ID {largest} 超出看板容量 {capacity}，这些牌桌仍走数据库路径；"
+                "请调大 BOOKING_OCCUPANCY_BOARD_SIZE。"
+            ))
+
+        board = occupancy.OccupancyBoard.create(name, capacity)
+        if once:
+            tables = occupancy.reconcile(board)
+            board.keep()
+            board.close()
+            self.stdout.write(self.style.SUCCESS(f"占用看板 {name} 已校正，{tables} 张牌桌有对局。"))
+            return
+
+        # 进程管理器用 SIGTERM 停止时也要删除看板
+        signal.signal(signal.SIGTERM, _interrupt)
+        self.stdout.write(f"占用看板 {name}（容量 {capacity} 张牌桌）每 {interval:g} 秒校正一次。")
+        try:
+            while True:
+                close_old_connections()
+                started = time.monotonic()
+                try:
+                    occupancy.reconcile(board)
+                except Exception as exc:  # 数据库暂时不可用时稍后重试；看板过期后 Web 进程自动回退
+                    self.stderr.write(f"校正失败：{exc}")
+                time.sleep(max(interval - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            board.close()
+            board.unlink()
+            self.stdout.write(f"占用看板 {name} 已删除。")
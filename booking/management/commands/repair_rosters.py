@@ -0,0 +1,57 @@
+# booking/management/commands/repair_rosters.py
+"""
+校正对局上的反范式化参与者名单：按批从关联表重新计算，只写回有偏差的对局。
+
+    python manage.py repair_rosters
+    python manage.py repair_rosters --dry-run
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from booking import changes
+from booking.caching import bump_versions
+from booking.models import Booking
+from booking.roster import ROSTER_FIELDS, ROSTER_UPDATE_FIELDS, apply_roster, build_rosters
+
+
+class Command(BaseCommand):
+    help = "按关联表重新计算对局的参与者名单（ID、显示名、人数），修复不一致的记录。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="每批处理的对局数量")
+        parser.add_argument('--dry-run', action='store_true', help="只统计不一致的对局，不写入数据库")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        checked = repaired = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Booking.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'store_id', 'table_id', *ROSTER_FIELDS)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            rosters = build_rosters([booking.pk for booking in batch])
+
+            stale = []
+            user_ids = set()
+            for booking in batch:
+                ids, names = rosters[booking.pk]
+                if (booking.participant_ids, booking.participant_names, booking.participant_count) != (ids, names, len(ids)):
+                    user_ids.update(booking.participant_ids, ids)
+                    apply_roster(booking, ids, names)
+                    stale.append(booking)
+            if stale and not dry_run:
+                with transaction.atomic():
+                    Booking.objects.bulk_update(stale, ROSTER_UPDATE_FIELDS)
+                    changes.record_bookings(stale)
+                bump_versions(
+                    [booking.store_id for booking in stale], [booking.table_id for booking in stale], user_ids,
+                )
+            checked += len(batch)
+            repaired += len(stale)
+
+        verb = "需要修复" if dry_run else "已修复"
+        self.stdout.write(self.style.SUCCESS(f"检查 {checked} 个对局，{verb} {repaired} 个名单。"))
@@ -0,0 +1,140 @@
+# booking/management/commands/simulate_policies.py
+"""
+用离散事件模拟比较预约规则（见 booking/simulation.py）：对每组规则参数在多个随机种子下模拟一个门店，
+按牌桌利用率、成行率与等待时间排序输出，当前生效的规则标记为 *。
+
+    python manage.py simulate_policies --store 1
+    python manage.py simulate_policies --store 1 --max-pending 1 2 3 --cancel-cutoff 0 30 60 120 \\
+        --game-minutes 40 45 50 --expiry-hours 6 12 24 48 --seeds 3 --workers 4
+    python manage.py simulate_policies --store 1 --replay --start 2025-01-01 --days 28
+
+--replay 时按门店在该时间段内实际发起的预约（发起时间、开始时间、半庄数、发起人）重放发起请求，
+加入与退出请求仍按参数合成（系统没有记录加入 / 退出的时间）。
+"""
+import datetime
+import itertools
+import math
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking import metadata
+from booking.conflicts import local_minutes
+from booking.models import Booking
+from booking.policy import GAME_MINUTES, BookingPolicy, minute_of_day
+from booking.simulation import CREATE, Request, StoreLayout, Workload, requests_for, sweep
+
+SORT_KEYS = {
+    'utilization': lambda result: -result.utilization,
+    'fill': lambda result: -result.fill_rate,
+    'wait': lambda result: result.wait_p50,
+}
+
+
+def history_requests(store_id, start, days, players):
+    """门店在 [start, start + days) 内发起的预约 -> 发起请求（时间相对 start 的本地分钟数）。"""
+    base = local_minutes(start)
+    rows = Booking.objects.filter(
+        store_id=store_id, created_at__gte=start, created_at__lt=start + datetime.timedelta(days=days),
+    ).order_by('created_at').values_list('created_at', 'start_time', 'end_time', 'num_games', 'creator_id')
+    creators = {}
+    requests = []
+    for created_at, start_time, end_time, num_games, creator_id in rows.iterator():
+        games = num_games or max(1, math.ceil((end_time - start_time).total_seconds() / 60 / GAME_MINUTES))
+        player = creators.setdefault(creator_id, len(creators) % players)
+        requests.append(Request(
+            local_minutes(created_at) - base, CREATE, player, local_minutes(start_time) - base, games, 0.0,
+        ))
+    return requests
+
+
+class Command(BaseCommand):
+    help = "模拟一个门店在不同预约规则下的牌桌利用率、成行率与等待时间。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, required=True, help="门店 ID（牌桌数与营业时间取自该门店）")
+        parser.add_argument('--tables', type=int, help="改用指定的牌桌数")
+        parser.add_argument('--days', type=int, default=28, help="模拟天数，默认 28")
+        parser.add_argument('--players', type=int, default=150, help="玩家人数，默认 150")
+        parser.add_argument('--create-rate', type=float, default=1.0, help="平均每小时发起预约数，默认 1")
+        parser.add_argument('--join-rate', type=float, default=3.0, help="平均每小时加入请求数，默认 3")
+        parser.add_argument('--lead-minutes', type=float, default=240, help="发起时距开始的平均分钟数，默认 240")
+        parser.add_argument('--leave-rate', type=float, default=0.1, help="每次加入后在开始前尝试退出的概率，默认 0.1")
+        parser.add_argument('--replay', action='store_true', help="重放门店的历史发起请求")
+        parser.add_argument('--start', type=datetime.date.fromisoformat,
+                            help="重放的开始日期 (YYYY-MM-DD)，默认为 --days 天前")
+        current = BookingPolicy.current()
+        parser.add_argument('--max-pending', type=int, nargs='+', default=[current.max_pending],
+                            help="每人匹配中预约上限（可给多个值）")
+        parser.add_argument('--cancel-cutoff', type=int, nargs='+', default=[current.cancel_cutoff_minutes],
+                            help="成行后退出的截止分钟数（可给多个值）")
+        parser.add_argument('--game-minutes', type=int, nargs='+', default=[current.game_minutes],
+                            help="每个半庄的分钟数（可给多个值）")
+        parser.add_argument('--expiry-hours', type=int, nargs='+', default=[current.pending_expiry_hours],
+                            help="匹配中预约的过期小时数（可给多个值）")
+        parser.add_argument('--seeds', type=int, default=3, help="每组规则模拟的随机种子数，默认 3")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="进程数，默认 CPU 核数")
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='utilization', help="排序指标")
+        parser.add_argument('--top', type=int, default=20, help="只显示前 N 组，默认 20")
+
+    def handle(self, *args, **options):
+        store = metadata.get_store(options['store'])
+        if store is None:
+            raise CommandError(f"门店 {options['store']} 不存在。")
+        layout = StoreLayout(
+            tables=options['tables'] or len(store.sorted_tables),
+            opening=minute_of_day(store.opening_time),
+            closing=minute_of_day(store.closing_time),
+        )
+        if layout.tables <= 0:
+            raise CommandError(f"门店 {store.name} 没有牌桌，可用 --tables 指定。")
+        days = options['days']
+        workload = Workload(
+            days=days, players=options['players'], create_rate=options['create_rate'],
+            join_rate=options['join_rate'], lead_minutes=options['lead_minutes'], leave_rate=options['leave_rate'],
+        )
+        seeds = range(options['seeds'])
+
+        requests = None
+        if options['replay']:
+            start_date = options['start'] or timezone.localdate() - datetime.timedelta(days=days)
+            start = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+            history = history_requests(store.id, start, days, workload.players)
+            if not history:
+                raise CommandError(f"{store.name} 在 {start_date} 起 {days} 天内没有发起的预约。")
+            self.stdout.write(f"重放 {start_date} 起 {days} 天内的 {len(history)} 个发起请求。")
+            requests = {
+                seed: sorted(history + requests_for(workload, layout, seed, create=False), key=lambda r: r.at)
+                for seed in seeds
+            }
+
+        policies = [
+            BookingPolicy(max_pending, cutoff, game_minutes, expiry)
+            for max_pending, cutoff, game_minutes, expiry in itertools.product(
+                options['max_pending'], options['cancel_cutoff'], options['game_minutes'], options['expiry_hours'],
+            )
+        ]
+        started = time.perf_counter()
+        results = sweep(layout, workload, policies, seeds, options['workers'], requests)
+        elapsed = time.perf_counter() - started
+
+        current = BookingPolicy.current()
+        results.sort(key=lambda item: SORT_KEYS[options['sort']](item[1]))
+        self.stdout.write(
+            "   上限 截止(分) 半庄(分) 过期(时) | 利用率 成行率 等待中位(分) 等待P90(分) "
+            "超限被拒 退出被拒 过期 未落座"
+        )
+        for policy, result in results[:options['top']]:
+            mark = '*' if policy == current else ' '
+            self.stdout.write(
+                f"{mark} {policy.max_pending:4d} {policy.cancel_cutoff_minutes:8d} {policy.game_minutes:8d} "
+                f"{policy.pending_expiry_hours:8d} | {result.utilization:6.1%} {result.fill_rate:6.1%} "
+                f"{result.wait_p50:12.0f} {result.wait_p90:11.0f} {result.rejected_pending:8.1f} "
+                f"{result.refused_leaves:8.1f} {result.expired:4.1f} {result.unseated:6.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{store.name}（{layout.tables} 桌）：{len(policies)} 组规则 × {len(seeds)} 个种子，"
+            f"共 {len(policies) * len(seeds)} 次模拟，用时 {elapsed:.1f} 秒。"
+        ))
@@ -0,0 +1,89 @@
+# booking/metadata.py
+"""
+门店 / 牌桌元数据的进程内缓存。
+
+门店和牌桌几乎不会变化，但门店状态页、时间表、发起预约页每次请求都要读取。
+这里把所有门店及其按桌号排序的牌桌整体缓存在本进程的 LRU 中，并记下构建时的元数据版本号：
+  * 门店、牌桌保存 / 删除时由 booking/signals.py 在事务提交后递增缓存中的版本号（与 accounts/search.py
+    的前缀索引相同），各进程在下次读取时发现版本变化后重建，新建的门店立即可以发起预约；
+  * 每次读取只多一次版本号的缓存读取，快照本身不经过网络、也不需要序列化；
+  * 快照总是从主库加载，避免把副本上的旧数据记在新版本号下。
+返回的模型实例在请求之间共享，调用方只能读取，不要修改。
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .local_cache import LocalLRUCache
+from .models import MahjongTable, Store
+
+DIRECTORY_KEY = 'store_directory'
+VERSION_KEY = 'booking:metadata:version'
+
+_cache = LocalLRUCache(
+    maxsize=getattr(settings, 'BOOKING_METADATA_MAXSIZE', 16),
+    ttl=getattr(settings, 'BOOKING_METADATA_TTL', 300),
+)
+
+
+class StoreDirectory:
+    """所有门店与牌桌的只读快照。每个门店带有 sorted_tables（按桌号排序的牌桌列表）。"""
+
+    def __init__(self, version, stores):
+        self.version = version
+        self.stores = stores
+        self.by_id = {store.id: store for store in stores}
+        self.tables_by_id = {table.id: table for store in stores for table in store.sorted_tables}
+
+    def get(self, store_id):
+        return self.by_id.get(store_id)
+
+
+def _load_directory(version):
+    stores = list(Store.objects.using(DEFAULT_DB_ALIAS).order_by('pk'))
+    tables_by_store = {store.id: [] for store in stores}
+    for table in MahjongTable.objects.using(DEFAULT_DB_ALIAS).order_by('table_number'):
+        tables_by_store.setdefault(table.store_id, []).append(table)
+    for store in stores:
+        store.sorted_tables = tables_by_store[store.id]
+    return StoreDirectory(version, stores)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        # add 失败说明其他进程刚刚写入，重新读取一次
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def store_directory():
+    # 先读版本号再加载：加载期间提交的修改会让版本号变化，下次读取时重建
+    version = _current_version()
+    directory = _cache.get(DIRECTORY_KEY)
+    if directory is None or directory.version != version:
+        directory = _load_directory(version)
+        _cache.set(DIRECTORY_KEY, directory)
+    return directory
+
+
+def get_store(store_id):
+    """返回门店（带 sorted_tables），不存在时返回 None。"""
+    return store_directory().get(store_id)
+
+
+def _bump_version():
+    _cache.clear()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def invalidate():
+    """门店、牌桌变化后调用（见 booking/signals.py），事务提交后所有进程的快照在下次读取时重建。"""
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-19 02:50
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_rosters(apps, schema_editor):
+    Booking = apps.get_model('booking', 'Booking')
+    User = Booking._meta.get_field('creator').related_model
+    Through = Booking.participants.through
+
+    ids_by_booking = defaultdict(list)
+    for booking_id, user_id in Through.objects.order_by('pk').values_list('booking_id', 'customuser_id'):
+        ids_by_booking[booking_id].append(user_id)
+    labels = {
+        pk: display_name or username
+        for pk, username, display_name in User.objects.values_list('pk', 'username', 'display_name')
+    }
+
+    updates = []
+    for booking in Booking.objects.only('pk').iterator():
+        ids = ids_by_booking.get(booking.pk, [])
+        booking.participant_ids = ids
+        booking.participant_names = [labels.get(user_id, '') for user_id in ids]
+        booking.participant_count = len(ids)
+        updates.append(booking)
+    Booking.objects.bulk_update(updates, ['participant_ids', 'participant_names', 'participant_count'], batch_size=1000)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_alter_booking_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='participant_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='参与人数'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='participant_ids',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='参与者ID'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='participant_names',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='参与者名单'),
+        ),
+        migrations.RunPython(fill_rosters, noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_booking_participant_roster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='closing_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='打烊时间'),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='opening_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='开门时间'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_booking_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='booking_type',
+            field=models.CharField(choices=[('STANDARD', '标准预约'), ('TOURNAMENT', '比赛')], default='STANDARD', max_length=10, verbose_name='预约类型'),
+        ),
+    ]
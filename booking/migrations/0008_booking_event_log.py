@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-19 04:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_alter_booking_booking_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('store_id', models.BigIntegerField(verbose_name='门店ID')),
+                ('taken_at', models.DateTimeField(verbose_name='快照时间')),
+                ('bookings', models.JSONField(default=dict, verbose_name='对局状态')),
+            ],
+            options={
+                'verbose_name': '对局状态快照',
+                'verbose_name_plural': '对局状态快照',
+                'indexes': [models.Index(fields=['store_id', 'taken_at'], name='booking_snapshot_store_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.BigIntegerField(verbose_name='对局ID')),
+                ('store_id', models.BigIntegerField(verbose_name='门店ID')),
+                ('kind', models.CharField(choices=[('CREATED', '创建'), ('JOINED', '加入'), ('LEFT', '退出'), ('CONFIRMED', '成行'), ('REVERTED', '退回匹配中'), ('TABLE_ASSIGNED', '分配牌桌'), ('UPDATED', '修改'), ('CANCELED', '取消'), ('DELETED', '删除')], max_length=16, verbose_name='事件')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='内容')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='时间')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='操作人')),
+            ],
+            options={
+                'verbose_name': '对局事件',
+                'verbose_name_plural': '对局事件',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['booking_id', 'created_at'], name='booking_event_booking_idx'), models.Index(fields=['store_id', 'created_at'], name='booking_event_store_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 04:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_booking_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedConsumer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='名称')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='已处理到的序号')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='最后提交时间')),
+            ],
+            options={
+                'verbose_name': '变更订阅消费者',
+                'verbose_name_plural': '变更订阅消费者',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeFeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(blank=True, null=True, unique=True, verbose_name='序号')),
+                ('entity', models.CharField(choices=[('booking', '对局'), ('table', '牌桌')], max_length=16, verbose_name='对象类型')),
+                ('object_id', models.BigIntegerField(verbose_name='对象ID')),
+                ('store_id', models.BigIntegerField(verbose_name='门店ID')),
+                ('op', models.CharField(choices=[('UPSERT', '新增 / 修改'), ('DELETE', '删除')], max_length=8, verbose_name='操作')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='时间')),
+            ],
+            options={
+                'verbose_name': '数据变更',
+                'verbose_name_plural': '数据变更',
+                'indexes': [models.Index(fields=['entity', 'object_id', 'seq'], name='change_feed_object_idx')],
+            },
+        ),
+    ]
@@ -8,10 +8,15 @@ from django.utils import timezone
 import datetime
 import math
 
+from .policy import GAME_MINUTES
+
 # 1. 门店模型
 class Store(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="门店名称")
     address = models.CharField(max_length=255, verbose_name="门店地址")
+    # 营业时间（本地时间）；留空表示 24 小时营业。打烊时间早于开门时间表示营业到次日
+    opening_time = models.TimeField(null=True, blank=True, verbose_name="开门时间")
+    closing_time = models.TimeField(null=True, blank=True, verbose_name="打烊时间")
 
     def __str__(self):
         return self.name
@@ -55,6 +60,7 @@ class Booking(models.Model):
     # --- 预约类型 ---
     BOOKING_TYPE_CHOICES = [
         ('STANDARD', '标准预约'),
+        ('TOURNAMENT', '比赛'),
     ]
     booking_type = models.CharField(
         max_length=10,
@@ -78,7 +84,15 @@ class Booking(models.Model):
     end_time = models.DateTimeField(verbose_name="结束时间")
 
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="预约状态")
+
+    # --- 参与者名单（反范式化）：按加入顺序保存 ID 与显示名，列表页 / 导出无需再查询关联表 ---
+    # 由 booking/signals.py 中的 m2m_changed 信号维护，可用 manage.py repair_rosters 校正
+    participant_ids = models.JSONField(default=list, blank=True, editable=False, verbose_name="参与者ID")
+    participant_names = models.JSONField(default=list, blank=True, editable=False, verbose_name="参与者名单")
+    participant_count = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="参与人数")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    # 最后修改时间：save() 自动更新，bulk_update / update() 需要显式设置（日历增量同步依赖它）
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="修改时间")
 
     # --- 重写 save 方法以适应新逻辑 ---
     def save(self, *args, **kwargs):
@@ -88,13 +102,13 @@ class Booking(models.Model):
 
         # 2. 统一保存逻辑：若缺少结束时间则按半庄数推算；若缺少半庄数则由时间推算
         if self.end_time is None and self.num_games:
-            duration_minutes = self.num_games * 45
+            duration_minutes = self.num_games * GAME_MINUTES
             self.end_time = self.start_time + datetime.timedelta(minutes=duration_minutes)
 
         if self.num_games in (None, 0) and self.end_time:
             duration = self.end_time - self.start_time
-            minutes = max(duration.total_seconds() / 60, 45)
-            self.num_games = max(1, math.ceil(minutes / 45))
+            minutes = max(duration.total_seconds() / 60, GAME_MINUTES)
+            self.num_games = max(1, math.ceil(minutes / GAME_MINUTES))
 
         # 3. 如果 end_time 仍然为空，兜底1小时
         if self.end_time is None:
@@ -115,7 +129,7 @@ class Booking(models.Model):
     @property
     def display_end_time(self):
         if self.num_games is not None:
-            return self.start_time + datetime.timedelta(minutes=self.num_games * 45)
+            return self.start_time + datetime.timedelta(minutes=self.num_games * GAME_MINUTES)
         return self.end_time # 按时段预约则直接返回 end_time
 
     @property
@@ -139,3 +153,99 @@ class Booking(models.Model):
         verbose_name = "对局预约"
         verbose_name_plural = verbose_name
         ordering = ['start_time'] # 默认按开始时间排序
+
+
+# 对局事件日志：只追加，不修改、不删除（见 booking/history.py）
+class BookingEvent(models.Model):
+    KIND_CHOICES = [
+        ('CREATED', '创建'),
+        ('JOINED', '加入'),
+        ('LEFT', '退出'),
+        ('CONFIRMED', '成行'),
+        ('REVERTED', '退回匹配中'),
+        ('TABLE_ASSIGNED', '分配牌桌'),
+        ('UPDATED', '修改'),
+        ('CANCELED', '取消'),
+        ('DELETED', '删除'),
+    ]
+
+    # 对局删除后事件仍保留，因此只记 ID，不用外键
+    booking_id = models.BigIntegerField(verbose_name="对局ID")
+    store_id = models.BigIntegerField(verbose_name="门店ID")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, verbose_name="事件")
+    actor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="操作人",
+    )
+    data = models.JSONField(default=dict, blank=True, verbose_name="内容")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="时间")
+
+    class Meta:
+        verbose_name = "对局事件"
+        verbose_name_plural = verbose_name
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['booking_id', 'created_at'], name='booking_event_booking_idx'),
+            models.Index(fields=['store_id', 'created_at'], name='booking_event_store_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("对局事件只能追加，不能修改。")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"#{self.booking_id} {self.get_kind_display()} @ {timezone.localtime(self.created_at):%Y-%m-%d %H:%M:%S}"
+
+
+# 门店对局状态的快照：taken_at 时刻所有未结束对局的状态，重建某一时刻的状态时从最近的快照开始重放事件
+class BookingSnapshot(models.Model):
+    store_id = models.BigIntegerField(verbose_name="门店ID")
+    taken_at = models.DateTimeField(verbose_name="快照时间")
+    bookings = models.JSONField(default=dict, verbose_name="对局状态")
+
+    class Meta:
+        verbose_name = "对局状态快照"
+        verbose_name_plural = verbose_name
+        indexes = [models.Index(fields=['store_id', 'taken_at'], name='booking_snapshot_store_idx')]
+
+
+# 变更订阅：对局 / 牌桌每次变化追加一条，下游系统按序号增量同步（见 booking/changes.py）
+class ChangeFeedEntry(models.Model):
+    ENTITY_CHOICES = [
+        ('booking', '对局'),
+        ('table', '牌桌'),
+    ]
+    OP_CHOICES = [
+        ('UPSERT', '新增 / 修改'),
+        ('DELETE', '删除'),
+    ]
+
+    # 序号在事务提交之后才分配（见 changes.sequence()），未分配前为空
+    seq = models.BigIntegerField(null=True, blank=True, unique=True, verbose_name="序号")
+    entity = models.CharField(max_length=16, choices=ENTITY_CHOICES, verbose_name="对象类型")
+    object_id = models.BigIntegerField(verbose_name="对象ID")
+    store_id = models.BigIntegerField(verbose_name="门店ID")
+    op = models.CharField(max_length=8, choices=OP_CHOICES, verbose_name="操作")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="时间")
+
+    class Meta:
+        verbose_name = "数据变更"
+        verbose_name_plural = verbose_name
+        indexes = [models.Index(fields=['entity', 'object_id', 'seq'], name='change_feed_object_idx')]
+
+    def __str__(self):
+        return f"{self.seq or '-'} {self.entity} #{self.object_id} {self.op}"
+
+
+# 变更订阅的消费者（下游系统）及其已处理到的序号
+class ChangeFeedConsumer(models.Model):
+    name = models.CharField(max_length=64, unique=True, verbose_name="名称")
+    offset = models.BigIntegerField(default=0, verbose_name="已处理到的序号")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="最后提交时间")
+
+    class Meta:
+        verbose_name = "变更订阅消费者"
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return self.name
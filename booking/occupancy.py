@@ -0,0 +1,324 @@
+# booking/occupancy.py
+"""
+共享内存中的牌桌占用看板：同一台机器上的所有 Web 进程直接读取，门店状态页与后台「当前状态」
+不再为占用情况查询数据库。
+
+看板是一段 multiprocessing.shared_memory，按 int64 排列：
+  * 头部 HEADER_WORDS 个字：魔数、序列号、容量（可容纳的最大牌桌 ID + 1）、最近一次全量校正的时间；
+  * 之后每张牌桌 SLOT_WORDS 个字，以牌桌 ID 为下标：当前对局 ID、其结束时间、下一个对局 ID、
+    其开始时间（时间为 Unix 秒，0 表示没有）。读取时按当前时间判断：当前对局已结束则视为空闲，
+    下一个对局已开始则视为由它占用，两次校正之间时间推移造成的变化也能正确显示。
+
+一致性（序列锁）：写入方先把序列号加 1（变为奇数）再写槽位，写完再加 1（变回偶数）；
+读取方在读槽位前后各读一次序列号，两次相同且为偶数才采用，否则重读。读取方不加锁、
+直接在共享内存上读（memoryview，零拷贝）；写入方之间用文件锁串行，任意时刻只有一个写入者。
+
+更新来源：
+  * 对局保存 / 删除的信号在事务提交后重新计算涉及的牌桌并写入（一次查询）；
+  * manage.py occupancy_board 作为常驻的更新进程创建看板，并每隔一段时间全量校正，
+    覆盖 update() 等不触发信号的批量操作。
+看板不存在、超过 BOOKING_OCCUPANCY_MAX_AGE 秒未校正或牌桌 ID 超出容量时，读取返回 None，
+调用方回退到原来的数据库 / 紧凑排期路径。不支持 fcntl 的平台（Windows）不启用看板。
+"""
+import datetime
+import os
+import tempfile
+import threading
+import time
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGIC = 0x4D4A4F4301  # 'MJOC' + 布局版本 1
+MAGIC_WORD, SEQ_WORD, CAPACITY_WORD, RECONCILED_WORD = 0, 1, 2, 3
+HEADER_WORDS = 8
+SLOT_WORDS = 4
+EMPTY_SLOT = (0, 0, 0, 0)
+# 「下一个对局」只看这段时间之内的
+LOOKAHEAD = datetime.timedelta(days=1)
+# 看板不存在时，每个进程至少隔这么久才重新尝试附加
+ATTACH_RETRY_SECONDS = 30
+READ_RETRIES = 100
+
+
+def board_name():
+    if fcntl is None:
+        return None
+    return getattr(settings, 'BOOKING_OCCUPANCY_BOARD', 'mahjong_occupancy')
+
+
+def board_capacity():
+    return getattr(settings, 'BOOKING_OCCUPANCY_BOARD_SIZE', 4096)
+
+
+def max_age():
+    return getattr(settings, 'BOOKING_OCCUPANCY_MAX_AGE', 120)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 及以前没有 track 参数：附加到已有的段也会登记到 resource_tracker，
+        # 进程退出时会被误删，取消登记
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class OccupancyBoard:
+    def __init__(self, shm):
+        self.shm = shm
+        self.words = shm.buf.cast('q')
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+
+    @classmethod
+    def create(cls, name, capacity):
+        """
+        创建看板（已存在且容量一致时直接复用）。创建者拥有看板：进程退出（包括被强制终止）时由
+        resource_tracker 删除，需要保留时调用 keep()。
+        """
+        size = (HEADER_WORDS + capacity * SLOT_WORDS) * 8
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            board = cls(_attach(name))
+            resource_tracker.register(board.shm._name, 'shared_memory')
+            if board.words[MAGIC_WORD] == MAGIC and board.capacity == capacity:
+                return board
+            board.close()
+            board.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        board = cls(shm)
+        board.words[CAPACITY_WORD] = capacity
+        board.words[MAGIC_WORD] = MAGIC
+        return board
+
+    @classmethod
+    def attach(cls, name):
+        """附加到已有的看板，不存在或格式不符时返回 None。"""
+        try:
+            board = cls(_attach(name))
+        except FileNotFoundError:
+            return None
+        if board.words[MAGIC_WORD] != MAGIC:
+            board.close()
+            return None
+        return board
+
+    @property
+    def capacity(self):
+        return self.words[CAPACITY_WORD]
+
+    @property
+    def reconciled_at(self):
+        return self.words[RECONCILED_WORD]
+
+    def __del__(self):
+        # 先释放 memoryview，SharedMemory 才能关闭映射
+        try:
+            self.close()
+        except (AttributeError, BufferError, ValueError):
+            pass
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def unlink(self):
+        self.shm.unlink()
+
+    def keep(self):
+        """创建者退出后保留看板（不再由 resource_tracker 删除）。"""
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+    def read(self, table_ids):
+        """读取一组牌桌的槽位，返回与 table_ids 顺序一致的 4 元组列表；有牌桌超出容量时返回 None。"""
+        words = self.words
+        capacity = words[CAPACITY_WORD]
+        if any(table_id >= capacity for table_id in table_ids):
+            return None
+        bases = [HEADER_WORDS + table_id * SLOT_WORDS for table_id in table_ids]
+        for _ in range(READ_RETRIES):
+            before = words[SEQ_WORD]
+            if before & 1:
+                continue
+            slots = [(words[base], words[base + 1], words[base + 2], words[base + 3]) for base in bases]
+            if words[SEQ_WORD] == before:
+                return slots
+        return None
+
+    def _file_lock(self):
+        if self._lock_file is None:
+            path = os.path.join(tempfile.gettempdir(), f"{self.shm.name.lstrip('/')}.lock")
+            self._lock_file = open(path, 'a')
+        return self._lock_file
+
+    def write(self, slots, clear=False, reconciled_at=None):
+        """写入 {牌桌ID: 4 元组}；clear=True 时先清空全部槽位（全量校正）。超出容量的牌桌被忽略。"""
+        words = self.words
+        capacity = words[CAPACITY_WORD]
+        with self._thread_lock:
+            lock_file = self._file_lock()
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                sequence = words[SEQ_WORD]
+                words[SEQ_WORD] = sequence + 1
+                try:
+                    if clear:
+                        words[HEADER_WORDS:] = array('q', bytes(capacity * SLOT_WORDS * 8))
+                    for table_id, slot in slots.items():
+                        if 0 <= table_id < capacity:
+                            base = HEADER_WORDS + table_id * SLOT_WORDS
+                            words[base:base + SLOT_WORDS] = array('q', slot)
+                    if reconciled_at is not None:
+                        words[RECONCILED_WORD] = reconciled_at
+                finally:
+                    words[SEQ_WORD] = sequence + 2
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# --- 本进程附加的看板 ---
+
+_board = None
+_next_attempt = 0.0
+_attach_lock = threading.Lock()
+
+
+def get_board(fresh=True):
+    """
+    本进程附加的看板。fresh=True 时还要求最近 BOOKING_OCCUPANCY_MAX_AGE 秒内校正过
+    （更新进程重启后会重建看板，旧的映射不再更新，过期时重新附加）。不可用时返回 None。
+    """
+    global _board, _next_attempt
+    name = board_name()
+    if not name:
+        return None
+    board = _board
+    if board is not None and (not fresh or time.time() - board.reconciled_at <= max_age()):
+        return board
+    if time.monotonic() < _next_attempt:
+        return board if board is not None and not fresh else None
+    with _attach_lock:
+        _next_attempt = time.monotonic() + ATTACH_RETRY_SECONDS
+        if board is not None:
+            _board = None
+            try:
+                board.close()
+            except BufferError:
+                pass
+        _board = OccupancyBoard.attach(name)
+    board = _board
+    if board is None or (fresh and time.time() - board.reconciled_at > max_age()):
+        return None
+    return board
+
+
+def load_slots(now=None, table_ids=None):
+    """
+    从数据库计算牌桌的槽位 {牌桌ID: (当前对局ID, 结束秒, 下一个对局ID, 开始秒)}，一次查询。
+    给出 table_ids 时只计算这些牌桌，没有对局的牌桌为空槽位。
+    """
+    now = now or timezone.now()
+    bookings = Booking.objects.filter(
+        status='CONFIRMED', table__isnull=False, end_time__gt=now, start_time__lt=now + LOOKAHEAD,
+    )
+    slots = {}
+    if table_ids is not None:
+        table_ids = {table_id for table_id in table_ids if table_id is not None}
+        bookings = bookings.filter(table_id__in=table_ids)
+        slots = {table_id: EMPTY_SLOT for table_id in table_ids}
+    current, upcoming = {}, {}
+    rows = bookings.order_by('table_id', 'start_time').values_list('table_id', 'pk', 'start_time', 'end_time')
+    for table_id, booking_id, start_time, end_time in rows:
+        if start_time <= now:
+            current.setdefault(table_id, (booking_id, int(end_time.timestamp())))
+        else:
+            upcoming.setdefault(table_id, (booking_id, int(start_time.timestamp())))
+    for table_id in current.keys() | upcoming.keys():
+        slots[table_id] = current.get(table_id, (0, 0)) + upcoming.get(table_id, (0, 0))
+    return slots
+
+
+def reconcile(board, now=None):
+    """全量校正：按数据库重写全部槽位，返回有对局的牌桌数。"""
+    now = now or timezone.now()
+    slots = load_slots(now)
+    board.write(slots, clear=True, reconciled_at=int(now.timestamp()))
+    return len(slots)
+
+
+def refresh_tables(table_ids):
+    """在当前事务提交后重新计算这些牌桌的槽位（信号中调用）。看板不存在时什么也不做。"""
+    table_ids = {table_id for table_id in table_ids if table_id is not None}
+    if not table_ids or not board_name():
+        return
+
+    def write():
+        board = get_board(fresh=False)
+        if board is not None:
+            board.write(load_slots(table_ids=table_ids))
+
+    transaction.on_commit(write)
+
+
+def _current(slot, now):
+    current_id, current_end, next_id, next_start = slot
+    if current_id and now < current_end:
+        return current_id
+    if next_id and next_start <= now:
+        return next_id
+    return None
+
+
+def current_booking_ids(table_ids, now=None):
+    """{牌桌ID: 当前对局ID}（只含有对局的牌桌），看板不可用时返回 None。"""
+    board = get_board()
+    if board is None:
+        return None
+    table_ids = list(table_ids)
+    try:
+        slots = board.read(table_ids)
+    except ValueError:  # 其他线程刚刚重新附加、释放了旧映射
+        return None
+    if slots is None:
+        return None
+    now = int((now or timezone.now()).timestamp())
+    result = {}
+    for table_id, slot in zip(table_ids, slots):
+        booking_id = _current(slot, now)
+        if booking_id:
+            result[table_id] = booking_id
+    return result
+
+
+def table_status(table_id, now=None):
+    """(当前对局ID 或 None, 下一个对局的开始时间 或 None)。优先读看板，不可用时查询数据库。"""
+    now = now or timezone.now()
+    board = get_board()
+    slots = None
+    if board is not None:
+        try:
+            slots = board.read([table_id])
+        except ValueError:
+            slots = None
+    slot = slots[0] if slots else load_slots(now, [table_id])[table_id]
+    timestamp = int(now.timestamp())
+    current_id = _current(slot, timestamp)
+    next_start = slot[3] if slot[2] and slot[3] > timestamp else 0
+    return current_id, (datetime.datetime.fromtimestamp(next_start, tz=datetime.timezone.utc) if next_start else None)
@@ -0,0 +1,86 @@
+# booking/policy.py
+"""
+预约规则的可调参数与判断。
+
+视图、定时清理任务与策略模拟（见 booking/simulation.py）共用这里的判断，模拟结果与线上行为一致：
+  * 每人同时发起的匹配中预约不超过 max_pending 个；
+  * 已成行的对局在开始前 cancel_cutoff_minutes 分钟以上才能退出；
+  * 每个半庄按 game_minutes 分钟计；
+  * 匹配中的预约创建 pending_expiry_hours 小时后仍未成行即过期取消。
+本模块只依赖标准库、不导入 Django 模型，进程池的子进程只需导入本模块与模拟模块。
+"""
+from dataclasses import dataclass
+
+# 每个半庄按 45 分钟计
+GAME_MINUTES = 45
+# 一桌的人数，满员即成行
+SEATS = 4
+MINUTES_PER_DAY = 24 * 60
+
+
+@dataclass(frozen=True)
+class BookingPolicy:
+    max_pending: int = 2
+    cancel_cutoff_minutes: int = 60
+    game_minutes: int = GAME_MINUTES
+    pending_expiry_hours: int = 24
+
+    @classmethod
+    def current(cls):
+        """线上生效的规则：settings 中的 BOOKING_MAX_PENDING 等配置，未配置时取默认值。"""
+        from django.conf import settings
+
+        return cls(
+            max_pending=getattr(settings, 'BOOKING_MAX_PENDING', cls.max_pending),
+            cancel_cutoff_minutes=getattr(settings, 'BOOKING_CANCEL_CUTOFF_MINUTES', cls.cancel_cutoff_minutes),
+            pending_expiry_hours=getattr(settings, 'BOOKING_PENDING_EXPIRY_HOURS', cls.pending_expiry_hours),
+        )
+
+    def pending_limit_reached(self, pending_count):
+        return pending_count >= self.max_pending
+
+    def can_leave_confirmed(self, minutes_to_start):
+        return minutes_to_start > self.cancel_cutoff_minutes
+
+    def duration_minutes(self, num_games):
+        return num_games * self.game_minutes
+
+    @property
+    def expiry_minutes(self):
+        return self.pending_expiry_hours * 60
+
+    @property
+    def cancel_cutoff_label(self):
+        minutes = self.cancel_cutoff_minutes
+        return f"{minutes // 60}小时" if minutes and minutes % 60 == 0 else f"{minutes}分钟"
+
+    def check_request(self, start, end, num_games):
+        """发起预约时的输入校验，start / end 可以是 datetime 或分钟数。不通过时抛出 ValueError。"""
+        if num_games <= 0:
+            raise ValueError("半庄数必须大于0。")
+        if end <= start:
+            raise ValueError("结束时间必须晚于开始时间。")
+
+
+def minute_of_day(value):
+    """datetime.time -> 当天的第几分钟（可带小数），None 保持为 None。"""
+    if value is None:
+        return None
+    return value.hour * 60 + value.minute + value.second / 60
+
+
+def within_hours(opening, closing, start, end):
+    """
+    [start, end)（本地时间的分钟数，每天从 MINUTES_PER_DAY 的整数倍开始）是否完全落在某个营业时段内。
+    opening / closing 为当天的第几分钟；任一为 None 或两者相等视为 24 小时营业，
+    打烊时间早于开门时间表示营业到次日。
+    """
+    if opening is None or closing is None or opening == closing:
+        return True
+    length = (closing - opening) % MINUTES_PER_DAY
+    day = start // MINUTES_PER_DAY
+    for opening_day in (day - 1, day):
+        opens = opening_day * MINUTES_PER_DAY + opening
+        if opens <= start and end <= opens + length:
+            return True
+    return False
@@ -0,0 +1,356 @@
+# booking/printing.py
+"""
+课表打印：把按天 / 门店的课表网格渲染为分页 HTML 与 PDF。
+
+本模块只依赖标准库、不导入 Django，进程池的子进程只需导入本模块即可渲染页面：
+  * ScheduleSheet：一个门店一天的课表网格，XLSX / HTML / PDF 三种导出共用，
+    由 booking/exports.py 从数据库流式构建；
+  * write_html() / write_pdf()：每个门店日作为一个任务交给进程池渲染，
+    结果按原顺序合并成一个多页文档并直接写入文件对象。
+PDF 使用 Adobe 预置的 STSong-Light 中文字体（UniGB-UCS2-H 编码），不嵌入字体文件，
+Acrobat、浏览器内置阅读器等常见阅读器都能直接显示。
+"""
+import html
+import itertools
+import multiprocessing
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+WEEKDAYS = "一二三四五六日"
+
+# A4 横向，单位为 pt
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+MARGIN = 28
+TITLE_SIZE = 12
+HEADER_SIZE = 8
+TEXT_SIZE = 7
+LEADING = 1.25
+PADDING = 3
+TIME_COLUMN_WIDTH = 62
+MIN_COLUMN_WIDTH = 72
+
+
+class ScheduleSheet:
+    """
+    一个门店一天的课表。tables 为各牌桌块的标题（按桌号排列，未分配牌桌的对局最后
+    单独一块）；cells[hour][block] 为该小时内开始的对局，每个对局是
+    (起止时间, 半庄数, 参与者名单) 元组。
+    """
+
+    __slots__ = ('day', 'store_name', 'tables', 'cells')
+
+    def __init__(self, day, store_name, tables, cells):
+        self.day = day
+        self.store_name = store_name
+        self.tables = tables
+        self.cells = cells
+
+    @property
+    def title(self):
+        """工作表名（Excel 限制 31 个字符）。"""
+        return f"{self.day.strftime('%m%d')}-{self.store_name}"[:31]
+
+    @property
+    def heading(self):
+        return f"{self.store_name}  {self.day:%Y-%m-%d} 周{WEEKDAYS[self.day.weekday()]}"
+
+    def hour_range(self):
+        """打印时只保留第一个到最后一个有对局的小时，返回 range。"""
+        hours = [hour for hour, row in enumerate(self.cells) if any(row)]
+        if not hours:
+            return range(0)
+        return range(hours[0], hours[-1] + 1)
+
+
+def hour_label(hour):
+    return f"{hour:02d}:00 - {(hour + 1) % 24:02d}:00"
+
+
+def entry_heading(entry):
+    time_label, num_games, _ = entry
+    return f"{time_label}  {num_games} 半庄" if num_games else time_label
+
+
+def entry_names(entry):
+    return "、".join(name for name in entry[2] if name)
+
+
+# 进程池每个任务包含的门店日数，以及每个子进程最多排队的任务数
+POOL_CHUNK_SIZE = 4
+POOL_TASKS_PER_WORKER = 2
+
+
+def _render_chunk(func, sheets):
+    return [func(sheet) for sheet in sheets]
+
+
+def render_in_pool(func, sheets, workers):
+    """
+    依次返回 func(sheet) 的结果（保持输入顺序）。workers > 1 时使用 spawn 方式的进程池，
+    主进程一边从数据库读取、构建课表，子进程一边渲染；在守护进程（如 Celery prefork
+    子进程）中不能再创建子进程，此时退化为在本进程内渲染。
+    同时提交的任务数有上限（滑动窗口），取出最早的结果后才继续读取 sheets：
+    executor.map 会先把整个输入读完并全部提交，课表与渲染结果都会堆在内存中。
+    """
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        yield from map(func, sheets)
+        return
+    context = multiprocessing.get_context('spawn')
+    sheets = iter(sheets)
+    window = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        while True:
+            while len(window) < workers * POOL_TASKS_PER_WORKER:
+                chunk = list(itertools.islice(sheets, POOL_CHUNK_SIZE))
+                if not chunk:
+                    break
+                window.append(executor.submit(_render_chunk, func, chunk))
+            if not window:
+                return
+            yield from window.popleft().result()
+
+
+# --- HTML ---
+
+HTML_STYLE = """
+@page { size: A4 landscape; margin: 10mm; }
+body { font-family: "Noto Sans CJK SC", "Microsoft YaHei", sans-serif; font-size: 9pt; margin: 0; }
+.sheet { break-after: page; page-break-after: always; }
+.sheet:last-child { break-after: auto; page-break-after: auto; }
+h2 { font-size: 13pt; margin: 0 0 6px; }
+table { border-collapse: collapse; width: 100%; table-layout: fixed; }
+thead { display: table-header-group; }
+tr { break-inside: avoid; page-break-inside: avoid; }
+th, td { border: 1px solid #999; padding: 2px 3px; vertical-align: top; }
+thead th { background: #eee; }
+tbody th { width: 80px; font-weight: normal; white-space: nowrap; }
+.entry + .entry { border-top: 1px dashed #bbb; margin-top: 2px; padding-top: 2px; }
+.entry b { display: block; }
+@media screen { .sheet { margin: 16px; } }
+"""
+
+
+def render_html_sheet(sheet):
+    """把一个门店日渲染为 HTML 片段（<section>），每个片段在打印时单独起一页。"""
+    parts = [
+        '<section class="sheet">',
+        f'<h2>{html.escape(sheet.heading)}</h2>',
+        '<table><thead><tr><th>时间</th>',
+    ]
+    parts.extend(f'<th>{html.escape(str(table))}</th>' for table in sheet.tables)
+    parts.append('</tr></thead><tbody>')
+    for hour in sheet.hour_range():
+        parts.append(f'<tr><th>{hour_label(hour)}</th>')
+        for entries in sheet.cells[hour]:
+            parts.append('<td>')
+            for entry in entries:
+                parts.append(
+                    f'<div class="entry"><b>{html.escape(entry_heading(entry))}</b>'
+                    f'{html.escape(entry_names(entry))}</div>'
+                )
+            parts.append('</td>')
+        parts.append('</tr>')
+    parts.append('</tbody></table></section>\n')
+    return "".join(parts)
+
+
+def write_html(sheets, output, title, workers=1):
+    """把全部课表写成一个可直接打印的 HTML 文档（output 为二进制文件对象）。"""
+    output.write(
+        f'<!DOCTYPE html>\n<html lang="zh-CN"><head><meta charset="utf-8">'
+        f'<title>{html.escape(title)}</title><style>{HTML_STYLE}</style></head><body>\n'.encode()
+    )
+    empty = True
+    for fragment in render_in_pool(render_html_sheet, sheets, workers):
+        output.write(fragment.encode())
+        empty = False
+    if empty:
+        output.write('<p>所选范围内没有对局。</p>\n'.encode())
+    output.write(b'</body></html>\n')
+
+
+# --- PDF ---
+
+def _wrap(text, width, size):
+    """按字符折行（中文没有空格可断），返回行列表。STSong-Light 的 ASCII 为半角，其余按全角计算。"""
+    lines, line, line_width = [], "", 0.0
+    for char in text:
+        char_width = (0.5 if ord(char) < 128 else 1.0) * size
+        if line and line_width + char_width > width:
+            lines.append(line)
+            line, line_width = "", 0.0
+        line += char
+        line_width += char_width
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_text(text):
+    # UniGB-UCS2-H 只能编码基本多文种平面内的字符
+    text = "".join(char if ord(char) <= 0xFFFF else "?" for char in text)
+    return text.encode('utf-16-be').hex().upper()
+
+
+class _Canvas:
+    """收集一页 PDF 的绘图指令。"""
+
+    def __init__(self):
+        self.ops = ['0.5 w 0.6 G']
+
+    def rect(self, x, y, width, height, fill=None):
+        if fill is not None:
+            self.ops.append(f'{fill} g {x:.1f} {y:.1f} {width:.1f} {height:.1f} re B 0 g')
+        else:
+            self.ops.append(f'{x:.1f} {y:.1f} {width:.1f} {height:.1f} re S')
+
+    def text(self, x, y, text, size):
+        self.ops.append(f'BT /F1 {size} Tf {x:.1f} {y:.1f} Td <{_pdf_text(text)}> Tj ET')
+
+    def lines(self, x, top, lines, size):
+        """从 top 向下逐行绘制文字。"""
+        for index, line in enumerate(lines):
+            self.text(x, top - PADDING - size * (0.88 + index * LEADING), line, size)
+
+    def content(self):
+        return zlib.compress("\n".join(self.ops).encode('ascii'))
+
+
+def _cell_lines(entries, width):
+    lines = []
+    for entry in entries:
+        lines.extend(_wrap(entry_heading(entry), width, TEXT_SIZE))
+        lines.extend(_wrap(entry_names(entry), width, TEXT_SIZE))
+    return lines
+
+
+def render_pdf_sheet(sheet):
+    """
+    把一个门店日渲染为若干 PDF 页面，返回压缩后的页面内容流列表。
+    牌桌较多时按列分成几组，每组再按行分页，每页都重复表头。
+    """
+    usable_width = PAGE_WIDTH - 2 * MARGIN - TIME_COLUMN_WIDTH
+    per_page = max(1, int(usable_width // MIN_COLUMN_WIDTH))
+    grid_top = PAGE_HEIGHT - MARGIN - TITLE_SIZE - 8
+    hours = sheet.hour_range()
+
+    pages = []
+    for first in range(0, len(sheet.tables), per_page):
+        blocks = range(first, min(first + per_page, len(sheet.tables)))
+        column_width = usable_width / len(blocks)
+        text_width = column_width - 2 * PADDING
+
+        headers = [_wrap(str(sheet.tables[block]), text_width, HEADER_SIZE) for block in blocks]
+        header_height = max(len(lines) for lines in headers) * HEADER_SIZE * LEADING + 2 * PADDING
+        max_lines = int((grid_top - header_height - MARGIN - 2 * PADDING) // (TEXT_SIZE * LEADING))
+
+        # 先排版出每页的行，再绘制（页码需要知道总页数）
+        group_pages, rows, available = [], [], grid_top - header_height - MARGIN
+        for hour in hours:
+            cells = []
+            for block in blocks:
+                lines = _cell_lines(sheet.cells[hour][block], text_width)
+                if len(lines) > max_lines:
+                    lines = lines[:max_lines - 1] + ["……"]
+                cells.append(lines)
+            height = max(1, *(len(lines) for lines in cells)) * TEXT_SIZE * LEADING + 2 * PADDING
+            if rows and height > available:
+                group_pages.append(rows)
+                rows, available = [], grid_top - header_height - MARGIN
+            rows.append((hour, cells, height))
+            available -= height
+        group_pages.append(rows)
+        pages.extend((blocks, column_width, headers, header_height, rows) for rows in group_pages)
+
+    streams = []
+    for page_index, (blocks, column_width, headers, header_height, rows) in enumerate(pages, 1):
+        canvas = _Canvas()
+        title = sheet.heading if len(pages) == 1 else f"{sheet.heading}  ({page_index}/{len(pages)})"
+        canvas.text(MARGIN, PAGE_HEIGHT - MARGIN - TITLE_SIZE, title, TITLE_SIZE)
+
+        top = grid_top
+        canvas.rect(MARGIN, top - header_height, TIME_COLUMN_WIDTH, header_height, fill=0.9)
+        canvas.lines(MARGIN + PADDING, top, ["时间"], HEADER_SIZE)
+        for index, lines in enumerate(headers):
+            x = MARGIN + TIME_COLUMN_WIDTH + index * column_width
+            canvas.rect(x, top - header_height, column_width, header_height, fill=0.9)
+            canvas.lines(x + PADDING, top, lines, HEADER_SIZE)
+        top -= header_height
+
+        for hour, cells, height in rows:
+            canvas.rect(MARGIN, top - height, TIME_COLUMN_WIDTH, height)
+            canvas.lines(MARGIN + PADDING, top, [hour_label(hour)], TEXT_SIZE)
+            for index, lines in enumerate(cells):
+                x = MARGIN + TIME_COLUMN_WIDTH + index * column_width
+                canvas.rect(x, top - height, column_width, height)
+                canvas.lines(x + PADDING, top, lines, TEXT_SIZE)
+            top -= height
+        streams.append(canvas.content())
+    return streams
+
+
+# 对象 1-5 固定为目录、页面树与字体，页面从 6 号开始
+_FONT_OBJECTS = {
+    3: b'<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UCS2-H '
+       b'/DescendantFonts [4 0 R] >>',
+    4: b'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light '
+       b'/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> '
+       b'/FontDescriptor 5 0 R /DW 1000 /W [1 95 500] >>',
+    5: b'<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880] '
+       b'/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>',
+}
+
+
+class _PdfWriter:
+    """顺序写出 PDF 对象并记录偏移，最后补上页面树与交叉引用表。"""
+
+    def __init__(self, output):
+        self.output = output
+        self.start = output.tell()
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 6
+        output.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        for object_id, body in _FONT_OBJECTS.items():
+            self.write_object(object_id, body)
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.output.tell() - self.start
+        self.output.write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+
+    def add_page(self, content):
+        page_id, content_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.write_object(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content)
+                          + content + b'\nendstream')
+        self.write_object(page_id, (
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            '/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        ).encode())
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self.write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>'.encode())
+        xref = self.output.tell() - self.start
+        self.output.write(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id)
+        for object_id in range(1, self.next_id):
+            self.output.write(b'%010d 00000 n \n' % self.offsets[object_id])
+        self.output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_id, xref))
+
+
+def write_pdf(sheets, output, workers=1):
+    """把全部课表写成一个多页 PDF（output 为二进制文件对象），每个门店日至少一页。"""
+    writer = _PdfWriter(output)
+    for streams in render_in_pool(render_pdf_sheet, sheets, workers):
+        for content in streams:
+            writer.add_page(content)
+    if not writer.page_ids:
+        canvas = _Canvas()
+        canvas.text(MARGIN, PAGE_HEIGHT - MARGIN - TITLE_SIZE, "所选范围内没有对局。", TITLE_SIZE)
+        writer.add_page(canvas.content())
+    writer.close()
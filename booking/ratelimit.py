@@ -0,0 +1,137 @@
+# booking/ratelimit.py
+"""
+写操作限流：按用户与按 IP 的令牌桶，状态保存在 Django 缓存中（多进程共享）。
+
+令牌桶用 GCRA（通用信元速率算法）实现：每个桶在缓存中只保存一个整数——「理论到达时间」
+TAT（微秒）。每次请求用 cache.incr 把 TAT 原子地推后一个令牌间隔，推后的结果距现在
+不超过桶容量对应的时长即放行，否则把这次增量减回去并拒绝，等价于容量为 N、
+每 period 补充 N 个令牌的令牌桶。正常请求只有一次缓存往返，不需要锁或读-改-写。
+
+限额在 settings.BOOKING_RATE_LIMITS 中按作用域配置，格式为「次数/周期」::
+
+    BOOKING_RATE_LIMITS = {
+        'join_booking': {'user': '20/m', 'ip': '60/m'},
+        'login': {'ip': '10/m'},
+    }
+
+周期可以是 s / m / h / d。未配置的作用域不限流。超限时返回 429 与 Retry-After 响应头。
+"""
+import functools
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.shortcuts import render
+
+KEY_PREFIX = 'booking:ratelimit:'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_parsed_rates = {}
+
+
+def parse_rate(rate):
+    """'20/m' -> (桶容量, 每个令牌的补充间隔微秒)。"""
+    if rate not in _parsed_rates:
+        count, period = rate.split('/')
+        count = int(count)
+        _parsed_rates[rate] = (count, max(PERIODS[period[0]] * 1_000_000 // count, 1))
+    return _parsed_rates[rate]
+
+
+def client_ip(request):
+    """
+    客户端 IP。部署在反向代理之后时把 BOOKING_RATE_LIMIT_IP_HEADER 设为代理写入的请求头
+    （如 'HTTP_X_FORWARDED_FOR'），取最后一个地址——即最近一层可信代理看到的地址，
+    客户端自己伪造的前几项不会被采用。
+    """
+    header = getattr(settings, 'BOOKING_RATE_LIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def hit(key, rate, now_us=None):
+    """
+    在桶 key 上消耗一个令牌。放行时返回 0，超限时返回需要等待的秒数（浮点数）。
+    """
+    capacity, interval = parse_rate(rate)
+    burst = capacity * interval
+    now_us = now_us if now_us is not None else time.time_ns() // 1000
+    timeout = math.ceil(burst / 1_000_000) + 60
+    try:
+        tat = cache.incr(key, interval)
+    except ValueError:
+        # 桶不存在（首次请求或已过期）：从现在开始计
+        if cache.add(key, now_us + interval, timeout):
+            return 0
+        tat = cache.incr(key, interval)
+
+    if tat - interval < now_us:
+        # 桶已经补满（TAT 落在过去）：把 TAT 拉回到现在。并发时最多多放行一次，可以接受
+        cache.set(key, now_us + interval, timeout)
+        return 0
+    if tat - now_us <= burst:
+        if tat - now_us > burst - interval:
+            # 桶已空：延长过期时间，持续满额请求的客户端不会因键过期而拿到一整桶新令牌
+            cache.touch(key, timeout)
+        return 0
+    # 超限：退回这次增量，被拒绝的请求不消耗令牌
+    cache.decr(key, interval)
+    cache.touch(key, timeout)
+    return (tat - burst - now_us) / 1_000_000
+
+
+def check(request, scope):
+    """按作用域的配置检查当前请求，返回需要等待的秒数（0 表示放行）。"""
+    limits = getattr(settings, 'BOOKING_RATE_LIMITS', {}).get(scope)
+    if not limits:
+        return 0
+    wait = 0
+    user_rate = limits.get('user')
+    if user_rate:
+        # 与页面 ETag 一样直接读取 session 中的用户 ID，不为限流加载用户对象
+        session = getattr(request, 'session', None)
+        user_id = session.get(SESSION_KEY) if session is not None else None
+        if user_id:
+            wait = hit(f"{KEY_PREFIX}{scope}:user:{user_id}", user_rate)
+    ip_rate = limits.get('ip')
+    if ip_rate and not wait:
+        wait = hit(f"{KEY_PREFIX}{scope}:ip:{client_ip(request)}", ip_rate)
+    return wait
+
+
+def too_many_requests(request, wait):
+    retry_after = max(1, math.ceil(wait))
+    response = render(request, 'booking/error.html', {
+        'message': f'操作过于频繁，请在 {retry_after} 秒后重试。',
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope, methods=('POST',)):
+    """
+    视图装饰器：对 methods 中的请求按 settings.BOOKING_RATE_LIMITS[scope] 限流。
+    默认只限制 POST，打开表单页面（GET）不消耗令牌。
+
+    用法::
+
+        @login_required
+        @rate_limit('join_booking')
+        def join_booking_view(request, booking_id):
+            ...
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check(request, scope)
+                if wait:
+                    return too_many_requests(request, wait)
+            return view_func(request, *args, **kwargs)
+
+        return _wrapped_view
+
+    return decorator
@@ -0,0 +1,61 @@
+# booking/roster.py
+"""
+对局参与者名单（Booking.participant_ids / participant_names / participant_count）的维护。
+
+名单按加入顺序（关联表主键顺序）保存，显示名取自 accounts.profiles 的用户资料缓存。
+参与者变化时由 booking/signals.py 调用 refresh_rosters()；数据出现偏差时
+（例如直接写关联表的批量导入）可运行 manage.py repair_rosters 全量校正。
+"""
+from django.utils import timezone
+
+from accounts.profiles import get_profiles
+
+from .models import Booking
+
+ROSTER_FIELDS = ['participant_ids', 'participant_names', 'participant_count']
+# bulk_update 不会自动更新 auto_now 字段，写回名单时一并写入修改时间
+ROSTER_UPDATE_FIELDS = ROSTER_FIELDS + ['updated_at']
+
+
+def build_rosters(booking_ids):
+    """从关联表计算名单，返回 {booking_id: (参与者ID列表, 显示名列表)}。"""
+    ids_by_booking = {booking_id: [] for booking_id in booking_ids}
+    rows = (
+        Booking.participants.through.objects
+        .filter(booking_id__in=list(ids_by_booking))
+        .order_by('pk')
+        .values_list('booking_id', 'customuser_id')
+    )
+    for booking_id, user_id in rows:
+        ids_by_booking[booking_id].append(user_id)
+
+    profiles = get_profiles({user_id for ids in ids_by_booking.values() for user_id in ids})
+    return {
+        booking_id: (ids, [profiles[user_id].label if user_id in profiles else '' for user_id in ids])
+        for booking_id, ids in ids_by_booking.items()
+    }
+
+
+def apply_roster(booking, ids, names):
+    booking.participant_ids = ids
+    booking.participant_names = names
+    booking.participant_count = len(ids)
+    booking.updated_at = timezone.now()
+
+
+def refresh_rosters(booking_ids, instance=None):
+    """
+    重新计算并写回指定对局的名单，使用 bulk_update（不触发 save 信号）。
+    传入 instance 时同步更新该内存对象，避免随后 instance.save() 用旧名单覆盖数据库。
+    返回更新的对局数量。
+    """
+    rosters = build_rosters(booking_ids)
+    updates = []
+    for booking_id, (ids, names) in rosters.items():
+        booking = Booking(pk=booking_id)
+        apply_roster(booking, ids, names)
+        updates.append(booking)
+        if instance is not None and instance.pk == booking_id:
+            apply_roster(instance, ids, names)
+    Booking.objects.bulk_update(updates, ROSTER_UPDATE_FIELDS, batch_size=500)
+    return len(updates)
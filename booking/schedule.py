@@ -0,0 +1,237 @@
+# booking/schedule.py
+"""
+排期核心：用紧凑的区间记录代替完整的 Booking 模型实例做占用 / 冲突判断。
+
+每个门店的对局以 (对局ID, 牌桌ID, 开始分钟, 结束分钟, 状态) 的形式，按开始时间排序
+存放在几个 array 中（时间为 Unix 纪元起的分钟数），重叠查询用 bisect 定位候选区间。
+  * get_schedules() / get_schedule()：读取门店在默认时间窗口内的排期，按门店版本号
+    （见 booking/caching.py）缓存在本进程的 LRU 中，版本号不变时不查询数据库；
+  * LazyBookings：只在模板真正需要对局详情时才用一次查询按 ID 取出 Booking，
+    配合按牌桌的模板片段缓存，热缓存时页面不触发对局查询。
+"""
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caching import get_versions
+from .local_cache import LocalLRUCache
+from .models import Booking
+
+STATUS_CODES = {'PENDING': 0, 'CONFIRMED': 1, 'CANCELED': 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+CONFIRMED = (STATUS_CODES['CONFIRMED'],)
+# 占用牌桌的状态（与后台分配牌桌时的判断一致：除已取消外都算占用）
+ACTIVE = (STATUS_CODES['PENDING'], STATUS_CODES['CONFIRMED'])
+NO_TABLE = 0
+MINUTES_PER_DAY = 24 * 60
+
+_cache = LocalLRUCache(
+    maxsize=getattr(settings, 'BOOKING_SCHEDULE_CACHE_SIZE', 64),
+    ttl=3600,
+)
+
+
+def to_minutes(dt):
+    return int(dt.timestamp()) // 60
+
+
+def from_minutes(minutes):
+    return datetime.datetime.fromtimestamp(minutes * 60, tz=datetime.timezone.utc)
+
+
+class Interval:
+    """单个对局的区间记录。"""
+
+    __slots__ = ('booking_id', 'table_id', 'start', 'end', 'status')
+
+    def __init__(self, booking_id, table_id, start, end, status):
+        self.booking_id = booking_id
+        self.table_id = table_id
+        self.start = start
+        self.end = end
+        self.status = status
+
+    def __repr__(self):
+        return (
+            f"Interval(booking_id={self.booking_id}, table_id={self.table_id}, "
+            f"start={self.start}, end={self.end}, status={STATUS_NAMES.get(self.status)})"
+        )
+
+
+class StoreSchedule:
+    """
+    某门店在 [window_start, window_end) 分钟范围内的全部对局区间。
+    rows 为按开始时间升序排列的 (对局ID, 牌桌ID, 开始分钟, 结束分钟, 状态码)，
+    未分配牌桌的对局牌桌ID 记为 NO_TABLE。
+    """
+
+    __slots__ = (
+        'store_id', 'window_start', 'window_end',
+        'booking_ids', 'table_ids', 'starts', 'ends', 'statuses', 'max_length',
+    )
+
+    def __init__(self, store_id, window_start, window_end, rows=()):
+        self.store_id = store_id
+        self.window_start = window_start
+        self.window_end = window_end
+        self.booking_ids = array('q')
+        self.table_ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.statuses = array('b')
+        self.max_length = 0
+        for booking_id, table_id, start, end, status in rows:
+            self.booking_ids.append(booking_id)
+            self.table_ids.append(table_id)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.statuses.append(status)
+            self.max_length = max(self.max_length, end - start)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def covers(self, start, end):
+        return self.window_start <= start and end <= self.window_end
+
+    def _overlapping_indexes(self, start, end, statuses, exclude):
+        # 开始时间早于 start - max_length 的区间不可能与 [start, end) 重叠
+        lo = bisect_right(self.starts, start - self.max_length - 1)
+        hi = bisect_left(self.starts, end)
+        ends, status_codes, booking_ids = self.ends, self.statuses, self.booking_ids
+        for index in range(lo, hi):
+            if ends[index] > start and status_codes[index] in statuses and booking_ids[index] != exclude:
+                yield index
+
+    def overlapping(self, start, end, statuses=CONFIRMED, exclude=None):
+        """返回与 [start, end) 分钟区间重叠的对局记录（按开始时间排序）。"""
+        return [
+            Interval(self.booking_ids[i], self.table_ids[i], self.starts[i], self.ends[i], self.statuses[i])
+            for i in self._overlapping_indexes(start, end, statuses, exclude)
+        ]
+
+    def occupied_table_ids(self, start, end, statuses=ACTIVE, exclude=None):
+        table_ids = self.table_ids
+        return {
+            table_ids[i] for i in self._overlapping_indexes(start, end, statuses, exclude)
+            if table_ids[i] != NO_TABLE
+        }
+
+    def booking_ids_by_table(self, start, end, statuses=CONFIRMED):
+        """{牌桌ID: [对局ID, ...]}，只包含已分配牌桌的对局，按开始时间排序。"""
+        result = {}
+        for i in self._overlapping_indexes(start, end, statuses, None):
+            if self.table_ids[i] != NO_TABLE:
+                result.setdefault(self.table_ids[i], []).append(self.booking_ids[i])
+        return result
+
+
+def _default_window(now=None):
+    # 从前一天零点 (UTC) 开始，覆盖 BOOKING_SCHEDULE_WINDOW_DAYS 天；窗口按天滚动
+    today = to_minutes(now or timezone.now()) // MINUTES_PER_DAY
+    days = getattr(settings, 'BOOKING_SCHEDULE_WINDOW_DAYS', 7)
+    return (today - 1) * MINUTES_PER_DAY, (today + days) * MINUTES_PER_DAY
+
+
+def load_schedules(store_ids, window_start, window_end):
+    """从数据库读取与窗口重叠的对局，返回 {store_id: StoreSchedule}。"""
+    rows_by_store = {store_id: [] for store_id in store_ids}
+    rows = (
+        Booking.objects.filter(
+            store_id__in=list(rows_by_store),
+            start_time__lt=from_minutes(window_end),
+            end_time__gt=from_minutes(window_start),
+        )
+        .order_by('start_time')
+        .values_list('store_id', 'id', 'table_id', 'start_time', 'end_time', 'status')
+    )
+    for store_id, booking_id, table_id, start_time, end_time, status in rows:
+        rows_by_store[store_id].append((
+            booking_id,
+            table_id or NO_TABLE,
+            to_minutes(start_time),
+            to_minutes(end_time),
+            STATUS_CODES.get(status, -1),
+        ))
+    return {
+        store_id: StoreSchedule(store_id, window_start, window_end, rows)
+        for store_id, rows in rows_by_store.items()
+    }
+
+
+def get_schedules(store_ids, now=None):
+    """
+    返回 {store_id: StoreSchedule}（默认时间窗口）。缓存键包含门店版本号，
+    对局有任何变化时版本号递增，旧排期自然失效；未命中的门店合并为一次查询加载。
+    """
+    window_start, window_end = _default_window(now)
+    versions = get_versions(store_ids)
+    keys = {store_id: (store_id, versions[store_id], window_start) for store_id in store_ids}
+
+    schedules = {}
+    missing = []
+    for store_id, key in keys.items():
+        schedule = _cache.get(key)
+        if schedule is None:
+            missing.append(store_id)
+        else:
+            schedules[store_id] = schedule
+    if missing:
+        for store_id, schedule in load_schedules(missing, window_start, window_end).items():
+            _cache.set(keys[store_id], schedule)
+            schedules[store_id] = schedule
+    return schedules
+
+
+def get_schedule(store_id, start=None, end=None):
+    """
+    返回覆盖 [start, end)（datetime）的门店排期。范围落在默认窗口内时使用缓存，
+    否则（例如后台编辑很久以后的对局）临时从数据库加载该范围。
+    """
+    schedule = get_schedules([store_id])[store_id]
+    if start is None or end is None or schedule.covers(to_minutes(start), to_minutes(end) + 1):
+        return schedule
+    return load_schedules([store_id], to_minutes(start), to_minutes(end) + 1)[store_id]
+
+
+def current_booking_ids(store_ids, now=None):
+    """{牌桌ID: 此刻正在进行的对局ID}，按门店排期计算（占用看板不可用时的回退路径）。"""
+    now_minute = to_minutes(now or timezone.now())
+    result = {}
+    for store_schedule in get_schedules(store_ids, now=now).values():
+        for table_id, booking_ids in store_schedule.booking_ids_by_table(now_minute, now_minute + 1).items():
+            result[table_id] = booking_ids[0]
+    return result
+
+
+class LazyBookings:
+    """
+    模板用的延迟加载映射：ids_by_key 为 {键: [对局ID, ...]}，第一次 get() 时
+    才用一次查询取出全部对局。many=False 时 get() 返回第一个对局或 None。
+    """
+
+    def __init__(self, ids_by_key, queryset=None, many=True):
+        self.ids_by_key = ids_by_key
+        self.queryset = queryset if queryset is not None else Booking.objects.all()
+        self.many = many
+        self._objects = None
+
+    def _load(self):
+        ids = [booking_id for ids in self.ids_by_key.values() for booking_id in ids]
+        self._objects = self.queryset.in_bulk(ids) if ids else {}
+
+    def get(self, key, default=None):
+        if key not in self.ids_by_key:
+            return default
+        if self._objects is None:
+            self._load()
+        bookings = [self._objects[i] for i in self.ids_by_key[key] if i in self._objects]
+        if self.many:
+            return bookings
+        return bookings[0] if bookings else default
+
+    def keys(self):
+        return self.ids_by_key.keys()
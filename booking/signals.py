@@ -0,0 +1,135 @@
+# booking/signals.py
+"""
+模型信号：对局、牌桌、门店变化时递增门店 / 牌桌 / 相关用户的版本号（见 booking/caching.py），
+并递增门店 / 牌桌元数据的版本号，各进程的元数据快照随之重建（见 booking/metadata.py）；
+参与者或用户显示名变化时同步对局上的反范式化名单（见 booking/roster.py）；
+对局变化在事务提交后刷新共享内存占用看板中涉及的牌桌（见 booking/occupancy.py）；
+对局、牌桌及参与者的变化追加到变更订阅（见 booking/changes.py）。
+"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.profiles import invalidate_profile
+
+from . import changes, metadata, occupancy
+from .caching import bump_versions
+from .models import Booking, MahjongTable, Store
+from .roster import refresh_rosters
+
+# 用户的这些字段变化时需要刷新其所在对局的名单
+ROSTER_USER_FIELDS = {'username', 'display_name'}
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_store(sender, instance, raw=False, **kwargs):
+    # 后台可能修改对局所属门店 / 牌桌，需要同时让旧门店、旧牌桌的版本号失效
+    instance._previous_location = (None, None)
+    if raw or not instance.pk:
+        return
+    instance._previous_location = (
+        Booking.objects.filter(pk=instance.pk).values_list('store_id', 'table_id').first()
+        or (None, None)
+    )
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    previous_store_id, previous_table_id = getattr(instance, '_previous_location', (None, None))
+    changes.record_bookings([instance], 'UPSERT' if kwargs['signal'] is post_save else 'DELETE')
+    bump_versions(
+        [instance.store_id, previous_store_id],
+        [instance.table_id, previous_table_id],
+        [instance.creator_id, *instance.participant_ids],
+    )
+    occupancy.refresh_tables([instance.table_id, previous_table_id])
+
+
+@receiver(m2m_changed, sender=Booking.participants.through)
+def booking_participants_changed(sender, instance, action, pk_set=None, **kwargs):
+    if action == 'pre_clear' and not isinstance(instance, Booking):
+        # 从用户一侧 clear() 时 post_clear 拿不到 pk_set，提前记下受影响的对局
+        instance._cleared_booking_ids = list(instance.joined_bookings.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Booking):
+        # 退出 / 被移出的用户也要让其日历失效，先记下刷新前的名单
+        previous_ids = list(instance.participant_ids)
+        refresh_rosters([instance.pk], instance=instance)
+        changes.record_bookings([instance])
+        bump_versions(
+            [instance.store_id], [instance.table_id],
+            [instance.creator_id, *previous_ids, *instance.participant_ids, *(pk_set or ())],
+        )
+    else:
+        # 从用户一侧修改 (user.joined_bookings.add(...))
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_cleared_booking_ids', [])
+        refresh_rosters(pk_set or [])
+        _bump_bookings(pk_set or [], [instance.pk])
+
+
+def _bump_bookings(booking_ids, user_ids=()):
+    """递增一组对局所在门店、牌桌及其全部参与者的版本号并记录变更（名单已刷新之后调用）。"""
+    rows = list(
+        Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'store_id', 'table_id', 'participant_ids')
+    )
+    changes.record('booking', [(booking_id, store_id) for booking_id, store_id, _, _ in rows])
+    bump_versions(
+        [store_id for _, store_id, _, _ in rows],
+        [table_id for _, _, table_id, _ in rows],
+        [*user_ids, *(user_id for _, _, _, ids in rows for user_id in ids)],
+    )
+
+
+def _updates_roster_fields(update_fields):
+    # 登录只更新 last_login（update_fields 不含显示名），无需检查名单
+    return update_fields is None or bool(ROSTER_USER_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_previous_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_name = None
+    if raw or not instance.pk or not _updates_roster_fields(update_fields):
+        return
+    instance._previous_name = (
+        sender.objects.filter(pk=instance.pk).values_list('username', 'display_name').first()
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_renamed(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_name', None)
+    if created or previous is None or previous == (instance.username, instance.display_name):
+        return
+    booking_ids = list(instance.joined_bookings.values_list('pk', flat=True))
+    if booking_ids:
+        # 本接收器先于 accounts 的缓存失效接收器执行，这里先清掉旧的用户资料
+        invalidate_profile(instance.pk)
+        refresh_rosters(booking_ids)
+        # 同局其他玩家日历里的名单也变了
+        _bump_bookings(booking_ids)
+
+
+@receiver(post_save, sender=MahjongTable)
+@receiver(post_delete, sender=MahjongTable)
+def table_changed(sender, instance, **kwargs):
+    op = 'UPSERT' if kwargs['signal'] is post_save else 'DELETE'
+    changes.record('table', [(instance.pk, instance.store_id)], op)
+    metadata.invalidate()
+    bump_versions([instance.store_id], [instance.pk])
+
+
+@receiver(pre_delete, sender=MahjongTable)
+def table_deleting(sender, instance, **kwargs):
+    # 删除牌桌时数据库把对局的牌桌置空（不触发对局的信号），这些对局也要出现在变更订阅中
+    changes.record('booking', Booking.objects.filter(table_id=instance.pk).values_list('pk', 'store_id'))
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def store_changed(sender, instance, **kwargs):
+    metadata.invalidate()
+    bump_versions([instance.pk])
@@ -0,0 +1,396 @@
+# booking/simulation.py
+"""
+门店运营与预约规则的离散事件模拟。
+
+在一个门店的牌桌上重放或合成「发起 / 加入 / 退出」请求流，每个请求都按 booking/policy.py 中
+与线上视图相同的规则判断，统计牌桌利用率、成行率与等待时间，用来比较不同的规则参数：
+  * 时间轴为本地时间的分钟数（第 0 天 0 点为 0），请求与模拟中产生的事件按时间依次处理；
+  * 发起与加入请求由 requests_for() 按随机种子事先生成，与规则无关——同一种子下不同规则
+    面对完全相同的需求，结果的差异只来自规则本身；
+  * 成行时按桌号分配第一张空闲牌桌，与 ConflictDetector.suggest() 的规则相同；没有空闲牌桌时
+    对局照常成行但记为未落座；
+  * 清理任务每 cleanup_interval 分钟运行一次（与 Celery Beat 的清理任务一致）：取消创建超过
+    过期时长的匹配中预约，删除已结束仍未成行的预约；
+  * sweep() 把「规则 × 种子」的组合交给进程池并行运行。
+本模块只依赖标准库与 booking/policy.py、booking/printing.py，不导入 Django，子进程无需初始化 Django。
+"""
+import functools
+import heapq
+import math
+import random
+from bisect import bisect_left
+from collections import namedtuple
+from dataclasses import dataclass, fields
+
+from .policy import GAME_MINUTES, MINUTES_PER_DAY, SEATS, within_hours
+from .printing import render_in_pool
+
+CREATE = 'create'
+JOIN = 'join'
+LEAVE = 'leave'
+CLEANUP = 'cleanup'
+
+# 发起预约时开始时间取整到的分钟数
+START_STEP = 15
+# 请求流结束后继续模拟的时长，让最后发起的对局走完成行 / 过期流程
+DRAIN_MINUTES = MINUTES_PER_DAY
+
+# at：请求时间；player：玩家编号；start / games：发起的开始时间与半庄数（加入请求为 None）；
+# pick：加入请求在可加入对局中的选择位置（0~1 之间）
+Request = namedtuple('Request', 'at kind player start games pick')
+
+
+@dataclass(frozen=True)
+class StoreLayout:
+    tables: int
+    # 营业时间（当天第几分钟）；任一为 None 表示 24 小时营业
+    opening: float = None
+    closing: float = None
+
+    def within_hours(self, start, end):
+        return within_hours(self.opening, self.closing, start, end)
+
+    def open_minutes(self, days):
+        """days 天内每张牌桌的营业分钟数。"""
+        if self.opening is None or self.closing is None or self.opening == self.closing:
+            return days * MINUTES_PER_DAY
+        return days * ((self.closing - self.opening) % MINUTES_PER_DAY)
+
+
+@dataclass(frozen=True)
+class Workload:
+    days: int = 28
+    players: int = 150
+    # 平均每小时的发起 / 加入请求数；hourly 为一天 24 小时的相对强度，None 表示全天均匀
+    create_rate: float = 1.0
+    join_rate: float = 3.0
+    hourly: tuple = None
+    # 发起时距开始时间的平均分钟数（指数分布）与 1~4 个半庄的相对权重
+    lead_minutes: float = 240.0
+    games: tuple = (1, 3, 4, 2)
+    # 每次加入（含发起）后，该玩家在开始前尝试退出的概率
+    leave_rate: float = 0.1
+    cleanup_interval: int = 60
+
+
+@dataclass
+class SimulationResult:
+    created: float = 0            # 通过校验的发起请求
+    rejected_pending: float = 0   # 超出匹配中上限被拒绝的发起
+    rejected_overlap: float = 0   # 与自己已成行的对局时间重叠被拒绝的发起
+    joins: float = 0              # 成功加入
+    unmet_joins: float = 0        # 想加入但没有可加入的对局
+    left_pending: float = 0       # 从匹配中的对局退出
+    left_confirmed: float = 0     # 成行后在截止时间前退出（对局退回匹配中）
+    refused_leaves: float = 0     # 成行后已过截止时间、退出被拒绝
+    expired: float = 0            # 过期取消
+    abandoned: float = 0          # 无人留下或已结束仍未成行而被删除
+    confirmed: float = 0          # 最终成行
+    unseated: float = 0           # 成行时没有空闲牌桌
+    utilization: float = 0.0      # 成行对局占用的牌桌时间 / 营业时间内的牌桌时间
+    fill_rate: float = 0.0        # 最终成行 / 通过校验的发起
+    wait_mean: float = 0.0        # 玩家从发起或加入到对局成行的等待分钟数
+    wait_p50: float = 0.0
+    wait_p90: float = 0.0
+
+
+def average(results):
+    results = list(results)
+    return SimulationResult(**{
+        field.name: sum(getattr(result, field.name) for result in results) / len(results)
+        for field in fields(SimulationResult)
+    })
+
+
+def _poisson(rng, rate, hourly, horizon):
+    """按小时强度变化的泊松过程（稀疏法）：依次返回 [0, horizon) 内的到达时间。"""
+    if rate <= 0:
+        return
+    weights = hourly or (1,) * 24
+    peak = max(weights)
+    peak_rate = rate * peak / (sum(weights) / len(weights)) / 60
+    at = 0.0
+    while True:
+        at += rng.expovariate(peak_rate)
+        if at >= horizon:
+            return
+        if rng.random() * peak <= weights[int(at // 60) % len(weights)]:
+            yield at
+
+
+def requests_for(workload, layout, seed, create=True):
+    """按工作负载与种子生成请求流（按时间排序）。create=False 时只生成加入请求，用于重放历史发起。"""
+    rng = random.Random(seed)
+    horizon = workload.days * MINUTES_PER_DAY
+    requests = []
+    if create:
+        for at in _poisson(rng, workload.create_rate, workload.hourly, horizon):
+            games = rng.choices(range(1, len(workload.games) + 1), workload.games)[0]
+            # 玩家只会选择营业时间内的开始时间
+            for _ in range(10):
+                start = math.ceil((at + rng.expovariate(1 / workload.lead_minutes)) / START_STEP) * START_STEP
+                if layout.within_hours(start, start + games * GAME_MINUTES):
+                    requests.append(Request(at, CREATE, rng.randrange(workload.players), start, games, 0.0))
+                    break
+    for at in _poisson(rng, workload.join_rate, workload.hourly, horizon):
+        requests.append(Request(at, JOIN, rng.randrange(workload.players), None, None, rng.random()))
+    requests.sort(key=lambda request: request.at)
+    return requests
+
+
+class _Tables:
+    """每张牌桌上已占用的区间（按开始时间排序，互不重叠）。"""
+
+    def __init__(self, count):
+        self.starts = [[] for _ in range(count)]
+        self.ends = [[] for _ in range(count)]
+
+    def allocate(self, start, end):
+        """按桌号取第一张在 [start, end) 空闲的牌桌，返回其序号，没有时返回 None。"""
+        for index, starts in enumerate(self.starts):
+            position = bisect_left(starts, end)
+            # 开始早于 end 的区间中最后一个结束得最晚，它不与 [start, end) 重叠即整桌空闲
+            if position == 0 or self.ends[index][position - 1] <= start:
+                position = bisect_left(starts, start)
+                starts.insert(position, start)
+                self.ends[index].insert(position, end)
+                return index
+        return None
+
+    def release(self, index, start):
+        position = bisect_left(self.starts[index], start)
+        del self.starts[index][position]
+        del self.ends[index][position]
+
+
+class _Booking:
+    __slots__ = ('creator', 'start', 'end', 'created', 'status', 'players', 'joined', 'table', 'confirmed_at')
+
+    def __init__(self, creator, start, end, created):
+        self.creator = creator
+        self.start = start
+        self.end = end
+        self.created = created
+        self.status = 'PENDING'
+        self.players = [creator]
+        self.joined = [created]
+        self.table = None
+        self.confirmed_at = None
+
+
+class Simulation:
+    """一次模拟运行：按时间处理请求与事件，run() 返回 SimulationResult。"""
+
+    def __init__(self, layout, workload, policy, seed=0):
+        self.layout = layout
+        self.workload = workload
+        self.policy = policy
+        self.rng = random.Random(seed)
+        self.tables = _Tables(layout.tables)
+        self.bookings = []
+        # 匹配中的对局（按发起顺序，对应「可加入的预约」列表）
+        self.pending = {}
+        # 玩家发起的匹配中对局、玩家参与的全部对局
+        self.created_by = {}
+        self.joined_by = {}
+        self.events = []
+        self.sequence = 0
+        self.result = SimulationResult()
+
+    def schedule(self, at, kind, booking=None, player=None):
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, kind, booking, player))
+
+    def run(self, requests):
+        horizon = self.workload.days * MINUTES_PER_DAY
+        end = horizon + DRAIN_MINUTES
+        for at in range(self.workload.cleanup_interval, end, self.workload.cleanup_interval):
+            self.schedule(at, CLEANUP)
+        requests = iter(requests)
+        request = next(requests, None)
+        while self.events or request is not None:
+            if request is not None and (not self.events or request.at < self.events[0][0]):
+                if request.kind == CREATE:
+                    self.create(request)
+                else:
+                    self.join(request)
+                request = next(requests, None)
+                continue
+            at, _, kind, booking, player = heapq.heappop(self.events)
+            if at > end:
+                break
+            if kind == LEAVE:
+                self.leave(at, booking, player)
+            else:
+                self.cleanup(at)
+        return self.summarize(horizon)
+
+    # --- 请求：与 booking/views.py 中的发起 / 加入 / 退出视图逐条对应 ---
+
+    def create(self, request):
+        now, player = request.at, request.player
+        mine = self.created_by.get(player, ())
+        if self.policy.pending_limit_reached(sum(1 for booking in mine if booking.end >= now)):
+            self.result.rejected_pending += 1
+            return
+        start, end = request.start, request.start + self.policy.duration_minutes(request.games)
+        try:
+            self.policy.check_request(start, end, request.games)
+        except ValueError:
+            return
+        if any(
+            booking.status == 'CONFIRMED' and booking.end > start and booking.start < end
+            for booking in self.joined_by.get(player, ())
+        ):
+            self.result.rejected_overlap += 1
+            return
+        booking = _Booking(player, start, end, now)
+        self.bookings.append(booking)
+        self._set_pending(booking)
+        self.joined_by.setdefault(player, set()).add(booking)
+        self.result.created += 1
+        self._maybe_leave(now, booking, player)
+
+    def join(self, request):
+        now, player = request.at, request.player
+        candidates = [
+            booking for booking in self.pending.values()
+            if booking.end >= now and len(booking.players) < SEATS and player not in booking.players
+        ]
+        if not candidates:
+            self.result.unmet_joins += 1
+            return
+        booking = candidates[int(request.pick * len(candidates))]
+        booking.players.append(player)
+        booking.joined.append(now)
+        self.joined_by.setdefault(player, set()).add(booking)
+        self.result.joins += 1
+        if len(booking.players) == SEATS:
+            self._confirm(now, booking)
+        self._maybe_leave(now, booking, player)
+
+    def leave(self, now, booking, player):
+        if player not in booking.players or booking.status == 'CANCELED':
+            return
+        if booking.status == 'PENDING':
+            self._remove_player(booking, player)
+            self.result.left_pending += 1
+            if not booking.players:
+                self._discard(booking)
+                self.result.abandoned += 1
+            return
+        if not self.policy.can_leave_confirmed(booking.start - now):
+            self.result.refused_leaves += 1
+            return
+        self._remove_player(booking, player)
+        # 与视图一致：状态退回匹配中，已分配的牌桌保留
+        booking.confirmed_at = None
+        self._set_pending(booking)
+        self.result.left_confirmed += 1
+
+    def cleanup(self, now):
+        """与 booking/tasks.py 的 cleanup_expired_bookings 相同：先取消过期的，再删除已结束的。"""
+        expired_before = now - self.policy.expiry_minutes
+        for booking in list(self.pending.values()):
+            if booking.created < expired_before:
+                self._discard(booking)
+                self.result.expired += 1
+            elif booking.end < now:
+                self._discard(booking)
+                self.result.abandoned += 1
+
+    # --- 内部状态 ---
+
+    def _maybe_leave(self, now, booking, player):
+        if now < booking.start and self.rng.random() < self.workload.leave_rate:
+            self.schedule(self.rng.uniform(now, booking.start), LEAVE, booking, player)
+
+    def _set_pending(self, booking):
+        booking.status = 'PENDING'
+        self.pending[id(booking)] = booking
+        self.created_by.setdefault(booking.creator, set()).add(booking)
+
+    def _unset_pending(self, booking):
+        self.pending.pop(id(booking), None)
+        self.created_by.get(booking.creator, set()).discard(booking)
+
+    def _confirm(self, now, booking):
+        self._unset_pending(booking)
+        booking.status = 'CONFIRMED'
+        booking.confirmed_at = now
+        if booking.table is None:
+            booking.table = self.tables.allocate(booking.start, booking.end)
+            if booking.table is None:
+                self.result.unseated += 1
+
+    def _remove_player(self, booking, player):
+        index = booking.players.index(player)
+        del booking.players[index]
+        del booking.joined[index]
+        self.joined_by[player].discard(booking)
+
+    def _discard(self, booking):
+        self._unset_pending(booking)
+        booking.status = 'CANCELED'
+        for player in booking.players:
+            self.joined_by[player].discard(booking)
+        if booking.table is not None:
+            self.tables.release(booking.table, booking.start)
+            booking.table = None
+
+    def summarize(self, horizon):
+        result = self.result
+        counted = [booking for booking in self.bookings if booking.start < horizon]
+        played = [booking for booking in counted if booking.status == 'CONFIRMED']
+        result.confirmed = len(played)
+        result.fill_rate = len(played) / len(counted) if counted else 0.0
+        capacity = self.layout.tables * self.layout.open_minutes(self.workload.days)
+        busy = sum(min(booking.end, horizon) - booking.start for booking in played if booking.table is not None)
+        result.utilization = busy / capacity if capacity else 0.0
+        waits = sorted(
+            booking.confirmed_at - joined for booking in played for joined in booking.joined
+        )
+        if waits:
+            result.wait_mean = sum(waits) / len(waits)
+            result.wait_p50 = waits[len(waits) // 2]
+            result.wait_p90 = waits[min(int(len(waits) * 0.9), len(waits) - 1)]
+        return result
+
+
+def simulate(layout, workload, policy, seed=0, requests=None):
+    """运行一次模拟。requests 为 None 时按种子合成请求流。"""
+    if requests is None:
+        requests = requests_for(workload, layout, seed)
+    return Simulation(layout, workload, policy, seed).run(requests)
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_requests(workload, layout, seed):
+    return requests_for(workload, layout, seed)
+
+
+def _simulate_task(task):
+    layout, workload, policy, seed, requests = task
+    # 同一进程内的各组规则共用同一种子的请求流，只生成一次
+    if requests is None:
+        requests = _cached_requests(workload, layout, seed)
+    return simulate(layout, workload, policy, seed, requests)
+
+
+def sweep(layout, workload, policies, seeds=(0,), workers=1, requests=None):
+    """
+    对每条规则在每个种子下各模拟一次，返回与 policies 顺序一致的 [(规则, 各种子的平均结果)]。
+    requests 为 {种子: 请求流}（例如重放的历史发起），未给出的种子在子进程中按种子合成。
+    """
+    policies = list(policies)
+    seeds = list(seeds)
+    requests = requests or {}
+    tasks = [
+        (layout, workload, policy, seed, requests.get(seed))
+        for policy in policies for seed in seeds
+    ]
+    results = list(render_in_pool(_simulate_task, tasks, workers))
+    return [
+        (policy, average(results[index * len(seeds):(index + 1) * len(seeds)]))
+        for index, policy in enumerate(policies)
+    ]
@@ -1,12 +1,18 @@
 # booking/tasks.py
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from .models import Booking
+from .caching import bump_versions
+from . import changes, history
+from .conflicts import conflict_report
+from .policy import BookingPolicy
+from notifications import outbox
 
 @shared_task
 def cleanup_expired_bookings():
-    expiration_time = timezone.now() - timedelta(hours=24)
+    expiration_time = timezone.now() - timedelta(minutes=BookingPolicy.current().expiry_minutes)
     
     expired_bookings = Booking.objects.filter(
         status='PENDING',
@@ -15,7 +21,20 @@ def cleanup_expired_bookings():
     
     count = expired_bookings.count()
     if count > 0:
-        expired_bookings.update(status='CANCELED')
+        with transaction.atomic():
+            bookings = list(expired_bookings)
+            expired_bookings.filter(pk__in=[booking.pk for booking in bookings]).update(
+                status='CANCELED', updated_at=timezone.now(),
+            )
+            outbox.bookings_expired(bookings)
+            history.record_many(bookings, 'CANCELED', reason='expired')
+            changes.record_bookings(bookings)
+        # update() 不触发信号，手动让页面缓存与日历订阅失效（变更订阅已在事务中记录）
+        bump_versions(
+            [booking.store_id for booking in bookings],
+            [booking.table_id for booking in bookings],
+            [user_id for booking in bookings for user_id in booking.participant_ids],
+        )
     
     # 自动删除已结束但未成行的记录
     auto_deleted = Booking.objects.filter(
@@ -24,8 +43,52 @@ def cleanup_expired_bookings():
     )
     deleted_count = auto_deleted.count()
     if deleted_count:
-        auto_deleted.delete()
+        with transaction.atomic():
+            history.record_many(list(auto_deleted.only('pk', 'store_id')), 'DELETED', reason='unfilled')
+            auto_deleted.delete()
     
     if count or deleted_count:
         return f"标记过期 {count} 条，删除已截止未成行 {deleted_count} 条。"
     return "没有发现需要清理的预约。"
+
+
+@shared_task
+def check_booking_conflicts(days=7):
+    """每晚检查未来几天的对局冲突，结果写入任务返回值，详细列表可用 manage.py check_conflicts 查看。"""
+    start = timezone.now()
+    report = conflict_report(start, start + timedelta(days=days))
+    if not report:
+        return "没有发现对局冲突。"
+    counts = {}
+    for conflict in report:
+        counts[conflict.label] = counts.get(conflict.label, 0) + 1
+    return "发现对局冲突：" + "，".join(f"{label} {count} 个" for label, count in counts.items())
+
+
+@shared_task
+def archive_completed_bookings():
+    """每晚把已结束的成行对局追加到列式归档（见 booking/archive.py），由 Celery Beat 触发。"""
+    from .archive import archive_completed
+
+    stats = archive_completed()
+    return (
+        f"归档 {stats['rows']} 条对局（截至 {timezone.localtime(stats['archived_until']):%Y-%m-%d %H:%M}），"
+        f"合并 {stats['merged']} 个段。"
+    )
+
+
+@shared_task
+def snapshot_booking_history():
+    """每晚为各门店生成对局状态快照（见 booking/history.py），重建历史状态时只需重放快照之后的事件。"""
+    count = history.take_snapshots()
+    return f"已生成 {count} 个门店的对局状态快照。"
+
+
+@shared_task
+def compact_change_feed():
+    """每晚压缩变更订阅（见 booking/changes.py），由 Celery Beat 触发。"""
+    result = changes.compact()
+    return (
+        f"补写 {result['baseline']} 条，删除被覆盖的变更 {result['superseded']} 条、"
+        f"过期的删除记录 {result['tombstones']} 条。"
+    )
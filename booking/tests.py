@@ -1,3 +1,862 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+    skipUnlessDBFeature,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from . import (
+    archive, bulk, changes, db_routing, exports, history, ical, metadata, occupancy, printing, ratelimit,
+    schedule, simulation,
+)
+from .caching import bump_versions, get_table_versions, get_user_version, get_version
+from .conflicts import DOUBLE_BOOKING, OUT_OF_HOURS, WRONG_STORE, ConflictDetector
+from .models import Booking, BookingEvent, BookingSnapshot, MahjongTable, Store
+from .policy import BookingPolicy
+
+# 测试不依赖 Redis：缓存改用进程内的 LocMemCache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# 测试中创建的用户很多，用最快的密码哈希
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+# 读查询都走主库：SQLite 的“副本”镜像是另一个连接，看不到测试事务中未提交的数据
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS)
+class BookingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name="测试门店", address="地址")
+        self.table = MahjongTable.objects.create(store=self.store, table_number="1")
+        self.users = [
+            CustomUser.objects.create_user(f"player{i}", password='pw', display_name=f"玩家{i}") for i in range(5)
+        ]
+        self.start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+
+    def make_booking(self, participants, status='PENDING', start=None, hours=3, table=None):
+        start = start or self.start
+        # 版本号在事务提交后递增，测试中手动执行提交回调
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                creator=participants[0], store=self.store, table=table, status=status,
+                start_time=start, end_time=start + datetime.timedelta(hours=hours), num_games=4,
+            )
+            booking.participants.add(*participants)
+        booking.refresh_from_db()
+        return booking
+
+
+class ConditionalGetTests(BookingTestCase):
+    def test_unchanged_page_returns_304(self):
+        url = reverse('list_pending_bookings')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_write_changes_etag(self):
+        url = reverse('list_pending_bookings')
+        etag = self.client.get(url)['ETag']
+        self.make_booking(self.users[:1])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_message_is_not_swallowed_by_304(self):
+        # 加入已满的对局不写数据库、版本号不变，只留下一条提示并重定向到列表页
+        full = self.make_booking(self.users[:4])
+        self.client.force_login(self.users[4])
+        url = reverse('list_pending_bookings')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.post(reverse('join_booking', args=[full.id]))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "该对局人数已满")
+        self.assertFalse(response.has_header('ETag'))
+
+        # 提示显示过之后恢复条件请求
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class VersionBumpTests(BookingTestCase):
+    def test_versions_bump_after_commit(self):
+        store_version = get_version(self.store.id)
+        table_version = get_table_versions([self.table.id])[self.table.id]
+        user_version = get_user_version(self.users[0].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                booking = Booking.objects.create(
+                    creator=self.users[0], store=self.store, table=self.table, start_time=self.start,
+                    end_time=self.start + datetime.timedelta(hours=3), num_games=4,
+                )
+                booking.participants.add(self.users[1])
+                # 提交前读到的仍是旧版本号，并发读请求不会把未提交的数据存到新版本号下
+                self.assertEqual(get_version(self.store.id), store_version)
+        self.assertGreater(get_version(self.store.id), store_version)
+        self.assertGreater(get_table_versions([self.table.id])[self.table.id], table_version)
+        self.assertGreater(get_user_version(self.users[0].id), user_version)
+
+    def test_rolled_back_write_does_not_bump(self):
+        store_version = get_version(self.store.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Booking.objects.create(
+                    creator=self.users[0], store=self.store, start_time=self.start,
+                    end_time=self.start + datetime.timedelta(hours=3), num_games=4,
+                )
+                raise RuntimeError
+        self.assertEqual(get_version(self.store.id), store_version)
+
+
+class FragmentCacheTests(BookingTestCase):
+    def test_table_card_rerenders_only_after_its_version_bump(self):
+        other = MahjongTable.objects.create(store=self.store, table_number="2")
+        start = timezone.now().replace(microsecond=0) - datetime.timedelta(hours=1)
+        first = self.make_booking(self.users[:4], 'CONFIRMED', start, table=self.table)
+        second = self.make_booking(self.users[1:5], 'CONFIRMED', start, table=other)
+        url = reverse('store_status')
+        response = self.client.get(url)
+        self.assertContains(response, "玩家0, 玩家1")
+        self.assertContains(response, "玩家1, 玩家2")
+
+        # update() 不触发信号、版本号不变：两张牌桌的卡片都命中片段缓存
+        Booking.objects.filter(pk=first.pk).update(participant_names=["改名甲"])
+        Booking.objects.filter(pk=second.pk).update(participant_names=["改名乙"])
+        response = self.client.get(url)
+        self.assertContains(response, "玩家0, 玩家1")
+        self.assertNotContains(response, "改名甲")
+
+        # 只递增第一张牌桌的版本号：只有它的卡片重新渲染
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions([], [self.table.id])
+        response = self.client.get(url)
+        self.assertContains(response, "改名甲")
+        self.assertNotContains(response, "玩家0, 玩家1")
+        self.assertContains(response, "玩家1, 玩家2")
+        self.assertNotContains(response, "改名乙")
+
+
+class RosterTests(BookingTestCase):
+    def roster(self, booking):
+        booking.refresh_from_db()
+        return booking.participant_ids, booking.participant_names, booking.participant_count
+
+    def test_roster_follows_participants_and_renames(self):
+        u = self.users
+        booking = self.make_booking(u[:2])
+        other = self.make_booking(u[1:3], start=self.start + datetime.timedelta(hours=4))
+        self.assertEqual(self.roster(booking), ([u[0].id, u[1].id], ["玩家0", "玩家1"], 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.participants.remove(u[0])
+            # 从用户一侧加入，名单按加入顺序
+            u[3].joined_bookings.add(booking)
+        self.assertEqual(self.roster(booking), ([u[1].id, u[3].id], ["玩家1", "玩家3"], 2))
+
+        # 改名：所在的全部对局名单都更新；清空显示名时显示用户名
+        u[1].display_name = "新名字"
+        with self.captureOnCommitCallbacks(execute=True):
+            u[1].save()
+        self.assertEqual(self.roster(booking)[1], ["新名字", "玩家3"])
+        self.assertEqual(self.roster(other)[1], ["新名字", "玩家2"])
+        u[3].display_name = ""
+        with self.captureOnCommitCallbacks(execute=True):
+            u[3].save()
+        self.assertEqual(self.roster(booking)[1], ["新名字", "player3"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            u[1].joined_bookings.clear()
+        self.assertEqual(self.roster(booking), ([u[3].id], ["player3"], 1))
+        self.assertEqual(self.roster(other), ([u[2].id], ["玩家2"], 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.participants.clear()
+        self.assertEqual(self.roster(booking), ([], [], 0))
+
+
+@override_settings(BOOKING_READ_REPLICA='default')
+class ReplicaRoutingTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+
+        @db_routing.read_replica
+        def view(request):
+            return HttpResponse(str(db_routing._replica_reads.get()))
+
+        self.view = view
+        self.request = RequestFactory().get('/')
+        self.request.db_pinned = False
+
+    def test_reads_primary_while_replica_may_lag(self):
+        self.assertEqual(self.view(self.request).content, b'True')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions([self.store.id])
+        # 写入提交后的窗口内，新版本号下缓存的内容只能来自主库
+        self.assertEqual(self.view(self.request).content, b'False')
+
+    def test_pinned_client_reads_primary(self):
+        self.request.db_pinned = True
+        self.assertEqual(self.view(self.request).content, b'False')
+
+
+@override_settings(BOOKING_CHANGE_FEED_TOKENS={'cashier': 'secret'})
+class ChangeFeedOffsetTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        # 检查 CSRF：令牌请求不带 Cookie，应当不受影响
+        self.client = Client(enforce_csrf_checks=True)
+        self.url = reverse('change_feed')
+        self.auth = {'HTTP_AUTHORIZATION': 'Bearer secret'}
+        self.make_booking(self.users[:2])
+
+    def test_get_does_not_move_offset(self):
+        response = self.client.get(self.url, {'after': 0}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        last = response.json()['next']
+        self.assertGreater(last, 0)
+        self.client.get(self.url, {'after': last}, **self.auth)
+        self.assertEqual(changes.offset('cashier'), 0)
+
+    def test_post_commits_own_consumer(self):
+        last = self.client.get(self.url, **self.auth).json()['next']
+        # 令牌请求忽略 consumer 参数，只能提交自己的偏移量
+        response = self.client.post(self.url, {'offset': last, 'consumer': 'finance'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(changes.offset('cashier'), last)
+        self.assertEqual(changes.offset('finance'), 0)
+        # 省略 after 时从提交的位置继续
+        self.assertEqual(self.client.get(self.url, **self.auth).json()['changes'], [])
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.post(self.url, {'offset': 1}, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_commit_requires_csrf(self):
+        staff = self.users[0]
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(self.url, {'consumer': 'finance', 'after': 5}).status_code, 200)
+        self.assertEqual(changes.offset('finance'), 0)
+        response = self.client.post(self.url, {'consumer': 'finance', 'offset': 1})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(changes.offset('finance'), 0)
+
+
+class StoreDirectoryTests(BookingTestCase):
+    def test_other_process_sees_new_store(self):
+        stale = metadata.store_directory()
+        with self.captureOnCommitCallbacks(execute=True):
+            store = Store.objects.create(name="新门店", address="地址")
+        # 模拟其他进程：共享缓存中的版本号已递增，但本进程仍持有旧快照
+        metadata._cache.set(metadata.DIRECTORY_KEY, stale)
+        self.assertIsNone(stale.get(store.id))
+        self.assertEqual(metadata.get_store(store.id), store)
+
+
+class StoreScheduleTests(SimpleTestCase):
+    def setUp(self):
+        codes = schedule.STATUS_CODES
+        pending, confirmed, canceled = codes['PENDING'], codes['CONFIRMED'], codes['CANCELED']
+        # (对局ID, 牌桌ID, 开始分钟, 结束分钟, 状态)，按开始时间排序；对局 5 很长，查询时需要往前多看
+        self.schedule = schedule.StoreSchedule(1, 0, 2000, [
+            (5, 13, 0, 1000, confirmed),
+            (4, 12, 50, 400, canceled),
+            (1, 10, 100, 200, confirmed),
+            (3, schedule.NO_TABLE, 150, 250, pending),
+            (2, 11, 200, 300, confirmed),
+        ])
+
+    def ids(self, start, end, statuses=schedule.CONFIRMED):
+        return [interval.booking_id for interval in self.schedule.overlapping(start, end, statuses)]
+
+    def test_touching_intervals_do_not_overlap(self):
+        self.assertEqual(self.ids(100, 200), [5, 1])
+        self.assertEqual(self.ids(200, 300), [5, 2])
+        self.assertEqual(self.ids(199, 201), [5, 1, 2])
+        self.assertEqual(self.ids(300, 400), [5])
+        self.assertEqual(self.ids(1000, 1100), [])
+        self.assertEqual(self.ids(999, 1000), [5])
+        self.assertEqual(self.ids(240, 260, schedule.ACTIVE), [5, 3, 2])
+
+    def test_occupied_tables_at_boundaries(self):
+        occupied = self.schedule.occupied_table_ids
+        self.assertEqual(occupied(200, 300), {11, 13})
+        self.assertEqual(occupied(150, 200), {10, 13})
+        self.assertEqual(occupied(150, 200, exclude=1), {13})
+        self.assertEqual(occupied(1000, 1200), set())
+        # 已取消的对局不占桌，未分配牌桌的对局不计入
+        self.assertEqual(occupied(50, 100), {13})
+        self.assertEqual(self.schedule.booking_ids_by_table(150, 250), {13: [5], 10: [1], 11: [2]})
+
+
+class ScheduleExportTests(BookingTestCase):
+    def test_workbook_has_one_sheet_per_store_day(self):
+        from openpyxl import load_workbook
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_store = Store.objects.create(name="门店B", address="地址")
+            other_table = MahjongTable.objects.create(store=other_store, table_number="B1")
+        day = timezone.localdate() + datetime.timedelta(days=2)
+        next_day = day + datetime.timedelta(days=1)
+
+        def local(date, hour):
+            return timezone.make_aware(datetime.datetime.combine(date, datetime.time(hour)))
+
+        self.make_booking(self.users[:4], 'CONFIRMED', local(day, 10), 3, self.table)
+        # 跨午夜、未分配牌桌的对局在两天的课表中都出现
+        self.make_booking(self.users[4:], start=local(day, 23), hours=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                creator=self.users[0], store=other_store, table=other_table, status='CONFIRMED', num_games=1,
+                start_time=local(next_day, 15), end_time=local(next_day, 16), participant_names=["玩家0"],
+            )
+
+        response = exports.export_schedule_xlsx(Booking.objects.all(), local(day, 0), local(next_day, 0))
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, [
+            f"{day:%m%d}-测试门店", f"{next_day:%m%d}-测试门店", f"{next_day:%m%d}-门店B",
+        ])
+
+        rows = list(workbook[f"{day:%m%d}-测试门店"].iter_rows(values_only=True))
+        self.assertEqual(len(rows), 2 + 24)
+        self.assertEqual(rows[0][:8], ("表号", "1", None, None, None, None, None, "未分配"))
+        self.assertEqual(rows[1][:7], ("时间", "起止时间", "半庄数", "参与者1", "参与者2", "参与者3", "参与者4"))
+        self.assertEqual(rows[2 + 10][:7], ("10:00 - 11:00", "10:00 - 13:00", "4", "玩家0", "玩家1", "玩家2", "玩家3"))
+        self.assertEqual(rows[2 + 23][7:10], ("23:00 - 01:00", "4", "玩家4"))
+
+        rows = list(workbook[f"{next_day:%m%d}-测试门店"].iter_rows(values_only=True))
+        # 前一天开始的对局放在 0 点
+        self.assertEqual(rows[2][7:10], ("23:00 - 01:00", "4", "玩家4"))
+        self.assertTrue(all(value is None for row in rows[3:] for value in row[1:]))
+        rows = list(workbook[f"{next_day:%m%d}-门店B"].iter_rows(values_only=True))
+        self.assertEqual(rows[0][:2], ("表号", "B1"))
+        self.assertEqual(rows[2 + 15][1:4], ("15:00 - 16:00", "1", "玩家0"))
+
+
+class PrintPoolTests(SimpleTestCase):
+    def sheets(self, count):
+        day = datetime.date(2025, 3, 1)
+        for index in range(count):
+            cells = [[[] for _ in range(3)] for _ in range(24)]
+            cells[10 + index % 8][index % 3].append(("10:00 - 13:00", 4, (f"玩家{index}", "玩家<b>", "", "张三")))
+            cells[20][0].append(("20:00 - 23:30", None, ("李四",)))
+            yield printing.ScheduleSheet(
+                day + datetime.timedelta(days=index), f"门店{index % 2}", ["1", "2", "未分配"], cells,
+            )
+
+    def test_pool_output_matches_in_process(self):
+        for render in (printing.render_html_sheet, printing.render_pdf_sheet):
+            expected = [render(sheet) for sheet in self.sheets(20)]
+            self.assertEqual(list(printing.render_in_pool(render, self.sheets(20), 2)), expected)
+
+        html_outputs, pdf_outputs = [], []
+        for workers in (1, 2):
+            output = io.BytesIO()
+            printing.write_html(self.sheets(20), output, "课表", workers=workers)
+            html_outputs.append(output.getvalue())
+            output = io.BytesIO()
+            printing.write_pdf(self.sheets(20), output, workers=workers)
+            pdf_outputs.append(output.getvalue())
+        self.assertEqual(html_outputs[0], html_outputs[1])
+        self.assertEqual(pdf_outputs[0], pdf_outputs[1])
+
+    def test_pool_reads_sheets_lazily(self):
+        pulled = []
+
+        def sheets():
+            for sheet in self.sheets(60):
+                pulled.append(sheet)
+                yield sheet
+
+        results = printing.render_in_pool(printing.render_html_sheet, sheets(), 2)
+        next(results)
+        # 同时提交的任务数有上限，不会先把输入全部读完
+        self.assertLessEqual(len(pulled), 2 * printing.POOL_TASKS_PER_WORKER * printing.POOL_CHUNK_SIZE)
+        self.assertEqual(len(list(results)), 59)
+        self.assertEqual(len(pulled), 60)
+
+
+class ConflictDetectorTests(BookingTestCase):
+    def proposal(self, start, hours=3, table=None, pk=None):
+        return Booking(
+            pk=pk, store_id=self.store.id, table_id=(table or self.table).id,
+            start_time=start, end_time=start + datetime.timedelta(hours=hours),
+        )
+
+    def kinds(self, conflicts):
+        return [[conflict.kind for conflict in found] for found in conflicts]
+
+    def test_overlap_with_existing_booking(self):
+        existing = self.make_booking(self.users[:1], status='CONFIRMED', table=self.table)
+        later = self.start + datetime.timedelta(hours=4)
+        proposals = [self.proposal(self.start + datetime.timedelta(hours=1)), self.proposal(later)]
+        detector = ConflictDetector.for_range(self.start, later + datetime.timedelta(hours=3))
+        found = detector.validate(proposals)
+        self.assertEqual(self.kinds(found), [[DOUBLE_BOOKING], []])
+        self.assertEqual(found[0][0].other_booking_id, existing.id)
+
+    def test_overlap_within_batch(self):
+        detector = ConflictDetector.for_range(self.start, self.start + datetime.timedelta(hours=5))
+        found = detector.validate([self.proposal(self.start), self.proposal(self.start + datetime.timedelta(hours=2))])
+        self.assertEqual(self.kinds(found), [[], [DOUBLE_BOOKING]])
+
+    def test_rescheduled_booking_ignores_its_old_interval(self):
+        existing = self.make_booking(self.users[:1], status='CONFIRMED', table=self.table)
+        detector = ConflictDetector.for_range(self.start, self.start + datetime.timedelta(hours=4))
+        moved = self.proposal(self.start + datetime.timedelta(hours=1), pk=existing.id)
+        self.assertEqual(self.kinds(detector.validate([moved])), [[]])
+
+    def test_wrong_store_and_opening_hours(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other_store = Store.objects.create(name="其他门店", address="地址")
+            other_table = MahjongTable.objects.create(store=other_store, table_number="1")
+            self.store.opening_time = datetime.time(10)
+            self.store.closing_time = datetime.time(22)
+            self.store.save()
+        day = timezone.localtime(self.start).replace(hour=0, minute=0, second=0)
+        detector = ConflictDetector.for_range(day, day + datetime.timedelta(days=1))
+        found = detector.validate([
+            self.proposal(day.replace(hour=12), table=other_table),
+            self.proposal(day.replace(hour=20)),
+        ])
+        self.assertEqual(self.kinds(found), [[WRONG_STORE], [OUT_OF_HOURS]])
+
+    def test_suggest_skips_busy_tables(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            second = MahjongTable.objects.create(store=self.store, table_number="2")
+        self.make_booking(self.users[:1], status='CONFIRMED', table=self.table)
+        detector = ConflictDetector.for_range(self.start, self.start + datetime.timedelta(hours=6))
+        proposals = [
+            Booking(store_id=self.store.id, start_time=self.start, end_time=self.start + datetime.timedelta(hours=3)),
+            Booking(store_id=self.store.id, start_time=self.start, end_time=self.start + datetime.timedelta(hours=3)),
+        ]
+        self.assertEqual(detector.suggest(proposals), [second.id, None])
+
+
+class BulkOperationTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second = MahjongTable.objects.create(store=self.store, table_number="2")
+
+    def test_shift_is_all_or_nothing(self):
+        first = self.make_booking(self.users[:1], table=self.table)
+        blocker = self.make_booking(self.users[1:2], table=self.table, start=self.start + datetime.timedelta(hours=4))
+        other = self.make_booking(self.users[2:3], table=self.second)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = bulk.shift_bookings(
+                Booking.objects.filter(pk__in=[first.pk, other.pk]), datetime.timedelta(hours=2),
+            )
+        self.assertEqual(result.applied, [])
+        self.assertEqual([(booking.pk, other_id) for booking, _, other_id in result.skipped], [(first.pk, blocker.pk)])
+        # 没有冲突的对局也不移动
+        for booking in (first, other):
+            self.assertEqual(Booking.objects.get(pk=booking.pk).start_time, self.start)
+
+    def test_shift_moves_selected_bookings_together(self):
+        # 两个对局同桌相邻，一起顺延时彼此不算冲突
+        first = self.make_booking(self.users[:1], table=self.table)
+        second = self.make_booking(self.users[1:2], table=self.table, start=self.start + datetime.timedelta(hours=3))
+        with self.captureOnCommitCallbacks(execute=True):
+            result = bulk.shift_bookings(
+                Booking.objects.filter(pk__in=[first.pk, second.pk]), datetime.timedelta(hours=2),
+            )
+        self.assertEqual(len(result.applied), 2)
+        self.assertEqual(Booking.objects.get(pk=first.pk).start_time, self.start + datetime.timedelta(hours=2))
+        self.assertEqual(Booking.objects.get(pk=second.pk).start_time, self.start + datetime.timedelta(hours=5))
+
+    def test_walk_ins_skip_occupied_tables(self):
+        occupied = self.make_booking(self.users[:1], status='CONFIRMED', table=self.table)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = bulk.open_walk_ins([self.table, self.second], self.users[4], start=self.start)
+        self.assertEqual([booking.table_id for booking in result.applied], [self.second.id])
+        self.assertEqual([(table, other_id) for table, _, other_id in result.skipped], [(self.table, occupied.pk)])
+        self.assertEqual(Booking.objects.filter(table=self.second, status='CONFIRMED').count(), 1)
+
+    def test_walk_ins_lock_tables_before_checking(self):
+        locked = []
+        for_range = ConflictDetector.for_range.__func__
+
+        def checking_for_range(cls, *args, **kwargs):
+            # 校验发生在锁定牌桌之后，且与写入在同一个事务中
+            self.assertEqual(locked, [{self.table.id, self.second.id}])
+            self.assertTrue(connection.in_atomic_block)
+            return for_range(cls, *args, **kwargs)
+
+        with mock.patch.object(bulk, 'lock_tables', lambda ids: locked.append(set(ids))), \
+                mock.patch.object(ConflictDetector, 'for_range', classmethod(checking_for_range)), \
+                self.captureOnCommitCallbacks(execute=True):
+            result = bulk.open_walk_ins([self.table, self.second], self.users[4], start=self.start)
+        self.assertEqual(len(result.applied), 2)
+
+
+# 需要行锁（PostgreSQL）：两个请求真正并发地为同一张牌桌开散客局
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS)
+class WalkInRaceTests(TransactionTestCase):
+    def test_concurrent_walk_in_waits_for_table_lock(self):
+        store = Store.objects.create(name="测试门店", address="地址")
+        table = MahjongTable.objects.create(store=store, table_number="1")
+        creator = CustomUser.objects.create_user("staff", password='pw')
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        checked = threading.Event()
+        for_range = ConflictDetector.for_range.__func__
+
+        def pausing_for_range(cls, *args, **kwargs):
+            detector = for_range(cls, *args, **kwargs)
+            if threading.current_thread().name == 'first':
+                # 校验之后、写入之前，另一个请求尝试占用同一张牌桌
+                checked.set()
+                time.sleep(0.5)
+            return detector
+
+        results = {}
+
+        def run():
+            name = threading.current_thread().name
+            try:
+                if name == 'second':
+                    checked.wait(5)
+                results[name] = bulk.open_walk_ins([table], creator, start=start)
+            finally:
+                connection.close()
+
+        with mock.patch.object(ConflictDetector, 'for_range', classmethod(pausing_for_range)):
+            threads = [threading.Thread(target=run, name=name) for name in ('first', 'second')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+        self.assertEqual(Booking.objects.filter(table=table, status='CONFIRMED').count(), 1)
+        self.assertEqual(len(results['first'].applied), 1)
+        self.assertEqual(len(results['second'].applied), 0)
+
+
+@override_settings(BOOKING_RATE_LIMITS={'test': {'user': '3/m', 'ip': '5/m'}})
+class RateLimitTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+
+        @ratelimit.rate_limit('test')
+        def view(request):
+            return HttpResponse('ok')
+
+        self.view = view
+
+    def request(self, method='post', user_id=None, ip='10.0.0.1'):
+        request = getattr(RequestFactory(), method)('/', REMOTE_ADDR=ip)
+        request.session = {SESSION_KEY: str(user_id)} if user_id else {}
+        request.user = AnonymousUser()
+        return self.view(request)
+
+    def test_limit_returns_429_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.request(user_id=1).status_code, 200)
+        response = self.request(user_id=1)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_get_is_not_limited(self):
+        for _ in range(10):
+            self.assertEqual(self.request('get', user_id=1).status_code, 200)
+        self.assertEqual(self.request(user_id=1).status_code, 200)
+
+    def test_user_and_ip_buckets_are_independent(self):
+        for _ in range(3):
+            self.request(user_id=1)
+        # 用户桶已空：换 IP 也被拒绝，同一 IP 的其他用户不受影响
+        self.assertEqual(self.request(user_id=1, ip='10.0.0.2').status_code, 429)
+        self.assertEqual(self.request(user_id=2).status_code, 200)
+        # IP 桶按地址计数，与用户无关：10.0.0.1 已放行 4 次（容量 5），还剩 1 次
+        self.assertEqual(self.request(ip='10.0.0.1').status_code, 200)
+        self.assertEqual(self.request(ip='10.0.0.1').status_code, 429)
+        self.assertEqual(self.request(ip='10.0.0.3').status_code, 200)
+
+    def test_bucket_resets_when_tat_is_in_the_past(self):
+        capacity, interval = ratelimit.parse_rate('3/m')
+        key = f"{ratelimit.KEY_PREFIX}reset"
+        now_us = 1_000_000_000_000
+        cache.set(key, now_us - 3600 * 1_000_000)
+        self.assertEqual(ratelimit.hit(key, '3/m', now_us=now_us), 0)
+        self.assertEqual(cache.get(key), now_us + interval)
+        for _ in range(capacity - 1):
+            self.assertEqual(ratelimit.hit(key, '3/m', now_us=now_us), 0)
+        self.assertGreater(ratelimit.hit(key, '3/m', now_us=now_us), 0)
+
+    def test_rejected_hit_is_rolled_back(self):
+        capacity, interval = ratelimit.parse_rate('3/m')
+        key = f"{ratelimit.KEY_PREFIX}rollback"
+        now_us = 1_000_000_000_000
+        for _ in range(capacity):
+            ratelimit.hit(key, '3/m', now_us=now_us)
+        tat = cache.get(key)
+        self.assertAlmostEqual(ratelimit.hit(key, '3/m', now_us=now_us), interval / 1_000_000)
+        self.assertAlmostEqual(ratelimit.hit(key, '3/m', now_us=now_us), interval / 1_000_000)
+        self.assertEqual(cache.get(key), tat)
+        # 过一个令牌间隔后恢复一个令牌
+        self.assertEqual(ratelimit.hit(key, '3/m', now_us=now_us + interval), 0)
+
+
+class CalendarFeedTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = self.make_booking(self.users[:2], table=self.table)
+        self.url = reverse('user_calendar', args=[ical.user_token(self.users[0].id)])
+
+    def test_bad_token_returns_404(self):
+        token = ical.user_token(self.users[0].id)
+        self.assertEqual(self.client.get(reverse('user_calendar', args=[token + 'x'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('user_calendar', args=['forged'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('store_calendar', args=[self.store.id + 100])).status_code, 404)
+
+    def test_unchanged_feed_returns_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'UID:booking-{self.booking.id}@mahjong-booking')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_booking_change_changes_etag(self):
+        url = reverse('store_calendar', args=[self.store.id])
+        user_etag = self.client.get(self.url)['ETag']
+        store_etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.participants.add(self.users[2])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=user_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], user_etag)
+        self.assertContains(response, "玩家2")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=store_etag).status_code, 200)
+
+    def test_since_returns_cancelled_changes_only(self):
+        other = self.make_booking(self.users[:1], start=self.start + datetime.timedelta(hours=4))
+        since = timezone.now() - datetime.timedelta(minutes=1)
+        Booking.objects.filter(pk=other.pk).update(updated_at=since - datetime.timedelta(minutes=1))
+        self.booking.status = 'CANCELED'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.save()
+
+        response = self.client.get(self.url, {'since': int(since.timestamp())})
+        body = response.content.decode()
+        self.assertIn(f'UID:booking-{self.booking.id}@mahjong-booking', body)
+        self.assertIn('STATUS:CANCELLED', body)
+        self.assertNotIn(f'UID:booking-{other.id}@mahjong-booking', body)
+        self.assertTrue(response['X-Calendar-Sync'].isdigit())
+        # 完整同步不包含已取消的对局
+        body = self.client.get(self.url).content.decode()
+        self.assertNotIn(f'UID:booking-{self.booking.id}@mahjong-booking', body)
+        self.assertIn(f'UID:booking-{other.id}@mahjong-booking', body)
+
+    def test_fold_keeps_multibyte_characters(self):
+        line = 'SUMMARY:' + '麻将门店' * 20
+        folded = ical._fold(line)
+        parts = folded.split('\r\n ')
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in parts))
+        self.assertEqual(''.join(parts), line)
+        self.assertEqual(ical._fold('SUMMARY:短'), 'SUMMARY:短')
+
+
+@skipIf(occupancy.fcntl is None, "看板需要 fcntl")
+class OccupancyBoardTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = MahjongTable.objects.create(store=self.store, table_number="2")
+        self.now = timezone.now().replace(microsecond=0)
+        self.board = occupancy.OccupancyBoard.create(f"mahjong_occupancy_test_{os.getpid()}", self.other.id + 1)
+        self.addCleanup(self.board.unlink)
+        self.addCleanup(self.board.close)
+
+    def at(self, hours):
+        return int((self.now + datetime.timedelta(hours=hours)).timestamp())
+
+    def test_slots_round_trip_through_board(self):
+        playing = self.make_booking(self.users[:4], 'CONFIRMED', self.now - datetime.timedelta(hours=1), 2, self.table)
+        later = self.make_booking(self.users[:4], 'CONFIRMED', self.now + datetime.timedelta(hours=2), 2, self.table)
+        upcoming = self.make_booking(self.users[:4], 'CONFIRMED', self.now + datetime.timedelta(hours=3), 1, self.other)
+        # 未成行的对局不占桌
+        self.make_booking(self.users[:1], 'PENDING', self.now - datetime.timedelta(hours=1), 2, self.other)
+
+        slots = occupancy.load_slots(self.now)
+        self.assertEqual(slots, {
+            self.table.id: (playing.id, self.at(1), later.id, self.at(2)),
+            self.other.id: (0, 0, upcoming.id, self.at(3)),
+        })
+        self.board.write(slots, clear=True, reconciled_at=self.at(0))
+        self.assertEqual(self.board.reconciled_at, self.at(0))
+        table_slot, other_slot = self.board.read([self.table.id, self.other.id])
+        self.assertEqual((table_slot, other_slot), (slots[self.table.id], slots[self.other.id]))
+
+        # 两次校正之间按当前时间推算：当前对局结束后、下一个对局开始后的占用
+        self.assertEqual(occupancy._current(table_slot, self.at(0)), playing.id)
+        self.assertIsNone(occupancy._current(table_slot, self.at(1.5)))
+        self.assertEqual(occupancy._current(table_slot, self.at(2)), later.id)
+        self.assertIsNone(occupancy._current(other_slot, self.at(0)))
+        self.assertEqual(occupancy._current(other_slot, self.at(3)), upcoming.id)
+
+        # 按牌桌刷新：没有对局的牌桌写回空槽位
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.filter(table=self.other).delete()
+        self.board.write(occupancy.load_slots(self.now, [self.other.id]))
+        self.assertEqual(self.board.read([self.other.id]), [occupancy.EMPTY_SLOT])
+
+    def test_read_past_capacity_returns_none(self):
+        self.assertIsNone(self.board.read([self.table.id, self.other.id + 1]))
+        self.assertEqual(self.board.read([self.other.id]), [occupancy.EMPTY_SLOT])
+        # 超出容量的槽位写入时被忽略
+        self.board.write({self.other.id + 1: (1, 2, 3, 4)})
+        self.assertEqual(self.board.read([self.table.id]), [occupancy.EMPTY_SLOT])
+
+
+class ArchiveScanTests(SimpleTestCase):
+    def setUp(self):
+        import numpy as np
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        rng = np.random.default_rng(0)
+        january = int(datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+        self.batches = []
+        for batch, (count, days, width) in enumerate([(120, 31, 4), (80, 45, 5)]):
+            starts = january + rng.integers(0, days * 86400, count)
+            self.batches.append({
+                'id': np.arange(count) + batch * 1000 + 1,
+                'store': rng.integers(1, 4, count),
+                'table': rng.integers(0, 6, count),
+                'start': starts,
+                'end': starts + rng.integers(1, 6, count) * 3600,
+                'participants': rng.integers(1, 50, (count, width)),
+            })
+
+    def expected_ids(self, start, end, stores):
+        ids = set()
+        for batch in self.batches:
+            for index, booking_id in enumerate(batch['id']):
+                if batch['start'][index] < end and batch['end'][index] > start and batch['store'][index] in stores:
+                    ids.add(int(booking_id))
+        return ids
+
+    def test_scan_after_compact_returns_overlapping_rows(self):
+        import numpy as np
+
+        archive.append(self.batches[0], datetime.datetime(2025, 2, 1, tzinfo=datetime.timezone.utc), self.root)
+        archive.append(self.batches[1], datetime.datetime(2025, 3, 1, tzinfo=datetime.timezone.utc), self.root)
+        before = archive.BookingArchive(self.root)
+        self.assertEqual([segment.month for segment in before.segments], ['2025-01', '2025-01', '2025-02'])
+
+        merged = archive.compact(self.root, before=datetime.datetime(2025, 2, 15, tzinfo=datetime.timezone.utc))
+        self.assertEqual(merged, 2)
+        store = archive.BookingArchive(self.root)
+        self.assertEqual([segment.month for segment in store.segments], ['2025-01', '2025-02'])
+        self.assertEqual(len(store), 200)
+        january = store.segments[0]
+        self.assertTrue(np.all(np.diff(january.column('start')) >= 0))
+        self.assertEqual(january.column('participants').shape[1], 5)
+
+        windows = [
+            (datetime.datetime(2025, 1, 10, 12, tzinfo=datetime.timezone.utc), 3 * 86400, [1]),
+            (datetime.datetime(2025, 1, 30, 12, tzinfo=datetime.timezone.utc), 2 * 86400, [1, 2, 3]),
+            (datetime.datetime(2025, 2, 3, tzinfo=datetime.timezone.utc), 5 * 86400, [2, 3]),
+        ]
+        for start, seconds, stores in windows:
+            end = int(start.timestamp()) + seconds
+            rows = store.load(start, end, stores=stores)
+            ids = rows['id'].tolist()
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(set(ids), self.expected_ids(int(start.timestamp()), end, stores))
+            self.assertTrue(set(rows['store'].tolist()) <= set(stores))
+        # 范围之外没有数据的段直接跳过
+        self.assertEqual(store.segments_for(datetime.datetime(2025, 3, 10, tzinfo=datetime.timezone.utc)), [])
+
+
+class StoreHistoryTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.t0 = timezone.now().replace(microsecond=0) - datetime.timedelta(hours=10)
+
+    def at(self, hours):
+        return self.t0 + datetime.timedelta(hours=hours)
+
+    def event(self, booking, kind, hours, store_id=None, **data):
+        BookingEvent.objects.bulk_create([history._event(booking, kind, None, data, self.at(hours), store_id)])
+
+    def test_store_at_matches_with_and_without_snapshot(self):
+        other_store = Store.objects.create(name="另一家门店", address="地址")
+        first = self.make_booking(self.users[:1])
+        self.event(first, 'CREATED', 0)
+        second = self.make_booking(self.users[2:3], start=self.start + datetime.timedelta(hours=4))
+        self.event(second, 'CREATED', 1)
+        self.event(first, 'JOINED', 2, user=self.users[1].id)
+        # 快照时间为第 3 小时，之后的事件只在快照之上重放
+        third = self.make_booking(self.users[3:4], start=self.start + datetime.timedelta(hours=8))
+        self.event(third, 'CREATED', 4)
+        Booking.objects.filter(pk=first.pk).update(table=self.table)
+        first.refresh_from_db()
+        self.event(first, 'TABLE_ASSIGNED', 4)
+        self.event(first, 'CONFIRMED', 4)
+        self.event(third, 'CANCELED', 5, reason='test')
+        Booking.objects.filter(pk=second.pk).update(store=other_store)
+        second.refresh_from_db()
+        self.event(second, 'UPDATED', 6, changed=['store'])
+        self.event(second, 'UPDATED', 6, store_id=self.store.id, changed=['store'])
+
+        moments = [self.at(hours) for hours in (0.5, 2.5, 3, 4.5, 5.5, 7)]
+        store_ids = [self.store.id, other_store.id]
+        replayed = {(store_id, at): history.store_at(store_id, at) for store_id in store_ids for at in moments}
+
+        self.assertEqual(set(replayed[self.store.id, self.at(0.5)]), {first.id})
+        self.assertEqual(
+            replayed[self.store.id, self.at(2.5)][first.id]['participants'], [self.users[0].id, self.users[1].id],
+        )
+        self.assertEqual(replayed[self.store.id, self.at(4.5)][first.id]['status'], 'CONFIRMED')
+        self.assertEqual(replayed[self.store.id, self.at(4.5)][first.id]['table'], self.table.id)
+        self.assertEqual(replayed[self.store.id, self.at(5.5)][third.id]['status'], 'CANCELED')
+        self.assertEqual(set(replayed[self.store.id, self.at(7)]), {first.id, third.id})
+        self.assertEqual(set(replayed[other_store.id, self.at(7)]), {second.id})
+
+        history.take_snapshots(now=self.at(3) + history.SNAPSHOT_LAG, store_ids=store_ids)
+        self.assertEqual(BookingSnapshot.objects.count(), 2)
+        for (store_id, at), expected in replayed.items():
+            with self.assertNumQueries(2):
+                self.assertEqual(history.store_at(store_id, at), expected)
+
+
+class SimulationTests(SimpleTestCase):
+    layout = simulation.StoreLayout(tables=3, opening=10 * 60, closing=2 * 60)
+    workload = simulation.Workload(days=5, players=40, create_rate=1.5, join_rate=4.0)
+
+    def test_fixed_seed_is_deterministic(self):
+        policy = BookingPolicy()
+        first = simulation.simulate(self.layout, self.workload, policy, seed=7)
+        self.assertGreater(first.created, 0)
+        self.assertGreater(first.confirmed, 0)
+        self.assertEqual(simulation.simulate(self.layout, self.workload, policy, seed=7), first)
+        self.assertEqual(
+            simulation.requests_for(self.workload, self.layout, 7),
+            simulation.requests_for(self.workload, self.layout, 7),
+        )
+        self.assertNotEqual(simulation.simulate(self.layout, self.workload, policy, seed=8), first)
+
+    def test_sweep_averages_in_policy_order(self):
+        policies = [BookingPolicy(max_pending=1), BookingPolicy(max_pending=3)]
+        results = simulation.sweep(self.layout, self.workload, policies, seeds=(1, 2))
+        self.assertEqual([policy for policy, _ in results], policies)
+        for policy, result in results:
+            expected = simulation.average(
+                simulation.simulate(self.layout, self.workload, policy, seed=seed) for seed in (1, 2)
+            )
+            self.assertEqual(result, expected)
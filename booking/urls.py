@@ -1,23 +1,40 @@
 # booking/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI 部署时可切换到异步版本的只读页面 (booking/async_views.py)
+if getattr(settings, 'BOOKING_ASYNC_VIEWS', False):
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
     # 核心页面
-    path('', views.store_status_view, name='store_status'),
-    path('pending-bookings/', views.list_pending_bookings_view, name='list_pending_bookings'),
-    path('my-bookings/', views.my_bookings_view, name='my_bookings'),
-    path('my-games/', views.my_games_view, name='my_games'),
+    path('', read_views.store_status_view, name='store_status'),
+    path('pending-bookings/', read_views.list_pending_bookings_view, name='list_pending_bookings'),
+    path('my-bookings/', read_views.my_bookings_view, name='my_bookings'),
+    path('my-games/', read_views.my_games_view, name='my_games'),
     
     # 操作 URL
     path('book/create/<int:store_id>/', views.create_booking_view, name='create_booking'),
     path('book/join/<int:booking_id>/', views.join_booking_view, name='join_booking'),
     path('book/cancel/<int:booking_id>/', views.cancel_booking_view, name='cancel_booking'),
+    path('players/search/', views.player_search_view, name='player_search'),
     
     # 用户认证
     path('signup/', views.signup_view, name='signup'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
 
-    path('store/<int:store_id>/timetable/', views.store_timetable_view, name='store_timetable'),
+    path('store/<int:store_id>/timetable/', read_views.store_timetable_view, name='store_timetable'),
+
+    # 日历订阅 (iCalendar)
+    path('calendar/user/<str:token>.ics', views.user_calendar_view, name='user_calendar'),
+    path('calendar/store/<int:store_id>.ics', views.store_calendar_view, name='store_calendar'),
+    path('calendar/store/<int:store_id>/table/<int:table_id>.ics', views.store_calendar_view, name='table_calendar'),
+
+    # 运维
+    path('ops/db-pool/', views.db_pool_stats_view, name='db_pool_stats'),
+    path('ops/changes/', views.change_feed_view, name='change_feed'),
 ]
@@ -4,8 +4,21 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.contrib import messages
-from .models import Store, Booking
+from .models import Booking
+from .policy import SEATS, BookingPolicy
+from . import changes, history, ical, metadata, occupancy, schedule
+from .caching import get_table_versions, get_user_version, get_version, versioned_page
+from .db_routing import pool_stats, read_replica
+from .ratelimit import rate_limit
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_http_methods
+from accounts import search as user_search
 from accounts.forms import CustomUserCreationForm
+from forecasts.forecasting import overlay as forecast_overlay
+from notifications import outbox
+from django.db import transaction
 from django.db.models import Q 
 import datetime
 
@@ -20,38 +33,50 @@ except ImportError:
     # 这确保了即使 forms.py 有问题，项目也能运行起来一部分
     from django.contrib.auth.forms import UserCreationForm as SignUpForm
 
+# 玩家搜索接口单次最多返回的人数
+PLAYER_SEARCH_MAX_RESULTS = 50
+
 # --- 视图 1: 门店对局情况 (重构) ---
+@versioned_page()
+@read_replica
 def store_status_view(request):
-    stores = Store.objects.prefetch_related('tables').all()
-    for store in stores:
-        store.sorted_tables = store.tables.all().order_by('table_number')
+    # 门店与牌桌来自进程内元数据缓存，每个门店已带有按桌号排序的 sorted_tables
+    stores = metadata.store_directory().stores
     now = timezone.now()
     
-    # --- 核心修正 ---
-    # 我们只查询那些 *当前时间* 正好处在 *开始时间* 和 *结束时间* 之间的对局
-    current_bookings = Booking.objects.filter(
-        status='CONFIRMED',
-        table__isnull=False,  # 确保已经分配了牌桌
-        start_time__lte=now,  # 对局已经开始
-        end_time__gte=now # 对局尚未结束
-    ).select_related('table').prefetch_related('participants')
-    
-    # 构建一个以 table_id 为键，当前正在进行的预定信息为值的字典
-    bookings_by_table = {booking.table.id: booking for booking in current_bookings}
+    # 当前正在进行的对局优先读共享内存占用看板（不访问数据库），看板不可用时回退到
+    # 进程内缓存的紧凑排期（按门店版本号失效）；只有模板片段缓存未命中、需要对局详情时才按 ID 查询 Booking
+    current_booking_ids = occupancy.current_booking_ids(
+        [table.id for store in stores for table in store.sorted_tables], now=now,
+    )
+    if current_booking_ids is None:
+        current_booking_ids = schedule.current_booking_ids([store.id for store in stores], now=now)
+    bookings_by_table = schedule.LazyBookings(
+        {table_id: [booking_id] for table_id, booking_id in current_booking_ids.items()},
+        Booking.objects.select_related('creator'),
+        many=False,
+    )
 
     context = {
         'stores': stores,
         'bookings_by_table': bookings_by_table,
+        'current_booking_ids': current_booking_ids,
+        # 牌桌版本号用作模板片段缓存的键，只有发生变化的牌桌才会重新渲染
+        'table_versions': get_table_versions(
+            [table.id for store in stores for table in store.sorted_tables]
+        ),
         'now': now,
     }
     return render(request, 'booking/store_status.html', context)
 
 # --- 视图 2: 可加入的预约列表 (全新) ---
+@versioned_page()
+@read_replica
 def list_pending_bookings_view(request):
     pending_bookings = Booking.objects.filter(
         status='PENDING',
         end_time__gte=timezone.now()  # 或者 Q(end_time__gte=timezone.now()) | Q(start_time__gte=timezone.now())
-    ).prefetch_related('participants')
+    ).select_related('store', 'creator')
     
     pending_bookings = list(pending_bookings)
     last_hour = timezone.now() + datetime.timedelta(hours=1)
@@ -65,15 +90,19 @@ def list_pending_bookings_view(request):
 
 # --- 视图 3: 创建预约 (重构) ---
 @login_required
+@rate_limit('create_booking')
 def create_booking_view(request, store_id):
-    store = get_object_or_404(Store, id=store_id)
+    store = metadata.get_store(store_id)
+    if store is None:
+        raise Http404("门店不存在。")
     
-    if Booking.objects.filter(
+    policy = BookingPolicy.current()
+    if policy.pending_limit_reached(Booking.objects.filter(
         creator=request.user,
         status='PENDING',
         end_time__gte=timezone.now()
-    ).count() >= 2:
-        messages.error(request, '您发起的待处理预约已达上限 (2个)。')
+    ).count()):
+        messages.error(request, f'您发起的待处理预约已达上限 ({policy.max_pending}个)。')
         return redirect('store_status')
     
     if request.method == 'POST':
@@ -89,9 +118,7 @@ def create_booking_view(request, store_id):
 
             start_time = timezone.make_aware(datetime.datetime.fromisoformat(start_time_str))
             end_time = timezone.make_aware(datetime.datetime.fromisoformat(end_time_str))
-
-            if end_time <= start_time:
-                raise ValueError("结束时间必须晚于开始时间。")
+            policy.check_request(start_time, end_time, num_games)
 
             overlapping_confirmed = request.user.joined_bookings.filter(
                 status='CONFIRMED',
@@ -111,8 +138,11 @@ def create_booking_view(request, store_id):
                 num_games=num_games,
             )
 
-            booking.save()
-            booking.participants.add(request.user)
+            with transaction.atomic():
+                booking.save()
+                booking.participants.add(request.user)
+                # 创建事件带上对局的完整状态（名单已由 m2m_changed 信号同步），与对局同一事务写入
+                history.record(booking, 'CREATED', actor=request.user)
             messages.success(request, '预约已成功发起！')
             return redirect('my_bookings')
 
@@ -126,25 +156,33 @@ def create_booking_view(request, store_id):
 
 # --- 视图 4: 加入预约 (全新) ---
 @login_required
+@rate_limit('join_booking')
 def join_booking_view(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id, status='PENDING')
     
-    if booking.participants.count() >= 4:
+    # 人数与参与者判断直接读取对局上的名单，不查询关联表
+    if booking.participant_count >= SEATS:
         messages.warning(request, '该对局人数已满。')
         return redirect('list_pending_bookings')
         
-    if request.user in booking.participants.all():
+    if request.user.id in booking.participant_ids:
         messages.warning(request, '您已经加入此对局。')
         return redirect('list_pending_bookings')
 
-    # 将用户加入
-    booking.participants.add(request.user)
-    
-    # 自动匹配逻辑：如果人数达到4人
-    if booking.participants.count() == 4:
-        booking.status = 'CONFIRMED'
-        booking.save()
-        # 在这里可以添加通知逻辑，通知所有参与者
+    with transaction.atomic():
+        # 将用户加入
+        booking.participants.add(request.user)
+        history.record(booking, 'JOINED', actor=request.user, user=request.user.pk)
+
+        # 自动匹配逻辑：如果人数达到4人（名单已由 m2m_changed 信号同步到 booking 上）
+        if booking.participant_count == SEATS:
+            booking.status = 'CONFIRMED'
+            booking.save()
+            history.record(booking, 'CONFIRMED', actor=request.user)
+            # 成行通知与开局提醒写入发件箱，与状态变化同一事务提交
+            outbox.booking_confirmed(booking)
+
+    if booking.status == 'CONFIRMED':
         messages.success(request, '加入成功！此对局已满4人，成功成行！')
         # TODO: 未来还可以加入自动分配牌桌的逻辑
     else:
@@ -154,21 +192,27 @@ def join_booking_view(request, booking_id):
 
 # --- 视图 5: 取消/退出预约 (全新) ---
 @login_required
+@rate_limit('cancel_booking')
 def cancel_booking_view(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id)
     user = request.user
     
     # 确认用户是参与者之一
-    if user not in booking.participants.all():
+    if user.id not in booking.participant_ids:
         messages.error(request, '您没有权限执行此操作。')
         return redirect('my_bookings')
 
     # 逻辑 1: 取消未成行的局 (PENDING)
     if booking.status == 'PENDING':
-        booking.participants.remove(user)
-        # 如果退出后没人了，直接删除这个预约
-        if booking.participants.count() == 0:
-            booking.delete()
+        with transaction.atomic():
+            booking.participants.remove(user)
+            history.record(booking, 'LEFT', actor=user, user=user.pk)
+            # 如果退出后没人了，直接删除这个预约
+            deleted = booking.participant_count == 0
+            if deleted:
+                history.record(booking, 'DELETED', actor=user)
+                booking.delete()
+        if deleted:
             messages.success(request, '您已退出且该预约已自动取消。')
         else:
             # 如果退出的是创建者，需要重新指定一个创建者（或者简单地保留原创建者信息）
@@ -178,16 +222,21 @@ def cancel_booking_view(request, booking_id):
         
     # 逻辑 2: 取消已成行的局 (CONFIRMED)
     if booking.status == 'CONFIRMED':
-        # 检查是否在开始前1小时以上
-        if booking.start_time > timezone.now() + datetime.timedelta(hours=1):
-            booking.participants.remove(user)
-            # 状态退回 PENDING，让其他人可以再次加入
-            booking.status = 'PENDING'
-            booking.save()
+        # 检查是否在开始前足够早（默认 1 小时以上）
+        policy = BookingPolicy.current()
+        if policy.can_leave_confirmed((booking.start_time - timezone.now()).total_seconds() / 60):
+            with transaction.atomic():
+                booking.participants.remove(user)
+                # 状态退回 PENDING，让其他人可以再次加入
+                booking.status = 'PENDING'
+                booking.save()
+                history.record(booking, 'LEFT', actor=user, user=user.pk)
+                history.record(booking, 'REVERTED', actor=user)
+                # 通知其他三位参与者有人退出（已写入的开局提醒会在投递时自动跳过）
+                outbox.participant_left(booking, user)
             messages.success(request, '您已退出对局，该对局现在重新开放让他人加入。')
-            # 在这里可以添加通知逻辑，通知其他三位参与者有人退出
         else:
-            messages.error(request, '已成行的对局必须在开始前1小时以上才能取消。')
+            messages.error(request, f'已成行的对局必须在开始前{policy.cancel_cutoff_label}以上才能取消。')
         return redirect('my_bookings')
 
     messages.warning(request, '该对局状态已无法取消。')
@@ -204,19 +253,21 @@ def my_bookings_view(request):
             status__in=['PENDING', 'CONFIRMED']
         )
         .select_related('store', 'table')
-        .prefetch_related('participants')
         .order_by('start_time')
     )
-    return render(request, 'booking/my_bookings.html', {'bookings': bookings})
+    return render(request, 'booking/my_bookings.html', {
+        'bookings': bookings,
+        **ical.subscription_urls(request, request.user.pk),
+    })
 
 
 @login_required
+@read_replica
 def my_games_view(request):
     games_qs = (
         request.user.joined_bookings
         .filter(status='CONFIRMED')
         .select_related('store', 'table')
-        .prefetch_related('participants')
         .order_by('-start_time')
     )
     games = list(games_qs)
@@ -234,6 +285,7 @@ def my_games_view(request):
     return render(request, 'booking/my_games.html', context)
 
 
+@rate_limit('signup')
 def signup_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST) # 使用新的表单
@@ -245,6 +297,7 @@ def signup_view(request):
         form = CustomUserCreationForm()
     return render(request, 'booking/signup.html', {'form': form})
 
+@rate_limit('login')
 def login_view(request):
     if request.method == 'POST':
         form = AuthenticationForm(request, data=request.POST)
@@ -263,8 +316,12 @@ def logout_view(request):
     logout(request)
     return redirect('store_status')
 
+@versioned_page(store_kwarg='store_id', bucket_seconds=3600)
+@read_replica
 def store_timetable_view(request, store_id):
-    store = get_object_or_404(Store, id=store_id)
+    store = metadata.get_store(store_id)
+    if store is None:
+        raise Http404("门店不存在。")
     local_timezone = timezone.get_current_timezone() # 获取 settings.TIME_ZONE
     now = timezone.localtime(timezone.now()) # 将当前 UTC 时间转换为本地时区时间
     
@@ -277,36 +334,135 @@ def store_timetable_view(request, store_id):
     # 确保时间轴的起始时间也是这一天/小时
     timeline_start_display_hour = start_of_view.hour
 
-    bookings = Booking.objects.filter(
-        store=store,
-        status='CONFIRMED',
-        table__isnull=False,
-        # 过滤条件：预约的结束时间晚于视图开始时间 且 预约的开始时间早于视图结束时间
-        end_time__gt=start_of_view,
-        start_time__lt=end_of_view
-    ).select_related('table', 'creator')
-    
-    bookings_by_table = {table.id: [] for table in store.tables.all()}
-    for booking in bookings:
-        if booking.table:
-            bookings_by_table[booking.table.id].append(booking)
+    # 各牌桌在时间轴范围内的已成行对局 ID 来自紧凑排期，对局详情按需一次性加载
+    booking_ids = schedule.get_schedule(store.id, start_of_view, end_of_view).booking_ids_by_table(
+        schedule.to_minutes(start_of_view), schedule.to_minutes(end_of_view)
+    )
+    bookings_by_table = schedule.LazyBookings(
+        {table.id: booking_ids.get(table.id, []) for table in store.sorted_tables},
+        Booking.objects.select_related('creator'),
+    )
 
+    # 需求预测叠加层：每小时的预计占用与建议准备桌数（见 forecasts/forecasting.py）
+    forecasts = forecast_overlay(store, start_of_view)
     time_slots = []
     for i in range(24): # 24个时间格
         slot_time = start_of_view + datetime.timedelta(hours=i)
         time_slots.append({
             'label': slot_time.strftime('%H:00'),
-            'is_current_hour': (slot_time.hour == now.hour and slot_time.day == now.day) # 标记当前小时
+            'is_current_hour': (slot_time.hour == now.hour and slot_time.day == now.day), # 标记当前小时
+            'forecast': forecasts[i],
         })
 
     context = {
         'store': store,
         'bookings_by_table': bookings_by_table,
-        'tables': store.tables.all().order_by('table_number'),
+        'tables': store.sorted_tables,
         'time_slots': time_slots,
         'timetable_start_datetime': start_of_view, # 将完整的 datetime 对象传递过去
         'timeline_start_display_hour': timeline_start_display_hour, # 用于在标题显示范围
         'now': now, # 用于画当前时间线
+        # 片段缓存的键：牌桌版本号 + 时间轴起点所在小时
+        'table_versions': get_table_versions(bookings_by_table.keys()),
+        'fragment_hour': start_of_view.strftime('%Y%m%d%H'),
 
     }
     return render(request, 'booking/store_timetable.html', context)
+
+
+# --- 日历订阅 (iCalendar) ---
+# 日历客户端每隔几分钟轮询一次：版本号未变时直接返回 304 或缓存的正文，不查询数据库
+def user_calendar_view(request, token):
+    user_id = ical.user_id_from_token(token)
+    if user_id is None:
+        raise Http404("订阅链接无效")
+    return ical.feed_response(
+        request, f"user:{user_id}", get_user_version(user_id), "我的麻将对局", ical.user_bookings(user_id),
+    )
+
+
+@read_replica
+def store_calendar_view(request, store_id, table_id=None):
+    store = metadata.get_store(store_id)
+    if store is None:
+        raise Http404("门店不存在")
+    if table_id is None:
+        return ical.feed_response(
+            request, f"store:{store_id}", get_version(store_id), f"{store.name} 对局",
+            Booking.objects.filter(store_id=store_id),
+        )
+    table = metadata.store_directory().tables_by_id.get(table_id)
+    if table is None or table.store_id != store_id:
+        raise Http404("牌桌不存在")
+    return ical.feed_response(
+        request, f"table:{table_id}", get_table_versions([table_id])[table_id],
+        f"{store.name} {table.display_label()} 对局", Booking.objects.filter(table_id=table_id),
+    )
+
+
+@login_required
+def player_search_view(request):
+    """
+    玩家搜索（发起 / 加入对局时选择参与者）：按用户名、显示名或拼音（全拼、首字母）搜索在用的账号，
+    返回 {'results': [{'id', 'username', 'display_name', 'label'}]}。见 accounts/search.py。
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), PLAYER_SEARCH_MAX_RESULTS)
+    except ValueError:
+        return JsonResponse({'error': "limit 必须是整数"}, status=400)
+    profiles = user_search.search_users(request.GET.get('q', ''), limit=limit)
+    return JsonResponse({'results': [
+        {'id': profile.id, 'username': profile.username, 'display_name': profile.display_name,
+         'label': profile.label}
+        for profile in profiles
+    ]})
+
+
+# --- 运维：当前进程的数据库连接 / 连接池使用情况 ---
+@staff_member_required
+def db_pool_stats_view(request):
+    return JsonResponse(pool_stats())
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def change_feed_view(request):
+    """
+    变更订阅（见 booking/changes.py）。
+    GET 只读：返回序号 after 之后的一批变更，带消费者时省略 after 则从上次提交的位置继续。
+    POST offset=<序号> 提交消费者的偏移量（表示该序号及之前的变更都已处理）。
+    下游系统用 Authorization: Bearer <令牌> 访问，只能读取、提交令牌对应的消费者；
+    后台管理员也可访问，用 consumer 参数指定消费者，此时 POST 需要通过 CSRF 校验。
+    """
+    consumer = changes.consumer_for_token(request.headers.get('Authorization', ''))
+    if consumer is not None:
+        # 令牌请求不带 Cookie，不需要 CSRF 校验
+        return _change_feed(request, consumer)
+    if not (request.user.is_active and request.user.is_staff):
+        return JsonResponse({'error': "需要有效的访问令牌"}, status=403)
+    return _staff_change_feed(request)
+
+
+@csrf_protect
+def _staff_change_feed(request):
+    return _change_feed(request, request.POST.get('consumer') or request.GET.get('consumer') or None)
+
+
+def _change_feed(request, consumer):
+    if request.method == 'POST':
+        if not consumer:
+            return JsonResponse({'error': "需要指定消费者"}, status=400)
+        try:
+            value = int(request.POST['offset'])
+        except (KeyError, ValueError):
+            return JsonResponse({'error': "offset 必须是整数"}, status=400)
+        changes.commit(consumer, value)
+        return JsonResponse({'consumer': consumer, 'offset': value})
+    try:
+        after = int(request.GET['after']) if 'after' in request.GET else None
+        limit = int(request.GET.get('limit', 0)) or None
+    except ValueError:
+        return JsonResponse({'error': "after 与 limit 必须是整数"}, status=400)
+    if after is None:
+        after = changes.offset(consumer) if consumer else 0
+    return JsonResponse(changes.fetch(after, limit))
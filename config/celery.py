@@ -6,6 +6,10 @@ from celery.schedules import crontab
 # 将Django的设置文件指向我们的项目
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Celery 的 Django 集成在导入任务模块前会执行系统检查 (run_checks)，进而加载 URL 配置和整个后台。
+# 检查已在部署时由 manage.py check 完成，worker 启动时跳过以缩短冷启动时间。
+os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
+
 # 创建Celery实例
 app = Celery('config')
 
@@ -27,9 +31,35 @@ app.conf.beat_schedule = {
         # 这里还可以传递参数给任务，但我们的任务不需要
         # 'args': (16, 16) 
     },
+    # 每晚 3 点检查未来 7 天的对局冲突
+    'check-booking-conflicts-nightly': {
+        'task': 'booking.tasks.check_booking_conflicts',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    # 每 30 秒投递一次到期的通知（成行 / 退出 / 过期通知与开局前 60 分钟的提醒）
+    'deliver-notifications': {
+        'task': 'notifications.tasks.deliver_notifications',
+        'schedule': 30.0,
+    },
+    # 每晚 2 点按历史对局重新拟合各门店的牌桌需求预测
+    'refresh-demand-forecasts-nightly': {
+        'task': 'forecasts.tasks.refresh_forecasts',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    # 每晚 1 点把已结束的成行对局追加到列式归档（需求预测等统计从归档读取历史）
+    'archive-completed-bookings-nightly': {
+        'task': 'booking.tasks.archive_completed_bookings',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    # 每晚 4 点为各门店生成对局状态快照（事件日志重建历史状态时从快照开始重放）
+    'snapshot-booking-history-nightly': {
+        'task': 'booking.tasks.snapshot_booking_history',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    # 每晚 4 点半压缩变更订阅：删除被覆盖的旧变更与所有消费者都已读过的过期删除记录
+    'compact-change-feed-nightly': {
+        'task': 'booking.tasks.compact_change_feed',
+        'schedule': crontab(hour=4, minute=30),
+    },
     # 未来您可以在这里添加更多的定时任务
-    # 'send-reminders-every-morning': {
-    #     'task': 'booking.tasks.send_reminders',
-    #     'schedule': crontab(hour=8, minute=0),
-    # }
 }
\ No newline at end of file
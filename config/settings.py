@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,7 +32,9 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # 使用 SimpleAdminConfig：admin.py 不在 django.setup() 时自动加载，而是在 config/urls.py
+    # 中调用 admin.autodiscover()，Celery worker 与不加载 URL 的管理命令无需导入整个后台
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -39,6 +42,10 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'booking',
     'accounts',
+    'notifications',
+    'ratings',
+    'tournaments',
+    'forecasts',
 ]
 
 MIDDLEWARE = [
@@ -47,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'booking.db_routing.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notifications.context_processors.inbox',
             ],
         },
     },
@@ -85,6 +94,50 @@ DATABASES = {
     }
 }
 
+# 连接复用：安装了 psycopg 3 连接池 (psycopg[pool]) 时使用 Django 内置连接池，
+# 否则退回到持久连接，避免每个请求都重新建立 PostgreSQL 连接
+try:
+    import psycopg_pool  # noqa: F401
+except ImportError:
+    DATABASES['default']['CONN_MAX_AGE'] = 60
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {'min_size': 2, 'max_size': 10, 'timeout': 10},
+    }
+
+# 只读副本：设置环境变量 MAHJONG_DB_REPLICA_HOST 后启用，只读页面的查询会发往副本
+if os.environ.get('MAHJONG_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['MAHJONG_DB_REPLICA_HOST'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# 本地调试：MAHJONG_DB_ENGINE=sqlite 时改用 SQLite，主库与“副本”指向同一个文件，
+# 可以在没有 PostgreSQL 的环境下验证读写分离路由
+if os.environ.get('MAHJONG_DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+
+DATABASE_ROUTERS = ['booking.db_routing.PrimaryReplicaRouter']
+
+# 只读副本的数据库别名；DATABASES 中不存在该别名时所有查询都走主库
+BOOKING_READ_REPLICA = 'replica'
+
+# 用户提交写请求后，多少秒内该用户的读请求固定走主库（保证能看到自己刚写入的数据）；
+# 任何写入提交后同样多秒内，所有只读页面也读主库，避免把副本上的旧数据缓存到新版本号下。应大于副本的复制延迟
+BOOKING_REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,6 +180,50 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# 门店版本号 (booking/caching.py) 需要在所有 Web / Celery 进程间共享，因此使用 Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/2',
+    }
+}
+
+# Sessions
+# 默认使用签名 Cookie 保存会话，已登录请求不再需要查询 session 表；
+# 需要服务端可撤销的会话时可设置 MAHJONG_SESSION_ENGINE=django.contrib.sessions.backends.cached_db
+SESSION_ENGINE = os.environ.get('MAHJONG_SESSION_ENGINE', 'django.contrib.sessions.backends.signed_cookies')
+
+# 用户对象缓存在 CACHES 中（见 accounts/backends.py），用户保存时自动失效
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+ACCOUNTS_USER_CACHE_TIMEOUT = 600
+# 用户显示名资料缓存（见 accounts/profiles.py）
+ACCOUNTS_PROFILE_CACHE_TIMEOUT = 3600
+
+# 门店 / 牌桌元数据的进程内 LRU 缓存（见 booking/metadata.py），设为 0 则不缓存
+BOOKING_METADATA_TTL = 300
+BOOKING_METADATA_MAXSIZE = 16
+
+# 紧凑排期（见 booking/schedule.py）：每个门店缓存的时间窗口天数与进程内最多缓存的门店排期数
+BOOKING_SCHEDULE_WINDOW_DAYS = 7
+BOOKING_SCHEDULE_CACHE_SIZE = 64
+
+# 日历订阅（见 booking/ical.py）：包含今天之前 / 之后多少天的对局，以及正文在缓存中的保存秒数
+BOOKING_CALENDAR_PAST_DAYS = 30
+BOOKING_CALENDAR_FUTURE_DAYS = 90
+BOOKING_CALENDAR_CACHE_TIMEOUT = 3600
+
+# 课表打印版（见 booking/printing.py）：渲染进程数（None 表示 CPU 核数），
+# 以及每个进程至少分到多少个门店日才启用进程池
+BOOKING_PRINT_WORKERS = None
+BOOKING_PRINT_SHEETS_PER_WORKER = 200
+
+# 公开页面 (门店状态 / 待加入列表 / 时间表) 的浏览器缓存秒数，0 表示每次都需要带 ETag 重新验证
+BOOKING_PAGE_MAX_AGE = 0
+
+# 使用 ASGI 服务器 (uvicorn config.asgi:application) 部署时，可开启只读页面的异步实现
+BOOKING_ASYNC_VIEWS = False
+
 # Celery Configuration Options
 CELERY_BROKER_URL = 'redis://localhost:6379/0' # Broker, 任务队列
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/1' # 结果存储
@@ -135,6 +232,76 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Shanghai' # 设置时区
 
+# 通知（见 notifications/）：各渠道的投递后端。本地使用控制台 / 文件代替真实渠道，
+# 部署时把 email 的 EMAIL_BACKEND 换成 SMTP，把 webhook 换成
+# {'BACKEND': 'notifications.backends.WebhookBackend', 'OPTIONS': {'url': ...}}
+NOTIFICATION_CHANNELS = {
+    'email': {'BACKEND': 'notifications.backends.EmailBackend'},
+    'webhook': {'BACKEND': 'notifications.backends.FileBackend', 'OPTIONS': {'path': BASE_DIR / 'notifications.jsonl'}},
+    'inapp': {'BACKEND': 'notifications.backends.InAppBackend'},
+}
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# 开局提醒提前的分钟数
+NOTIFICATION_REMINDER_MINUTES = 60
+# 每批投递的消息数、认领租约秒数、失败重试的初始退避秒数（之后每次翻倍）与最多尝试次数
+NOTIFICATION_BATCH_SIZE = 200
+NOTIFICATION_LEASE_SECONDS = 300
+NOTIFICATION_RETRY_BACKOFF = 30
+NOTIFICATION_MAX_ATTEMPTS = 6
+# 站内信收件箱每页条数与未读数缓存秒数（计数变化时缓存会被主动删除）
+NOTIFICATION_INBOX_PAGE_SIZE = 20
+NOTIFICATION_INBOX_CACHE_TIMEOUT = 300
+
+# 写操作限流（见 booking/ratelimit.py）：每个作用域按用户 / 按 IP 的令牌桶，「次数/周期」中的次数
+# 同时是桶容量，周期可为 s / m / h / d；登录与注册只按 IP 限流。只对 POST 请求计数
+BOOKING_RATE_LIMITS = {
+    'create_booking': {'user': '10/m', 'ip': '30/m'},
+    'join_booking': {'user': '20/m', 'ip': '60/m'},
+    'cancel_booking': {'user': '20/m', 'ip': '60/m'},
+    'login': {'ip': '10/m'},
+    'signup': {'ip': '5/m'},
+}
+# 部署在反向代理之后时设为代理写入客户端地址的请求头，例如 'HTTP_X_FORWARDED_FOR'
+BOOKING_RATE_LIMIT_IP_HEADER = None
+
+# 战绩（见 ratings/）：四人终局点数合计（设为 None 不校验）与排行榜展示人数
+RATINGS_TOTAL_POINTS = 100000
+RATINGS_LEADERBOARD_SIZE = 100
+
+# 预约规则（见 booking/policy.py，可用 manage.py simulate_policies 模拟比较不同取值）：每人匹配中的预约上限、
+# 成行后允许退出的截止分钟数（开始前）与匹配中预约的过期小时数
+BOOKING_MAX_PENDING = 2
+BOOKING_CANCEL_CUTOFF_MINUTES = 60
+BOOKING_PENDING_EXPIRY_HOURS = 24
+
+# 牌桌需求预测（见 forecasts/forecasting.py）：拟合使用的历史周数、近期权重的半衰期（周）、
+# 高位估计的标准差倍数（1.28 约为 90% 分位）与预测的天数
+FORECAST_HISTORY_WEEKS = 104
+FORECAST_HALF_LIFE_WEEKS = 8
+FORECAST_STAFFING_Z = 1.28
+FORECAST_HORIZON_DAYS = 7
+
+# 共享内存占用看板（见 booking/occupancy.py，由 manage.py occupancy_board 创建并定期校正）：
+# 共享内存段名（设为 None 关闭看板）、容量（可容纳的最大牌桌 ID + 1），
+# 以及超过多少秒未校正即视为过期、回退到数据库（须大于更新进程的校正间隔）
+BOOKING_OCCUPANCY_BOARD = 'mahjong_occupancy'
+BOOKING_OCCUPANCY_BOARD_SIZE = 4096
+BOOKING_OCCUPANCY_MAX_AGE = 120
+
+# 已完成对局的列式归档（见 booking/archive.py，每晚由 Celery Beat 追加）：归档目录，
+# 以及截止时间相对今天 0 点往前的天数（留出事后修改对局的余地）
+BOOKING_ARCHIVE_DIR = BASE_DIR / 'archive'
+BOOKING_ARCHIVE_DELAY_DAYS = 1
+
+# 变更订阅（见 booking/changes.py）：每批默认返回的变更数；下游系统的访问令牌 {消费者名: 令牌}，
+# 由环境变量 MAHJONG_CHANGE_FEED_TOKENS 设置，格式为 "pos=令牌1,accounting=令牌2"；
+# 以及删除记录在所有消费者读过之后保留的天数（超过后由每晚的压缩任务移除）
+BOOKING_CHANGE_FEED_BATCH_SIZE = 500
+BOOKING_CHANGE_FEED_TOKENS = dict(
+    item.split('=', 1) for item in os.environ.get('MAHJONG_CHANGE_FEED_TOKENS', '').split(',') if '=' in item
+)
+BOOKING_CHANGE_FEED_TOMBSTONE_DAYS = 7
+
 # Authentication settings
 LOGIN_URL = 'login' # 当需要登录时，跳转到名为 'login' 的URL
 LOGIN_REDIRECT_URL = 'store_status' # 登录成功后，跳转到名为 'store_status' 的URL
@@ -4,9 +4,18 @@ from django.contrib import admin
 # 确保你导入了 `path` 和 `include`
 from django.urls import path, include 
 
+# settings 中使用 SimpleAdminConfig，后台注册推迟到 URL 配置加载时进行
+admin.autodiscover()
+
 urlpatterns = [
     # 将 /admin/ 的所有请求交给 Django admin 应用处理
     path('admin/', admin.site.urls),
+
+    # 站内信收件箱
+    path('inbox/', include('notifications.urls')),
+
+    # 战绩排行榜
+    path('leaderboard/', include('ratings.urls')),
     
     # 将所有其他的请求 (路径前缀为空 '') 交给 'booking.urls' 去处理
     # 这才是正确的做法！
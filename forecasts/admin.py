@@ -0,0 +1,46 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.html import format_html
+
+from booking import metadata
+
+from . import forecasting
+from .models import DemandForecast
+
+
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ('store', 'local_hour', 'demand_bar', 'expected', 'upper', 'tables', 'generated_at')
+    list_filter = ('store',)
+    list_select_related = ('store',)
+    date_hierarchy = 'hour'
+    list_per_page = 168
+    actions = ['refresh_selected_stores']
+
+    @admin.display(description="时段", ordering='hour')
+    def local_hour(self, obj):
+        return timezone.localtime(obj.hour).strftime('%m-%d %a %H:00')
+
+    @admin.display(description="预计占用 / 牌桌数")
+    def demand_bar(self, obj):
+        # 门店牌桌数来自进程内元数据缓存，不为每行查询
+        store = metadata.get_store(obj.store_id)
+        capacity = max(len(store.sorted_tables) if store else 0, 1)
+        return format_html(
+            '<div style="width:160px;background:#eee;border-radius:3px;" title="高位估计 {} 桌">'
+            '<div style="width:{}%;background:#f0ad4e;height:10px;border-radius:3px;"></div></div>',
+            round(obj.upper, 1), min(round(obj.expected / capacity * 100), 100),
+        )
+
+    @admin.action(description="重新生成所选门店的预测")
+    def refresh_selected_stores(self, request, queryset):
+        store_ids = sorted(set(queryset.values_list('store_id', flat=True)))
+        stats = forecasting.refresh(store_ids=store_ids)
+        self.message_user(request, f"已重新生成 {stats['stores']} 个门店的预测，用时 {stats['seconds']:.2f} 秒。")
+
+    # 预测由定时任务生成，后台只查看
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
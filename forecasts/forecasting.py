@@ -0,0 +1,220 @@
+# forecasts/forecasting.py
+"""
+门店牌桌需求预测：按小时预测每个门店同时占用的牌桌数，供店长安排人手。
+
+  * 需求序列：历史窗口内成行对局的 (门店, 开始, 结束) 一次读出（已归档的部分读列式归档，
+    见 booking/archive.py），换算为本地时间的分钟数。
+    每小时平均同时占用的桌数是「占用桌数」曲线在该小时内的积分除以 60；曲线在对局开始处
+    斜率 +1、结束处 -1，用 np.bincount 把这些斜率变化累加到其后的整点上，再做一次累加即得到
+    每个整点处的积分，整个窗口只做两次 bincount，不逐对局 / 逐小时循环；
+  * 季节模型：每个门店的序列按周折叠为 (周数, 168) 的矩阵，对每个「星期几 × 小时」取指数衰减的
+    加权平均作为预计占用（半衰期 FORECAST_HALF_LIFE_WEEKS 周，近期权重更高），加权标准差乘以
+    FORECAST_STAFFING_Z 作为高位估计；建议准备的桌数为高位估计向上取整，不超过门店的牌桌数。
+    门店第一个对局之前的周不参与拟合；
+  * refresh() 由 Celery Beat 每晚调用，重写各门店从今天 0 点起 FORECAST_HORIZON_DAYS 天的预测，
+    随后递增门店版本号，时间表页面的 ETag 随之变化。
+本地时间按当前时区此刻的 UTC 偏移换算（不处理夏令时切换）。
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from booking import metadata
+from booking.archive import BookingArchive
+from booking.caching import bump_versions
+from booking.models import Booking
+
+from .models import DemandForecast
+
+HOURS_PER_WEEK = 7 * 24
+OVERLAY_KEY_PREFIX = 'forecasts:overlay:'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _offset_minutes(now=None):
+    offset = timezone.localtime(now or timezone.now()).utcoffset()
+    return int(offset.total_seconds() // 60)
+
+
+def local_hour(value, offset):
+    """aware datetime -> 本地时间自 1970-01-01 00:00 起的小时序号（向下取整）。"""
+    return (int(value.timestamp()) // 60 + offset) // 60
+
+
+def hour_datetime(hour, offset):
+    """local_hour() 的逆运算：本地小时序号 -> aware datetime（UTC）。"""
+    return datetime.datetime.fromtimestamp((hour * 60 - offset) * 60, tz=datetime.timezone.utc)
+
+
+def occupancy(stores, starts, ends, window_start, hours, count):
+    """
+    每个门店每小时平均同时占用的牌桌数。stores 为门店行号 (0..count-1)，starts / ends 为本地分钟数，
+    窗口从本地分钟 window_start 开始、共 hours 小时；返回 (count, hours) 的数组。
+    """
+    import numpy as np
+
+    span = hours * 60
+    starts = np.clip(starts - window_start, 0, span)
+    ends = np.clip(ends - window_start, 0, span)
+    times = np.concatenate([starts, ends]).astype(np.float64)
+    signs = np.concatenate([np.ones(len(starts)), -np.ones(len(ends))])
+    rows = np.concatenate([stores, stores])
+    # 斜率变化计入其后的第一个整点；恰在整点上的变化对该整点的积分贡献为 0，计入下一个整点即可
+    width = hours + 2
+    index = rows * width + (times // 60).astype(np.int64) + 1
+    slope = np.bincount(index, weights=signs, minlength=count * width).reshape(count, width).cumsum(axis=1)
+    moment = np.bincount(index, weights=signs * times, minlength=count * width).reshape(count, width).cumsum(axis=1)
+    boundaries = np.arange(width) * 60.0
+    # 整点 H 处的积分：Σ 斜率变化 × (H - 变化时刻)
+    integral = slope * boundaries - moment
+    return np.diff(integral[:, :hours + 1], axis=1) / 60
+
+
+def fit(series, weeks, half_life, z):
+    """
+    series 为 (S, weeks × 168) 的每小时占用，第 j 列对应窗口起点之后第 j 小时。
+    返回 (预计占用, 高位估计)，均为 (S, 168)，第 j 列与 series 的第 j 列是同一个周内小时。
+    """
+    import numpy as np
+
+    folded = series.reshape(len(series), weeks, HOURS_PER_WEEK)
+    # 门店开业（第一个有对局的周）之前的周不参与拟合
+    active = np.cumsum(folded.sum(axis=2) > 0, axis=1) > 0
+    decay = 0.5 ** ((weeks - 1 - np.arange(weeks)) / half_life)
+    weights = decay * active
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+    expected = np.einsum('sw,swh->sh', weights, folded)
+    variance = np.einsum('sw,swh->sh', weights, (folded - expected[:, None, :]) ** 2)
+    return expected, expected + z * np.sqrt(variance)
+
+
+def load_series(store_ids, window_start, hours, offset):
+    """
+    读出窗口内的成行对局并计算 (S, hours) 的占用序列，行顺序与 store_ids 一致。
+    已归档的部分从列式归档读取（见 booking/archive.py），只有归档进度之后结束的对局查询数据库。
+    """
+    import numpy as np
+
+    start = hour_datetime(window_start, offset)
+    end = hour_datetime(window_start + hours, offset)
+    position = np.zeros(max(store_ids) + 1, dtype=np.int64)
+    position[store_ids] = np.arange(len(store_ids))
+    stores, starts, ends = [], [], []
+
+    rows = Booking.objects.filter(
+        status='CONFIRMED', store_id__in=store_ids, start_time__lt=end, end_time__gt=start,
+    )
+    archive = BookingArchive()
+    if archive.archived_until is not None:
+        for chunk in archive.scan(start, end, columns=('store', 'start', 'end'), stores=store_ids):
+            stores.append(position[chunk['store']])
+            starts.append(chunk['start'] // 60 + offset)
+            ends.append(chunk['end'] // 60 + offset)
+        rows = rows.filter(end_time__gt=archive.archived_until)
+
+    recent_stores, recent_starts, recent_ends = [], [], []
+    for store_id, start_time, end_time in rows.values_list('store_id', 'start_time', 'end_time').iterator(
+        chunk_size=10000,
+    ):
+        recent_stores.append(position[store_id])
+        recent_starts.append(int(start_time.timestamp()) // 60 + offset)
+        recent_ends.append(int(end_time.timestamp()) // 60 + offset)
+    stores.append(np.array(recent_stores, dtype=np.int64))
+    starts.append(np.array(recent_starts, dtype=np.int64))
+    ends.append(np.array(recent_ends, dtype=np.int64))
+    return occupancy(
+        np.concatenate(stores).astype(np.int64), np.concatenate(starts), np.concatenate(ends),
+        window_start * 60, hours, len(store_ids),
+    )
+
+
+def refresh(store_ids=None, now=None):
+    """重新拟合并写入各门店的预测，返回统计信息。"""
+    import numpy as np
+
+    started = time.perf_counter()
+    now = now or timezone.now()
+    offset = _offset_minutes(now)
+    weeks = _setting('FORECAST_HISTORY_WEEKS', 104)
+    horizon = _setting('FORECAST_HORIZON_DAYS', 7) * 24
+    directory = metadata.store_directory()
+    stores = [store for store in directory.stores if store_ids is None or store.id in store_ids]
+    if not stores:
+        return {'stores': 0, 'hours': 0, 'seconds': time.perf_counter() - started}
+    store_ids = [store.id for store in stores]
+
+    # 历史窗口为截至今天 0 点（本地时间）的整周，预测从今天 0 点开始
+    today = local_hour(now, offset) // 24 * 24
+    window_start = today - weeks * HOURS_PER_WEEK
+    series = load_series(store_ids, window_start, weeks * HOURS_PER_WEEK, offset)
+    expected, upper = fit(
+        series, weeks, _setting('FORECAST_HALF_LIFE_WEEKS', 8), _setting('FORECAST_STAFFING_Z', 1.28),
+    )
+    capacity = np.array([len(store.sorted_tables) for store in stores])[:, None]
+    suggested = np.minimum(np.ceil(np.round(upper, 6)), capacity).astype(np.int64)
+
+    forecast_hours = np.arange(today, today + horizon)
+    columns = (forecast_hours - window_start) % HOURS_PER_WEEK
+    hour_values = [hour_datetime(int(hour), offset) for hour in forecast_hours]
+    forecasts = [
+        DemandForecast(store_id=store_id, hour=hour, expected=mean, upper=high, tables=tables)
+        for row, store_id in enumerate(store_ids)
+        for hour, mean, high, tables in zip(
+            hour_values, expected[row, columns].tolist(), upper[row, columns].tolist(),
+            suggested[row, columns].tolist(),
+        )
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.filter(store_id__in=store_ids).delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=2000)
+    bump_versions(store_ids)
+    # 时间表叠加层按「门店 + 起始小时」缓存，删除当前小时（及上一小时）的缓存
+    current = local_hour(now, offset)
+    cache.delete_many([
+        _overlay_key(store_id, hour_datetime(hour, offset)) for store_id in store_ids for hour in (current - 1, current)
+    ])
+    return {
+        'stores': len(store_ids),
+        'hours': horizon,
+        'weeks': weeks,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _overlay_key(store_id, start):
+    return f"{OVERLAY_KEY_PREFIX}{store_id}:{int(start.timestamp()) // 3600}"
+
+
+def overlay(store, start, hours=24):
+    """
+    时间表叠加层：从整点 start 起 hours 小时，每小时一个 dict（预计占用、高位估计、建议桌数、
+    相对门店牌桌数的比例），没有预测的小时为 None。结果按门店与起始小时缓存一小时。
+    """
+    key = _overlay_key(store.id, start)
+    slots = cache.get(key)
+    if slots is None:
+        rows = DemandForecast.objects.filter(
+            store_id=store.id, hour__gte=start, hour__lt=start + datetime.timedelta(hours=hours),
+        ).values_list('hour', 'expected', 'upper', 'tables')
+        by_offset = {int((hour - start).total_seconds() // 3600): row for hour, *row in rows}
+        capacity = max(len(store.sorted_tables), 1)
+        slots = [
+            {
+                'expected': round(by_offset[index][0], 1),
+                'upper': round(by_offset[index][1], 1),
+                'tables': by_offset[index][2],
+                'percent': min(round(by_offset[index][0] / capacity * 100), 100),
+            } if index in by_offset else None
+            for index in range(hours)
+        ]
+        cache.set(key, slots, 3600)
+    return slots
+
@@ -0,0 +1,24 @@
+# forecasts/management/commands/refresh_forecasts.py
+"""
+立即重新拟合牌桌需求预测（见 forecasts/forecasting.py），平时由 Celery Beat 每晚运行：
+
+    python manage.py refresh_forecasts
+    python manage.py refresh_forecasts --store 1 --store 2
+"""
+from django.core.management.base import BaseCommand
+
+from forecasts.forecasting import refresh
+
+
+class Command(BaseCommand):
+    help = "按历史成行对局重新拟合各门店每小时的牌桌需求预测。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, action='append', dest='stores', help="只更新指定门店，可重复")
+
+    def handle(self, *args, stores, **options):
+        stats = refresh(store_ids=stores)
+        self.stdout.write(self.style.SUCCESS(
+            f"用最近 {stats.get('weeks', 0)} 周的历史更新了 {stats['stores']} 个门店未来 {stats['hours']} 小时的预测，"
+            f"用时 {stats['seconds']:.2f} 秒。"
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('booking', '0007_alter_booking_booking_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='时段开始')),
+                ('expected', models.FloatField(verbose_name='预计占用桌数')),
+                ('upper', models.FloatField(verbose_name='高位估计')),
+                ('tables', models.PositiveSmallIntegerField(verbose_name='建议准备桌数')),
+                ('generated_at', models.DateTimeField(auto_now_add=True, verbose_name='生成时间')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='booking.store', verbose_name='门店')),
+            ],
+            options={
+                'verbose_name': '需求预测',
+                'verbose_name_plural': '需求预测',
+                'ordering': ['store', 'hour'],
+                'constraints': [models.UniqueConstraint(fields=('store', 'hour'), name='unique_store_forecast_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# forecasts/models.py
+from django.db import models
+
+
+# 门店某一小时的牌桌需求预测，由 forecasts/forecasting.py 每晚重写
+class DemandForecast(models.Model):
+    store = models.ForeignKey('booking.Store', on_delete=models.CASCADE, related_name='demand_forecasts', verbose_name="门店")
+    hour = models.DateTimeField(verbose_name="时段开始")
+    # 该小时内平均同时占用的牌桌数（对局跨越整点时按实际分钟数分摊）
+    expected = models.FloatField(verbose_name="预计占用桌数")
+    upper = models.FloatField(verbose_name="高位估计")
+    tables = models.PositiveSmallIntegerField(verbose_name="建议准备桌数")
+    generated_at = models.DateTimeField(auto_now_add=True, verbose_name="生成时间")
+
+    def __str__(self):
+        return f"{self.store_id} 号门店 {self.hour:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        verbose_name = "需求预测"
+        verbose_name_plural = verbose_name
+        ordering = ['store', 'hour']
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'hour'], name='unique_store_forecast_hour'),
+        ]
@@ -0,0 +1,10 @@
+from celery import shared_task
+
+
+@shared_task
+def refresh_forecasts():
+    """每晚重新拟合各门店的牌桌需求预测，由 Celery Beat 触发。"""
+    from .forecasting import refresh
+
+    stats = refresh()
+    return f"已更新 {stats['stores']} 个门店未来 {stats['hours']} 小时的预测，用时 {stats['seconds']:.2f} 秒。"
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase
+
+from .forecasting import occupancy
+
+
+class OccupancyTests(SimpleTestCase):
+    def test_booking_across_hour_boundary(self):
+        import numpy as np
+
+        # 门店 0：30 分至 120 分的 90 分钟对局；门店 1：恰在整点开始、结束的对局，以及窗口开始前就在进行的对局
+        stores = np.array([0, 1, 1])
+        starts = np.array([30, 60, -90])
+        ends = np.array([120, 180, 30])
+        result = occupancy(stores, starts, ends, 0, 4, 2)
+        self.assertEqual(result.shape, (2, 4))
+        np.testing.assert_allclose(result[0], [0.5, 1.0, 0.0, 0.0])
+        np.testing.assert_allclose(result[1], [0.5, 1.0, 1.0, 0.0])
+
+    def test_window_offset_and_empty_input(self):
+        import numpy as np
+
+        result = occupancy(np.array([0]), np.array([600 + 45]), np.array([600 + 195]), 600, 3, 1)
+        np.testing.assert_allclose(result[0], [0.25, 1.0, 1.0])
+        empty = np.array([], dtype=np.int64)
+        np.testing.assert_allclose(occupancy(empty, empty, empty, 0, 2, 1), [[0.0, 0.0]])
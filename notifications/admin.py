@@ -0,0 +1,47 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from . import inbox
+from .models import InboxItem, OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'kind', 'channel', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel', 'kind')
+    list_select_related = ('recipient',)
+    search_fields = ('subject', 'recipient__username', 'recipient__display_name')
+    raw_id_fields = ('recipient', 'booking')
+    readonly_fields = ('dedupe_key', 'created_at', 'sent_at', 'last_error')
+    date_hierarchy = 'created_at'
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='SENT').update(status='PENDING', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} 条通知将在下一次投递时重新发送。")
+
+    retry_now.short_description = "立即重新发送选中的通知"
+
+
+@admin.register(InboxItem)
+class InboxItemAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'kind', 'recipient', 'created_at', 'read_at')
+    list_filter = ('kind',)
+    list_select_related = ('recipient',)
+    search_fields = ('subject', 'recipient__username', 'recipient__display_name')
+    raw_id_fields = ('recipient', 'booking', 'source')
+    readonly_fields = ('created_at', 'read_at')
+    date_hierarchy = 'created_at'
+
+    # 站内信只由投递任务写入；删除后按剩余站内信重新统计未读数
+    def has_add_permission(self, request):
+        return False
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        inbox.recount([obj.recipient_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('recipient_id', flat=True))
+        super().delete_queryset(request, queryset)
+        inbox.recount(user_ids)
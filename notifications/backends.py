@@ -0,0 +1,109 @@
+# notifications/backends.py
+"""
+通知投递后端。每个渠道在 settings.NOTIFICATION_CHANNELS 中配置一个后端::
+
+    NOTIFICATION_CHANNELS = {
+        'email': {'BACKEND': 'notifications.backends.EmailBackend'},
+        'webhook': {
+            'BACKEND': 'notifications.backends.WebhookBackend',
+            'OPTIONS': {'url': 'https://example.com/hooks/mahjong'},
+        },
+        'inapp': {'BACKEND': 'notifications.backends.InAppBackend'},
+    }
+
+后端一次收到同一渠道的一批消息，返回 {消息ID: 错误信息}，只包含失败的消息；
+抛出异常视为整批失败。本地开发可用 ConsoleBackend / FileBackend 代替真实渠道。
+"""
+import json
+import sys
+import urllib.request
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_backends = {}
+
+
+class BaseBackend:
+    def __init__(self, **options):
+        self.options = options
+
+    def send_batch(self, messages):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    """把消息打印到标准输出（或 OPTIONS 中的 stream）。"""
+
+    def send_batch(self, messages):
+        stream = self.options.get('stream') or sys.stdout
+        for message in messages:
+            stream.write(f"[{message.channel}] -> {message.recipient_id or '*'} {message.subject}\n{message.body}\n\n")
+        stream.flush()
+        return {}
+
+
+class FileBackend(BaseBackend):
+    """把消息以 JSON Lines 追加到文件（OPTIONS: path）。"""
+
+    def send_batch(self, messages):
+        with open(self.options['path'], 'a', encoding='utf-8') as output:
+            for message in messages:
+                output.write(json.dumps(message.as_dict(), ensure_ascii=False) + "\n")
+        return {}
+
+
+class EmailBackend(BaseBackend):
+    """使用 Django 邮件设置（EMAIL_BACKEND 等）发送，同一批消息共用一个连接。"""
+
+    def send_batch(self, messages):
+        from django.core.mail import EmailMessage, get_connection
+
+        failures = {}
+        connection = get_connection(fail_silently=False)
+        with connection:
+            for message in messages:
+                email = EmailMessage(
+                    subject=message.subject, body=message.body,
+                    from_email=self.options.get('from_email'), to=[message.payload['to']],
+                    connection=connection,
+                )
+                try:
+                    email.send()
+                except Exception as exc:  # 单封失败不影响同批其他邮件
+                    failures[message.pk] = repr(exc)
+        return failures
+
+
+class InAppBackend(BaseBackend):
+    """写入站内信收件箱（见 notifications/inbox.py），整批在一个事务中写入。"""
+
+    def send_batch(self, messages):
+        from .inbox import deliver
+
+        deliver(messages)
+        return {}
+
+
+class WebhookBackend(BaseBackend):
+    """把一批消息作为 JSON 数组 POST 到 OPTIONS['url']，非 2xx 响应或网络错误时整批重试。"""
+
+    def send_batch(self, messages):
+        body = json.dumps({'events': [message.as_dict() for message in messages]}, ensure_ascii=False).encode()
+        request = urllib.request.Request(
+            self.options['url'], data=body, method='POST',
+            headers={'Content-Type': 'application/json', **self.options.get('headers', {})},
+        )
+        with urllib.request.urlopen(request, timeout=self.options.get('timeout', 10)):
+            pass  # urlopen 对非 2xx 响应抛出 HTTPError
+        return {}
+
+
+def get_backend(channel):
+    """返回渠道的后端实例（按进程缓存）；渠道未配置时返回 None。"""
+    if channel not in _backends:
+        config = getattr(settings, 'NOTIFICATION_CHANNELS', {}).get(channel)
+        _backends[channel] = (
+            import_string(config['BACKEND'])(**config.get('OPTIONS', {})) if config else None
+        )
+    return _backends[channel]
@@ -0,0 +1,9 @@
+# notifications/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .inbox import unread_count
+
+
+def inbox(request):
+    """页面顶部的未读站内信角标。延迟求值，只有模板用到时才读取（每个请求最多一次缓存）。"""
+    return {'inbox_unread': SimpleLazyObject(lambda: unread_count(request))}
@@ -0,0 +1,149 @@
+# notifications/delivery.py
+"""
+发件箱投递：取出到期的待发送消息，按渠道分批交给后端（见 notifications/backends.py）。
+
+  * 认领：在短事务中用 SELECT ... FOR UPDATE SKIP LOCKED 取一批到期消息，并把它们的
+    投递时间推迟 NOTIFICATION_LEASE_SECONDS 秒作为租约，多个 worker 并行时互不重复；
+    worker 中途退出时，租约到期后消息会被重新认领（至少投递一次）；
+  * 开局提醒在投递前用一次查询核对对局仍为成行状态、开始时间未变、接收人仍在名单中，
+    否则标记为已跳过；
+  * 失败的消息按 NOTIFICATION_RETRY_BACKOFF * 2^(尝试次数-1) 秒指数退避（带少量随机抖动，
+    最长 1 小时），超过 NOTIFICATION_MAX_ATTEMPTS 次后标记为发送失败。
+"""
+import datetime
+import random
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from booking.models import Booking
+
+from .backends import get_backend
+from .models import OutboxMessage
+
+MAX_BACKOFF_SECONDS = 3600
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backoff(attempts):
+    base = _setting('NOTIFICATION_RETRY_BACKOFF', 30) * 2 ** max(attempts - 1, 0)
+    seconds = min(base, MAX_BACKOFF_SECONDS)
+    return datetime.timedelta(seconds=seconds * random.uniform(1.0, 1.1))
+
+
+def claim(batch_size, now):
+    """认领一批到期消息并加上租约，返回消息列表（按投递时间排序）。"""
+    lease = datetime.timedelta(seconds=_setting('NOTIFICATION_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        ids = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if ids:
+            OutboxMessage.objects.filter(pk__in=ids).update(
+                next_attempt_at=now + lease, attempts=F('attempts') + 1,
+            )
+    return list(OutboxMessage.objects.filter(pk__in=ids).order_by('next_attempt_at', 'pk')) if ids else []
+
+
+def _parse_time(value):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stale_reminders(messages):
+    """返回已失效的开局提醒 ID：对局已取消 / 退回匹配中、开始时间变化或接收人已退出。"""
+    reminders = [message for message in messages if message.kind == 'REMINDER']
+    if not reminders:
+        return set()
+    bookings = {
+        pk: (status, start_time, participant_ids)
+        for pk, status, start_time, participant_ids in Booking.objects.filter(
+            pk__in={message.booking_id for message in reminders}
+        ).values_list('pk', 'status', 'start_time', 'participant_ids')
+    }
+    stale = set()
+    for message in reminders:
+        current = bookings.get(message.booking_id)
+        if (
+            current is None
+            or current[0] != 'CONFIRMED'
+            or current[1] != _parse_time(message.payload.get('start_time'))
+            or (message.recipient_id is not None and message.recipient_id not in current[2])
+        ):
+            stale.add(message.pk)
+    return stale
+
+
+def deliver(messages, now):
+    """投递一批已认领的消息并写回结果，返回 Counter（sent / retry / failed / skipped）。"""
+    counts = Counter()
+    skipped = _stale_reminders(messages)
+    by_channel = defaultdict(list)
+    for message in messages:
+        if message.pk not in skipped:
+            by_channel[message.channel].append(message)
+
+    sent, retries = [], []
+    for channel, batch in by_channel.items():
+        backend = get_backend(channel)
+        if backend is None:
+            failures = {message.pk: f"渠道 {channel} 未配置" for message in batch}
+        else:
+            try:
+                failures = backend.send_batch(batch)
+            except Exception as exc:
+                failures = {message.pk: repr(exc) for message in batch}
+        for message in batch:
+            if message.pk in failures:
+                message.last_error = failures[message.pk][:2000]
+                retries.append(message)
+            else:
+                sent.append(message.pk)
+
+    max_attempts = _setting('NOTIFICATION_MAX_ATTEMPTS', 6)
+    for message in retries:
+        # claim() 认领时已把尝试次数加 1
+        attempts = message.attempts
+        if attempts >= max_attempts:
+            message.status = 'FAILED'
+            counts['failed'] += 1
+        else:
+            message.next_attempt_at = now + backoff(attempts)
+            counts['retry'] += 1
+
+    with transaction.atomic():
+        if sent:
+            OutboxMessage.objects.filter(pk__in=sent).update(status='SENT', sent_at=now, last_error='')
+        if skipped:
+            OutboxMessage.objects.filter(pk__in=skipped).update(status='SKIPPED')
+        if retries:
+            OutboxMessage.objects.bulk_update(retries, ['status', 'next_attempt_at', 'last_error'])
+    counts['sent'] += len(sent)
+    counts['skipped'] += len(skipped)
+    return counts
+
+
+def deliver_due(batch_size=None, max_batches=20, now=None):
+    """投递所有到期消息（最多 max_batches 批），返回各结果的计数。"""
+    batch_size = batch_size or _setting('NOTIFICATION_BATCH_SIZE', 200)
+    counts = Counter()
+    for _ in range(max_batches):
+        current = now or timezone.now()
+        messages = claim(batch_size, current)
+        if not messages:
+            break
+        counts.update(deliver(messages, current))
+        if len(messages) < batch_size:
+            break
+    return counts
@@ -0,0 +1,179 @@
+# notifications/inbox.py
+"""
+站内信收件箱与未读数。
+
+  * 未读数保存在 InboxCounter 中，与站内信的写入 / 标记已读在同一个事务中用 F() 表达式增减，
+    不在页面加载时执行 COUNT(*)；
+  * 每个用户的未读数缓存在 notifications:unread:<用户ID>，计数变化的事务提交后删除该键。
+    页面角标与页面 ETag（见 booking/caching.py）共用 unread_count(request) 的结果，
+    它在每个请求上只读取一次缓存，未命中时按主键查询一次计数行；
+  * 收件箱按 ID 倒序做键集分页（?before=<ID>），不使用 OFFSET；
+  * 「全部已读」是一条 UPDATE 语句，再把计数减去实际更新的行数。
+"""
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import InboxCounter, InboxItem
+
+UNREAD_KEY_PREFIX = 'notifications:unread:'
+REQUEST_ATTR = '_inbox_unread'
+
+
+def _unread_key(user_id):
+    return f"{UNREAD_KEY_PREFIX}{user_id}"
+
+
+def _cache_timeout():
+    return getattr(settings, 'NOTIFICATION_INBOX_CACHE_TIMEOUT', 300)
+
+
+def page_size():
+    return getattr(settings, 'NOTIFICATION_INBOX_PAGE_SIZE', 20)
+
+
+def _forget(user_ids):
+    keys = [_unread_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _session_user_id(request):
+    # 与页面 ETag 一样直接读取 session 中的用户 ID，不为角标加载用户对象
+    session = getattr(request, 'session', None)
+    return session.get(SESSION_KEY) if session is not None else None
+
+
+def _load_unread(user_id):
+    count = InboxCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first() or 0
+    cache.set(_unread_key(user_id), count, _cache_timeout())
+    return count
+
+
+def unread_count(request):
+    """当前登录用户的未读站内信数，未登录时为 0。结果记在 request 上，同一请求只读一次缓存。"""
+    if not hasattr(request, REQUEST_ATTR):
+        user_id = _session_user_id(request)
+        count = 0
+        if user_id:
+            count = cache.get(_unread_key(user_id))
+            if count is None:
+                count = _load_unread(user_id)
+        setattr(request, REQUEST_ATTR, count)
+    return getattr(request, REQUEST_ATTR)
+
+
+async def aunread_count(request):
+    if not hasattr(request, REQUEST_ATTR):
+        session = getattr(request, 'session', None)
+        user_id = await session.aget(SESSION_KEY) if session is not None else None
+        count = 0
+        if user_id:
+            count = await cache.aget(_unread_key(user_id))
+            if count is None:
+                count = await sync_to_async(_load_unread)(user_id)
+        setattr(request, REQUEST_ATTR, count)
+    return getattr(request, REQUEST_ATTR)
+
+
+def _add_unread(counts):
+    """counts 为 {用户ID: 新增未读数}。增量相同的用户合并为一条 UPDATE（通常全部为 1）。"""
+    if not counts:
+        return
+    InboxCounter.objects.bulk_create(
+        [InboxCounter(user_id=user_id) for user_id in counts], ignore_conflicts=True,
+    )
+    by_amount = defaultdict(list)
+    for user_id, amount in counts.items():
+        by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        InboxCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + amount)
+    _forget(counts)
+
+
+def deliver(messages):
+    """把一批 inapp 渠道的发件箱消息写入收件箱，已经写入过的消息（重复投递）被跳过，返回写入条数。"""
+    messages = [message for message in messages if message.recipient_id]
+    with transaction.atomic():
+        delivered = set(
+            InboxItem.objects.filter(source_id__in=[message.pk for message in messages])
+            .values_list('source_id', flat=True)
+        )
+        items = [
+            InboxItem(
+                recipient_id=message.recipient_id, booking_id=message.booking_id, source_id=message.pk,
+                kind=message.kind, subject=message.subject, body=message.body,
+            )
+            for message in messages if message.pk not in delivered
+        ]
+        InboxItem.objects.bulk_create(items, batch_size=500)
+        _add_unread(Counter(item.recipient_id for item in items))
+    return len(items)
+
+
+def page(user_id, before=None, size=None):
+    """
+    键集分页：返回 (站内信列表, 下一页的 before 参数)，没有下一页时后者为 None。
+    多取一行判断是否还有下一页，不执行 COUNT(*)。
+    """
+    size = size or page_size()
+    items = InboxItem.objects.filter(recipient_id=user_id)
+    if before:
+        items = items.filter(pk__lt=before)
+    items = list(items.order_by('-pk')[:size + 1])
+    if len(items) > size:
+        return items[:size], items[size - 1].pk
+    return items, None
+
+
+def mark_read(user_id, item_id):
+    """把一条站内信标记为已读，返回是否有变化（已读的或别人的站内信不计）。"""
+    with transaction.atomic():
+        updated = InboxItem.objects.filter(
+            pk=item_id, recipient_id=user_id, read_at__isnull=True,
+        ).update(read_at=timezone.now())
+        if updated:
+            InboxCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - updated, 0))
+            _forget([user_id])
+    return updated > 0
+
+
+def mark_all_read(user_id):
+    """一条 UPDATE 把用户的全部未读站内信标记为已读，返回更新的条数。"""
+    with transaction.atomic():
+        updated = InboxItem.objects.filter(
+            recipient_id=user_id, read_at__isnull=True,
+        ).update(read_at=timezone.now())
+        if updated:
+            # 减去实际更新的行数而不是清零：并发写入、尚未提交的新站内信仍计为未读
+            InboxCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - updated, 0))
+            _forget([user_id])
+    return updated
+
+
+def recount(user_ids):
+    """按站内信重新统计指定用户的未读数（后台删除站内信后使用）。"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    counts = dict(
+        InboxItem.objects.filter(recipient_id__in=user_ids)
+        .values('recipient_id')
+        .annotate(unread=Count('pk', filter=Q(read_at__isnull=True)))
+        .values_list('recipient_id', 'unread')
+    )
+    with transaction.atomic():
+        InboxCounter.objects.bulk_create(
+            [InboxCounter(user_id=user_id) for user_id in user_ids], ignore_conflicts=True,
+        )
+        InboxCounter.objects.bulk_update(
+            [InboxCounter(user_id=user_id, unread=counts.get(user_id, 0)) for user_id in user_ids], ['unread'],
+        )
+        _forget(user_ids)
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 03:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('booking', '0006_booking_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CONFIRMED', '对局成行'), ('PARTICIPANT_LEFT', '有人退出'), ('EXPIRED', '预约过期'), ('REMINDER', '开局提醒')], max_length=20, verbose_name='类型')),
+                ('channel', models.CharField(choices=[('email', '邮件'), ('webhook', 'Webhook'), ('inapp', '站内信')], max_length=10, verbose_name='渠道')),
+                ('status', models.CharField(choices=[('PENDING', '待发送'), ('SENT', '已发送'), ('FAILED', '发送失败'), ('SKIPPED', '已跳过')], default='PENDING', max_length=10, verbose_name='状态')),
+                ('subject', models.CharField(max_length=200, verbose_name='标题')),
+                ('body', models.TextField(verbose_name='正文')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='附加数据')),
+                ('dedupe_key', models.CharField(max_length=40, unique=True, verbose_name='去重键')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='尝试次数')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次投递时间')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='发送时间')),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booking.booking', verbose_name='对局')),
+                ('recipient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='接收人')),
+            ],
+            options={
+                'verbose_name': '通知',
+                'verbose_name_plural': '通知',
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['next_attempt_at'], name='outbox_due_idx')],
+            },
+        ),
+    ]
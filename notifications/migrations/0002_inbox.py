@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 03:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('booking', '0006_booking_updated_at'),
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+                ('unread', models.PositiveIntegerField(default=0, verbose_name='未读数')),
+            ],
+            options={
+                'verbose_name': '未读计数',
+                'verbose_name_plural': '未读计数',
+            },
+        ),
+        migrations.CreateModel(
+            name='InboxItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CONFIRMED', '对局成行'), ('PARTICIPANT_LEFT', '有人退出'), ('EXPIRED', '预约过期'), ('REMINDER', '开局提醒')], max_length=20, verbose_name='类型')),
+                ('subject', models.CharField(max_length=200, verbose_name='标题')),
+                ('body', models.TextField(verbose_name='正文')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='阅读时间')),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booking.booking', verbose_name='对局')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='接收人')),
+                ('source', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='notifications.outboxmessage', verbose_name='来源通知')),
+            ],
+            options={
+                'verbose_name': '站内信',
+                'verbose_name_plural': '站内信',
+                'indexes': [models.Index(fields=['recipient', '-id'], name='inbox_recipient_idx'), models.Index(condition=models.Q(('read_at__isnull', True)), fields=['recipient'], name='inbox_unread_idx')],
+            },
+        ),
+    ]
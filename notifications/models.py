@@ -0,0 +1,132 @@
+# notifications/models.py
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+# 通知发件箱：与对局状态变化在同一个事务中写入，由 Celery 任务批量投递（见 notifications/delivery.py）
+class OutboxMessage(models.Model):
+    KIND_CHOICES = [
+        ('CONFIRMED', '对局成行'),
+        ('PARTICIPANT_LEFT', '有人退出'),
+        ('EXPIRED', '预约过期'),
+        ('REMINDER', '开局提醒'),
+    ]
+    CHANNEL_CHOICES = [
+        ('email', '邮件'),
+        ('webhook', 'Webhook'),
+        ('inapp', '站内信'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', '待发送'),
+        ('SENT', '已发送'),
+        ('FAILED', '发送失败'),
+        ('SKIPPED', '已跳过'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="类型")
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, verbose_name="渠道")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="状态")
+    # Webhook 通知面向整个对局，没有接收人
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='+', verbose_name="接收人",
+    )
+    booking = models.ForeignKey(
+        'booking.Booking', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name="对局",
+    )
+    subject = models.CharField(max_length=200, verbose_name="标题")
+    body = models.TextField(verbose_name="正文")
+    # 渠道相关的数据（邮件地址、提醒对应的开始时间、Webhook 的结构化内容等）
+    payload = models.JSONField(default=dict, blank=True, verbose_name="附加数据")
+    # 同一事件重复写入（例如请求重试）时靠唯一键去重
+    dedupe_key = models.CharField(max_length=40, unique=True, verbose_name="去重键")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="尝试次数")
+    # 待发送消息的投递时间：普通通知为写入时间，开局提醒为开始前 60 分钟，失败后按退避时间顺延
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="下次投递时间")
+    last_error = models.TextField(blank=True, verbose_name="最近错误")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="发送时间")
+
+    def __str__(self):
+        return f"[{self.get_channel_display()}] {self.subject}"
+
+    def as_dict(self):
+        """控制台 / 文件 / Webhook 后端输出的结构。"""
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'channel': self.channel,
+            'recipient_id': self.recipient_id,
+            'booking_id': self.booking_id,
+            'subject': self.subject,
+            'body': self.body,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    class Meta:
+        verbose_name = "通知"
+        verbose_name_plural = verbose_name
+        indexes = [
+            # 投递任务只扫描到期的待发送消息（部分索引，已发送的历史消息不进入索引）
+            models.Index(
+                fields=['next_attempt_at'], condition=Q(status='PENDING'), name='outbox_due_idx',
+            ),
+        ]
+
+
+# 站内信：由 inapp 渠道的后端（notifications.backends.InAppBackend）从发件箱写入
+class InboxItem(models.Model):
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name="接收人",
+    )
+    booking = models.ForeignKey(
+        'booking.Booking', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name="对局",
+    )
+    # 来源消息，发件箱重复投递同一条消息时不会写入两条站内信
+    source = models.OneToOneField(
+        OutboxMessage, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name="来源通知",
+    )
+    kind = models.CharField(max_length=20, choices=OutboxMessage.KIND_CHOICES, verbose_name="类型")
+    subject = models.CharField(max_length=200, verbose_name="标题")
+    body = models.TextField(verbose_name="正文")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name="阅读时间")
+
+    def __str__(self):
+        return self.subject
+
+    @property
+    def is_read(self):
+        return self.read_at is not None
+
+    class Meta:
+        verbose_name = "站内信"
+        verbose_name_plural = verbose_name
+        indexes = [
+            # 收件箱按 ID 倒序做键集分页：WHERE recipient_id = ? AND id < ? ORDER BY id DESC
+            models.Index(fields=['recipient', '-id'], name='inbox_recipient_idx'),
+            # 「全部已读」只需要找到未读的行
+            models.Index(fields=['recipient'], condition=Q(read_at__isnull=True), name='inbox_unread_idx'),
+        ]
+
+
+# 每个用户的未读站内信数，随写入 / 标记已读在同一事务中增减，页面角标不需要 COUNT(*)
+class InboxCounter(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+        related_name='+', verbose_name="用户",
+    )
+    unread = models.PositiveIntegerField(default=0, verbose_name="未读数")
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread}"
+
+    class Meta:
+        verbose_name = "未读计数"
+        verbose_name_plural = verbose_name
@@ -0,0 +1,168 @@
+# notifications/outbox.py
+"""
+写入通知发件箱。
+
+调用方在修改对局状态的同一个事务中调用这里的函数，事务回滚时通知也不会留下；
+真正的投递由 notifications/delivery.py 中的 Celery 任务异步完成。
+每条消息按 (类型, 对局, 渠道, 接收人, 事件标识) 计算唯一的去重键，
+同一事件重复写入时被 bulk_create(ignore_conflicts=True) 直接忽略。
+开局提醒在对局成行时就写入，投递时间为开始前 NOTIFICATION_REMINDER_MINUTES 分钟，
+投递任务只按部分索引取到期消息，无需扫描对局表。
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from booking import metadata
+from booking.policy import BookingPolicy
+
+from .models import OutboxMessage
+
+
+def enabled_channels():
+    return list(getattr(settings, 'NOTIFICATION_CHANNELS', {}))
+
+
+def reminder_lead():
+    return datetime.timedelta(minutes=getattr(settings, 'NOTIFICATION_REMINDER_MINUTES', 60))
+
+
+def _dedupe_key(kind, booking_id, channel, recipient_id, event):
+    raw = f"{kind}:{booking_id}:{channel}:{recipient_id or ''}:{event}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _describe(booking):
+    """对局的门店、牌桌与本地时间描述，门店 / 牌桌来自元数据缓存。"""
+    store = metadata.get_store(booking.store_id)
+    table = metadata.store_directory().tables_by_id.get(booking.table_id)
+    start = timezone.localtime(booking.start_time)
+    end = timezone.localtime(booking.end_time)
+    return {
+        'store': store.name if store else "",
+        'table': table.display_label() if table else "未分配",
+        'time': f"{start:%m-%d %H:%M} - {end:%H:%M}",
+        'participants': "、".join(name for name in booking.participant_names if name) or "-",
+    }
+
+
+def _messages(kind, booking, user_ids, event, subject, body, next_attempt_at=None, emails=None):
+    """为一个事件在各启用的渠道上生成未保存的消息：邮件 / 站内信每个接收人一条，Webhook 每个事件一条。"""
+    when = next_attempt_at or timezone.now()
+    info = _describe(booking)
+    data = {
+        'kind': kind,
+        'booking_id': booking.pk,
+        'start_time': booking.start_time.isoformat(),
+        'store': info['store'],
+        'table': info['table'],
+        'user_ids': list(user_ids),
+    }
+    messages = []
+    for channel in enabled_channels():
+        if channel == 'webhook':
+            messages.append(OutboxMessage(
+                kind=kind, channel=channel, booking_id=booking.pk, subject=subject, body=body,
+                payload=data, next_attempt_at=when,
+                dedupe_key=_dedupe_key(kind, booking.pk, channel, None, event),
+            ))
+            continue
+        for user_id in user_ids:
+            payload = {'start_time': data['start_time']}
+            if channel == 'email':
+                address = (emails or {}).get(user_id)
+                if not address:
+                    continue
+                payload['to'] = address
+            messages.append(OutboxMessage(
+                kind=kind, channel=channel, recipient_id=user_id, booking_id=booking.pk,
+                subject=subject, body=body, payload=payload, next_attempt_at=when,
+                dedupe_key=_dedupe_key(kind, booking.pk, channel, user_id, event),
+            ))
+    return messages
+
+
+def _emails(user_ids):
+    if 'email' not in enabled_channels() or not user_ids:
+        return {}
+    return dict(
+        get_user_model().objects.filter(pk__in=set(user_ids)).exclude(email='').values_list('pk', 'email')
+    )
+
+
+def _save(messages):
+    OutboxMessage.objects.bulk_create(messages, ignore_conflicts=True, batch_size=500)
+    return len(messages)
+
+
+def bookings_confirmed(bookings):
+    """
+    对局成行：通知全部参与者，并写入开局提醒。参与者或开始时间不变时重复调用不会重复通知
+    （例如后台再次保存已成行的对局）。
+    """
+    bookings = list(bookings)
+    emails = _emails([user_id for booking in bookings for user_id in booking.participant_ids])
+    now = timezone.now()
+    messages = []
+    for booking in bookings:
+        info = _describe(booking)
+        start = int(booking.start_time.timestamp())
+        messages.extend(_messages(
+            'CONFIRMED', booking, booking.participant_ids,
+            f"{start}:{','.join(map(str, sorted(booking.participant_ids)))}",
+            f"对局已成行：{info['store']} {info['time']}",
+            f"您参与的对局已满 4 人成行。\n门店：{info['store']}\n牌桌：{info['table']}\n"
+            f"时间：{info['time']}\n参与者：{info['participants']}",
+            emails=emails,
+        ))
+        remind_at = booking.start_time - reminder_lead()
+        if remind_at > now:
+            minutes = int(reminder_lead().total_seconds() // 60)
+            messages.extend(_messages(
+                'REMINDER', booking, booking.participant_ids, start,
+                f"对局即将开始：{info['store']} {info['time']}",
+                f"您的对局将在 {minutes} 分钟后开始。\n门店：{info['store']}\n牌桌：{info['table']}\n"
+                f"时间：{info['time']}\n参与者：{info['participants']}",
+                next_attempt_at=remind_at, emails=emails,
+            ))
+    return _save(messages)
+
+
+def booking_confirmed(booking):
+    return bookings_confirmed([booking])
+
+
+def participant_left(booking, user):
+    """已成行的对局有人退出：通知留下的参与者，对局重新开放匹配。"""
+    info = _describe(booking)
+    remaining = [user_id for user_id in booking.participant_ids if user_id != user.pk]
+    name = user.display_name or user.username
+    return _save(_messages(
+        'PARTICIPANT_LEFT', booking, remaining,
+        f"{user.pk}:{int(timezone.now().timestamp())}",
+        f"有人退出了对局：{info['store']} {info['time']}",
+        f"{name} 退出了您参与的对局，该对局已重新开放匹配。\n门店：{info['store']}\n"
+        f"时间：{info['time']}\n当前参与者：{info['participants']}",
+        emails=_emails(remaining),
+    ))
+
+
+def bookings_expired(bookings):
+    """超过 BookingPolicy.pending_expiry_hours 仍未成行、被自动取消的预约：通知全部参与者。"""
+    bookings = list(bookings)
+    hours = BookingPolicy.current().pending_expiry_hours
+    emails = _emails([user_id for booking in bookings for user_id in booking.participant_ids])
+    messages = []
+    for booking in bookings:
+        info = _describe(booking)
+        messages.extend(_messages(
+            'EXPIRED', booking, booking.participant_ids, 'expired',
+            f"预约已过期：{info['store']} {info['time']}",
+            f"您参与的预约在 {hours} 小时内未凑满 4 人，已自动取消。\n门店：{info['store']}\n"
+            f"时间：{info['time']}\n参与者：{info['participants']}",
+            emails=emails,
+        ))
+    return _save(messages)
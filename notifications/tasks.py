@@ -0,0 +1,13 @@
+# notifications/tasks.py
+from celery import shared_task
+
+
+@shared_task
+def deliver_notifications():
+    """投递到期的通知（包括到点的开局提醒），由 Celery Beat 定期触发。"""
+    from .delivery import deliver_due
+
+    counts = deliver_due()
+    if not counts:
+        return "没有到期的通知。"
+    return "，".join(f"{name} {count} 条" for name, count in sorted(counts.items()))
@@ -0,0 +1,126 @@
+import datetime
+
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from booking.models import Booking, Store
+
+from . import inbox, outbox
+from .models import InboxCounter, InboxItem, OutboxMessage
+
+# 测试不依赖 Redis：缓存改用进程内的 LocMemCache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS)
+class InboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("player", password='pw')
+        self.client.force_login(self.user)
+        self.sent = 0
+
+    def deliver(self, count, user=None):
+        messages = []
+        for _ in range(count):
+            self.sent += 1
+            messages.append(OutboxMessage.objects.create(
+                kind='CONFIRMED', channel='inapp', recipient=user or self.user,
+                subject=f"消息{self.sent}", body="正文", dedupe_key=f"test:{self.sent}",
+            ))
+        # 未读数缓存在事务提交后才删除
+        with self.captureOnCommitCallbacks(execute=True):
+            inbox.deliver(messages)
+        return messages
+
+    def unread(self):
+        request = RequestFactory().get('/')
+        request.session = {SESSION_KEY: str(self.user.pk)}
+        return inbox.unread_count(request)
+
+    def test_unread_count_follows_deliver_and_mark_read(self):
+        messages = self.deliver(3)
+        self.assertEqual(self.unread(), 3)
+        # 重复投递不重复计数
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(inbox.deliver(messages), 0)
+        self.assertEqual(self.unread(), 3)
+
+        item = InboxItem.objects.filter(recipient=self.user).first()
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('inbox_mark_read', args=[item.pk]))
+            self.assertEqual(self.unread(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('inbox_mark_all_read'))
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(InboxItem.objects.filter(recipient=self.user, read_at__isnull=True).exists())
+
+    def test_other_users_items_are_not_marked(self):
+        other = CustomUser.objects.create_user("other", password='pw')
+        self.deliver(1, user=other)
+        item = InboxItem.objects.get(recipient=other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('inbox_mark_read', args=[item.pk]))
+        self.assertEqual(InboxCounter.objects.get(user=other).unread, 1)
+
+    def test_cold_cache_reads_counter(self):
+        self.deliver(2)
+        self.assertEqual(self.unread(), 2)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread(), 2)
+        # 之后命中缓存，不再查询
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 2)
+
+    @override_settings(NOTIFICATION_INBOX_PAGE_SIZE=10)
+    def test_keyset_pages_are_stable(self):
+        self.deliver(25)
+        first = self.client.get(reverse('inbox'))
+        first_ids = [item.pk for item in first.context['items']]
+        self.assertEqual(len(first_ids), 10)
+        self.assertEqual(first_ids, sorted(first_ids, reverse=True))
+
+        # 翻页之前又来了新消息：下一页按 before 定位，不受影响
+        self.deliver(3)
+        second = self.client.get(reverse('inbox'), {'before': first.context['next_before']})
+        second_ids = [item.pk for item in second.context['items']]
+        self.assertEqual(len(second_ids), 10)
+        self.assertFalse(set(first_ids) & set(second_ids))
+        self.assertLess(max(second_ids), min(first_ids))
+        self.assertEqual(max(second_ids), min(first_ids) - 1)
+
+        last = self.client.get(reverse('inbox'), {'before': second.context['next_before']})
+        self.assertEqual(len(last.context['items']), 5)
+        self.assertIsNone(last.context['next_before'])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS,
+    NOTIFICATION_CHANNELS={'inapp': {'BACKEND': 'notifications.backends.InAppBackend'}},
+)
+class OutboxMessageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("player", password='pw')
+        store = Store.objects.create(name="门店", address="地址")
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.booking = Booking.objects.create(
+            creator=self.user, store=store, num_games=1,
+            start_time=start, end_time=start + datetime.timedelta(hours=1),
+        )
+        self.booking.participants.add(self.user)
+
+    @override_settings(BOOKING_PENDING_EXPIRY_HOURS=6)
+    def test_expired_message_uses_policy_hours(self):
+        outbox.bookings_expired([self.booking])
+        message = OutboxMessage.objects.get(kind='EXPIRED', recipient=self.user)
+        self.assertIn("6 小时内未凑满 4 人", message.body)
+        self.assertNotIn("24 小时", message.body)
@@ -0,0 +1,10 @@
+# notifications/urls.py
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('', views.inbox_view, name='inbox'),
+    path('<int:item_id>/read/', views.mark_read_view, name='inbox_mark_read'),
+    path('read-all/', views.mark_all_read_view, name='inbox_mark_all_read'),
+]
@@ -0,0 +1,37 @@
+# notifications/views.py
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+from . import inbox
+
+
+@login_required
+def inbox_view(request):
+    try:
+        before = int(request.GET.get('before', ''))
+    except ValueError:
+        before = None
+    items, next_before = inbox.page(request.user.pk, before=before)
+    return render(request, 'notifications/inbox.html', {
+        'items': items,
+        'next_before': next_before,
+        'is_first_page': before is None,
+    })
+
+
+@login_required
+@require_POST
+def mark_read_view(request, item_id):
+    inbox.mark_read(request.user.pk, item_id)
+    return redirect('inbox')
+
+
+@login_required
+@require_POST
+def mark_all_read_view(request):
+    updated = inbox.mark_all_read(request.user.pk)
+    if updated:
+        messages.success(request, f'已将 {updated} 条消息标记为已读。')
+    return redirect('inbox')
@@ -0,0 +1,66 @@
+from django.contrib import admin
+
+from . import rating
+from .forms import GameScoreFormSet
+from .models import GameResult, GameScore, PlayerRating
+
+
+class GameScoreInline(admin.TabularInline):
+    model = GameScore
+    formset = GameScoreFormSet
+    extra = 4
+    max_num = 4
+    raw_id_fields = ('player',)
+    fields = ('seat', 'player', 'score', 'placement')
+    readonly_fields = ('placement',)
+
+
+@admin.register(GameResult)
+class GameResultAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'store', 'created_at', 'recorded_by')
+    list_filter = ('store',)
+    list_select_related = ('store', 'recorded_by')
+    raw_id_fields = ('booking',)
+    date_hierarchy = 'created_at'
+    inlines = [GameScoreInline]
+
+    # 结果录入后立即计入 Rating，不能再修改；录错时删除后重新录入
+    def has_change_permission(self, request, obj=None):
+        return obj is None and super().has_change_permission(request, obj)
+
+    def save_model(self, request, obj, form, change):
+        obj.recorded_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if not change:
+            rating.apply_result(form.instance)
+
+    def _recompute(self, request):
+        stats = rating.recompute()
+        self.message_user(request, f"已按剩余的 {stats['games']} 个半庄重新计算 Rating 与排行榜。")
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._recompute(request)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self._recompute(request)
+
+
+@admin.register(PlayerRating)
+class PlayerRatingAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'user', 'scope', 'rating', 'games', 'first_count', 'fourth_count', 'updated_at')
+    list_filter = ('scope',)
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'user__display_name')
+    ordering = ('scope', 'rank')
+
+    # Rating 只由录入结果与 recompute_ratings 命令维护
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
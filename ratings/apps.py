@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class RatingsConfig(AppConfig):
+    name = 'ratings'
+    verbose_name = '战绩与排行'
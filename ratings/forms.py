@@ -0,0 +1,26 @@
+# ratings/forms.py
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+class GameScoreFormSet(forms.BaseInlineFormSet):
+    """一个半庄必须恰好录入四位参与者的终局点数，座位不重复，点数合计符合规则。"""
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        rows = [form.cleaned_data for form in self.forms if form.cleaned_data and not form.cleaned_data.get('DELETE')]
+        if len(rows) != 4:
+            raise ValidationError("请录入全部四位玩家的终局点数。")
+        if len({row['player'].pk for row in rows}) != 4 or len({row['seat'] for row in rows}) != 4:
+            raise ValidationError("玩家与座位都不能重复。")
+        booking = getattr(self.instance, 'booking', None)
+        if booking is not None:
+            outsiders = [row['player'] for row in rows if row['player'].pk not in booking.participant_ids]
+            if outsiders:
+                raise ValidationError(f"{'、'.join(map(str, outsiders))} 不是该对局的参与者。")
+        total = getattr(settings, 'RATINGS_TOTAL_POINTS', None)
+        if total is not None and sum(row['score'] for row in rows) != total:
+            raise ValidationError(f"四人终局点数合计应为 {total}（供托未取回的点棒请计入一位）。")
@@ -0,0 +1,27 @@
+# ratings/management/commands/recompute_ratings.py
+"""
+按录入顺序重放全部半庄结果，重建全局 / 门店 Rating 与排行榜名次（见 ratings/rating.py）。
+修改 Rating 规则或修复数据后运行：
+
+    python manage.py recompute_ratings
+"""
+from django.core.management.base import BaseCommand
+
+from ratings.rating import recompute
+
+
+class Command(BaseCommand):
+    help = "按录入顺序重放全部半庄结果，重建 Rating 与排行榜。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="每批写入的行数")
+
+    def handle(self, *args, batch_size, **options):
+        stats = recompute(batch_size=batch_size)
+        message = (
+            f"重放 {stats['games']} 个半庄（{stats['levels']} 批），{stats['players']} 位玩家，"
+            f"用时 {stats['seconds']:.2f} 秒。"
+        )
+        if stats['skipped']:
+            message += f" 跳过 {stats['skipped']} 个不足四人的半庄。"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,103 @@
+# Generated by Django 5.2 on 2026-10-19 03:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('booking', '0006_booking_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('scope', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='范围')),
+                ('players', models.PositiveIntegerField(default=0, verbose_name='人数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '排行榜',
+                'verbose_name_plural': '排行榜',
+            },
+        ),
+        migrations.CreateModel(
+            name='GameResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_number', models.PositiveSmallIntegerField(default=1, verbose_name='第几个半庄')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='录入时间')),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='booking.booking', verbose_name='对局')),
+                ('recorded_by', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='录入人')),
+                ('store', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='booking.store', verbose_name='门店')),
+            ],
+            options={
+                'verbose_name': '半庄结果',
+                'verbose_name_plural': '半庄结果',
+            },
+        ),
+        migrations.CreateModel(
+            name='GameScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seat', models.PositiveSmallIntegerField(choices=[(0, '东'), (1, '南'), (2, '西'), (3, '北')], verbose_name='座位')),
+                ('score', models.IntegerField(verbose_name='终局点数')),
+                ('placement', models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='名次')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='玩家')),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='ratings.gameresult', verbose_name='半庄')),
+            ],
+            options={
+                'verbose_name': '终局点数',
+                'verbose_name_plural': '终局点数',
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.PositiveIntegerField(verbose_name='范围')),
+                ('rating', models.FloatField(verbose_name='Rating')),
+                ('games', models.PositiveIntegerField(default=0, verbose_name='半庄数')),
+                ('placement_sum', models.PositiveIntegerField(default=0, verbose_name='名次合计')),
+                ('first_count', models.PositiveIntegerField(default=0, verbose_name='一位次数')),
+                ('fourth_count', models.PositiveIntegerField(default=0, verbose_name='四位次数')),
+                ('rank', models.PositiveIntegerField(verbose_name='名次')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='玩家')),
+            ],
+            options={
+                'verbose_name': '玩家 Rating',
+                'verbose_name_plural': '玩家 Rating',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gameresult',
+            constraint=models.UniqueConstraint(fields=('booking', 'game_number'), name='unique_game_result'),
+        ),
+        migrations.AddConstraint(
+            model_name='gamescore',
+            constraint=models.UniqueConstraint(fields=('result', 'player'), name='unique_score_player'),
+        ),
+        migrations.AddConstraint(
+            model_name='gamescore',
+            constraint=models.UniqueConstraint(fields=('result', 'seat'), name='unique_score_seat'),
+        ),
+        migrations.AddIndex(
+            model_name='playerrating',
+            index=models.Index(fields=['scope', 'rank'], name='rating_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerrating',
+            index=models.Index(fields=['scope', '-rating', 'user'], name='rating_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='playerrating',
+            constraint=models.UniqueConstraint(fields=('scope', 'user'), name='unique_rating_scope_user'),
+        ),
+    ]
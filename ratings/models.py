@@ -0,0 +1,115 @@
+# ratings/models.py
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+
+# PlayerRating / Leaderboard 的 scope：0 表示全局，其余为门店 ID
+GLOBAL_SCOPE = 0
+
+
+# 一个半庄的结果，四位参与者的终局点数见 GameScore
+class GameResult(models.Model):
+    booking = models.ForeignKey('booking.Booking', on_delete=models.CASCADE, related_name='results', verbose_name="对局")
+    game_number = models.PositiveSmallIntegerField(default=1, verbose_name="第几个半庄")
+    # 冗余保存门店，重算门店排行时无需关联对局表
+    store = models.ForeignKey('booking.Store', on_delete=models.CASCADE, related_name='+', editable=False, verbose_name="门店")
+    recorded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', editable=False, verbose_name="录入人",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="录入时间")
+
+    def clean(self):
+        super().clean()
+        booking = getattr(self, 'booking', None)
+        if booking is None:
+            return
+        if booking.status != 'CONFIRMED':
+            raise ValidationError({'booking': "只能为已成行的对局录入结果。"})
+        if booking.num_games and self.game_number > booking.num_games:
+            raise ValidationError({'game_number': f"该对局只有 {booking.num_games} 个半庄。"})
+
+    def save(self, *args, **kwargs):
+        self.store_id = self.booking.store_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.booking_id} 号对局 第 {self.game_number} 个半庄"
+
+    class Meta:
+        verbose_name = "半庄结果"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['booking', 'game_number'], name='unique_game_result'),
+        ]
+
+
+class GameScore(models.Model):
+    SEAT_CHOICES = [(0, '东'), (1, '南'), (2, '西'), (3, '北')]
+
+    result = models.ForeignKey(GameResult, on_delete=models.CASCADE, related_name='scores', verbose_name="半庄")
+    player = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name="玩家")
+    # 起家座位，点数相同时座位靠前者名次在前
+    seat = models.PositiveSmallIntegerField(choices=SEAT_CHOICES, verbose_name="座位")
+    score = models.IntegerField(verbose_name="终局点数")
+    # 由 ratings/rating.py 在计入 Rating 时写入
+    placement = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="名次")
+
+    def __str__(self):
+        return f"{self.get_seat_display()} {self.score}"
+
+    class Meta:
+        verbose_name = "终局点数"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['result', 'player'], name='unique_score_player'),
+            models.UniqueConstraint(fields=['result', 'seat'], name='unique_score_seat'),
+        ]
+
+
+# 玩家在全局或某个门店的 Rating 与名次。名次随每个半庄增量维护（见 ratings/rating.py），
+# 排行榜只需按 (scope, rank) 索引取前 N 行，不对整张表排序
+class PlayerRating(models.Model):
+    scope = models.PositiveIntegerField(verbose_name="范围")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name="玩家")
+    rating = models.FloatField(verbose_name="Rating")
+    games = models.PositiveIntegerField(default=0, verbose_name="半庄数")
+    placement_sum = models.PositiveIntegerField(default=0, verbose_name="名次合计")
+    first_count = models.PositiveIntegerField(default=0, verbose_name="一位次数")
+    fourth_count = models.PositiveIntegerField(default=0, verbose_name="四位次数")
+    rank = models.PositiveIntegerField(verbose_name="名次")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    @property
+    def average_placement(self):
+        return self.placement_sum / self.games if self.games else None
+
+    def __str__(self):
+        return f"{self.scope}#{self.rank} {self.user_id} ({self.rating:.0f})"
+
+    class Meta:
+        verbose_name = "玩家 Rating"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'user'], name='unique_rating_scope_user'),
+        ]
+        indexes = [
+            # 排行榜分页；名次在移动时会整段平移，因此不能是唯一索引
+            models.Index(fields=['scope', 'rank'], name='rating_rank_idx'),
+            # Rating 变化后按 (Rating 降序, 用户 ID) 定位新名次
+            models.Index(fields=['scope', '-rating', 'user'], name='rating_order_idx'),
+        ]
+
+
+# 每个排行范围一行：记录人数，并在更新 Rating 时加行锁，同一范围的名次调整串行执行
+class Leaderboard(models.Model):
+    scope = models.PositiveIntegerField(primary_key=True, verbose_name="范围")
+    players = models.PositiveIntegerField(default=0, verbose_name="人数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    def __str__(self):
+        return f"排行榜 {self.scope}"
+
+    class Meta:
+        verbose_name = "排行榜"
+        verbose_name_plural = verbose_name
@@ -0,0 +1,263 @@
+# ratings/rating.py
+"""
+天凤式 Rating 与排行榜名次。
+
+每个半庄结束后，每位玩家的 Rating 变化为::
+
+    修正系数 × (名次分 + (同桌平均 Rating - 自己的 Rating) / 40)
+
+名次分为 +30 / +10 / -10 / -30；修正系数为 max(1 - 已打半庄数 × 0.002, 0.2)，新玩家变化大、
+老玩家逐渐稳定。初始 Rating 为 1500。全局与每个门店各自维护一套 Rating。
+
+  * 增量更新（apply_result）：录入一个半庄只读写这四位玩家在全局与所在门店的两行记录，
+    与历史半庄数无关。名次保存在 PlayerRating.rank 中：Rating 变化后用索引定位新位置，
+    再用一条 UPDATE 把新旧名次之间的玩家整体平移一位，通常只涉及名次相近的少数行；
+  * 全量重算（recompute）：按录入顺序重放全部半庄。每个半庄的「层」为其四位玩家上一个
+    半庄所在层的最大值加 1，同一层内的半庄没有共同玩家，可以用 NumPy 整批计算，
+    结果与逐个增量更新相同。
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import GLOBAL_SCOPE, GameScore, Leaderboard, PlayerRating
+
+INITIAL_RATING = 1500.0
+PLACEMENT_POINTS = (30.0, 10.0, -10.0, -30.0)
+CORRECTION_STEP = 0.002
+MIN_CORRECTION = 0.2
+RATING_DIVISOR = 40.0
+
+RATING_FIELDS = ['rating', 'rank', 'games', 'placement_sum', 'first_count', 'fourth_count', 'updated_at']
+
+
+def placements(scores):
+    """scores 为 [(座位, 点数)]，返回与输入同序的名次（1-4）。点数相同时座位靠前者在前。"""
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i][1], scores[i][0]))
+    result = [0] * len(scores)
+    for place, index in enumerate(order, 1):
+        result[index] = place
+    return result
+
+
+def correction(games):
+    return max(1 - games * CORRECTION_STEP, MIN_CORRECTION)
+
+
+def rating_deltas(ratings, games, places):
+    """同桌四人的 Rating、已打半庄数与名次 -> 各自的 Rating 变化。"""
+    average = sum(ratings) / len(ratings)
+    return [
+        correction(count) * (PLACEMENT_POINTS[place - 1] + (average - rating) / RATING_DIVISOR)
+        for rating, count, place in zip(ratings, games, places)
+    ]
+
+
+def _lock_boards(scopes):
+    Leaderboard.objects.bulk_create([Leaderboard(scope=scope) for scope in scopes], ignore_conflicts=True)
+    # 固定按 scope 顺序加锁，避免并发录入时死锁
+    return {
+        board.scope: board
+        for board in Leaderboard.objects.select_for_update().filter(scope__in=scopes).order_by('scope')
+    }
+
+
+def _target_rank(board, row, rating):
+    """row 的 Rating 变为 rating 后的名次：找到排在它后面的第一位玩家（两次索引查找）。"""
+    others = PlayerRating.objects.filter(scope=board.scope).exclude(pk=row.pk)
+    behind = (
+        others.filter(rating=rating, user_id__gt=row.user_id).order_by('user_id')
+        .values_list('rank', flat=True).first()
+    )
+    if behind is None:
+        behind = (
+            others.filter(rating__lt=rating).order_by('-rating', 'user_id')
+            .values_list('rank', flat=True).first()
+        )
+    if behind is None:
+        return board.players
+    return behind - 1 if behind > row.rank else behind
+
+
+def _move(board, row, rating, loaded):
+    """
+    把 row 移到 Rating 对应的名次并保存。中间的玩家用一条 UPDATE 平移一位，
+    loaded 中其他已加载的行同步调整内存中的名次。
+    """
+    old = row.rank
+    target = _target_rank(board, row, rating)
+    ranks = PlayerRating.objects.filter(scope=board.scope).exclude(pk=row.pk)
+    if target > old:
+        ranks.filter(rank__gt=old, rank__lte=target).update(rank=F('rank') - 1)
+        low, high, step = old + 1, target, -1
+    elif target < old:
+        ranks.filter(rank__gte=target, rank__lt=old).update(rank=F('rank') + 1)
+        low, high, step = target, old - 1, 1
+    else:
+        low, high, step = 1, 0, 0
+    for other in loaded:
+        if other is not row and low <= other.rank <= high:
+            other.rank += step
+    row.rank, row.rating = target, rating
+    row.save(update_fields=RATING_FIELDS)
+
+
+def _rows(board, user_ids):
+    """取出（必要时创建）玩家在该范围的记录。新玩家先排到末尾，再按初始 Rating 移到对应名次。"""
+    rows = {row.user_id: row for row in PlayerRating.objects.filter(scope=board.scope, user_id__in=user_ids)}
+    for user_id in user_ids:
+        if user_id not in rows:
+            board.players += 1
+            row = PlayerRating.objects.create(
+                scope=board.scope, user_id=user_id, rating=INITIAL_RATING, rank=board.players,
+            )
+            rows[user_id] = row
+            _move(board, row, INITIAL_RATING, list(rows.values()))
+    return [rows[user_id] for user_id in user_ids]
+
+
+def apply_result(result):
+    """录入一个半庄后调用：计算名次，更新四位玩家的全局与门店 Rating 及名次。"""
+    with transaction.atomic():
+        scores = list(result.scores.order_by('seat'))
+        places = placements([(score.seat, score.score) for score in scores])
+        user_ids = [score.player_id for score in scores]
+        boards = _lock_boards(sorted({GLOBAL_SCOPE, result.store_id}))
+        for scope in (GLOBAL_SCOPE, result.store_id):
+            board = boards[scope]
+            rows = _rows(board, user_ids)
+            deltas = rating_deltas([row.rating for row in rows], [row.games for row in rows], places)
+            for row, delta, place in zip(rows, deltas, places):
+                row.games += 1
+                row.placement_sum += place
+                row.first_count += place == 1
+                row.fourth_count += place == 4
+                _move(board, row, row.rating + delta, rows)
+            board.save(update_fields=['players', 'updated_at'])
+        for score, place in zip(scores, places):
+            score.placement = place
+        GameScore.objects.bulk_update(scores, ['placement'])
+
+
+def _levels(players):
+    """每个半庄所在的层：其玩家上一个半庄所在层的最大值加 1（按录入顺序一次遍历）。"""
+    last = {}
+    levels = []
+    for table in players:
+        level = max(last.get(player, 0) for player in table) + 1
+        for player in table:
+            last[player] = level
+        levels.append(level)
+    return levels
+
+
+def _replay(players, places, size, levels):
+    """按层重放：players / places 为 (半庄数, 4) 的数组，返回每位玩家的 (Rating, 半庄数)。"""
+    import numpy as np
+
+    points = np.array(PLACEMENT_POINTS)
+    ratings = np.full(size, INITIAL_RATING)
+    games = np.zeros(size, dtype=np.int64)
+    order = np.argsort(levels, kind='stable')
+    bounds = np.flatnonzero(np.diff(levels[order])) + 1
+    for batch in np.split(order, bounds):
+        table = players[batch]
+        current = ratings[table]
+        factor = np.maximum(1 - games[table] * CORRECTION_STEP, MIN_CORRECTION)
+        average = current.sum(axis=1, keepdims=True) / 4
+        change = factor * (points[places[batch] - 1] + (average - current) / RATING_DIVISOR)
+        # 同一层内没有重复玩家，花式索引赋值不会相互覆盖
+        ratings[table] = current + change
+        games[table] += 1
+    return ratings, games
+
+
+def _ranks(scopes, users, ratings):
+    """按 (范围, Rating 降序, 用户 ID) 排序，返回每行在所属范围内的名次（从 1 开始）。"""
+    import numpy as np
+
+    order = np.lexsort((users, -ratings, scopes))
+    sorted_scopes = scopes[order]
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.searchsorted(sorted_scopes, sorted_scopes) + 1
+    return ranks
+
+
+def recompute(batch_size=2000):
+    """按录入顺序重放全部半庄，重建 PlayerRating 与 Leaderboard（名次已在录入时写入终局点数）。"""
+    import numpy as np
+
+    started = time.perf_counter()
+    rows = GameScore.objects.order_by('result_id', 'seat').values_list(
+        'result_id', 'result__store_id', 'player_id', 'seat', 'score',
+    )
+    data = np.array(list(rows.iterator(chunk_size=10000)), dtype=np.int64).reshape(-1, 5)
+    # 只重放恰好有四位玩家的半庄
+    _, counts = np.unique(data[:, 0], return_counts=True)
+    complete = np.repeat(counts == 4, counts)
+    data = data[complete]
+    games = data.reshape(-1, 4, 5)
+    stores = games[:, 0, 1]
+
+    # 名次：点数降序、座位升序
+    key = -games[:, :, 4] * 4 + games[:, :, 3]
+    places = np.argsort(np.argsort(key, axis=1, kind='stable'), axis=1) + 1
+
+    users, players = np.unique(games[:, :, 2], return_inverse=True)
+    players = players.reshape(-1, 4)
+    levels = np.array(_levels(players.tolist()), dtype=np.int64)
+
+    # 全局
+    global_ratings, global_games = _replay(players, places, len(users), levels)
+    # 门店：每个 (门店, 玩家) 组合视为一名玩家；同一层在全局无共同玩家，在门店内也没有
+    pair_keys = stores[:, None] * (len(users) + 1) + players
+    pairs, pair_players = np.unique(pair_keys, return_inverse=True)
+    pair_players = pair_players.reshape(-1, 4)
+    store_ratings, store_games = _replay(pair_players, places, len(pairs), levels)
+    pair_stores, pair_users = pairs // (len(users) + 1), users[pairs % (len(users) + 1)]
+
+    def totals(index, size):
+        flat_index, flat_places = index.ravel(), places.ravel()
+        return (
+            np.bincount(flat_index, weights=flat_places, minlength=size).astype(np.int64),
+            np.bincount(flat_index[flat_places == 1], minlength=size),
+            np.bincount(flat_index[flat_places == 4], minlength=size),
+        )
+
+    scopes = np.concatenate([np.full(len(users), GLOBAL_SCOPE), pair_stores])
+    scope_users = np.concatenate([users, pair_users])
+    ratings = np.concatenate([global_ratings, store_ratings])
+    game_counts = np.concatenate([global_games, store_games])
+    placement_sums, firsts, fourths = (
+        np.concatenate(pair) for pair in zip(totals(players, len(users)), totals(pair_players, len(pairs)))
+    )
+    ranks = _ranks(scopes, scope_users, ratings)
+
+    with transaction.atomic():
+        PlayerRating.objects.all().delete()
+        PlayerRating.objects.bulk_create(
+            (
+                PlayerRating(
+                    scope=scope, user_id=user_id, rating=rating, games=count, placement_sum=placement_sum,
+                    first_count=first, fourth_count=fourth, rank=rank,
+                )
+                for scope, user_id, rating, count, placement_sum, first, fourth, rank in zip(
+                    scopes.tolist(), scope_users.tolist(), ratings.tolist(), game_counts.tolist(),
+                    placement_sums.tolist(), firsts.tolist(), fourths.tolist(), ranks.tolist(),
+                )
+            ),
+            batch_size=batch_size,
+        )
+        board_scopes, board_sizes = np.unique(scopes, return_counts=True)
+        Leaderboard.objects.all().delete()
+        Leaderboard.objects.bulk_create(
+            [Leaderboard(scope=scope, players=size) for scope, size in zip(board_scopes.tolist(), board_sizes.tolist())]
+        )
+    return {
+        'games': len(games),
+        'skipped': int((counts != 4).sum()),
+        'players': len(users),
+        'levels': int(levels.max()) if len(levels) else 0,
+        'seconds': time.perf_counter() - started,
+    }
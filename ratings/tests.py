@@ -0,0 +1,75 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from booking.models import Booking, Store
+
+from . import rating
+from .models import GLOBAL_SCOPE, GameResult, GameScore, Leaderboard, PlayerRating
+
+# 测试不依赖 Redis：缓存改用进程内的 LocMemCache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS)
+class IncrementalRatingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stores = [Store.objects.create(name=f"门店{i}", address="地址") for i in range(2)]
+        self.players = [CustomUser.objects.create_user(f"player{i}", password='pw') for i in range(8)]
+        self.start = timezone.now() - datetime.timedelta(days=1)
+
+    def record(self, store, players, scores):
+        booking = Booking.objects.create(
+            creator=players[0], store=store, status='CONFIRMED', num_games=1,
+            start_time=self.start, end_time=self.start + datetime.timedelta(hours=1),
+        )
+        result = GameResult.objects.create(booking=booking)
+        GameScore.objects.bulk_create([
+            GameScore(result=result, player=player, seat=seat, score=score)
+            for seat, (player, score) in enumerate(zip(players, scores))
+        ])
+        rating.apply_result(result)
+
+    def snapshot(self):
+        return {
+            (row.scope, row.user_id): (
+                row.rating, row.rank, row.games, row.placement_sum, row.first_count, row.fourth_count,
+            )
+            for row in PlayerRating.objects.all()
+        }, dict(Leaderboard.objects.values_list('scope', 'players'))
+
+    def test_incremental_matches_recompute(self):
+        p = self.players
+        a, b = self.stores
+        self.record(a, p[0:4], [40000, 30000, 20000, 10000])
+        # 另一桌新玩家打出相同的名次：全局 Rating 与上一桌完全相同，名次按用户 ID 排
+        self.record(b, p[4:8], [40000, 30000, 20000, 10000])
+        # 点数全部相同：名次按座位；p4、p5 是门店 a 的新玩家
+        self.record(a, [p[0], p[1], p[4], p[5]], [25000, 25000, 25000, 25000])
+        self.record(b, [p[2], p[3], p[6], p[7]], [10000, 20000, 30000, 40000])
+        self.record(a, [p[7], p[5], p[2], p[0]], [31000, 31000, 19000, 19000])
+
+        incremental, boards = self.snapshot()
+        global_rows = sorted(
+            (values for (scope, _), values in incremental.items() if scope == GLOBAL_SCOPE), key=lambda v: v[1],
+        )
+        self.assertEqual([values[1] for values in global_rows], list(range(1, 9)))
+        self.assertEqual(boards, {GLOBAL_SCOPE: 8, a.id: 7, b.id: 6})
+
+        rating.recompute()
+        self.assertEqual(self.snapshot(), (incremental, boards))
+
+    def test_rating_ties_rank_by_user_id(self):
+        p = self.players
+        self.record(self.stores[0], p[0:4], [40000, 30000, 20000, 10000])
+        self.record(self.stores[1], p[4:8], [40000, 30000, 20000, 10000])
+        rows = PlayerRating.objects.filter(scope=GLOBAL_SCOPE).order_by('rank')
+        self.assertEqual(
+            [row.user_id for row in rows],
+            [p[0].id, p[4].id, p[1].id, p[5].id, p[2].id, p[6].id, p[3].id, p[7].id],
+        )
@@ -0,0 +1,9 @@
+# ratings/urls.py
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('', views.leaderboard_view, name='leaderboard'),
+    path('store/<int:store_id>/', views.leaderboard_view, name='store_leaderboard'),
+]
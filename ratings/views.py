@@ -0,0 +1,35 @@
+# ratings/views.py
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import render
+
+from booking import metadata
+from booking.db_routing import read_replica
+
+from .models import GLOBAL_SCOPE, PlayerRating
+
+
+@read_replica
+def leaderboard_view(request, store_id=None):
+    store = None
+    if store_id is not None:
+        store = metadata.get_store(store_id)
+        if store is None:
+            raise Http404("门店不存在。")
+    scope = store_id if store_id is not None else GLOBAL_SCOPE
+    size = getattr(settings, 'RATINGS_LEADERBOARD_SIZE', 100)
+    # 名次已预先维护，按 (scope, rank) 索引读取前 N 行
+    entries = list(
+        PlayerRating.objects.filter(scope=scope, rank__lte=size).order_by('rank').select_related('user')
+    )
+    mine = None
+    if request.user.is_authenticated:
+        mine = next((entry for entry in entries if entry.user_id == request.user.pk), None)
+        if mine is None:
+            mine = PlayerRating.objects.filter(scope=scope, user_id=request.user.pk).first()
+    return render(request, 'ratings/leaderboard.html', {
+        'store': store,
+        'stores': metadata.store_directory().stores,
+        'entries': entries,
+        'mine': mine,
+    })
@@ -0,0 +1,122 @@
+"""
+基准测试公共工具：配置 Django、创建一次性测试数据库、批量生成测试数据。
+各基准脚本在导入本模块后即可直接使用 ORM，不会写入开发/生产数据库。
+
+缓存默认换成进程内的 LocMemCache：setup_database() 会清空缓存，不能作用于共享的 Redis。
+需要测量 Redis 时设置 MAHJONG_BENCH_REDIS_URL 指向一个专用的库（例如 redis://localhost:6379/15），
+该库的内容会被清空。
+"""
+import datetime
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from booking.models import Booking, MahjongTable, Store  # noqa: E402
+
+if os.environ.get('MAHJONG_BENCH_REDIS_URL'):
+    BENCH_CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['MAHJONG_BENCH_REDIS_URL'],
+    }}
+else:
+    BENCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+override_settings(CACHES=BENCH_CACHES).enable()
+
+
+def setup_database():
+    """创建测试数据库（SQLite 下为内存库）并清空缓存。设置了 TEST['MIRROR'] 的别名（只读副本）指向同一个库。"""
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    for alias in connections:
+        mirror = connections[alias].settings_dict.get('TEST', {}).get('MIRROR')
+        if mirror:
+            connections[alias].close()
+            connections[alias].creation.set_as_test_mirror(connections[mirror].settings_dict)
+    cache.clear()
+
+
+def seed(stores=4, tables_per_store=8, users=64, bookings_per_table=6, start=None, seed_value=42):
+    """
+    批量写入门店、牌桌、用户与已成行对局。对局以 start 为起点，每张桌子
+    按 bookings_per_table 个连续时段排布，参与者随机抽取 4 人。
+    返回 (门店列表, 牌桌列表, 用户列表)。
+    """
+    rng = random.Random(seed_value)
+    start = start or timezone.now().replace(minute=0, second=0, microsecond=0)
+    User = get_user_model()
+
+    store_objs = Store.objects.bulk_create(
+        [Store(name=f"门店{i}", address=f"地址{i}") for i in range(stores)]
+    )
+    table_objs = MahjongTable.objects.bulk_create([
+        MahjongTable(store=store, table_number=f"{store.name} - {idx + 1}")
+        for store in store_objs
+        for idx in range(tables_per_store)
+    ])
+    user_objs = User.objects.bulk_create([
+        User(username=f"player{i}", display_name=f"玩家{i}") for i in range(users)
+    ])
+
+    bookings = []
+    for table in table_objs:
+        for slot in range(bookings_per_table):
+            slot_start = start + datetime.timedelta(hours=3 * slot - 1)
+            players = rng.sample(user_objs, min(4, len(user_objs)))
+            bookings.append(Booking(
+                creator=rng.choice(user_objs),
+                store_id=table.store_id,
+                table=table,
+                start_time=slot_start,
+                end_time=slot_start + datetime.timedelta(hours=3),
+                num_games=4,
+                status='CONFIRMED',
+                # bulk_create 不触发 m2m_changed，直接写入反范式化名单
+                participant_ids=[user.id for user in players],
+                participant_names=[user.display_name for user in players],
+                participant_count=len(players),
+            ))
+    bookings = Booking.objects.bulk_create(bookings, batch_size=2000)
+
+    through = Booking.participants.through
+    links = []
+    for booking in bookings:
+        for user_id in booking.participant_ids:
+            links.append(through(booking_id=booking.id, customuser_id=user_id))
+    through.objects.bulk_create(links, batch_size=5000)
+    return store_objs, table_objs, user_objs
+
+
+def measure(func, repeat=50):
+    """执行 func repeat 次，返回 (每次平均墙钟秒数, 每次平均 CPU 秒数)。"""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(repeat):
+        func()
+    return (
+        (time.perf_counter() - wall_start) / repeat,
+        (time.process_time() - cpu_start) / repeat,
+    )
+
+
+def report(title, rows):
+    """打印简单的对齐表格。rows 为 (名称, 值) 列表。"""
+    print(f"\n== {title} ==")
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f"  {name.ljust(width)}  {value}")
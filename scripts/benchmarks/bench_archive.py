@@ -0,0 +1,148 @@
+"""
+基准：已完成对局的列式归档（1000 万条对局，约两年，50 个门店 × 10 张牌桌）。
+
+直接用 NumPy 生成数据、按月追加为段（不经过数据库），然后报告：打开归档、按日期范围扫描
+（一天 / 一周单个门店 / 一个月）时跳过的段数、耗时与常驻内存增量，整个归档流式聚合的耗时，
+以及每晚追加一天的数据、合并已结束月份的段的耗时。数据写在临时目录中，结束后删除。
+
+运行方式：python scripts/benchmarks/bench_archive.py
+"""
+import datetime
+import resource
+import shutil
+import tempfile
+import time
+
+from _bootstrap import report, setup_database
+
+import numpy as np
+
+from booking import archive
+
+ROWS = 10_000_000
+STORES = 50
+TABLES = 10
+DAYS = 730
+SEATS = 4
+
+
+def generate(rng, rows, first, days):
+    """rows 条对局，开始时间均匀分布在 first 起的 days 天内，时长 1 ~ 4 小时。"""
+    starts = np.sort(rng.integers(first, first + days * 86400, rows))
+    tables = rng.integers(0, STORES * TABLES, rows)
+    return {
+        'id': np.arange(rows, dtype=np.int64),
+        'store': (tables // TABLES + 1).astype(np.int32),
+        'table': (tables + 1).astype(np.int32),
+        'start': starts,
+        'end': starts + rng.integers(1, 5, rows) * 3600,
+        'participants': rng.integers(1, 5000, (rows, SEATS)).astype(np.int32),
+    }
+
+
+def rss_mb():
+    """当前常驻内存（含已读入的映射页）；没有 /proc 时退回峰值。"""
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def range_totals(store, start, end, stores):
+    """范围内的对局数与牌桌小时数（读到每一行的开始 / 结束时间）。"""
+    count = seconds = 0
+    for chunk in store.scan(start, end, columns=('start', 'end'), stores=stores):
+        count += len(chunk['start'])
+        seconds += int((chunk['end'] - chunk['start']).sum())
+    return count, seconds / 3600
+
+
+def timed(func, repeat=5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    setup_database()
+    root = tempfile.mkdtemp(prefix='booking-archive-')
+    try:
+        rng = np.random.default_rng(3)
+        first = int(datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+        started = time.perf_counter()
+        per_day = ROWS // DAYS
+        # 按月生成、追加，避免一次在内存中持有 1000 万行
+        for month_start in range(0, DAYS, 30):
+            days = min(30, DAYS - month_start)
+            columns = generate(rng, per_day * days, first + month_start * 86400, days)
+            columns['id'] += month_start * per_day
+            until = datetime.datetime.fromtimestamp(first + (month_start + days) * 86400, tz=datetime.timezone.utc)
+            archive.append(columns, until, root)
+        written = time.perf_counter() - started
+
+        opened, store = timed(lambda: archive.BookingArchive(root), repeat=20)
+        summary = store.describe()
+        report("归档", [
+            ("对局数", f"{summary['rows']:,}"),
+            ("段数", summary['segments']),
+            ("磁盘占用 (MB)", f"{summary['bytes'] / 1024 / 1024:.0f}"),
+            ("生成并写入 (s)", f"{written:.1f}"),
+            ("打开（读取 manifest）(ms)", f"{opened * 1000:.2f}"),
+        ])
+
+        middle = first + DAYS // 2 * 86400
+        rows = []
+        for label, start, end, stores in (
+            ("一天 · 全部门店", middle, middle + 86400, None),
+            ("一周 · 单个门店", middle, middle + 7 * 86400, [7]),
+            ("一个月 · 全部门店", middle, middle + 30 * 86400, None),
+        ):
+            store = archive.BookingArchive(root)
+            before = rss_mb()
+            elapsed, (count, table_hours) = timed(lambda: range_totals(store, start, end, stores))
+            rows.append((
+                f"{label}：扫描段数 / 对局数 / 牌桌小时",
+                f"{len(store.segments_for(start, end))} / {count:,} / {table_hours:,.0f}",
+            ))
+            rows.append((f"{label}：耗时 (ms) / 常驻内存增量 (MB)", f"{elapsed * 1000:.1f} / {rss_mb() - before:.1f}"))
+        report("按日期范围扫描（内存映射，跳过无关的段）", rows)
+
+        def table_hours_per_store():
+            hours = np.zeros(STORES + 1)
+            for chunk in archive.BookingArchive(root).scan(columns=('store', 'start', 'end')):
+                hours += np.bincount(chunk['store'], weights=(chunk['end'] - chunk['start']) / 3600,
+                                     minlength=STORES + 1)
+            return hours
+
+        elapsed, hours = timed(table_hours_per_store, repeat=3)
+        report("全量流式聚合（各门店牌桌小时数）", [
+            ("耗时 (s)", f"{elapsed:.2f}"),
+            ("合计牌桌小时", f"{hours.sum():,.0f}"),
+        ])
+
+        # 每晚追加一天，再把该月的多个段合并为一段
+        last = first + DAYS * 86400
+        started = time.perf_counter()
+        for day in range(3):
+            columns = generate(rng, per_day, last + day * 86400, 1)
+            until = datetime.datetime.fromtimestamp(last + (day + 1) * 86400, tz=datetime.timezone.utc)
+            archive.append(columns, until, root)
+        appended = (time.perf_counter() - started) / 3
+        started = time.perf_counter()
+        merged = archive.compact(root, before=last + 62 * 86400)
+        compacted = time.perf_counter() - started
+        report("每晚任务", [
+            (f"追加一天（{per_day:,} 条）(ms)", f"{appended * 1000:.0f}"),
+            (f"合并已结束月份的段（共 {merged} 个）(s)", f"{compacted:.2f}"),
+        ])
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+基准：只读页面在 ASGI (uvicorn + 异步视图) 与 WSGI (多线程 runserver + 同步视图)
+下面对“慢客户端”并发负载时的吞吐量。
+
+每个模拟客户端先发送请求行，停顿 SLOW_DELAY 秒后才发送剩余请求头，
+然后读取完整响应；在 DURATION 秒内循环请求，统计完成数与延迟。
+两种服务器共用同一个临时 SQLite 数据库，不会影响现有数据。
+
+运行方式：python scripts/benchmarks/bench_asgi.py [并发数]
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+DURATION = 10
+SLOW_DELAY = 0.2
+PATHS = ['/', '/pending-bookings/']
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix='mahjong-bench-'))
+SETTINGS_TEMPLATE = """
+from config.settings import *
+DEBUG = False
+DATABASES = {{'default': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': r'{db}'}}}}
+CACHES = {{'default': {{'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}}}
+BOOKING_ASYNC_VIEWS = {async_views}
+"""
+for module, async_views in (('bench_sync_settings', False), ('bench_async_settings', True)):
+    (WORK_DIR / f'{module}.py').write_text(
+        SETTINGS_TEMPLATE.format(db=WORK_DIR / 'bench.sqlite3', async_views=async_views)
+    )
+sys.path.insert(0, str(WORK_DIR))
+os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_sync_settings'
+
+from _bootstrap import PROJECT_ROOT, report, seed  # noqa: E402
+
+from django.core.management import call_command  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, settings_module, port):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    env['PYTHONPATH'] = os.pathsep.join([str(WORK_DIR), str(PROJECT_ROOT)])
+    process = subprocess.Popen(
+        command, cwd=PROJECT_ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"服务器启动失败: {' '.join(command)}")
+
+
+async def slow_request(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\n".encode())
+    await writer.drain()
+    await asyncio.sleep(SLOW_DELAY)
+    writer.write(b"Host: 127.0.0.1\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data.startswith(b"HTTP/1.1 200") or data.startswith(b"HTTP/1.0 200")
+
+
+async def run_load(port):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + DURATION
+
+    async def client(index):
+        nonlocal errors
+        path = PATHS[index % len(PATHS)]
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = await slow_request(port, path)
+            except OSError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client(i) for i in range(CONCURRENCY)))
+    return latencies, errors
+
+
+def bench(name, command, settings_module, port):
+    process = start_server(command, settings_module, port)
+    try:
+        latencies, errors = asyncio.run(run_load(port))
+    finally:
+        process.terminate()
+        process.wait()
+    latencies.sort()
+    report(f"{name} (并发 {CONCURRENCY}, 慢客户端 {SLOW_DELAY}s)", [
+        ("吞吐量 (req/s)", f"{len(latencies) / DURATION:.1f}"),
+        ("中位延迟 (ms)", f"{statistics.median(latencies) * 1000:.1f}" if latencies else "-"),
+        ("P95 延迟 (ms)", f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f}" if latencies else "-"),
+        ("失败请求", errors),
+    ])
+
+
+def main():
+    call_command('migrate', verbosity=0)
+    seed(stores=4, tables_per_store=8, users=100, bookings_per_table=6)
+
+    wsgi_port = free_port()
+    bench(
+        "WSGI (runserver, 同步视图)",
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{wsgi_port}'],
+        'bench_sync_settings', wsgi_port,
+    )
+    asgi_port = free_port()
+    bench(
+        "ASGI (uvicorn, 异步视图)",
+        [sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+         '--port', str(asgi_port), '--log-level', 'warning'],
+        'bench_async_settings', asgi_port,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+基准：后台批量操作（500 个对局 / 100 张牌桌）。
+
+通过后台的 action 接口（一次 POST）依次执行：整体顺延 30 分钟、取消其中一半、
+为另一半清空牌桌后自动分配空闲牌桌、为全部牌桌开散客局，报告每个操作的耗时与查询数；
+另外以逐个对局 save() 的方式顺延同样的 500 个对局作为对照（只有信号，不写事件日志与通知）。
+批量顺延已成行的对局时会按新时间重新写入成行通知与开局提醒，耗时主要花在这里。
+
+运行方式：python scripts/benchmarks/bench_bulk_admin.py
+"""
+import datetime
+import time
+
+from _bootstrap import report, seed, setup_database
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking.models import Booking, MahjongTable
+from notifications.models import OutboxMessage
+
+STORES = 5
+TABLES_PER_STORE = 20
+BOOKINGS_PER_TABLE = 5
+
+
+def post(client, url, action, ids, **extra):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.post(url, {'action': action, '_selected_action': ids, 'index': 0, **extra})
+        elapsed = time.perf_counter() - started
+    assert response.status_code == 302, response.status_code
+    return elapsed, len(queries)
+
+
+def main():
+    setup_database()
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    seed(stores=STORES, tables_per_store=TABLES_PER_STORE, users=400, bookings_per_table=BOOKINGS_PER_TABLE,
+         start=start)
+    admin = get_user_model().objects.create_superuser('bench-admin', 'admin@example.com', 'pw')
+    client = Client()
+    client.force_login(admin)
+    bookings_url = '/admin/booking/booking/'
+    ids = list(Booking.objects.order_by('pk').values_list('pk', flat=True))
+    half = len(ids) // 2
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for booking in Booking.objects.filter(pk__in=ids):
+            booking.start_time += datetime.timedelta(minutes=30)
+            booking.end_time += datetime.timedelta(minutes=30)
+            booking.save()
+        loop_time = time.perf_counter() - started
+    loop_queries = len(queries)
+
+    rows = [(f"逐个 save() 顺延 {len(ids)} 个对局（对照）", f"{loop_time * 1000:.0f} ms / {loop_queries} 次查询")]
+    messages = OutboxMessage.objects.count()
+    elapsed, count = post(client, bookings_url, 'shift_selected_bookings', ids, shift_minutes=30)
+    messages = OutboxMessage.objects.count() - messages
+    rows.append((f"批量顺延 {len(ids)} 个对局（含 {messages:,} 条通知）", f"{elapsed * 1000:.0f} ms / {count} 次查询"))
+    elapsed, count = post(client, bookings_url, 'cancel_selected_bookings', ids[:half], cancel_reason="门店停电")
+    rows.append((f"批量取消 {half} 个对局", f"{elapsed * 1000:.0f} ms / {count} 次查询"))
+    Booking.objects.filter(pk__in=ids[half:]).update(table=None)
+    elapsed, count = post(client, bookings_url, 'assign_free_tables', ids[half:])
+    rows.append((f"自动分配牌桌 {len(ids) - half} 个对局", f"{elapsed * 1000:.0f} ms / {count} 次查询"))
+    table_ids = list(MahjongTable.objects.values_list('pk', flat=True))
+    elapsed, count = post(client, '/admin/booking/mahjongtable/', 'create_walk_in_booking', table_ids)
+    rows.append((f"为 {len(table_ids)} 张牌桌开散客局", f"{elapsed * 1000:.0f} ms / {count} 次查询"))
+    assert Booking.objects.filter(pk__in=ids[half:], table__isnull=True).count() == 0
+    report("后台批量操作（一次请求）", rows)
+
+
+if __name__ == '__main__':
+    main()
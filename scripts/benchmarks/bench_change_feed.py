@@ -0,0 +1,106 @@
+"""
+基准：下游系统同步对局——按变更订阅增量读取 vs 整表比对（10 万条对局）。
+
+先用 compact() 为已有对局补写新增记录并全量读一遍（相当于下游首次同步），
+然后修改 1% 的对局（其中一半通过 ORM save() 触发信号，一半通过 update() + record_bookings()），
+比较两种同步方式的耗时与查询数：
+
+  * 整表比对：读出全部对局的状态，与上次同步时保存的状态逐条比较；
+  * 增量读取：从上次的偏移量开始按批 fetch()，只读取变化过的对局。
+
+最后报告压缩前后的变更条数（被覆盖的旧变更会被删除）。
+
+运行方式：python scripts/benchmarks/bench_change_feed.py
+"""
+import datetime
+import random
+import time
+
+from _bootstrap import report, seed, setup_database
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking import changes
+from booking.history import booking_state
+from booking.models import Booking, ChangeFeedEntry
+
+STORES = 20
+TABLES_PER_STORE = 25
+BOOKINGS_PER_TABLE = 200
+CHANGED = 0.01
+
+
+def full_state():
+    return {booking.pk: booking_state(booking) for booking in Booking.objects.iterator(chunk_size=5000)}
+
+
+def read_all(after):
+    """从 after 开始按批读到末尾，返回 (变更数, 新的偏移量, 批数)。"""
+    count = batches = 0
+    while True:
+        batch = changes.fetch(after, 500)
+        count += len(batch['changes'])
+        after = batch['next']
+        batches += 1
+        if not batch['more']:
+            return count, after, batches
+
+
+def main():
+    setup_database()
+    start = timezone.now() - datetime.timedelta(days=30)
+    seed(stores=STORES, tables_per_store=TABLES_PER_STORE, users=2000, bookings_per_table=BOOKINGS_PER_TABLE,
+         start=start)
+    rng = random.Random(5)
+
+    started = time.perf_counter()
+    baseline = changes.compact()['baseline']
+    _, offset, _ = read_all(0)
+    initial = time.perf_counter() - started
+    previous = full_state()
+
+    ids = list(Booking.objects.values_list('pk', flat=True))
+    changed = rng.sample(ids, int(len(ids) * CHANGED))
+    half = len(changed) // 2
+    for booking in Booking.objects.filter(pk__in=changed[:half]):
+        booking.num_games = 8
+        booking.save()
+    with transaction.atomic():
+        bulk = list(Booking.objects.filter(pk__in=changed[half:]))
+        Booking.objects.filter(pk__in=changed[half:]).update(status='CANCELED', updated_at=timezone.now())
+        changes.record_bookings(bulk)
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        current = full_state()
+        diff = [pk for pk, state in current.items() if previous.get(pk) != state]
+        full_time = time.perf_counter() - started
+    full_queries = len(queries)
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        count, offset, batches = read_all(offset)
+        feed_time = time.perf_counter() - started
+    feed_queries = len(queries)
+    assert count == len(diff) == len(changed)
+
+    before = ChangeFeedEntry.objects.count()
+    started = time.perf_counter()
+    result = changes.compact()
+    compact_time = time.perf_counter() - started
+
+    report(f"下游同步 · {len(ids):,} 条对局，修改 {len(changed):,} 条", [
+        ("首次同步：补写 / 全量读取 (s)", f"{baseline:,} / {initial:.2f}"),
+        ("整表比对 (ms)", f"{full_time * 1000:.0f}"),
+        ("整表比对的查询数", full_queries),
+        ("增量读取 (ms)", f"{feed_time * 1000:.1f}"),
+        ("增量读取的查询数 / 批数", f"{feed_queries} / {batches}"),
+        ("压缩前 / 后的变更条数", f"{before:,} / {ChangeFeedEntry.objects.count():,}"),
+        ("压缩删除的旧变更 / 耗时 (ms)", f"{result['superseded']:,} / {compact_time * 1000:.0f}"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
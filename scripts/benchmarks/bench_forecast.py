@@ -0,0 +1,91 @@
+"""
+基准：门店牌桌需求预测（20 个门店 × 8 张牌桌 × 2 年历史）。
+
+按「周末与晚间更忙」的规律批量写入两年的已成行对局，然后报告：读取历史并用 bincount 构建
+每小时占用序列、拟合季节模型、整体 refresh()（含写入未来 7 天预测）的耗时，
+以及预测与生成规律之间的误差。目标：20 个门店两年历史的训练在数秒内完成。
+
+运行方式：python scripts/benchmarks/bench_forecast.py
+"""
+import datetime
+import random
+import time
+
+from _bootstrap import report, seed, setup_database
+
+from django.conf import settings
+from django.utils import timezone
+
+from booking.models import Booking
+from forecasts import forecasting
+from forecasts.models import DemandForecast
+
+STORES = 20
+TABLES = 8
+WEEKS = 104
+
+
+def busy_probability(local):
+    """生成数据用的规律：晚间与周末更忙。"""
+    evening = 0.6 if 18 <= local.hour <= 23 else 0.25 if 12 <= local.hour < 18 else 0.03
+    return min(evening * (1.5 if local.weekday() >= 5 else 1.0), 0.95)
+
+
+def main():
+    setup_database()
+    stores, tables, users = seed(stores=STORES, tables_per_store=TABLES, users=100, bookings_per_table=0)
+    rng = random.Random(7)
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    first = today - datetime.timedelta(weeks=WEEKS)
+
+    started = time.perf_counter()
+    bookings = []
+    slot = first
+    while slot < today:
+        chance = busy_probability(slot)
+        for table in tables:
+            # 每张牌桌每 3 小时一个时段，按规律决定是否有一局 3 小时的对局
+            if rng.random() < chance:
+                bookings.append(Booking(
+                    creator=users[0], store_id=table.store_id, table=table, start_time=slot,
+                    end_time=slot + datetime.timedelta(hours=3), num_games=4, status='CONFIRMED',
+                ))
+        slot += datetime.timedelta(hours=3)
+    Booking.objects.bulk_create(bookings, batch_size=5000)
+    report("测试数据", [
+        ("历史对局数", f"{len(bookings):,}"),
+        ("写入耗时 (s)", f"{time.perf_counter() - started:.1f}"),
+    ])
+
+    store_ids = [store.id for store in stores]
+    offset = forecasting._offset_minutes()
+    window_start = forecasting.local_hour(today, offset) - WEEKS * forecasting.HOURS_PER_WEEK
+    hours = WEEKS * forecasting.HOURS_PER_WEEK
+
+    started = time.perf_counter()
+    series = forecasting.load_series(store_ids, window_start, hours, offset)
+    loaded = time.perf_counter() - started
+    started = time.perf_counter()
+    expected, upper = forecasting.fit(series, WEEKS, settings.FORECAST_HALF_LIFE_WEEKS, settings.FORECAST_STAFFING_Z)
+    fitted = time.perf_counter() - started
+    started = time.perf_counter()
+    stats = forecasting.refresh()
+    refreshed = time.perf_counter() - started
+
+    # 与生成规律比较：每小时的期望占用 = 覆盖该小时的 3 小时时段的概率 × 牌桌数
+    errors = []
+    for forecast in DemandForecast.objects.filter(store_id=store_ids[0]):
+        local = timezone.localtime(forecast.hour)
+        slot_start = local.replace(hour=local.hour // 3 * 3)
+        errors.append(abs(forecast.expected - busy_probability(slot_start) * TABLES))
+    report(f"需求预测 · {STORES} 个门店 × {WEEKS} 周", [
+        ("读取历史 + bincount 构建序列 (s)", f"{loaded:.2f}"),
+        ("拟合季节模型 (ms)", f"{fitted * 1000:.1f}"),
+        ("refresh() 整体 (s)", f"{refreshed:.2f}"),
+        ("写入预测行数", f"{stats['stores'] * stats['hours']:,}"),
+        ("预计占用平均绝对误差 (桌)", f"{sum(errors) / len(errors):.2f}"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
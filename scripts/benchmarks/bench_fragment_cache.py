@@ -0,0 +1,59 @@
+"""
+基准：时间表 / 门店状态页按牌桌的模板片段缓存。
+
+对一个 50 桌门店分别测量：
+  * 冷缓存：每次请求前清空缓存，所有牌桌都重新渲染；
+  * 热缓存：所有牌桌片段命中缓存；
+  * 单桌变化：每次请求前递增一张牌桌的版本号，只有这一张重新渲染。
+
+运行方式：python scripts/benchmarks/bench_fragment_cache.py
+"""
+import itertools
+
+from _bootstrap import measure, report, seed, setup_database
+
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from booking.caching import bump_versions
+
+REPEAT = 30
+
+
+def bench_page(client, url, tables):
+    table_cycle = itertools.cycle(tables)
+
+    def cold():
+        cache.clear()
+        client.get(url)
+
+    def warm():
+        client.get(url)
+
+    def one_changed():
+        table = next(table_cycle)
+        bump_versions([], [table.id])
+        client.get(url)
+
+    cold_wall, _ = measure(cold, REPEAT)
+    client.get(url)
+    warm_wall, _ = measure(warm, REPEAT)
+    changed_wall, _ = measure(one_changed, REPEAT)
+    report(url, [
+        ("冷缓存 (ms)", f"{cold_wall * 1000:.2f}"),
+        ("热缓存 (ms)", f"{warm_wall * 1000:.2f}"),
+        ("单桌变化 (ms)", f"{changed_wall * 1000:.2f}"),
+    ])
+
+
+def main():
+    setup_database()
+    stores, tables, _ = seed(stores=1, tables_per_store=50, users=200, bookings_per_table=8)
+    client = Client()
+    bench_page(client, reverse('store_timetable', args=[stores[0].id]), tables)
+    bench_page(client, reverse('store_status'), tables)
+
+
+if __name__ == '__main__':
+    main()
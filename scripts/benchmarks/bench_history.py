@@ -0,0 +1,102 @@
+"""
+基准：对局事件日志的历史状态重建（20 个门店 × 60 天，约 40 万条事件）。
+
+直接批量写入事件（每个对局：创建、三人加入、成行、分配牌桌，部分有退出 / 退回 / 取消），
+每天结束时生成一次快照，然后比较重建门店在某一时刻的状态：从最近的快照开始重放与从头重放
+整个门店日志的耗时与查询数，以及重建单个对局的耗时。两种方式的结果应当一致。
+
+运行方式：python scripts/benchmarks/bench_history.py
+"""
+import datetime
+import random
+
+from _bootstrap import measure, report, seed, setup_database
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking import history
+from booking.models import BookingEvent, BookingSnapshot
+
+STORES = 20
+DAYS = 60
+BOOKINGS_PER_DAY = 50
+
+
+def day_events(rng, store, tables, users, day_start, next_id):
+    """一个门店一天的事件：对局在当天发起，开始于一到三天之后。"""
+    events = []
+    for _ in range(BOOKINGS_PER_DAY):
+        booking_id, next_id = next_id, next_id + 1
+        at = day_start + datetime.timedelta(minutes=rng.randrange(0, 20 * 60))
+        start = day_start + datetime.timedelta(days=rng.randint(1, 3), hours=rng.randrange(10, 22))
+        players = rng.sample(users, 5)
+        state = {
+            'status': 'PENDING', 'store': store.id, 'table': None,
+            'start': start.isoformat(), 'end': (start + datetime.timedelta(hours=3)).isoformat(),
+            'games': 4, 'type': 'STANDARD', 'creator': players[0], 'participants': [players[0]],
+        }
+        steps = [('CREATED', state)] + [('JOINED', {'user': user}) for user in players[1:4]]
+        steps += [('CONFIRMED', {}), ('TABLE_ASSIGNED', {'table': rng.choice(tables)})]
+        roll = rng.random()
+        if roll < 0.2:
+            steps += [('LEFT', {'user': players[2]}), ('REVERTED', {}), ('JOINED', {'user': players[4]}),
+                      ('CONFIRMED', {})]
+        elif roll < 0.25:
+            steps.append(('CANCELED', {'reason': 'staff'}))
+        for kind, data in steps:
+            at += datetime.timedelta(minutes=rng.randrange(1, 30))
+            events.append(BookingEvent(booking_id=booking_id, store_id=store.id, kind=kind, data=data, created_at=at))
+    return events, next_id
+
+
+def main():
+    setup_database()
+    stores, tables, users = seed(stores=STORES, tables_per_store=8, users=300, bookings_per_table=0)
+    rng = random.Random(11)
+    tables_by_store = {store.id: [table.id for table in tables if table.store_id == store.id] for store in stores}
+    user_ids = [user.id for user in users]
+    first = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - datetime.timedelta(days=DAYS)
+
+    next_id = 1
+    for day in range(DAYS):
+        day_start = first + datetime.timedelta(days=day)
+        events = []
+        for store in stores:
+            store_events, next_id = day_events(rng, store, tables_by_store[store.id], user_ids, day_start, next_id)
+            events += store_events
+        BookingEvent.objects.bulk_create(events, batch_size=5000)
+        history.take_snapshots(now=day_start + datetime.timedelta(days=1, minutes=10),
+                               store_ids=[store.id for store in stores])
+
+    store_id = stores[0].id
+    at = first + datetime.timedelta(days=DAYS - 1, hours=15)
+
+    def full_replay():
+        events = BookingEvent.objects.filter(store_id=store_id, created_at__lte=at)
+        return history._not_ended(history._replay({}, events, store_id), at)
+
+    with CaptureQueriesContext(connection) as queries:
+        from_snapshot = history.store_at(store_id, at)
+    snapshot_queries = len(queries)
+    assert from_snapshot == full_replay()
+    snapshot_time, _ = measure(lambda: history.store_at(store_id, at), repeat=20)
+    full_time, _ = measure(full_replay, repeat=3)
+    booking_time, _ = measure(lambda: history.booking_at(next_id - 1, at), repeat=200)
+
+    latest = BookingSnapshot.objects.filter(store_id=store_id).order_by('-taken_at').first()
+    report(f"事件日志 · {STORES} 个门店 × {DAYS} 天", [
+        ("事件总数", f"{BookingEvent.objects.count():,}"),
+        ("单个门店的事件数", f"{BookingEvent.objects.filter(store_id=store_id).count():,}"),
+        ("最近一份快照中的对局数", len(latest.bookings)),
+        ("重建时刻尚未结束的对局数", len(from_snapshot)),
+        ("门店状态 · 快照 + 重放 (ms)", f"{snapshot_time * 1000:.2f}"),
+        ("门店状态 · 快照 + 重放的查询数", snapshot_queries),
+        ("门店状态 · 从头重放 (ms)", f"{full_time * 1000:.1f}"),
+        ("单个对局 (ms)", f"{booking_time * 1000:.2f}"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+基准：公开页面的条件请求 (ETag / 304)。
+
+模拟轮询客户端反复请求门店状态、待加入列表和时间表，对比
+“每次完整渲染”与“携带 If-None-Match 命中 304”两种情况下的
+响应字节数、CPU 时间和数据库查询数。
+
+运行方式：python scripts/benchmarks/bench_http_cache.py
+"""
+from _bootstrap import measure, report, seed, setup_database
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+REPEAT = 200
+
+
+def bench_page(client, url):
+    def full():
+        client.get(url)
+
+    def conditional():
+        client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    full_wall, full_cpu = measure(full, REPEAT)
+    # 页面 ETag 含时间片，测量前重新获取，避免跨越分钟边界
+    first = client.get(url)
+    etag = first['ETag']
+    cond_wall, cond_cpu = measure(conditional, REPEAT)
+    with CaptureQueriesContext(connection) as full_queries:
+        full()
+    with CaptureQueriesContext(connection) as cond_queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304, (url, response.status_code)
+
+    report(url, [
+        ("完整响应字节", len(first.content)),
+        ("304 响应字节", len(response.content)),
+        ("完整渲染 CPU (ms)", f"{full_cpu * 1000:.2f}"),
+        ("304 CPU (ms)", f"{cond_cpu * 1000:.2f}"),
+        ("完整渲染耗时 (ms)", f"{full_wall * 1000:.2f}"),
+        ("304 耗时 (ms)", f"{cond_wall * 1000:.2f}"),
+        ("完整渲染查询数", len(full_queries)),
+        ("304 查询数", len(cond_queries)),
+    ])
+
+
+def main():
+    setup_database()
+    stores, _, _ = seed(stores=6, tables_per_store=10, users=100, bookings_per_table=6)
+    client = Client()
+    for url in (
+        reverse('store_status'),
+        reverse('list_pending_bookings'),
+        reverse('store_timetable', args=[stores[0].id]),
+    ):
+        bench_page(client, url)
+
+
+if __name__ == '__main__':
+    main()
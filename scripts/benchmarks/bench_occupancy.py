@@ -0,0 +1,122 @@
+"""
+基准：共享内存占用看板（20 个门店 × 8 张牌桌）。
+
+比较门店状态页取「当前对局」的三种方式：看板读取、进程内紧凑排期（缓存命中）、排期缓存失效
+后重新查询数据库；以及后台「当前状态」逐行读看板与逐行查询数据库的差别。另起一个子进程
+在写入方不间断全量重写时反复读取，检查序列锁下读到的槽位始终一致（同一次写入的值）；
+这是最坏情况，实际的写入只在对局变化与每 30 秒校正时发生，读取几乎不会重试。
+
+运行方式：python scripts/benchmarks/bench_occupancy.py
+"""
+import multiprocessing
+import time
+from multiprocessing import resource_tracker
+
+from _bootstrap import measure, report, seed, setup_database
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking import occupancy, schedule
+from booking.caching import bump_versions
+
+STORES = 20
+TABLES = 8
+
+
+def torn_reader(name, table_ids, seconds, results):
+    """子进程：持续读取，统计读到的槽位是否来自同一次写入（写入方每次把全部字写成同一个值）。"""
+    board = occupancy.OccupancyBoard.attach(name)
+    reads = torn = failed = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        slots = board.read(table_ids)
+        if slots is None:
+            failed += 1
+            continue
+        reads += 1
+        values = {value for slot in slots for value in slot}
+        torn += len(values) > 1
+    board.close()
+    results.put((reads, torn, failed))
+
+
+def main():
+    setup_database()
+    stores, tables, users = seed(stores=STORES, tables_per_store=TABLES, users=100, bookings_per_table=6,
+                                 start=timezone.now())
+    store_ids = [store.id for store in stores]
+    table_ids = [table.id for table in tables]
+    name = f"{occupancy.board_name()}_bench"
+    board = occupancy.OccupancyBoard.create(name, occupancy.board_capacity())
+    try:
+        started = time.perf_counter()
+        occupancy.reconcile(board)
+        reconciled = time.perf_counter() - started
+        occupancy._board, occupancy._next_attempt = board, time.monotonic() + 3600
+
+        now = timezone.now()
+        assert occupancy.current_booking_ids(table_ids, now) == schedule.current_booking_ids(store_ids, now)
+        board_read, _ = measure(lambda: occupancy.current_booking_ids(table_ids, now), repeat=2000)
+        schedule.current_booking_ids(store_ids, now)
+        schedule_hit, _ = measure(lambda: schedule.current_booking_ids(store_ids, now), repeat=500)
+
+        def schedule_miss():
+            bump_versions(store_ids)
+            schedule.current_booking_ids(store_ids, now)
+
+        with CaptureQueriesContext(connection) as queries:
+            schedule_miss()
+        miss_queries = len(queries)
+        schedule_missed, _ = measure(schedule_miss, repeat=50)
+        report(f"门店状态页 · {STORES * TABLES} 张牌桌的当前对局", [
+            ("全量校正一次 (ms)", f"{reconciled * 1000:.1f}"),
+            ("看板读取 (µs)", f"{board_read * 1e6:.0f}"),
+            ("紧凑排期 · 缓存命中 (µs)", f"{schedule_hit * 1e6:.0f}"),
+            ("紧凑排期 · 缓存失效后重建 (ms)", f"{schedule_missed * 1000:.2f}"),
+            ("缓存失效后的查询数", miss_queries),
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            per_row_board, _ = measure(lambda: [occupancy.table_status(table_id) for table_id in table_ids], 20)
+        board_queries = len(queries)
+        occupancy._board = None
+        with CaptureQueriesContext(connection) as queries:
+            per_row_db, _ = measure(lambda: [occupancy.table_status(table_id) for table_id in table_ids], 20)
+        db_queries = len(queries) // 20
+        occupancy._board = board
+        report(f"后台牌桌列表 · {len(table_ids)} 行的「当前状态」", [
+            ("读看板 (ms)", f"{per_row_board * 1000:.2f}"),
+            ("读看板的查询数", board_queries),
+            ("逐行查询数据库 (ms)", f"{per_row_db * 1000:.2f}"),
+            ("逐行查询数据库的查询数", db_queries),
+        ])
+
+        # 序列锁：子进程读取的同时本进程不停地全量重写
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        reader = context.Process(target=torn_reader, args=(name, table_ids, 3.0, results))
+        reader.start()
+        writes = 0
+        while reader.is_alive() and results.empty():
+            writes += 1
+            board.write({table_id: (writes,) * occupancy.SLOT_WORDS for table_id in table_ids}, clear=True)
+        reads, torn, failed = results.get()
+        reader.join()
+        # spawn 的子进程与本进程共用 resource_tracker，子进程附加时取消了登记（见 occupancy._attach），补回
+        resource_tracker.register(board.shm._name, 'shared_memory')
+        report("序列锁 · 3 秒并发读写", [
+            ("写入次数", f"{writes:,}"),
+            ("一致的读取", f"{reads:,}"),
+            ("不一致的读取（应为 0）", torn),
+            ("重试用尽、回退数据库的读取", f"{failed:,}"),
+        ])
+    finally:
+        occupancy._board = None
+        board.close()
+        board.unlink()
+
+
+if __name__ == '__main__':
+    main()
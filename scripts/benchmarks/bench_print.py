@@ -0,0 +1,62 @@
+"""
+基准：课表打印版（10 个门店 × 30 天，共 300 个门店日）。
+
+分别在本进程内（1 个进程）和进程池（默认 4 个进程，可用命令行参数指定）中生成
+PDF 与 HTML，报告耗时、页数与文件大小。目标：4 核下 30 天 × 10 个门店的 PDF 在 10 秒内完成。
+
+运行方式：python scripts/benchmarks/bench_print.py [进程数]
+"""
+import datetime
+import re
+import sys
+import tempfile
+import time
+
+from _bootstrap import report, seed, setup_database
+
+from django.utils import timezone
+
+from booking import exports, printing
+from booking.models import Booking
+
+STORES = 10
+TABLES_PER_STORE = 8
+DAYS = 30
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    setup_database()
+    start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    # 每张牌桌每天 8 个 3 小时的时段
+    seed(stores=STORES, tables_per_store=TABLES_PER_STORE, users=400, bookings_per_table=DAYS * 8, start=start)
+    exports.metadata.store_directory()  # 预热门店元数据缓存
+    end = start + datetime.timedelta(days=DAYS) - datetime.timedelta(seconds=1)
+    bookings = Booking.objects.filter(start_time__gte=start, start_time__lte=end)
+
+    for name, write in (('PDF', printing.write_pdf), ('HTML', None)):
+        for count in (1, workers):
+            output = tempfile.TemporaryFile()
+            sheets = exports.iter_schedule_sheets(bookings, start, end)
+            started = time.perf_counter()
+            if write is None:
+                printing.write_html(sheets, output, "课表", workers=count)
+            else:
+                write(sheets, output, workers=count)
+            elapsed = time.perf_counter() - started
+            size = output.tell()
+            output.seek(0)
+            content = output.read()
+            if write is None:
+                pages = content.count(b'<section class="sheet">')
+            else:
+                pages = int(re.search(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', content).group(1))
+            report(f"{name} · {STORES} 个门店 × {DAYS} 天 · {count} 个进程", [
+                ("耗时 (s)", f"{elapsed:.2f}"),
+                ("页数" if write else "门店日", str(pages)),
+                ("文件大小 (MB)", f"{size / 2**20:.1f}"),
+            ])
+
+
+if __name__ == '__main__':
+    main()
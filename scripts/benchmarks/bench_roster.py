@@ -0,0 +1,63 @@
+"""
+基准：列出 10k 个对局及其参与者名单。
+
+  * 关联表：prefetch_related('participants')，为每位参与者实例化用户对象；
+  * 反范式化名单：直接读取 Booking.participant_names / participant_count。
+
+另外报告 repair_rosters 全量校验（从关联表重新计算并比较）的耗时。
+
+运行方式：python scripts/benchmarks/bench_roster.py
+"""
+import io
+import time
+
+from _bootstrap import measure, report, seed, setup_database
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from booking.models import Booking
+
+REPEAT = 5
+
+
+def list_with_join():
+    lines = []
+    for booking in Booking.objects.select_related('store').prefetch_related('participants'):
+        names = [p.display_name or p.username for p in booking.participants.all()]
+        lines.append(f"{booking.store.name} {len(names)}/4 {', '.join(names)}")
+    return lines
+
+
+def list_with_roster():
+    lines = []
+    for booking in Booking.objects.select_related('store'):
+        lines.append(f"{booking.store.name} {booking.participant_count}/4 {', '.join(booking.participant_names)}")
+    return lines
+
+
+def main():
+    setup_database()
+    seed(stores=10, tables_per_store=10, users=500, bookings_per_table=100)
+
+    started = time.perf_counter()
+    call_command('repair_rosters', stdout=io.StringIO())
+    repair_seconds = time.perf_counter() - started
+
+    # 关联表的预取不保证加入顺序，只比较每个对局的名单内容
+    assert [sorted(line) for line in list_with_join()] == [sorted(line) for line in list_with_roster()]
+
+    rows = []
+    for label, func in (("关联表", list_with_join), ("反范式化名单", list_with_roster)):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        wall, cpu = measure(func, REPEAT)
+        rows.append((f"{label} 耗时 / CPU (ms)", f"{wall * 1000:.1f} / {cpu * 1000:.1f}"))
+        rows.append((f"{label} 查询数", str(len(ctx))))
+    rows.append(("repair_rosters 全量校验 (ms)", f"{repair_seconds * 1000:.1f}"))
+    report(f"列出 {Booking.objects.count()} 个对局", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+基准：紧凑排期（booking/schedule.py）在 100 万个区间下的内存与查询耗时。
+
+  * 内存：StoreSchedule 的 array 存储 vs __slots__ 区间对象列表 vs Booking 模型实例
+    （模型实例按 5 万个抽样后线性外推）；
+  * 查询：随机 3 小时窗口的占用牌桌查询，bisect vs 线性扫描。
+另外从测试数据库读取 10 万个对局，报告 values_list 加载排期的耗时。
+
+运行方式：python scripts/benchmarks/bench_schedule.py
+"""
+import datetime
+import random
+import time
+import tracemalloc
+
+from _bootstrap import measure, report, seed, setup_database
+
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from booking.models import Booking
+from booking.schedule import ACTIVE, Interval, StoreSchedule, load_schedules, to_minutes
+
+INTERVALS = 1_000_000
+TABLES = 200
+MODEL_SAMPLE = 50_000
+QUERIES = 2000
+
+
+def synthetic_rows(count, tables, seed_value=42):
+    """每张牌桌上首尾相接、间隔随机的对局，按开始时间排序。"""
+    rng = random.Random(seed_value)
+    per_table = count // tables
+    rows = []
+    booking_id = 1
+    for table_id in range(1, tables + 1):
+        cursor = 0
+        for _ in range(per_table):
+            cursor += rng.choice((0, 15, 30, 60))
+            length = rng.choice((90, 135, 180, 240))
+            rows.append((booking_id, table_id, cursor, cursor + length, rng.choice(ACTIVE)))
+            booking_id += 1
+            cursor += length
+    rows.sort(key=lambda row: row[2])
+    return rows
+
+
+def traced(factory):
+    tracemalloc.start()
+    obj = factory()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def main():
+    rows = synthetic_rows(INTERVALS, TABLES)
+    horizon = rows[-1][3]
+
+    schedule, schedule_bytes = traced(lambda: StoreSchedule(1, 0, horizon + 1, rows))
+    _, slots_bytes = traced(lambda: [Interval(*row) for row in rows])
+
+    base = timezone.now()
+
+    def make_models():
+        return [
+            Booking(
+                id=booking_id, store_id=1, table_id=table_id,
+                start_time=base + datetime.timedelta(minutes=start),
+                end_time=base + datetime.timedelta(minutes=end),
+                status='CONFIRMED',
+            )
+            for booking_id, table_id, start, end, _ in rows[:MODEL_SAMPLE]
+        ]
+
+    _, model_bytes = traced(make_models)
+    model_bytes = model_bytes * INTERVALS // MODEL_SAMPLE
+
+    rng = random.Random(7)
+    windows = [(start, start + 180) for start in (rng.randrange(horizon) for _ in range(QUERIES))]
+    window_cycle = iter(windows * 100)
+
+    def bisect_query():
+        start, end = next(window_cycle)
+        schedule.occupied_table_ids(start, end)
+
+    def linear_query():
+        start, end = next(window_cycle)
+        {row[1] for row in rows if row[2] < end and row[3] > start and row[4] in ACTIVE}
+
+    bisect_wall, _ = measure(bisect_query, QUERIES)
+    linear_wall, _ = measure(linear_query, 20)
+
+    report(f"{INTERVALS:,} 个区间 / {TABLES} 张牌桌", [
+        ("StoreSchedule (MB)", f"{schedule_bytes / 2**20:.1f}"),
+        ("__slots__ 区间对象 (MB)", f"{slots_bytes / 2**20:.1f}"),
+        ("Booking 实例（外推，MB）", f"{model_bytes / 2**20:.1f}"),
+        ("bisect 查询 (µs)", f"{bisect_wall * 1e6:.1f}"),
+        ("线性扫描查询 (ms)", f"{linear_wall * 1000:.1f}"),
+    ])
+
+    setup_database()
+    stores, _, _ = seed(stores=1, tables_per_store=100, users=200, bookings_per_table=1000)
+    bounds = Booking.objects.aggregate(first=Min('start_time'), last=Max('end_time'))
+    started = time.perf_counter()
+    loaded = load_schedules(
+        [stores[0].id], to_minutes(bounds['first']), to_minutes(bounds['last']) + 1
+    )[stores[0].id]
+    report("从数据库加载排期", [
+        ("对局数", f"{len(loaded):,}"),
+        ("values_list 加载 (ms)", f"{(time.perf_counter() - started) * 1000:.1f}"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
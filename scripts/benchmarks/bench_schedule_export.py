@@ -0,0 +1,64 @@
+"""
+基准：按天 / 门店的课表导出（20 个门店 × 90 天）。
+
+分别导出前 30 / 60 / 90 天，报告耗时、查询数、工作表数与文件大小，用于确认耗时随天数
+线性增长；最后在 tracemalloc 下重跑 90 天，报告 Python 堆内存峰值（tracemalloc 会明显拖慢
+执行，所以不与计时放在一起）。
+
+运行方式：python scripts/benchmarks/bench_schedule_export.py
+"""
+import datetime
+import time
+import tracemalloc
+
+from _bootstrap import report, seed, setup_database
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking import exports
+from booking.models import Booking
+
+STORES = 20
+TABLES_PER_STORE = 4
+DAYS = 90
+
+
+def main():
+    setup_database()
+    start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    # 每张牌桌每天 8 个 3 小时的时段
+    seed(stores=STORES, tables_per_store=TABLES_PER_STORE, users=400, bookings_per_table=DAYS * 8, start=start)
+    exports.metadata.store_directory()  # 预热门店元数据缓存
+
+    def run(days):
+        end = start + datetime.timedelta(days=days) - datetime.timedelta(seconds=1)
+        bookings = Booking.objects.filter(start_time__gte=start, start_time__lte=end)
+        response = exports.export_schedule_xlsx(bookings, start, end)
+        size = response.file_to_stream.seek(0, 2)
+        response.close()
+        return bookings.count(), size
+
+    for days in (30, 60, DAYS):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            count, size = run(days)
+        elapsed = time.perf_counter() - started
+        report(f"{STORES} 个门店 × {days} 天", [
+            ("对局数", f"{count:,}"),
+            ("耗时 (s)", f"{elapsed:.2f}"),
+            ("查询数", str(len(ctx) - 1)),  # 去掉统计对局数的 count()
+            ("工作表数", str(STORES * days)),
+            ("文件大小 (MB)", f"{size / 2**20:.1f}"),
+        ])
+
+    tracemalloc.start()
+    run(DAYS)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report(f"{STORES} 个门店 × {DAYS} 天（tracemalloc）", [("Python 堆内存峰值 (MB)", f"{peak / 2**20:.1f}")])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+基准：已登录用户每个请求的查询数（会话 / 用户 / 门店元数据缓存）。
+
+对比两种配置下同一组页面的查询数与耗时：
+  * 基线：数据库 session + ModelBackend + 关闭门店元数据缓存；
+  * 当前：签名 Cookie session + CachedModelBackend + 进程内门店元数据缓存。
+
+运行方式：python scripts/benchmarks/bench_session_cache.py
+"""
+from _bootstrap import measure, report, seed, setup_database
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from booking import metadata
+
+REPEAT = 50
+
+BASELINE = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+
+
+def count_queries(client, url):
+    client.get(url)  # 预热缓存
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(url)
+    return len(ctx)
+
+
+def run(user, urls, metadata_ttl):
+    metadata._cache.ttl = metadata_ttl
+    metadata.invalidate()
+    # 新建 Client 才会按当前配置重新加载 session 中间件
+    client = Client()
+    client.force_login(user)
+    rows = {}
+    for label, url in urls:
+        queries = count_queries(client, url)
+        wall, _ = measure(lambda: client.get(url), REPEAT)
+        rows[label] = (queries, wall)
+    return rows
+
+
+def main():
+    setup_database()
+    stores, _, users = seed(stores=4, tables_per_store=12, users=200, bookings_per_table=6)
+    user = users[0]
+    urls = [
+        ("我的预约", reverse('my_bookings')),
+        ("我的对局", reverse('my_games')),
+        ("发起预约 (GET)", reverse('create_booking', args=[stores[0].id])),
+    ]
+
+    ttl = metadata._cache.ttl
+    with override_settings(**BASELINE):
+        baseline = run(user, urls, metadata_ttl=0)
+    current = run(user, urls, metadata_ttl=ttl)
+
+    for label, _ in urls:
+        base_queries, base_wall = baseline[label]
+        cur_queries, cur_wall = current[label]
+        report(label, [
+            ("查询数 基线 / 当前", f"{base_queries} / {cur_queries}"),
+            ("耗时 基线 / 当前 (ms)", f"{base_wall * 1000:.2f} / {cur_wall * 1000:.2f}"),
+        ])
+
+
+if __name__ == '__main__':
+    main()
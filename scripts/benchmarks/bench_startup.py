@@ -0,0 +1,88 @@
+"""
+基准：进程冷启动的模块导入耗时 (python -X importtime)。
+
+分别测量 `manage.py check`、WSGI 应用和 Celery worker 启动时的导入总耗时，
+取多次运行中的最小值，并断言：
+  * 导入耗时不超过各自的预算 (BUDGETS_MS)；
+  * 不应在启动阶段加载的重模块 (如 openpyxl) 确实没有被导入。
+任一断言失败时以非零状态码退出，可直接用于 CI。
+
+本脚本不创建数据库，会沿用当前环境的 DJANGO_SETTINGS_MODULE / MAHJONG_DB_ENGINE。
+运行方式：python scripts/benchmarks/bench_startup.py [运行次数]
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+TARGETS = {
+    'manage.py check': ['manage.py', 'check'],
+    'WSGI 应用': ['-c', 'import config.wsgi'],
+    'Celery worker': ['-c', 'from config.celery import app; app.loader.import_default_modules()'],
+}
+# 导入耗时预算 (毫秒)，留有余量以适应较慢的机器
+BUDGETS_MS = {
+    'manage.py check': 800,
+    'WSGI 应用': 800,
+    'Celery worker': 800,
+}
+FORBIDDEN_MODULES = {
+    'manage.py check': {'openpyxl', 'numpy', 'booking.exports'},
+    'WSGI 应用': {'openpyxl', 'numpy', 'booking.exports'},
+    'Celery worker': {'openpyxl', 'numpy', 'booking.exports', 'booking.admin', 'accounts.admin', 'booking.views'},
+}
+
+
+def import_profile(args):
+    """运行一次目标命令，返回 (导入总耗时毫秒, {模块: 累计耗时毫秒})。"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=PROJECT_ROOT, env=os.environ.copy(),
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"命令执行失败: {' '.join(args)}\n{result.stderr[-2000:]}")
+    total_us = 0
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        modules[name.strip()] = int(cumulative_us) / 1000
+    return total_us / 1000, modules
+
+
+def main():
+    failures = []
+    for name, args in TARGETS.items():
+        best_total, best_modules = min(
+            (import_profile(args) for _ in range(RUNS)), key=lambda item: item[0]
+        )
+        slowest = sorted(best_modules.items(), key=lambda item: item[1], reverse=True)[:5]
+        loaded_forbidden = sorted(FORBIDDEN_MODULES[name] & best_modules.keys())
+
+        print(f"\n== {name} ==")
+        print(f"  导入总耗时: {best_total:.1f} ms (预算 {BUDGETS_MS[name]} ms)")
+        print("  累计耗时最高的模块:")
+        for module, cumulative_ms in slowest:
+            print(f"    {module:<40} {cumulative_ms:8.1f} ms")
+        if loaded_forbidden:
+            print(f"  不应加载的模块: {', '.join(loaded_forbidden)}")
+
+        if best_total > BUDGETS_MS[name]:
+            failures.append(f"{name} 导入耗时 {best_total:.1f} ms 超出预算")
+        if loaded_forbidden:
+            failures.append(f"{name} 启动时加载了 {', '.join(loaded_forbidden)}")
+
+    if failures:
+        print("\n失败:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\n全部通过。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+基准：比赛分桌与整轮生成（256 名选手、64 张牌桌、8 轮）。
+
+每轮报告纯分桌（交换局部搜索）耗时、重逢对数，以及包含读取历史、分配牌桌、
+批量写入对局 / 关联表 / 桌次与成行通知的整轮耗时和查询数。目标：256 人一轮的分桌远低于 1 秒。
+
+运行方式：python scripts/benchmarks/bench_tournament.py
+"""
+import time
+
+from _bootstrap import report, seed, setup_database
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tournaments.models import Tournament
+from tournaments.rounds import generate_round
+
+PLAYERS = 256
+ROUNDS = 8
+
+
+def main():
+    setup_database()
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) + timezone.timedelta(days=7)
+    stores, _, users = seed(stores=1, tables_per_store=PLAYERS // 4, users=PLAYERS, bookings_per_table=0, start=start)
+    organizer = get_user_model().objects.create(username='organizer')
+    tournament = Tournament.objects.create(
+        name="月赛", store=stores[0], start_time=start, round_count=ROUNDS, games_per_round=2,
+    )
+    tournament.players.set(users)
+
+    rows = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            round_, pairing = generate_round(tournament, organizer)
+        total = time.perf_counter() - started
+        rows.append((
+            f"第 {round_.number} 轮",
+            f"分桌 {pairing * 1000:6.1f} ms · 整轮 {total * 1000:6.1f} ms · "
+            f"{len(queries)} 次查询 · 重逢 {round_.repeat_pairs} 对 · 未分配牌桌 {round_.unassigned_tables} 桌",
+        ))
+    report(f"比赛分桌 · {PLAYERS} 名选手 × {ROUNDS} 轮", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+基准：用户搜索（5 万个中文姓名的用户）。
+
+对一组典型关键词（拼音全拼 / 首字母、姓、姓名、名字、用户名前缀）比较：
+  * 原来的做法：username / display_name 上的 icontains 查询（全表扫描）；
+  * accounts.search.search_users()（本地 SQLite 下为进程内前缀索引）；
+  * 玩家搜索接口 /players/search/ 与后台参与者自动补全 /admin/autocomplete/ 的完整请求耗时。
+另外报告批量计算拼音 (rebuild) 与建立进程内索引的耗时。PostgreSQL 上走 pg_trgm / 前缀索引，需另行在库上测量。
+
+运行方式：python scripts/benchmarks/bench_user_search.py
+"""
+import random
+import time
+
+from _bootstrap import report, setup_database
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.test import Client
+
+from accounts import search
+
+USERS = 50000
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈"
+GIVEN = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华玉兰萍红鹏飞建国海燕文博宇轩浩然子涵雨欣梓萱"
+QUERIES = ['zhang', 'zw', '王', '李明', '明', 'wangfang', 'player123', 'chen', 'lj', '欧阳', 'zhaoyu', 'x']
+
+
+def latency(func, repeat=5):
+    """每个关键词执行 repeat 次，返回 (平均毫秒, 最大毫秒)。"""
+    samples = []
+    for query in QUERIES:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(query)
+            samples.append((time.perf_counter() - started) * 1000)
+    return sum(samples) / len(samples), max(samples)
+
+
+def main():
+    setup_database()
+    rng = random.Random(7)
+    User = get_user_model()
+    User.objects.bulk_create(
+        [
+            User(username=f"player{i}",
+                 display_name=rng.choice(SURNAMES) + ''.join(rng.choices(GIVEN, k=rng.choice((1, 2)))))
+            for i in range(USERS)
+        ],
+        batch_size=5000,
+    )
+    admin = User.objects.create_superuser('bench-admin', 'admin@example.com', 'pw')
+    client = Client()
+    client.force_login(admin)
+    started = time.perf_counter()
+    search.rebuild()
+    rebuild_time = time.perf_counter() - started
+    started = time.perf_counter()
+    search.search_users('warm-up')
+    build_time = time.perf_counter() - started
+
+    def scan(query):
+        # 与原来的自动补全相同：过滤后计数并取第一页
+        matched = User.objects.filter(Q(username__icontains=query) | Q(display_name__icontains=query))
+        matched.count()
+        list(matched.order_by('username').values_list('pk', 'username', 'display_name')[:20])
+
+    def endpoint(query):
+        assert client.get('/players/search/', {'q': query}).status_code == 200
+
+    def autocomplete(query):
+        response = client.get('/admin/autocomplete/', {
+            'term': query, 'app_label': 'booking', 'model_name': 'booking', 'field_name': 'participants',
+        })
+        assert response.status_code == 200
+
+    endpoint('warm-up')  # 首个请求的中间件、URL 解析等初始化不计入
+    rows = [
+        (f"计算 {USERS:,} 个用户的拼音 (s)", f"{rebuild_time:.2f}"),
+        ("建立进程内前缀索引 (ms)", f"{build_time * 1000:.0f}"),
+    ]
+    for name, func in (
+        ("icontains 全表扫描，计数并取第一页（原做法）", scan),
+        ("search_users()", lambda query: search.search_users(query)),
+        ("玩家搜索接口（完整请求）", endpoint),
+        ("后台参与者自动补全（完整请求）", autocomplete),
+    ):
+        average, worst = latency(func)
+        rows.append((f"{name} 平均 / 最慢 (ms)", f"{average:.2f} / {worst:.2f}"))
+    sample = ', '.join(profile.label for profile in search.search_users('zw', limit=5))
+    rows.append(("zw 的前 5 个结果", sample))
+    report(f"用户搜索 · {USERS:,} 个用户", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from django.contrib import admin
+
+from .models import Tournament, TournamentRound, TournamentTable
+from .rounds import RoundError, generate_round
+
+
+class TournamentRoundInline(admin.TabularInline):
+    model = TournamentRound
+    extra = 0
+    can_delete = False
+    fields = ('number', 'start_time', 'repeat_pairs', 'unassigned_tables', 'created_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Tournament)
+class TournamentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'store', 'start_time', 'round_count', 'games_per_round')
+    list_filter = ('store',)
+    filter_horizontal = ('players',)
+    inlines = [TournamentRoundInline]
+    actions = ['generate_next_round']
+
+    def generate_next_round(self, request, queryset):
+        for tournament in queryset:
+            try:
+                round_, elapsed = generate_round(tournament, request.user)
+            except RoundError as exc:
+                self.message_user(request, str(exc), level='ERROR')
+                continue
+            message = (
+                f"{round_}：{round_.tables.count()} 桌，重逢 {round_.repeat_pairs} 对，"
+                f"分桌用时 {elapsed * 1000:.0f} 毫秒。"
+            )
+            if round_.unassigned_tables:
+                self.message_user(request, f"{message}门店空闲牌桌不足，{round_.unassigned_tables} 桌未分配牌桌。", level='WARNING')
+            else:
+                self.message_user(request, message)
+
+    generate_next_round.short_description = "生成下一轮分桌"
+
+
+@admin.register(TournamentTable)
+class TournamentTableAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'booking')
+    list_filter = ('round__tournament',)
+    list_select_related = ('round__tournament', 'booking')
+    raw_id_fields = ('booking',)
+
+    def has_add_permission(self, request):
+        return False
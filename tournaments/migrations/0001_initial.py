@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-19 03:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('booking', '0007_alter_booking_booking_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='比赛名称')),
+                ('start_time', models.DateTimeField(verbose_name='第一轮开始时间')),
+                ('round_count', models.PositiveSmallIntegerField(default=4, verbose_name='轮数')),
+                ('games_per_round', models.PositiveSmallIntegerField(default=1, verbose_name='每轮半庄数')),
+                ('break_minutes', models.PositiveSmallIntegerField(default=15, verbose_name='轮间休息（分钟）')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('players', models.ManyToManyField(blank=True, related_name='tournaments', to=settings.AUTH_USER_MODEL, verbose_name='参赛选手')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tournaments', to='booking.store', verbose_name='门店')),
+            ],
+            options={
+                'verbose_name': '比赛',
+                'verbose_name_plural': '比赛',
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentRound',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField(verbose_name='轮次')),
+                ('start_time', models.DateTimeField(verbose_name='开始时间')),
+                ('repeat_pairs', models.PositiveIntegerField(default=0, verbose_name='重逢对数')),
+                ('unassigned_tables', models.PositiveIntegerField(default=0, verbose_name='未分配牌桌的桌数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rounds', to='tournaments.tournament', verbose_name='比赛')),
+            ],
+            options={
+                'verbose_name': '比赛轮次',
+                'verbose_name_plural': '比赛轮次',
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='桌次')),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tournament_table', to='booking.booking', verbose_name='对局')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tables', to='tournaments.tournamentround', verbose_name='轮次')),
+            ],
+            options={
+                'verbose_name': '比赛桌次',
+                'verbose_name_plural': '比赛桌次',
+                'ordering': ['round', 'position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tournamentround',
+            constraint=models.UniqueConstraint(fields=('tournament', 'number'), name='unique_tournament_round'),
+        ),
+    ]
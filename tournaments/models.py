@@ -0,0 +1,71 @@
+# tournaments/models.py
+import datetime
+
+from django.conf import settings
+from django.db import models
+
+from booking.models import GAME_MINUTES
+
+
+# 比赛：在一个门店进行若干轮，每轮每桌 4 人，每桌是一个已成行的 Booking（类型为「比赛」）
+class Tournament(models.Model):
+    name = models.CharField(max_length=100, verbose_name="比赛名称")
+    store = models.ForeignKey('booking.Store', on_delete=models.CASCADE, related_name='tournaments', verbose_name="门店")
+    players = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='tournaments', blank=True, verbose_name="参赛选手")
+    start_time = models.DateTimeField(verbose_name="第一轮开始时间")
+    round_count = models.PositiveSmallIntegerField(default=4, verbose_name="轮数")
+    games_per_round = models.PositiveSmallIntegerField(default=1, verbose_name="每轮半庄数")
+    break_minutes = models.PositiveSmallIntegerField(default=15, verbose_name="轮间休息（分钟）")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    def round_duration(self):
+        return datetime.timedelta(minutes=self.games_per_round * GAME_MINUTES)
+
+    def round_start(self, number):
+        """第 number 轮（从 1 开始）的开始时间。"""
+        step = self.round_duration() + datetime.timedelta(minutes=self.break_minutes)
+        return self.start_time + step * (number - 1)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "比赛"
+        verbose_name_plural = verbose_name
+
+
+class TournamentRound(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='rounds', verbose_name="比赛")
+    number = models.PositiveSmallIntegerField(verbose_name="轮次")
+    start_time = models.DateTimeField(verbose_name="开始时间")
+    # 本轮与之前轮次重复同桌的玩家对数（0 表示没有重逢）
+    repeat_pairs = models.PositiveIntegerField(default=0, verbose_name="重逢对数")
+    unassigned_tables = models.PositiveIntegerField(default=0, verbose_name="未分配牌桌的桌数")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    def __str__(self):
+        return f"{self.tournament} 第 {self.number} 轮"
+
+    class Meta:
+        verbose_name = "比赛轮次"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'number'], name='unique_tournament_round'),
+        ]
+
+
+# 一轮中的一桌，对应一个 Booking；参与者与牌桌都在 Booking 上
+class TournamentTable(models.Model):
+    round = models.ForeignKey(TournamentRound, on_delete=models.CASCADE, related_name='tables', verbose_name="轮次")
+    booking = models.OneToOneField(
+        'booking.Booking', on_delete=models.CASCADE, related_name='tournament_table', verbose_name="对局",
+    )
+    position = models.PositiveSmallIntegerField(verbose_name="桌次")
+
+    def __str__(self):
+        return f"{self.round} 第 {self.position} 桌"
+
+    class Meta:
+        verbose_name = "比赛桌次"
+        verbose_name_plural = verbose_name
+        ordering = ['round', 'position']
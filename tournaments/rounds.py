@@ -0,0 +1,98 @@
+# tournaments/rounds.py
+"""
+生成比赛的下一轮：分桌（见 tournaments/pairing.py）、一次分配牌桌、批量写入对局。
+
+整轮在一个事务中完成：
+  * 之前各轮的同桌关系从对局的反范式化名单中一次读出，构成交手矩阵；
+  * 先锁定门店的牌桌（见 booking.conflicts.lock_tables），再用 ConflictDetector 一次查出本轮时段内
+    被占用的牌桌，空闲牌桌按桌号依次分给各桌，不够时多出的桌不分配牌桌（在轮次上记录数量，
+    由工作人员手动安排）；
+  * 对局、参与者关联表、桌次都用 bulk_create 写入，名单直接写在对局上
+    （bulk_create 不触发信号），随后手动递增版本号，写入成行通知、对局创建事件与变更订阅。
+"""
+import time
+
+from django.db import transaction
+
+from accounts.profiles import get_profiles
+from booking import changes, history, metadata
+from booking.caching import bump_versions
+from booking.conflicts import ConflictDetector, lock_tables
+from booking.models import Booking
+from notifications import outbox
+
+from .models import Tournament, TournamentRound, TournamentTable
+from .pairing import meeting_matrix, pair_round, repeat_pairs
+
+
+class RoundError(Exception):
+    pass
+
+
+def generate_round(tournament, organizer):
+    """生成下一轮并返回 (TournamentRound, 分桌耗时秒数)。不能生成时抛出 RoundError。"""
+    with transaction.atomic():
+        tournament = Tournament.objects.select_for_update().get(pk=tournament.pk)
+        number = tournament.rounds.count() + 1
+        if number > tournament.round_count:
+            raise RoundError(f"{tournament} 的 {tournament.round_count} 轮已全部生成。")
+        user_ids = list(tournament.players.order_by('pk').values_list('pk', flat=True))
+        if not user_ids or len(user_ids) % 4:
+            raise RoundError(f"{tournament} 的参赛人数为 {len(user_ids)}，必须是 4 的正整数倍。")
+
+        index = {user_id: position for position, user_id in enumerate(user_ids)}
+        previous = Booking.objects.filter(tournament_table__round__tournament=tournament).values_list(
+            'participant_ids', flat=True,
+        )
+        meetings = meeting_matrix(previous, index)
+        started = time.perf_counter()
+        tables, _ = pair_round(meetings, seed=tournament.pk * 1000 + number)
+        elapsed = time.perf_counter() - started
+
+        start = tournament.round_start(number)
+        end = start + tournament.round_duration()
+        store = metadata.get_store(tournament.store_id)
+        # 先锁定门店的牌桌再查占用：并发的散客局、后台分配要等本轮提交后才能校验这些牌桌
+        lock_tables(table.id for table in store.sorted_tables)
+        busy = ConflictDetector.for_range(start, end, [store.id]).occupied_table_ids(store.id, start, end)
+        free = [table.id for table in store.sorted_tables if table.id not in busy]
+
+        profiles = get_profiles(user_ids)
+        bookings = []
+        for position, seats in enumerate(tables.tolist()):
+            ids = [user_ids[seat] for seat in seats]
+            bookings.append(Booking(
+                booking_type='TOURNAMENT',
+                creator=organizer,
+                store_id=store.id,
+                table_id=free[position] if position < len(free) else None,
+                start_time=start,
+                end_time=end,
+                num_games=tournament.games_per_round,
+                status='CONFIRMED',
+                participant_ids=ids,
+                participant_names=[profiles[user_id].label if user_id in profiles else '' for user_id in ids],
+                participant_count=len(ids),
+            ))
+        Booking.objects.bulk_create(bookings)
+        through = Booking.participants.through
+        through.objects.bulk_create([
+            through(booking_id=booking.pk, customuser_id=user_id)
+            for booking in bookings for user_id in booking.participant_ids
+        ])
+
+        round_ = TournamentRound.objects.create(
+            tournament=tournament, number=number, start_time=start,
+            repeat_pairs=repeat_pairs(meetings, tables),
+            unassigned_tables=max(len(bookings) - len(free), 0),
+        )
+        TournamentTable.objects.bulk_create([
+            TournamentTable(round=round_, booking=booking, position=position)
+            for position, booking in enumerate(bookings, 1)
+        ])
+        bump_versions([store.id], [booking.table_id for booking in bookings], user_ids + [organizer.pk])
+        outbox.bookings_confirmed(bookings)
+        history.record_many(bookings, 'CREATED', actor=organizer)
+        changes.record_bookings(bookings)
+    return round_, elapsed
+
@@ -0,0 +1,92 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from booking.models import Booking, MahjongTable, Store
+
+from . import rounds
+from .models import Tournament
+from .pairing import meeting_matrix, pair_round, repeat_pairs
+
+# 测试不依赖 Redis：缓存改用进程内的 LocMemCache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class PairingTests(TestCase):
+    def test_no_repeat_pairs_over_three_rounds(self):
+        index = {user_id: user_id for user_id in range(16)}
+        history = []
+        for number in range(3):
+            meetings = meeting_matrix(history, index)
+            tables, penalty = pair_round(meetings, seed=number)
+            self.assertEqual(penalty, 0)
+            self.assertEqual(repeat_pairs(meetings, tables), 0)
+            self.assertEqual(sorted(tables.ravel().tolist()), list(range(16)))
+            history.extend(tables.tolist())
+
+    def test_player_count_must_be_multiple_of_four(self):
+        with self.assertRaises(ValueError):
+            pair_round(meeting_matrix([], {user_id: user_id for user_id in range(10)}))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_READ_REPLICA=None, PASSWORD_HASHERS=FAST_HASHERS)
+class GenerateRoundTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name="比赛门店", address="地址")
+        self.tables = [MahjongTable.objects.create(store=self.store, table_number=str(i)) for i in range(1, 5)]
+        self.organizer = CustomUser.objects.create_user("organizer", password='pw')
+        self.players = [CustomUser.objects.create_user(f"player{i}", password='pw') for i in range(16)]
+        self.tournament = Tournament.objects.create(
+            name="测试比赛", store=self.store, round_count=3,
+            start_time=timezone.now().replace(microsecond=0) + datetime.timedelta(days=1),
+        )
+        self.tournament.players.set(self.players)
+
+    def generate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            round_, _ = rounds.generate_round(self.tournament, self.organizer)
+        return round_
+
+    def test_three_rounds_without_repeats(self):
+        for number in range(1, 4):
+            round_ = self.generate()
+            self.assertEqual(round_.number, number)
+            self.assertEqual(round_.repeat_pairs, 0)
+            self.assertEqual(round_.unassigned_tables, 0)
+        with self.assertRaises(rounds.RoundError):
+            rounds.generate_round(self.tournament, self.organizer)
+
+    def test_player_count_must_be_multiple_of_four(self):
+        self.tournament.players.remove(*self.players[:2])
+        with self.assertRaises(rounds.RoundError):
+            rounds.generate_round(self.tournament, self.organizer)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_busy_tables_leave_extra_tables_unassigned(self):
+        start = self.tournament.round_start(1)
+        Booking.objects.create(
+            creator=self.organizer, store=self.store, table=self.tables[0], status='CONFIRMED',
+            start_time=start, end_time=start + datetime.timedelta(hours=1), num_games=1,
+        )
+        locked = []
+        lock_tables = rounds.lock_tables
+
+        def recording_lock(table_ids):
+            locked.append(set(table_ids))
+            lock_tables(locked[-1])
+
+        with mock.patch.object(rounds, 'lock_tables', recording_lock):
+            round_ = self.generate()
+        # 占用检查之前锁定了门店的全部牌桌
+        self.assertEqual(locked, [{table.id for table in self.tables}])
+        self.assertEqual(round_.unassigned_tables, 1)
+        table_ids = [
+            table.booking.table_id for table in round_.tables.select_related('booking').order_by('position')
+        ]
+        self.assertEqual(table_ids, [table.id for table in self.tables[1:]] + [None])